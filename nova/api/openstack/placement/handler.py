@@ -72,7 +72,8 @@ ROUTE_DECLARATIONS = {
     },
     '/resource_providers': {
         'GET': resource_provider.list_resource_providers,
-        'POST': resource_provider.create_resource_provider
+        'POST': resource_provider.create_resource_provider,
+        'PUT': resource_provider.update_resource_providers,
     },
     '/resource_providers/{uuid}': {
         'GET': resource_provider.get_resource_provider,
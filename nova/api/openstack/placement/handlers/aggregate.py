@@ -89,8 +89,17 @@ def get_aggregates(req):
     uuid = util.wsgi_path_item(req.environ, 'uuid')
     resource_provider = rp_obj.ResourceProvider.get_by_uuid(
         context, uuid)
-    aggregate_uuids = resource_provider.get_aggregates()
 
+    # Setting the aggregates before microversion 1.19 does not increment the
+    # generation of the provider but the aggregates generation, so both are
+    # part of the ETag.
+    want_version = req.environ[microversion.MICROVERSION_ENVIRON]
+    if want_version.matches((1, 24)) and util.check_etag(
+            req, resource_provider.uuid, resource_provider.generation,
+            rp_obj.get_aggregates_generation(context)):
+        return req.response
+
+    aggregate_uuids = resource_provider.get_aggregates()
     return _send_aggregates(req, resource_provider, aggregate_uuids)
 
 
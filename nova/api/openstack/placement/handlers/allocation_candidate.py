@@ -30,9 +30,10 @@ from nova.i18n import _
 
 
 def _transform_allocation_requests_dict(alloc_reqs):
-    """Turn supplied list of AllocationRequest objects into a list of
-    allocations dicts keyed by resource provider uuid of resources involved
-    in the allocation request. The returned results are intended to be used
+    """Turn supplied list of allocation requests, tuples of
+    _AllocationRequestResource, into a list of allocations dicts keyed by
+    resource provider uuid of resources involved in the allocation request.
+    The returned results are intended to be used
     as the body of a PUT /allocations/{consumer_uuid} HTTP request at
     micoversion 1.12 (and beyond). The JSON objects look like the following:
 
@@ -59,23 +60,25 @@ def _transform_allocation_requests_dict(alloc_reqs):
     results = []
 
     for ar in alloc_reqs:
-        # A default dict of {$rp_uuid: "resources": {})
-        rp_resources = collections.defaultdict(lambda: dict(resources={}))
-        for rr in ar.resource_requests:
-            res_dict = rp_resources[rr.resource_provider.uuid]['resources']
-            res_dict[rr.resource_class] = rr.amount
-        results.append(dict(allocations=rp_resources))
+        # A dict of {$rp_uuid: "resources": {})
+        rp_resources = {}
+        for rr in ar:
+            rp_uuid = rr.resource_provider_uuid
+            if rp_uuid not in rp_resources:
+                rp_resources[rp_uuid] = {'resources': {}}
+            rp_resources[rp_uuid]['resources'][rr.resource_class] = rr.amount
+        results.append({'allocations': rp_resources})
 
     return results
 
 
 def _transform_allocation_requests_list(alloc_reqs):
-    """Turn supplied list of AllocationRequest objects into a list of dicts of
-    resources involved in the allocation request. The returned results is
-    intended to be able to be used as the body of a PUT
-    /allocations/{consumer_uuid} HTTP request, prior to microversion 1.12,
-    so therefore we return a list of JSON objects that looks like the
-    following:
+    """Turn supplied list of allocation requests, tuples of
+    _AllocationRequestResource, into a list of dicts of resources involved
+    in the allocation request. The returned results is intended to be able to
+    be used as the body of a PUT /allocations/{consumer_uuid} HTTP request,
+    prior to microversion 1.12, so therefore we return a list of JSON objects
+    that looks like the following:
 
     [
         {
@@ -95,8 +98,8 @@ def _transform_allocation_requests_list(alloc_reqs):
     results = []
     for ar in alloc_reqs:
         provider_resources = collections.defaultdict(dict)
-        for rr in ar.resource_requests:
-            res_dict = provider_resources[rr.resource_provider.uuid]
+        for rr in ar:
+            res_dict = provider_resources[rr.resource_provider_uuid]
             res_dict[rr.resource_class] = rr.amount
 
         allocs = [
@@ -115,7 +118,7 @@ def _transform_allocation_requests_list(alloc_reqs):
 
 
 def _transform_provider_summaries(p_sums, include_traits=False):
-    """Turn supplied list of ProviderSummary objects into a dict, keyed by
+    """Turn supplied list of _ProviderSummary tuples into a dict, keyed by
     resource provider UUID, of dicts of provider and inventory information. The
     traits only show up when `include_traits` is `True`.
 
@@ -159,24 +162,26 @@ def _transform_provider_summaries(p_sums, include_traits=False):
 
     for ps in p_sums:
         resources = {
-            psr.resource_class: {
-                'capacity': psr.capacity,
-                'used': psr.used,
-            } for psr in ps.resources
+            rc_name: {
+                'capacity': capacity,
+                'used': used,
+            } for rc_name, capacity, used in ps.resources
         }
 
-        ret[ps.resource_provider.uuid] = {'resources': resources}
+        ret[ps.resource_provider_uuid] = {'resources': resources}
 
         if include_traits:
-            ret[ps.resource_provider.uuid]['traits'] = [
-                t.name for t in ps.traits]
+            ret[ps.resource_provider_uuid]['traits'] = list(ps.traits)
 
     return ret
 
 
-def _transform_allocation_candidates(alloc_cands, want_version):
-    """Turn supplied AllocationCandidates object into a dict containing
-    allocation requests and provider summaries.
+def _transform_allocation_candidates(alloc_reqs, p_sums, want_version,
+                                     include_summaries=True):
+    """Turn supplied allocation requests and provider summaries, as returned
+    by AllocationCandidates.get_raw_by_requests(), into a dict containing
+    allocation requests and provider summaries. The provider summaries are
+    left out if `include_summaries` is `False`.
 
     {
         'allocation_requests': <ALLOC_REQUESTS>,
@@ -184,19 +189,18 @@ def _transform_allocation_candidates(alloc_cands, want_version):
     }
     """
     if want_version.matches((1, 12)):
-        a_reqs = _transform_allocation_requests_dict(
-            alloc_cands.allocation_requests)
+        a_reqs = _transform_allocation_requests_dict(alloc_reqs)
     else:
-        a_reqs = _transform_allocation_requests_list(
-            alloc_cands.allocation_requests)
+        a_reqs = _transform_allocation_requests_list(alloc_reqs)
 
-    include_traits = want_version.matches((1, 17))
-    p_sums = _transform_provider_summaries(alloc_cands.provider_summaries,
-                                           include_traits=include_traits)
-    return {
+    result = {
         'allocation_requests': a_reqs,
-        'provider_summaries': p_sums,
     }
+    if include_summaries:
+        include_traits = want_version.matches((1, 17))
+        result['provider_summaries'] = _transform_provider_summaries(
+            p_sums, include_traits=include_traits)
+    return result
 
 
 @wsgi_wrapper.PlacementWsgify
@@ -212,7 +216,9 @@ def list_allocation_candidates(req):
     context = req.environ['placement.context']
     want_version = req.environ[microversion.MICROVERSION_ENVIRON]
     get_schema = schema.GET_SCHEMA_1_10
-    if want_version.matches((1, 21)):
+    if want_version.matches((1, 23)):
+        get_schema = schema.GET_SCHEMA_1_23
+    elif want_version.matches((1, 21)):
         get_schema = schema.GET_SCHEMA_1_21
     elif want_version.matches((1, 17)):
         get_schema = schema.GET_SCHEMA_1_17
@@ -230,10 +236,16 @@ def list_allocation_candidates(req):
     # of an integer.
     if limit:
         limit = int(limit[0])
+    # Callers which already know about the providers can skip the summaries.
+    include_summaries = req.GET.get('provider_summaries', 'true') == 'true'
 
+    # The candidates may be read from the replica: claiming them is what checks
+    # the capacity, against the primary, so stale candidates only make that
+    # claim fail and be retried.
     try:
-        cands = rp_obj.AllocationCandidates.get_by_requests(context, requests,
-                                                            limit)
+        alloc_reqs, p_sums = rp_obj.AllocationCandidates.get_raw_by_requests(
+            context, requests, limit, use_slave=True,
+            include_summaries=include_summaries)
     except exception.ResourceClassNotFound as exc:
         raise webob.exc.HTTPBadRequest(
             _('Invalid resource class in resources parameter: %(error)s') %
@@ -242,7 +254,8 @@ def list_allocation_candidates(req):
         raise webob.exc.HTTPBadRequest(six.text_type(exc))
 
     response = req.response
-    trx_cands = _transform_allocation_candidates(cands, want_version)
+    trx_cands = _transform_allocation_candidates(
+        alloc_reqs, p_sums, want_version, include_summaries=include_summaries)
     json_data = jsonutils.dumps(trx_cands)
     response.body = encodeutils.to_utf8(json_data)
     response.content_type = 'application/json'
@@ -72,7 +72,7 @@ def _extract_inventories(body, schema):
     return data
 
 
-def _make_inventory_object(resource_provider, resource_class, **data):
+def make_inventory_object(resource_provider, resource_class, **data):
     """Single place to catch malformed Inventories."""
     # TODO(cdent): Some of the validation checks that are done here
     # could be done via JSONschema (using, for example, "minimum":
@@ -95,7 +95,7 @@ def _send_inventories(req, resource_provider, inventories):
     """Send a JSON representation of a list of inventories."""
     response = req.response
     response.status = 200
-    output, last_modified = _serialize_inventories(
+    output, last_modified = serialize_inventories(
         inventories, resource_provider.generation)
     response.body = encodeutils.to_utf8(jsonutils.dumps(output))
     response.content_type = 'application/json'
@@ -132,7 +132,7 @@ def _serialize_inventory(inventory, generation=None):
     return data
 
 
-def _serialize_inventories(inventories, generation):
+def serialize_inventories(inventories, generation):
     """Turn a list of inventories in a dict by resource class."""
     inventories_by_class = {inventory.resource_class: inventory
                             for inventory in inventories}
@@ -162,9 +162,9 @@ def create_inventory(req):
     data = _extract_inventory(req.body, schema.POST_INVENTORY_SCHEMA)
     resource_class = data.pop('resource_class')
 
-    inventory = _make_inventory_object(resource_provider,
-                                       resource_class,
-                                       **data)
+    inventory = make_inventory_object(resource_provider,
+                                      resource_class,
+                                      **data)
 
     try:
         resource_provider.add_inventory(inventory)
@@ -236,6 +236,14 @@ def get_inventories(req):
             _("No resource provider with uuid %(uuid)s found : %(error)s") %
              {'uuid': uuid, 'error': exc})
 
+    # The inventories only change along with the generation of the provider,
+    # but they show the names of the resource classes, which can change.
+    want_version = req.environ[microversion.MICROVERSION_ENVIRON]
+    if want_version.matches((1, 24)) and util.check_etag(
+            req, rp.uuid, rp.generation,
+            rp_obj.ResourceClassList.get_generation(context)):
+        return req.response
+
     inv_list = rp_obj.InventoryList.get_all_by_resource_provider(context, rp)
 
     return _send_inventories(req, rp, inv_list)
@@ -298,7 +306,7 @@ def set_inventories(req):
 
     inv_list = []
     for res_class, inventory_data in data['inventories'].items():
-        inventory = _make_inventory_object(
+        inventory = make_inventory_object(
             resource_provider, res_class, **inventory_data)
         inv_list.append(inventory)
     inventories = rp_obj.InventoryList(objects=inv_list)
@@ -391,9 +399,9 @@ def update_inventory(req):
         raise webob.exc.HTTPConflict(
             _('resource provider generation conflict'))
 
-    inventory = _make_inventory_object(resource_provider,
-                                       resource_class,
-                                       **data)
+    inventory = make_inventory_object(resource_provider,
+                                      resource_class,
+                                      **data)
 
     try:
         resource_provider.update_inventory(inventory)
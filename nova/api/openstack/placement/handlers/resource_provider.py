@@ -11,6 +11,8 @@
 #    under the License.
 """Placement API handlers for resource providers."""
 
+import copy
+
 from oslo_db import exception as db_exc
 from oslo_serialization import jsonutils
 from oslo_utils import encodeutils
@@ -19,6 +21,7 @@ from oslo_utils import uuidutils
 import webob
 
 from nova.api.openstack.placement import exception
+from nova.api.openstack.placement.handlers import inventory
 from nova.api.openstack.placement import microversion
 from nova.api.openstack.placement.objects import resource_provider as rp_obj
 from nova.api.openstack.placement.schemas import resource_provider as rp_schema
@@ -160,6 +163,12 @@ def get_resource_provider(req):
         context, uuid)
 
     response = req.response
+    if want_version.matches((1, 24)) and util.check_etag(
+            req, req.environ.get('SCRIPT_NAME', ''), resource_provider.uuid,
+            resource_provider.generation, resource_provider.name,
+            resource_provider.parent_provider_uuid,
+            resource_provider.root_provider_uuid):
+        return response
     response.body = encodeutils.to_utf8(jsonutils.dumps(
         _serialize_provider(req.environ, resource_provider, want_version)))
     response.content_type = 'application/json'
@@ -222,9 +231,10 @@ def list_resource_providers(req):
                 value = util.normalize_traits_qs_param(
                     value, allow_forbidden=allow_forbidden)
             filters[attr] = value
+    # Listing providers tolerates stale results, so it may use the replica.
     try:
         resource_providers = rp_obj.ResourceProviderList.get_all_by_filters(
-            context, filters)
+            context, filters, use_slave=True)
     except exception.ResourceClassNotFound as exc:
         raise webob.exc.HTTPBadRequest(
             _('Invalid resource class in resources parameter: %(error)s') %
@@ -291,3 +301,141 @@ def update_resource_provider(req):
         response.last_modified = resource_provider.updated_at
         response.cache_control = 'no-cache'
     return response
+
+
+def _extract_provider_update(context, uuid, data):
+    """Turn the changes requested for a resource provider into a
+    ProviderUpdate, checking the generation of the provider.
+    """
+    try:
+        resource_provider = rp_obj.ResourceProvider.get_by_uuid(
+            context, uuid)
+    except exception.NotFound:
+        raise webob.exc.HTTPNotFound(
+            _('No resource provider with uuid %s found') % uuid)
+    if data['resource_provider_generation'] != resource_provider.generation:
+        raise webob.exc.HTTPConflict(
+            _('resource provider generation conflict for resource provider '
+              '%(rp_uuid)s') % {'rp_uuid': uuid})
+
+    inventories = None
+    if 'inventories' in data:
+        inv_list = []
+        for res_class, raw_inventory in data['inventories'].items():
+            inventory_data = copy.copy(inventory.INVENTORY_DEFAULTS)
+            inventory_data.update(raw_inventory)
+            inv_list.append(inventory.make_inventory_object(
+                resource_provider, res_class, **inventory_data))
+        inventories = rp_obj.InventoryList(objects=inv_list)
+
+    traits = None
+    if 'traits' in data:
+        traits = rp_obj.TraitList(objects=[])
+        if data['traits']:
+            traits = rp_obj.TraitList.get_all(
+                context, filters={'name_in': data['traits']})
+        non_existed_trait = set(data['traits']) - set(t.name for t in traits)
+        if non_existed_trait:
+            raise webob.exc.HTTPBadRequest(
+                _("No such trait %s") % ', '.join(sorted(non_existed_trait)))
+
+    return rp_obj.ProviderUpdate(resource_provider, inventories, traits,
+                                 data.get('aggregates'))
+
+
+def _update_providers(context, updates):
+    """Apply ProviderUpdates in a single transaction, turning the failures
+    into HTTP errors.
+    """
+    try:
+        rp_obj.update_providers(context, updates)
+    except exception.ResourceClassNotFound as exc:
+        raise webob.exc.HTTPBadRequest(
+            _('Unknown resource class in inventory: %(error)s') %
+            {'error': exc})
+    except exception.InventoryWithResourceClassNotFound as exc:
+        raise webob.exc.HTTPConflict(
+            _('Race condition detected when setting inventory. No inventory '
+              'record with resource class: %(error)s') % {'error': exc})
+    except (exception.ConcurrentUpdateDetected,
+            exception.InventoryInUse,
+            db_exc.DBDuplicateEntry) as exc:
+        raise webob.exc.HTTPConflict(
+            _('update conflict: %(error)s') % {'error': exc})
+    except exception.InvalidInventoryCapacity as exc:
+        raise webob.exc.HTTPBadRequest(
+            _('Unable to update inventory: %(error)s') % {'error': exc})
+
+
+def _serialize_provider_update(update):
+    resource_provider = update.resource_provider
+    data = {'resource_provider_generation': resource_provider.generation}
+    if update.inventories is not None:
+        data['inventories'] = inventory.serialize_inventories(
+            update.inventories, resource_provider.generation)[0][
+                'inventories']
+    if update.traits is not None:
+        data['traits'] = sorted(t.name for t in update.traits)
+    if update.aggregates is not None:
+        data['aggregates'] = update.aggregates
+    return data
+
+
+def _serialize_provider_error(exc):
+    """Represent a failure to update one resource provider in the same form
+    as the error of a whole request.
+    """
+    return {'errors': [{
+        'status': exc.code,
+        'title': exc.title,
+        'detail': exc.detail,
+    }]}
+
+
+@wsgi_wrapper.PlacementWsgify
+@microversion.version_handler('1.25', status_code=405)
+@util.require_content('application/json')
+def update_resource_providers(req):
+    """PUT to replace the inventories, traits and aggregates of several
+    resource providers at once.
+
+    The changes are made in a single transaction, and any failure is returned
+    as the error of the request, unless 'atomic' is false. In that case each
+    provider is updated on its own and the error of each provider which could
+    not be updated is returned in its place.
+
+    On success return a 200 response with, for each provider, its new
+    generation and what was set on it.
+    """
+    context = req.environ['placement.context']
+    data = util.extract_json(req.body, rp_schema.PUT_RESOURCE_PROVIDERS_SCHEMA)
+    # Update the providers in a consistent order, so that concurrent requests
+    # lock their rows in the same order.
+    providers = sorted(data['resource_providers'].items())
+
+    results = {}
+    if data.get('atomic', True):
+        updates = [_extract_provider_update(context, uuid, rp_data)
+                   for uuid, rp_data in providers]
+        _update_providers(context, updates)
+        for update in updates:
+            results[update.resource_provider.uuid] = (
+                _serialize_provider_update(update))
+    else:
+        for uuid, rp_data in providers:
+            try:
+                update = _extract_provider_update(context, uuid, rp_data)
+                _update_providers(context, [update])
+            except webob.exc.HTTPError as exc:
+                results[uuid] = _serialize_provider_error(exc)
+            else:
+                results[uuid] = _serialize_provider_update(update)
+
+    response = req.response
+    response.status = 200
+    response.body = encodeutils.to_utf8(jsonutils.dumps(
+        {'resource_providers': results}))
+    response.content_type = 'application/json'
+    response.cache_control = 'no-cache'
+    response.last_modified = timeutils.utcnow(with_timezone=True)
+    return response
@@ -191,6 +191,12 @@ def list_traits_for_resource_provider(req):
             _("No resource provider with uuid %(uuid)s found: %(error)s") %
              {'uuid': uuid, 'error': exc})
 
+    # Changing the traits of a provider increments its generation, and traits
+    # associated with a provider can not be deleted.
+    if want_version.matches((1, 24)) and util.check_etag(
+            req, rp.uuid, rp.generation):
+        return req.response
+
     traits = rp_obj.TraitList.get_all_by_resource_provider(context, rp)
     response_body, last_modified = _serialize_traits(traits, want_version)
     response_body["resource_provider_generation"] = rp.generation
@@ -59,8 +59,9 @@ def list_usages(req):
             _("No resource provider with uuid %(uuid)s found: %(error)s") %
              {'uuid': uuid, 'error': exc})
 
+    # Usages are informational, so they may be read from the replica.
     usage = rp_obj.UsageList.get_all_by_resource_provider_uuid(
-        context, uuid)
+        context, uuid, use_slave=True)
 
     response = req.response
     response.body = encodeutils.to_utf8(jsonutils.dumps(
@@ -96,7 +97,8 @@ def get_total_usages(req):
     user_id = req.GET.get('user_id')
 
     usages = rp_obj.UsageList.get_all_by_project_user(context, project_id,
-                                                      user_id=user_id)
+                                                      user_id=user_id,
+                                                      use_slave=True)
 
     response = req.response
     usages_dict = {'usages': {resource.resource_class: resource.usage
@@ -63,6 +63,12 @@ VERSIONS = [
              # GET /allocation_candidates
     '1.22',  # Support forbidden traits in the required parameter of
              # GET /resource_providers and GET /allocation_candidates
+    '1.23',  # Support ?provider_summaries=false queryparam on
+             # GET /allocation_candidates
+    '1.24',  # Support ETag and If-None-Match on GET /resource_providers/{uuid}
+             # and its inventories, traits and aggregates
+    '1.25',  # Adds PUT /resource_providers to set the inventories, traits and
+             # aggregates of multiple resource providers
 ]
 
 
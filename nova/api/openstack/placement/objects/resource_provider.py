@@ -11,7 +11,10 @@
 #    under the License.
 
 import collections
+import contextlib
 import copy
+import functools
+import inspect
 import itertools
 import random
 
@@ -47,22 +50,69 @@ _TRAIT_TBL = models.Trait.__table__
 _ALLOC_TBL = models.Allocation.__table__
 _INV_TBL = models.Inventory.__table__
 _RP_TBL = models.ResourceProvider.__table__
-# Not used in this file but used in tests.
 _RC_TBL = models.ResourceClass.__table__
 _AGG_TBL = models.PlacementAggregate.__table__
 _RP_AGG_TBL = models.ResourceProviderAggregate.__table__
 _RP_TRAIT_TBL = models.ResourceProviderTrait.__table__
+_USAGE_TBL = models.Usage.__table__
+_TREE_INV_TBL = models.ProviderTreeInventory.__table__
 _PROJECT_TBL = models.Project.__table__
 _USER_TBL = models.User.__table__
 _CONSUMER_TBL = models.Consumer.__table__
+_GEN_TBL = models.PlacementGeneration.__table__
 _RC_CACHE = None
+# A (generations, provider IDs by resource class) tuple of the providers
+# sharing their inventory via aggregates, see _get_sharing_providers_by_rc()
+_SHARING_CACHE = None
 _TRAIT_LOCK = 'trait_sync'
 _TRAITS_SYNCED = False
+# The name of the generation bumped by sync_usages(), which only exists once
+# the usages table has been built from the allocations.
+_USAGES_GENERATION = 'usages'
+# The names of the generations bumped by each change of the custom resource
+# classes, and of the aggregates of a provider not bumping its generation.
+_RC_GENERATION = 'resource_classes'
+_AGG_GENERATION = 'aggregates'
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
+def _select_reader_mode(f):
+    """Decorator to select the reader mode of a placement read, like
+    nova.db.sqlalchemy.api.select_db_reader_mode does for the main database.
+
+    If the wrapped function is called with use_slave=True, it reads from the
+    API database replica, [api_database]/slave_connection, if one is
+    configured. Reads there may lag behind the writes, so this is only for
+    callers tolerating stale results. Any reader nested in the wrapped
+    function must be marked allow_async.
+    """
+
+    arg_names = inspect.getargspec(f).args
+    context_pos = arg_names.index('context')
+    use_slave_pos = arg_names.index('use_slave')
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        if len(args) > context_pos:
+            context = args[context_pos]
+        else:
+            context = kwargs['context']
+        if len(args) > use_slave_pos:
+            use_slave = args[use_slave_pos]
+        else:
+            use_slave = kwargs.get('use_slave', False)
+        if use_slave:
+            reader_mode = db_api.api_context_manager.async
+        else:
+            reader_mode = db_api.api_context_manager.reader
+
+        with reader_mode.using(context):
+            return f(*args, **kwargs)
+    return wrapper
+
+
 @db_api.api_context_manager.reader
 def _ensure_rc_cache(ctx):
     """Ensures that a singleton resource class cache has been created in the
@@ -259,6 +309,352 @@ def _update_inventory_for_provider(ctx, rp, inv_list, to_update):
     return exceeded
 
 
+def _get_generation(ctx, name):
+    """Returns the generation of the named placement data, or None if it was
+    never bumped.
+
+    :param ctx: `nova.context.RequestContext` that contains an oslo_db Session
+    :param name: Name of the generation
+    """
+    sel = sa.select([_GEN_TBL.c.generation]).where(_GEN_TBL.c.name == name)
+    return ctx.session.execute(sel).scalar()
+
+
+def _increment_generation(ctx, name):
+    """Bumps the generation of the named placement data, which must be done in
+    the transaction changing the data.
+
+    :param ctx: `nova.context.RequestContext` that contains an oslo_db Session
+    :param name: Name of the generation
+    """
+    upd_stmt = _GEN_TBL.update().where(_GEN_TBL.c.name == name).values(
+        generation=_GEN_TBL.c.generation + 1)
+    if ctx.session.execute(upd_stmt).rowcount:
+        return
+    ins_stmt = _GEN_TBL.insert().values(name=name, generation=1)
+    try:
+        with db_api.api_context_manager.writer.savepoint.using(ctx):
+            ctx.session.execute(ins_stmt)
+    except db_exc.DBDuplicateEntry:
+        # A concurrent transaction bumped the generation first.
+        ctx.session.execute(upd_stmt)
+
+
+def _usages_synced(ctx):
+    """Returns whether sync_usages() built the usages table from the
+    allocations, so that it can be read instead of summing them.
+    """
+    return _get_generation(ctx, _USAGES_GENERATION) is not None
+
+
+def _usage_subquery(ctx, rc_ids, name='usage', rp_ids=None):
+    """Returns a derived table, with resource_provider_id, resource_class_id
+    and used columns, of the amount of each of the supplied resource classes
+    used on each resource provider.
+
+    The amounts are read from the usages table if CONF.placement.track_usages
+    is True and the table was built by sync_usages(), otherwise they are
+    summed from the allocations.
+
+    :param ctx: `nova.context.RequestContext` that contains an oslo_db Session
+    :param rc_ids: List of resource class internal IDs
+    :param name: Name of the derived table
+    :param rp_ids: Optional list of resource provider internal IDs to restrict
+                   the usages to
+    """
+    if CONF.placement.track_usages and _usages_synced(ctx):
+        tbl = _USAGE_TBL
+        sel = sa.select([tbl.c.resource_provider_id, tbl.c.resource_class_id,
+                         tbl.c.used])
+    else:
+        tbl = _ALLOC_TBL
+        sel = sa.select([tbl.c.resource_provider_id, tbl.c.resource_class_id,
+                         sql.func.sum(tbl.c.used).label('used')])
+        sel = sel.group_by(tbl.c.resource_provider_id,
+                           tbl.c.resource_class_id)
+    sel = sel.where(tbl.c.resource_class_id.in_(rc_ids))
+    if rp_ids is not None:
+        sel = sel.where(tbl.c.resource_provider_id.in_(rp_ids))
+    return sa.alias(sel, name=name)
+
+
+def _sum_allocations(ctx, rp_id, rc_id):
+    """Returns the sum of the allocations of a resource class against a
+    resource provider.
+    """
+    sel = sa.select([func.coalesce(func.sum(_ALLOC_TBL.c.used), 0)])
+    sel = sel.where(sa.and_(_ALLOC_TBL.c.resource_provider_id == rp_id,
+                            _ALLOC_TBL.c.resource_class_id == rc_id))
+    return ctx.session.execute(sel).scalar()
+
+
+def _adjust_usages(ctx, deltas):
+    """Adds amounts to the usages of resource providers in the usages table,
+    which must be done in the transaction writing the allocations whether or
+    not CONF.placement.track_usages is enabled, so that the table never goes
+    stale.
+
+    :param deltas: A dict, keyed by (resource provider internal ID, resource
+                   class internal ID) tuples, of the amounts to add to the
+                   usages
+    """
+    for (rp_id, rc_id), delta in deltas.items():
+        if not delta:
+            continue
+        upd_stmt = _USAGE_TBL.update().where(sa.and_(
+            _USAGE_TBL.c.resource_provider_id == rp_id,
+            _USAGE_TBL.c.resource_class_id == rc_id)).values(
+                used=_USAGE_TBL.c.used + delta)
+        if ctx.session.execute(upd_stmt).rowcount:
+            continue
+        # There is no usage yet for this provider and resource class, the
+        # allocations written so far in the transaction make it up.
+        ins_stmt = _USAGE_TBL.insert().values(
+            resource_provider_id=rp_id, resource_class_id=rc_id,
+            used=_sum_allocations(ctx, rp_id, rc_id))
+        try:
+            with db_api.api_context_manager.writer.savepoint.using(ctx):
+                ctx.session.execute(ins_stmt)
+        except db_exc.DBDuplicateEntry:
+            # A concurrent transaction inserted the usage first, from the
+            # allocations committed before ours.
+            ctx.session.execute(upd_stmt)
+
+
+@db_api.api_context_manager.writer
+def sync_usages(ctx, verify=False):
+    """Brings the usages table in line with the allocations, to be used once
+    after upgrading, before enabling CONF.placement.track_usages, or to check
+    the table afterwards. The usages table is only read once it has been built
+    by this function.
+
+    :param ctx: `nova.context.RequestContext` that contains an oslo_db Session
+    :param verify: If True, only report the usages which differ from the
+                   allocations without changing them
+    :returns: A list of (resource provider internal ID, resource class
+              internal ID, tracked used, allocated) tuples of the usages which
+              differed from the allocations
+    """
+    sel = sa.select([_ALLOC_TBL.c.resource_provider_id,
+                     _ALLOC_TBL.c.resource_class_id,
+                     sql.func.sum(_ALLOC_TBL.c.used).label('used')])
+    sel = sel.group_by(_ALLOC_TBL.c.resource_provider_id,
+                       _ALLOC_TBL.c.resource_class_id)
+    allocated = {(r[0], r[1]): int(r[2])
+                 for r in ctx.session.execute(sel)}
+    sel = sa.select([_USAGE_TBL.c.resource_provider_id,
+                     _USAGE_TBL.c.resource_class_id,
+                     _USAGE_TBL.c.used])
+    tracked = {(r[0], r[1]): r[2] for r in ctx.session.execute(sel)}
+
+    mismatches = []
+    for key in sorted(set(allocated) | set(tracked)):
+        used = allocated.get(key, 0)
+        if tracked.get(key, 0) != used:
+            mismatches.append(key + (tracked.get(key), used))
+    if verify:
+        return mismatches
+
+    for rp_id, rc_id, tracked_used, used in mismatches:
+        if tracked_used is None:
+            ins_stmt = _USAGE_TBL.insert().values(
+                resource_provider_id=rp_id, resource_class_id=rc_id,
+                used=used)
+            ctx.session.execute(ins_stmt)
+        else:
+            upd_stmt = _USAGE_TBL.update().where(sa.and_(
+                _USAGE_TBL.c.resource_provider_id == rp_id,
+                _USAGE_TBL.c.resource_class_id == rc_id)).values(used=used)
+            ctx.session.execute(upd_stmt)
+    _increment_generation(ctx, _USAGES_GENERATION)
+    return mismatches
+
+
+def _get_tree_inventories(ctx, root_ids=None, rp_id=None):
+    """Returns a dict, keyed by (root provider internal ID, resource class
+    internal ID) tuples, of (capacity, used) tuples summed over the providers
+    in each tree.
+
+    The amount used on each provider is capped at the provider's capacity, so
+    an overcommitted provider does not hide the free capacity of the other
+    providers in its tree.
+
+    :param root_ids: Optional list of root provider internal IDs to restrict
+                     the trees to
+    :param rp_id: Optional internal ID of a single resource provider to sum
+                  the inventory of, instead of whole trees
+    """
+    usage = sa.select([_ALLOC_TBL.c.resource_provider_id,
+                       _ALLOC_TBL.c.resource_class_id,
+                       sql.func.sum(_ALLOC_TBL.c.used).label('used')])
+    if rp_id is not None:
+        usage = usage.where(_ALLOC_TBL.c.resource_provider_id == rp_id)
+    elif root_ids is not None:
+        tree_sel = sa.select([_RP_TBL.c.id]).where(
+            _RP_TBL.c.root_provider_id.in_(root_ids))
+        usage = usage.where(_ALLOC_TBL.c.resource_provider_id.in_(tree_sel))
+    usage = usage.group_by(_ALLOC_TBL.c.resource_provider_id,
+                           _ALLOC_TBL.c.resource_class_id)
+    usage = sa.alias(usage, name='usage')
+
+    rp_to_inv = sa.join(_RP_TBL, _INV_TBL,
+                        _RP_TBL.c.id == _INV_TBL.c.resource_provider_id)
+    inv_to_usage = sa.outerjoin(rp_to_inv, usage, sa.and_(
+        _INV_TBL.c.resource_provider_id == usage.c.resource_provider_id,
+        _INV_TBL.c.resource_class_id == usage.c.resource_class_id))
+    sel = sa.select([_RP_TBL.c.root_provider_id,
+                     _INV_TBL.c.resource_class_id,
+                     _INV_TBL.c.total,
+                     _INV_TBL.c.reserved,
+                     _INV_TBL.c.allocation_ratio,
+                     usage.c.used]).select_from(inv_to_usage)
+    sel = sel.where(_RP_TBL.c.root_provider_id != null())
+    if rp_id is not None:
+        sel = sel.where(_RP_TBL.c.id == rp_id)
+    elif root_ids is not None:
+        sel = sel.where(_RP_TBL.c.root_provider_id.in_(root_ids))
+
+    trees = {}
+    for root_id, rc_id, total, reserved, ratio, used in (
+            ctx.session.execute(sel)):
+        capacity = int((total - reserved) * ratio)
+        used = min(int(used or 0), capacity)
+        tree_capacity, tree_used = trees.get((root_id, rc_id), (0, 0))
+        trees[root_id, rc_id] = (tree_capacity + capacity, tree_used + used)
+    return trees
+
+
+def _adjust_tree_inventories(ctx, deltas):
+    """Adds amounts to the capacity and used amounts of provider trees in the
+    provider_tree_inventories table, which must be done in the transaction
+    changing the inventories or allocations.
+
+    :param deltas: A dict, keyed by (root provider internal ID, resource class
+                   internal ID) tuples, of (capacity, used) tuples of the
+                   amounts to add
+    """
+    for (root_id, rc_id), (capacity, used) in deltas.items():
+        if not capacity and not used:
+            continue
+        upd_stmt = _TREE_INV_TBL.update().where(sa.and_(
+            _TREE_INV_TBL.c.root_provider_id == root_id,
+            _TREE_INV_TBL.c.resource_class_id == rc_id)).values(
+                capacity=_TREE_INV_TBL.c.capacity + capacity,
+                used=_TREE_INV_TBL.c.used + used)
+        if ctx.session.execute(upd_stmt).rowcount:
+            continue
+        # The tree is not tracked yet for this resource class, the changes
+        # made so far in the transaction are part of its current inventory.
+        trees = _get_tree_inventories(ctx, root_ids=[root_id])
+        tree_capacity, tree_used = trees.get((root_id, rc_id), (0, 0))
+        ins_stmt = _TREE_INV_TBL.insert().values(
+            root_provider_id=root_id, resource_class_id=rc_id,
+            capacity=tree_capacity, used=tree_used)
+        try:
+            with db_api.api_context_manager.writer.savepoint.using(ctx):
+                ctx.session.execute(ins_stmt)
+        except db_exc.DBDuplicateEntry:
+            # A concurrent transaction inserted the tree first, from the
+            # changes committed before ours.
+            ctx.session.execute(upd_stmt)
+
+
+def _adjust_tree_usages(ctx, deltas):
+    """Adds amounts allocated against resource providers to the used amounts
+    of their trees in the provider_tree_inventories table.
+
+    Allocations are only ever added within the capacity of a provider, so
+    adding the amounts is exact. Removing an allocation from an overcommitted
+    provider can leave the used amount of its tree lower than the capped sum,
+    which only makes the tree look less full than it is.
+
+    :param deltas: A dict, keyed by (resource provider internal ID, resource
+                   class internal ID) tuples, of the amounts to add to the
+                   used amounts
+    """
+    rp_ids = set(rp_id for rp_id, rc_id in deltas)
+    if not rp_ids:
+        return
+    sel = sa.select([_RP_TBL.c.id, _RP_TBL.c.root_provider_id])
+    sel = sel.where(_RP_TBL.c.id.in_(rp_ids))
+    roots = dict(ctx.session.execute(sel).fetchall())
+    tree_deltas = collections.defaultdict(int)
+    for (rp_id, rc_id), delta in deltas.items():
+        root_id = roots.get(rp_id)
+        if root_id is not None:
+            tree_deltas[root_id, rc_id] += delta
+    _adjust_tree_inventories(
+        ctx, {key: (0, used) for key, used in tree_deltas.items()})
+
+
+@contextlib.contextmanager
+def _tracking_provider_tree(ctx, rp_id):
+    """Context manager bringing the provider_tree_inventories table in line
+    with the changes made, within the block, to the inventory or the tree of
+    a resource provider when CONF.placement.track_provider_trees is True.
+
+    :param rp_id: Internal ID of the resource provider being changed
+    """
+    if not CONF.placement.track_provider_trees:
+        yield
+        return
+    before = _get_tree_inventories(ctx, rp_id=rp_id)
+    yield
+    after = _get_tree_inventories(ctx, rp_id=rp_id)
+    deltas = {}
+    for key in set(before) | set(after):
+        capacity, used = after.get(key, (0, 0))
+        old_capacity, old_used = before.get(key, (0, 0))
+        deltas[key] = (capacity - old_capacity, used - old_used)
+    _adjust_tree_inventories(ctx, deltas)
+
+
+@db_api.api_context_manager.writer
+def sync_provider_trees(ctx, verify=False):
+    """Brings the provider_tree_inventories table in line with the inventories
+    and allocations, to be used when enabling
+    CONF.placement.track_provider_trees or to check the table afterwards.
+
+    :param ctx: `nova.context.RequestContext` that contains an oslo_db Session
+    :param verify: If True, only report the trees which differ from the
+                   inventories without changing them
+    :returns: A list of (root provider internal ID, resource class internal
+              ID, tracked capacity, tracked used, capacity, used) tuples of
+              the trees which differed from the inventories
+    """
+    trees = _get_tree_inventories(ctx)
+    sel = sa.select([_TREE_INV_TBL.c.root_provider_id,
+                     _TREE_INV_TBL.c.resource_class_id,
+                     _TREE_INV_TBL.c.capacity,
+                     _TREE_INV_TBL.c.used])
+    tracked = {(r[0], r[1]): (r[2], r[3]) for r in ctx.session.execute(sel)}
+
+    mismatches = []
+    for key in sorted(set(trees) | set(tracked)):
+        capacity, used = trees.get(key, (0, 0))
+        tracked_capacity, tracked_used = tracked.get(key, (None, None))
+        if (tracked_capacity or 0, tracked_used or 0) != (capacity, used):
+            mismatches.append(
+                key + (tracked_capacity, tracked_used, capacity, used))
+    if verify:
+        return mismatches
+
+    for (root_id, rc_id, tracked_capacity, tracked_used,
+         capacity, used) in mismatches:
+        if tracked_capacity is None:
+            ins_stmt = _TREE_INV_TBL.insert().values(
+                root_provider_id=root_id, resource_class_id=rc_id,
+                capacity=capacity, used=used)
+            ctx.session.execute(ins_stmt)
+        else:
+            upd_stmt = _TREE_INV_TBL.update().where(sa.and_(
+                _TREE_INV_TBL.c.root_provider_id == root_id,
+                _TREE_INV_TBL.c.resource_class_id == rc_id)).values(
+                    capacity=capacity, used=used)
+            ctx.session.execute(upd_stmt)
+    return mismatches
+
+
 def _increment_provider_generation(ctx, rp):
     """Increments the supplied provider's generation value, supplying the
     currently-known generation. Returns whether the increment succeeded.
@@ -294,8 +690,9 @@ def _add_inventory(context, rp, inventory):
     _ensure_rc_cache(context)
     rc_id = _RC_CACHE.id_from_string(inventory.resource_class)
     inv_list = InventoryList(objects=[inventory])
-    _add_inventory_to_provider(
-        context, rp, inv_list, set([rc_id]))
+    with _tracking_provider_tree(context, rp.id):
+        _add_inventory_to_provider(
+            context, rp, inv_list, set([rc_id]))
     rp.generation = _increment_provider_generation(context, rp)
 
 
@@ -309,8 +706,9 @@ def _update_inventory(context, rp, inventory):
     _ensure_rc_cache(context)
     rc_id = _RC_CACHE.id_from_string(inventory.resource_class)
     inv_list = InventoryList(objects=[inventory])
-    exceeded = _update_inventory_for_provider(
-        context, rp, inv_list, set([rc_id]))
+    with _tracking_provider_tree(context, rp.id):
+        exceeded = _update_inventory_for_provider(
+            context, rp, inv_list, set([rc_id]))
     rp.generation = _increment_provider_generation(context, rp)
     return exceeded
 
@@ -324,7 +722,9 @@ def _delete_inventory(context, rp, resource_class):
     """
     _ensure_rc_cache(context)
     rc_id = _RC_CACHE.id_from_string(resource_class)
-    if not _delete_inventory_from_provider(context, rp, [rc_id]):
+    with _tracking_provider_tree(context, rp.id):
+        deleted = _delete_inventory_from_provider(context, rp, [rc_id])
+    if not deleted:
         raise exception.NotFound(
             'No inventory of class %s found for delete'
             % resource_class)
@@ -366,13 +766,14 @@ def _set_inventory(context, rp, inv_list):
     to_update = these_resources & existing_resources
     exceeded = []
 
-    if to_delete:
-        _delete_inventory_from_provider(context, rp, to_delete)
-    if to_add:
-        _add_inventory_to_provider(context, rp, inv_list, to_add)
-    if to_update:
-        exceeded = _update_inventory_for_provider(context, rp, inv_list,
-                                                  to_update)
+    with _tracking_provider_tree(context, rp.id):
+        if to_delete:
+            _delete_inventory_from_provider(context, rp, to_delete)
+        if to_add:
+            _add_inventory_to_provider(context, rp, inv_list, to_add)
+        if to_update:
+            exceeded = _update_inventory_for_provider(context, rp, inv_list,
+                                                      to_update)
 
     # Here is where we update the resource provider's generation value.  If
     # this update updates zero rows, that means that another thread has updated
@@ -494,6 +895,16 @@ def _set_aggregates(context, resource_provider, provided_aggregates,
     if increment_generation:
         resource_provider.generation = _increment_provider_generation(
             context, resource_provider)
+    else:
+        _increment_generation(context, _AGG_GENERATION)
+
+
+@db_api.api_context_manager.reader
+def get_aggregates_generation(context):
+    """Returns a generation which changes whenever the aggregates of a
+    resource provider are set without incrementing its generation.
+    """
+    return _get_generation(context, _AGG_GENERATION) or 0
 
 
 @db_api.api_context_manager.reader
@@ -601,7 +1012,8 @@ def _set_root_provider_id(context, rp_id, root_id):
     """
     upd = _RP_TBL.update().where(_RP_TBL.c.id == rp_id)
     upd = upd.values(root_provider_id=root_id)
-    context.session.execute(upd)
+    with _tracking_provider_tree(context, rp_id):
+        context.session.execute(upd)
 
 
 ProviderIds = collections.namedtuple(
@@ -847,8 +1259,17 @@ class ResourceProvider(base.VersionedObject, base.TimestampedObject):
         if rp_allocations:
             raise exception.ResourceProviderInUse()
         # Delete any inventory associated with the resource provider
-        context.session.query(models.Inventory).\
-            filter(models.Inventory.resource_provider_id == _id).\
+        with _tracking_provider_tree(context, _id):
+            context.session.query(models.Inventory).\
+                filter(models.Inventory.resource_provider_id == _id).\
+                delete(synchronize_session=False)
+        # Delete any usages tracked for the resource provider
+        context.session.query(models.Usage).\
+            filter(models.Usage.resource_provider_id == _id).\
+            delete(synchronize_session=False)
+        # Delete any capacity tracked for the tree the provider is the root of
+        context.session.query(models.ProviderTreeInventory).\
+            filter(models.ProviderTreeInventory.root_provider_id == _id).\
             delete(synchronize_session=False)
         # Delete any aggregate associations for the resource provider
         # The name substitution on the next line is needed to satisfy pep8
@@ -874,6 +1295,9 @@ class ResourceProvider(base.VersionedObject, base.TimestampedObject):
             raise exception.CannotDeleteParentResourceProvider()
         if not result:
             raise exception.NotFound()
+        # The ID of the provider could be reused by a new sharing provider
+        global _SHARING_CACHE
+        _SHARING_CACHE = None
 
     @db_api.api_context_manager.writer
     def _update_in_db(self, context, id, updates):
@@ -917,15 +1341,17 @@ class ResourceProvider(base.VersionedObject, base.TimestampedObject):
         db_rp = context.session.query(models.ResourceProvider).filter_by(
             id=id).first()
         db_rp.update(updates)
-        try:
-            db_rp.save(context.session)
-        except sqla_exc.IntegrityError:
-            # NOTE(jaypipes): Another thread snuck in and deleted the parent
-            # for this resource provider in between the above check for a valid
-            # parent provider and here...
-            raise exception.ObjectActionError(
-                    action='update',
-                    reason=_('parent provider UUID does not exist.'))
+        # Parenting a provider moves its inventory into the parent's tree
+        with _tracking_provider_tree(context, id):
+            try:
+                db_rp.save(context.session)
+            except sqla_exc.IntegrityError:
+                # NOTE(jaypipes): Another thread snuck in and deleted the
+                # parent for this resource provider in between the above
+                # check for a valid parent provider and here...
+                raise exception.ObjectActionError(
+                        action='update',
+                        reason=_('parent provider UUID does not exist.'))
 
     @staticmethod
     @db_api.api_context_manager.writer  # Needed for online data migration
@@ -944,7 +1370,40 @@ class ResourceProvider(base.VersionedObject, base.TimestampedObject):
         return resource_provider
 
 
-@db_api.api_context_manager.reader
+ProviderUpdate = collections.namedtuple(
+    'ProviderUpdate', 'resource_provider inventories traits aggregates')
+
+
+@db_api.api_context_manager.writer
+def update_providers(context, updates):
+    """Replaces the inventories, traits and aggregates of several resource
+    providers in a single transaction, so that either all or none of the
+    changes are made.
+
+    Each change increments the generation of its provider, after checking it
+    against the generation the provider object was read with.
+
+    :param context: `nova.context.RequestContext` that contains an oslo_db
+                    Session
+    :param updates: A list of ProviderUpdate namedtuples, with the
+                    ResourceProvider to update, an InventoryList of its new
+                    inventories, a list of its new Trait objects and a list of
+                    its new aggregate UUIDs. Any of the last three left as
+                    None is not changed.
+    :raises nova.exception.ConcurrentUpdateDetected: if another thread updated
+            one of the providers since it was read.
+    """
+    for update in updates:
+        rp = update.resource_provider
+        if update.inventories is not None:
+            rp.set_inventory(update.inventories)
+        if update.traits is not None:
+            rp.set_traits(update.traits)
+        if update.aggregates is not None:
+            rp.set_aggregates(update.aggregates, increment_generation=True)
+
+
+@db_api.api_context_manager.reader.allow_async
 def _get_providers_with_shared_capacity(ctx, rc_id, amount):
     """Returns a list of resource provider IDs (internal IDs, not UUIDs)
     that have capacity for a requested amount of a resource and indicate that
@@ -1037,11 +1496,7 @@ def _get_providers_with_shared_capacity(ctx, rc_id, amount):
         ),
     )
 
-    usage = sa.select([_ALLOC_TBL.c.resource_provider_id,
-                       sql.func.sum(_ALLOC_TBL.c.used).label('used')])
-    usage = usage.where(_ALLOC_TBL.c.resource_class_id == rc_id)
-    usage = usage.group_by(_ALLOC_TBL.c.resource_provider_id)
-    usage = sa.alias(usage, name='usage')
+    usage = _usage_subquery(ctx, [rc_id])
 
     inv_to_usage_join = sa.outerjoin(
         rp_to_inv_join, usage,
@@ -1063,7 +1518,72 @@ def _get_providers_with_shared_capacity(ctx, rc_id, amount):
     return [r[0] for r in ctx.session.execute(sel)]
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.independent
+def _get_sharing_providers_by_rc(ctx):
+    """Returns a dict, keyed by resource class ID, of sets of internal IDs of
+    the providers marked with MISC_SHARES_VIA_AGGREGATE which have inventory
+    of that resource class.
+
+    Sharing providers rarely change, so they are cached in the process along
+    with their generations. Since any change of the traits or inventories of a
+    provider increments its generation, only the generations of the sharing
+    providers are read to validate the cache, which also sees the changes made
+    by other processes. The cache is shared by all the requests, so it is
+    always read from the API database rather than its replica, in a
+    transaction independent of any enclosing one.
+    """
+    global _SHARING_CACHE
+    rp_tbl = sa.alias(_RP_TBL, name='rp')
+    t_tbl = sa.alias(_TRAIT_TBL, name='t')
+    rpt_tbl = sa.alias(_RP_TRAIT_TBL, name='rpt')
+    join = sa.join(
+        sa.join(rp_tbl, rpt_tbl,
+                rp_tbl.c.id == rpt_tbl.c.resource_provider_id),
+        t_tbl,
+        sa.and_(
+            rpt_tbl.c.trait_id == t_tbl.c.id,
+            t_tbl.c.name == six.text_type(os_traits.MISC_SHARES_VIA_AGGREGATE),
+        ),
+    )
+    sel = sa.select([rp_tbl.c.id, rp_tbl.c.generation]).select_from(join)
+    generations = {r[0]: r[1] for r in ctx.session.execute(sel)}
+
+    cache = _SHARING_CACHE
+    if cache is not None and cache[0] == generations:
+        return cache[1]
+
+    providers_by_rc = collections.defaultdict(set)
+    if generations:
+        sel = sa.select([_INV_TBL.c.resource_provider_id,
+                         _INV_TBL.c.resource_class_id])
+        sel = sel.where(_INV_TBL.c.resource_provider_id.in_(generations))
+        for rp_id, rc_id in ctx.session.execute(sel):
+            providers_by_rc[rc_id].add(rp_id)
+    providers_by_rc = dict(providers_by_rc)
+    _SHARING_CACHE = (generations, providers_by_rc)
+    return providers_by_rc
+
+
+def _get_sharing_providers(ctx, resources):
+    """Returns a dict, keyed by resource class ID, of lists of internal IDs
+    of the providers sharing enough capacity for the requested amount of that
+    resource class, see _get_providers_with_shared_capacity().
+
+    The capacity is only queried for the resource classes that some sharing
+    provider has inventory of.
+
+    :param resources: A dict, keyed by resource class ID, of the amount
+                      requested of that resource class.
+    """
+    shared_rc_ids = _get_sharing_providers_by_rc(ctx)
+    return {
+        rc_id: (_get_providers_with_shared_capacity(ctx, rc_id, amount)
+                if rc_id in shared_rc_ids else [])
+        for rc_id, amount in resources.items()
+    }
+
+
+@db_api.api_context_manager.reader.allow_async
 def _get_all_with_shared(ctx, resources, member_of=None):
     """Uses some more advanced SQL to find providers that either have the
     requested resources "locally" or are associated with a provider that shares
@@ -1267,10 +1787,7 @@ def _get_all_with_shared(ctx, resources, member_of=None):
     rpt = sa.alias(_RP_TBL, name="rp")
 
     # Contains a set of resource provider IDs for each resource class requested
-    sharing_providers = {
-        rc_id: _get_providers_with_shared_capacity(ctx, rc_id, amount)
-        for rc_id, amount in resources.items()
-    }
+    sharing_providers = _get_sharing_providers(ctx, resources)
 
     name_map = {
         rc_id: _RC_CACHE.string_from_id(rc_id).lower() for rc_id in resources
@@ -1284,20 +1801,10 @@ def _get_all_with_shared(ctx, resources, member_of=None):
     }
 
     # Dict, keyed by resource class ID, of a derived table (subquery in the
-    # FROM clause or JOIN) against the allocations table  winnowed to only that
-    # resource class, grouped by resource provider.
+    # FROM clause or JOIN) of the usages winnowed to only that resource class.
     usage_tables = {
-        rc_id: sa.alias(
-            sa.select([
-                _ALLOC_TBL.c.resource_provider_id,
-                sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-            ]).where(
-                _ALLOC_TBL.c.resource_class_id == rc_id
-            ).group_by(
-                _ALLOC_TBL.c.resource_provider_id
-            ),
-            name='usage_%s' % name_map[rc_id],
-        )
+        rc_id: _usage_subquery(ctx, [rc_id],
+                               name='usage_%s' % name_map[rc_id])
         for rc_id in resources
     }
 
@@ -1410,8 +1917,8 @@ class ResourceProviderList(base.ObjectListBase, base.VersionedObject):
     }
 
     @staticmethod
-    @db_api.api_context_manager.reader
-    def _get_all_by_filters_from_db(context, filters):
+    @_select_reader_mode
+    def _get_all_by_filters_from_db(context, filters, use_slave=False):
         # Eg. filters can be:
         #  filters = {
         #      'name': <name>,
@@ -1574,13 +2081,7 @@ class ResourceProviderList(base.ObjectListBase, base.VersionedObject):
             rp.c.id == _INV_TBL.c.resource_provider_id)
 
         # Now, below is the LEFT JOIN for getting the allocations usage
-        usage = sa.select([_ALLOC_TBL.c.resource_provider_id,
-                           _ALLOC_TBL.c.resource_class_id,
-                           sql.func.sum(_ALLOC_TBL.c.used).label('used')])
-        usage = usage.where(_ALLOC_TBL.c.resource_class_id.in_(resources))
-        usage = usage.group_by(_ALLOC_TBL.c.resource_provider_id,
-                               _ALLOC_TBL.c.resource_class_id)
-        usage = sa.alias(usage, name='usage')
+        usage = _usage_subquery(context, resources)
         usage_join = sa.outerjoin(inv_join, usage,
             sa.and_(
                 usage.c.resource_provider_id == (
@@ -1612,7 +2113,7 @@ class ResourceProviderList(base.ObjectListBase, base.VersionedObject):
         return [dict(r) for r in res]
 
     @classmethod
-    def get_all_by_filters(cls, context, filters=None):
+    def get_all_by_filters(cls, context, filters=None, use_slave=False):
         """Returns a list of `ResourceProvider` objects that have sufficient
         resources in their inventories to satisfy the amounts specified in the
         `filters` parameter.
@@ -1629,10 +2130,13 @@ class ResourceProviderList(base.ObjectListBase, base.VersionedObject):
                         providers to filter results by and `resources` is a
                         dict of amounts keyed by resource classes.
         :type filters: dict
+        :param use_slave: Whether the providers may be read from the API
+                          database replica, if one is configured.
         """
         _ensure_rc_cache(context)
         _ensure_trait_sync(context)
-        resource_providers = cls._get_all_by_filters_from_db(context, filters)
+        resource_providers = cls._get_all_by_filters_from_db(
+            context, filters, use_slave=use_slave)
         return base.obj_make_list(context, cls(context),
                                   ResourceProvider, resource_providers)
 
@@ -1784,9 +2288,19 @@ def _delete_allocations_for_consumer(ctx, consumer_id):
     be written. This is wrapped in a transaction, so if the write subsequently
     fails, the deletion will also be rolled back.
     """
+    sel = sa.select([_ALLOC_TBL.c.resource_provider_id,
+                     _ALLOC_TBL.c.resource_class_id,
+                     _ALLOC_TBL.c.used])
+    sel = sel.where(_ALLOC_TBL.c.consumer_id == consumer_id)
+    deltas = collections.defaultdict(int)
+    for rp_id, rc_id, used in ctx.session.execute(sel):
+        deltas[rp_id, rc_id] -= used
     del_sql = _ALLOC_TBL.delete().where(
         _ALLOC_TBL.c.consumer_id == consumer_id)
     ctx.session.execute(del_sql)
+    _adjust_usages(ctx, deltas)
+    if CONF.placement.track_provider_trees:
+        _adjust_tree_usages(ctx, deltas)
 
 
 def _check_capacity_exceeded(ctx, allocs):
@@ -1836,13 +2350,7 @@ def _check_capacity_exceeded(ctx, allocs):
                        for a in allocs])
     provider_uuids = set([a.resource_provider.uuid for a in allocs])
 
-    usage = sa.select([_ALLOC_TBL.c.resource_provider_id,
-                       _ALLOC_TBL.c.resource_class_id,
-                       sql.func.sum(_ALLOC_TBL.c.used).label('used')])
-    usage = usage.where(_ALLOC_TBL.c.resource_class_id.in_(rc_ids))
-    usage = usage.group_by(_ALLOC_TBL.c.resource_provider_id,
-                           _ALLOC_TBL.c.resource_class_id)
-    usage = sa.alias(usage, name='usage')
+    usage = _usage_subquery(ctx, rc_ids)
 
     inv_join = sql.join(_RP_TBL, _INV_TBL,
             sql.and_(_RP_TBL.c.id == _INV_TBL.c.resource_provider_id,
@@ -2107,6 +2615,7 @@ class AllocationList(base.ObjectListBase, base.VersionedObject):
                                                [alloc for alloc in
                                                 allocs if alloc.used > 0])
         seen_consumers = set()
+        deltas = collections.defaultdict(int)
         for alloc in allocs:
             # If alloc.used is set to zero that is a signal that we don't want
             # to (re-)create any allocations for this resource class.
@@ -2132,6 +2641,11 @@ class AllocationList(base.ObjectListBase, base.VersionedObject):
                     consumer_id=consumer_id,
                     used=alloc.used)
             context.session.execute(ins_stmt)
+            deltas[rp.id, rc_id] += alloc.used
+
+        _adjust_usages(context, deltas)
+        if CONF.placement.track_provider_trees:
+            _adjust_tree_usages(context, deltas)
 
         # Generation checking happens here. If the inventory for this resource
         # provider changed out from under us, this will raise a
@@ -2242,8 +2756,8 @@ class UsageList(base.ObjectListBase, base.VersionedObject):
     }
 
     @staticmethod
-    @db_api.api_context_manager.reader
-    def _get_all_by_resource_provider_uuid(context, rp_uuid):
+    @_select_reader_mode
+    def _get_all_by_resource_provider_uuid(context, rp_uuid, use_slave=False):
         query = (context.session.query(models.Inventory.resource_class_id,
                  func.coalesce(func.sum(models.Allocation.used), 0))
                  .join(models.ResourceProvider,
@@ -2261,8 +2775,9 @@ class UsageList(base.ObjectListBase, base.VersionedObject):
         return result
 
     @staticmethod
-    @db_api.api_context_manager.reader
-    def _get_all_by_project_user(context, project_id, user_id=None):
+    @_select_reader_mode
+    def _get_all_by_project_user(context, project_id, user_id=None,
+                                 use_slave=False):
         query = (context.session.query(models.Allocation.resource_class_id,
                  func.coalesce(func.sum(models.Allocation.used), 0))
                  .join(models.Consumer,
@@ -2280,14 +2795,18 @@ class UsageList(base.ObjectListBase, base.VersionedObject):
         return result
 
     @classmethod
-    def get_all_by_resource_provider_uuid(cls, context, rp_uuid):
-        usage_list = cls._get_all_by_resource_provider_uuid(context, rp_uuid)
+    def get_all_by_resource_provider_uuid(cls, context, rp_uuid,
+                                          use_slave=False):
+        usage_list = cls._get_all_by_resource_provider_uuid(
+            context, rp_uuid, use_slave=use_slave)
         return base.obj_make_list(context, cls(context), Usage, usage_list)
 
     @classmethod
-    def get_all_by_project_user(cls, context, project_id, user_id=None):
+    def get_all_by_project_user(cls, context, project_id, user_id=None,
+                                use_slave=False):
         usage_list = cls._get_all_by_project_user(context, project_id,
-                                                  user_id=user_id)
+                                                  user_id=user_id,
+                                                  use_slave=use_slave)
         return base.obj_make_list(context, cls(context), Usage, usage_list)
 
     def __repr__(self):
@@ -2405,6 +2924,8 @@ class ResourceClass(base.VersionedObject, base.TimestampedObject):
         rc.update(updates)
         rc.id = next_id
         context.session.add(rc)
+        context.session.flush()
+        _increment_generation(context, _RC_GENERATION)
         return rc
 
     def destroy(self):
@@ -2435,6 +2956,7 @@ class ResourceClass(base.VersionedObject, base.TimestampedObject):
                 models.ResourceClass.id == _id).delete()
         if not res:
             raise exception.NotFound()
+        _increment_generation(context, _RC_GENERATION)
 
     def save(self):
         if 'id' not in self:
@@ -2460,6 +2982,7 @@ class ResourceClass(base.VersionedObject, base.TimestampedObject):
             db_rc.save(context.session)
         except db_exc.DBDuplicateEntry:
             raise exception.ResourceClassExists(resource_class=name)
+        _increment_generation(context, _RC_GENERATION)
 
 
 @base.VersionedObjectRegistry.register_if(False)
@@ -2482,6 +3005,15 @@ class ResourceClassList(base.ObjectListBase, base.VersionedObject):
         return base.obj_make_list(context, cls(context),
                                   ResourceClass, resource_classes)
 
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def get_generation(context):
+        """Returns a generation which changes whenever a custom resource class
+        is created, renamed or deleted. The standard resource classes never
+        change.
+        """
+        return _get_generation(context, _RC_GENERATION) or 0
+
     def __repr__(self):
         strings = [repr(x) for x in self.objects]
         return "ResourceClassList[" + ", ".join(strings) + "]"
@@ -2669,7 +3201,53 @@ class ProviderSummary(base.VersionedObject):
         return set(res.resource_class for res in self.resources)
 
 
-@db_api.api_context_manager.reader
+# The allocation candidates are built from the following plain tuples, which
+# are much cheaper to create than the equivalent objects above when there are
+# many candidates. An allocation request is a tuple of
+# _AllocationRequestResource and a provider summary is a _ProviderSummary, with
+# a list of _ProviderSummaryResource and a list of string trait names.
+_AllocationRequestResource = collections.namedtuple(
+    '_AllocationRequestResource',
+    ['resource_provider_id', 'resource_provider_uuid', 'resource_class',
+     'amount'])
+_ProviderSummaryResource = collections.namedtuple(
+    '_ProviderSummaryResource', ['resource_class', 'capacity', 'used'])
+_ProviderSummary = collections.namedtuple(
+    '_ProviderSummary', ['resource_provider_uuid', 'resources', 'traits'])
+
+
+def _allocation_request_obj(ctx, alloc_req):
+    """Returns an AllocationRequest object for a tuple of
+    _AllocationRequestResource.
+    """
+    resource_requests = [
+        AllocationRequestResource(
+            ctx, resource_provider=ResourceProvider(
+                ctx, uuid=rr.resource_provider_uuid),
+            resource_class=rr.resource_class,
+            amount=rr.amount,
+        ) for rr in alloc_req
+    ]
+    return AllocationRequest(ctx, resource_requests=resource_requests)
+
+
+def _provider_summary_obj(ctx, summary):
+    """Returns a ProviderSummary object for a _ProviderSummary."""
+    return ProviderSummary(
+        ctx,
+        resource_provider=ResourceProvider(
+            ctx, uuid=summary.resource_provider_uuid),
+        resources=[
+            ProviderSummaryResource(
+                ctx, resource_class=psr.resource_class,
+                capacity=psr.capacity, used=psr.used,
+            ) for psr in summary.resources
+        ],
+        traits=[Trait(ctx, name=tname) for tname in summary.traits],
+    )
+
+
+@db_api.api_context_manager.reader.allow_async
 def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
     """Returns a row iterator of usage records grouped by resource provider ID
     and resource class ID for all resource providers and resource classes
@@ -2701,24 +3279,9 @@ def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
     # AND inv.resource_class_id IN ($rc_ids)
     rpt = sa.alias(_RP_TBL, name="rp")
     inv = sa.alias(_INV_TBL, name="inv")
-    # Build our derived table (subquery in the FROM clause) that sums used
+    # Build our derived table (subquery in the FROM clause) of the used
     # amounts for resource provider and resource class
-    usage = sa.alias(
-        sa.select([
-            _ALLOC_TBL.c.resource_provider_id,
-            _ALLOC_TBL.c.resource_class_id,
-            sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-        ]).where(
-            sa.and_(
-                _ALLOC_TBL.c.resource_provider_id.in_(rp_ids),
-                _ALLOC_TBL.c.resource_class_id.in_(rc_ids),
-            ),
-        ).group_by(
-            _ALLOC_TBL.c.resource_provider_id,
-            _ALLOC_TBL.c.resource_class_id
-        ),
-        name='usage',
-    )
+    usage = _usage_subquery(ctx, rc_ids, rp_ids=rp_ids)
     # Build a join between the resource providers and inventories table
     rpt_inv_join = sa.join(rpt, inv, rpt.c.id == inv.c.resource_provider_id)
     # And then join to the derived table of usages
@@ -2744,7 +3307,7 @@ def _get_usages_by_provider_and_rc(ctx, rp_ids, rc_ids):
     return ctx.session.execute(query).fetchall()
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _get_provider_ids_having_any_trait(ctx, traits):
     """Returns a list of resource provider internal IDs that have ANY of the
     supplied traits.
@@ -2765,7 +3328,7 @@ def _get_provider_ids_having_any_trait(ctx, traits):
     return [r[0] for r in ctx.session.execute(sel)]
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _get_provider_ids_having_all_traits(ctx, required_traits):
     """Returns a list of resource provider internal IDs that have ALL of the
     required traits.
@@ -2794,7 +3357,7 @@ def _get_provider_ids_having_all_traits(ctx, required_traits):
     return [r[0] for r in ctx.session.execute(sel)]
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _has_provider_trees(ctx):
     """Simple method that returns whether provider trees (i.e. nested resource
     providers) are in use in the deployment at all. This information is used to
@@ -2811,9 +3374,9 @@ def _has_provider_trees(ctx):
     return len(res) > 0
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _get_provider_ids_matching(ctx, resources, required_traits,
-        forbidden_traits, member_of=None):
+        forbidden_traits, member_of=None, limit=None, randomize=False):
     """Returns a list of resource provider internal IDs that have available
     inventory to satisfy all the supplied requests for resources.
 
@@ -2834,6 +3397,12 @@ def _get_provider_ids_matching(ctx, resources, required_traits,
                       allocation_candidates returned will only be for resource
                       providers that are members of one or more of the supplied
                       aggregates.
+    :param limit: An optional maximum number of provider IDs to return. The
+                  first ones the database returns are kept, unless randomize
+                  is True.
+    :param randomize: If True, the provider IDs are returned in random order
+                      and, if there are more than limit, are a random sample
+                      of limit of them.
     """
     trait_rps = None
     forbidden_rp_ids = None
@@ -2859,20 +3428,10 @@ def _get_provider_ids_matching(ctx, resources, required_traits,
     }
 
     # Dict, keyed by resource class ID, of a derived table (subquery in the
-    # FROM clause or JOIN) against the allocations table winnowed to only that
-    # resource class, grouped by resource provider.
+    # FROM clause or JOIN) of the usages winnowed to only that resource class.
     usage_tables = {
-        rc_id: sa.alias(
-            sa.select([
-                _ALLOC_TBL.c.resource_provider_id,
-                sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-            ]).where(
-                _ALLOC_TBL.c.resource_class_id == rc_id
-            ).group_by(
-                _ALLOC_TBL.c.resource_provider_id
-            ),
-            name='usage_%s' % rc_name_map[rc_id],
-        )
+        rc_id: _usage_subquery(ctx, [rc_id],
+                               name='usage_%s' % rc_name_map[rc_id])
         for rc_id in resources
     }
 
@@ -2939,11 +3498,19 @@ def _get_provider_ids_matching(ctx, resources, required_traits,
 
     sel = sel.select_from(join_chain)
     sel = sel.where(sa.and_(*where_conds))
+    if limit and not randomize:
+        sel = sel.limit(limit)
 
-    return [r[0] for r in ctx.session.execute(sel)]
+    rp_ids = [r[0] for r in ctx.session.execute(sel)]
+    if randomize:
+        if limit and limit < len(rp_ids):
+            rp_ids = random.sample(rp_ids, limit)
+        else:
+            random.shuffle(rp_ids)
+    return rp_ids
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _provider_aggregates(ctx, rp_ids):
     """Given a list of resource provider internal IDs, returns a dict,
     keyed by those provider IDs, of sets of aggregate ids associated
@@ -2968,7 +3535,7 @@ def _provider_aggregates(ctx, rp_ids):
     return res
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _get_trees_matching_all_resources(ctx, resources):
     """Returns a list of root provider internal IDs for provider trees where
     the nodes in the tree collectively have available inventory to satisfy all
@@ -3032,19 +3599,7 @@ def _get_trees_matching_all_resources(ctx, resources):
 
     # Derived table containing usage numbers for all resource providers for
     # each resource class involved in the request
-    usages = sa.alias(
-        sa.select([
-            _ALLOC_TBL.c.resource_provider_id,
-            _ALLOC_TBL.c.resource_class_id,
-            sql.func.sum(_ALLOC_TBL.c.used).label('used'),
-        ]).where(
-            _ALLOC_TBL.c.resource_class_id.in_(resources),
-        ).group_by(
-            _ALLOC_TBL.c.resource_provider_id,
-            _ALLOC_TBL.c.resource_class_id
-        ),
-        name='usage',
-    )
+    usages = _usage_subquery(ctx, resources)
 
     sel = sa.select([rpt.c.root_provider_id])
 
@@ -3072,6 +3627,37 @@ def _get_trees_matching_all_resources(ctx, resources):
         )
         usage_conds.append(usage_cond)
 
+    if CONF.placement.track_provider_trees:
+        # Only look at the providers of the trees which have enough free
+        # capacity, summed over their providers, for all the requested
+        # resources, which is read from the provider_tree_inventories table
+        # by resource class instead of scanning every provider:
+        #
+        # JOIN (
+        #     SELECT root_provider_id
+        #     FROM provider_tree_inventories
+        #     WHERE (resource_class_id = $VCPU
+        #            AND capacity - used >= $VCPU_REQUESTED)
+        #     OR ...
+        #     GROUP BY root_provider_id
+        #     HAVING COUNT(DISTINCT resource_class_id) = 3
+        # ) AS trees
+        #  ON rp.root_provider_id = trees.root_provider_id
+        tree_conds = [
+            sa.and_(_TREE_INV_TBL.c.resource_class_id == rc_id,
+                    _TREE_INV_TBL.c.capacity - _TREE_INV_TBL.c.used >= amount)
+            for rc_id, amount in resources.items()]
+        trees = sa.select([_TREE_INV_TBL.c.root_provider_id])
+        trees = trees.where(sa.or_(*tree_conds))
+        trees = trees.group_by(_TREE_INV_TBL.c.root_provider_id)
+        trees = trees.having(
+            sql.func.count(sql.func.distinct(
+                _TREE_INV_TBL.c.resource_class_id)) == len(resources))
+        trees = sa.alias(trees, name='trees')
+        rp_inv_usage_join = sa.join(
+            rp_inv_usage_join, trees,
+            rpt.c.root_provider_id == trees.c.root_provider_id)
+
     sel = sel.select_from(rp_inv_usage_join)
     sel = sel.where(
         sa.and_(inv.c.resource_class_id.in_(resources),
@@ -3084,12 +3670,11 @@ def _get_trees_matching_all_resources(ctx, resources):
     return [r[0] for r in ctx.session.execute(sel)]
 
 
-def _build_provider_summaries(context, usages, prov_traits):
+def _build_provider_summaries(usages, prov_traits):
     """Given a list of dicts of usage information and a map of providers to
     their associated string traits, returns a dict, keyed by resource provider
-    ID, of ProviderSummary objects.
+    ID, of _ProviderSummary tuples.
 
-    :param context: nova.context.RequestContext object
     :param usages: A list of dicts with the following format:
 
         {
@@ -3104,8 +3689,8 @@ def _build_provider_summaries(context, usages, prov_traits):
                         string trait names associated with that provider
     """
     # Build up a dict, keyed by internal resource provider ID, of
-    # ProviderSummary objects containing one or more ProviderSummaryResource
-    # objects representing the resources the provider has inventory for.
+    # _ProviderSummary tuples containing one or more _ProviderSummaryResource
+    # tuples representing the resources the provider has inventory for.
     summaries = {}
     for usage in usages:
         rp_id = usage['resource_provider_id']
@@ -3116,29 +3701,19 @@ def _build_provider_summaries(context, usages, prov_traits):
         used = usage['used'] or 0
         allocation_ratio = usage['allocation_ratio']
         cap = int((usage['total'] - usage['reserved']) * allocation_ratio)
-        traits = prov_traits.get(rp_id) or []
 
         summary = summaries.get(rp_id)
         if not summary:
-            summary = ProviderSummary(
-                context,
-                resource_provider=ResourceProvider(
-                    context,
-                    uuid=rp_uuid,
-                ),
+            summary = _ProviderSummary(
+                resource_provider_uuid=rp_uuid,
                 resources=[],
+                traits=prov_traits.get(rp_id) or [],
             )
             summaries[rp_id] = summary
 
         rc_name = _RC_CACHE.string_from_id(rc_id)
-        rpsr = ProviderSummaryResource(
-            context,
-            resource_class=rc_name,
-            capacity=cap,
-            used=used,
-        )
-        summary.resources.append(rpsr)
-        summary.traits = [Trait(context, name=tname) for tname in traits]
+        summary.resources.append(
+            _ProviderSummaryResource(rc_name, cap, used))
     return summaries
 
 
@@ -3155,21 +3730,20 @@ def _aggregates_associated_with_providers(a, b, prov_aggs):
     return a_aggs & b_aggs
 
 
-def _shared_allocation_request_resources(ctx, ns_rp_id, requested_resources,
+def _shared_allocation_request_resources(ns_rp_id, requested_resources,
                                          sharing, summaries, prov_aggs):
     """Returns a dict, keyed by resource class ID, of lists of
-    AllocationRequestResource objects that represent resources that are
+    _AllocationRequestResource tuples that represent resources that are
     provided by a sharing provider.
 
-    :param ctx: nova.context.RequestContext object
     :param ns_rp_id: an internal ID of a non-sharing resource provider
     :param requested_resources: dict, keyed by resource class ID, of amounts
                                 being requested for that resource class
     :param sharing: dict, keyed by resource class ID, of lists of resource
                     provider IDs that share that resource class and can
                     contribute to the overall allocation request
-    :param summaries: dict, keyed by resource provider ID, of ProviderSummary
-                      objects containing usage and trait information for
+    :param summaries: dict, keyed by resource provider ID, of _ProviderSummary
+                      tuples containing usage and trait information for
                       resource providers involved in the overall request
     :param prov_aggs: dict, keyed by resource provider ID, of sets of
                       aggregate ids associated with that provider.
@@ -3181,38 +3755,32 @@ def _shared_allocation_request_resources(ctx, ns_rp_id, requested_resources,
                 ns_rp_id, rp_id, prov_aggs)
             if not aggs_in_both:
                 continue
-            summary = summaries[rp_id]
-            rp_uuid = summary.resource_provider.uuid
-            res_req = AllocationRequestResource(
-                ctx,
-                resource_provider=ResourceProvider(ctx, uuid=rp_uuid),
-                resource_class=_RC_CACHE.string_from_id(rc_id),
-                amount=requested_resources[rc_id],
-            )
+            rp_uuid = summaries[rp_id].resource_provider_uuid
+            res_req = _AllocationRequestResource(
+                rp_id, rp_uuid, _RC_CACHE.string_from_id(rc_id),
+                requested_resources[rc_id])
             res_requests[rc_id].append(res_req)
     return res_requests
 
 
-def _allocation_request_for_provider(ctx, requested_resources, rp_uuid):
-    """Returns an AllocationRequest object containing AllocationRequestResource
-    objects for each resource class in the supplied requested resources dict.
+def _allocation_request_for_provider(requested_resources, rp_id, rp_uuid):
+    """Returns an allocation request, a tuple of _AllocationRequestResource
+    for each resource class in the supplied requested resources dict.
 
-    :param ctx: nova.context.RequestContext object
     :param requested_resources: dict, keyed by resource class ID, of amounts
                                 being requested for that resource class
+    :param rp_id: internal ID of the resource provider supplying the resources
     :param rp_uuid: UUID of the resource provider supplying the resources
     """
-    resource_requests = [
-        AllocationRequestResource(
-            ctx, resource_provider=ResourceProvider(ctx, uuid=rp_uuid),
-            resource_class=_RC_CACHE.string_from_id(rc_id),
-            amount=amount,
-        ) for rc_id, amount in requested_resources.items()
-    ]
-    return AllocationRequest(ctx, resource_requests=resource_requests)
+    return tuple(
+        _AllocationRequestResource(
+            rp_id, rp_uuid, _RC_CACHE.string_from_id(rc_id), amount)
+        for rc_id, amount in requested_resources.items()
+    )
 
 
-def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids):
+def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids,
+                                include_summaries=True):
     """Returns a tuple of (allocation requests, provider summaries) for a
     supplied set of requested resource amounts and resource providers. The
     supplied resource providers have capacity to satisfy ALL of the resources
@@ -3221,18 +3789,31 @@ def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids):
 
     This is an optimized code path for the common scenario when no sharing
     providers exist in the system for any requested resource. In this scenario,
-    we can more efficiently build the list of AllocationRequest and
-    ProviderSummary objects due to not having to determine requests for some
-    shared and some non-shared resources.
+    we can more efficiently build the list of allocation requests and provider
+    summaries due to not having to determine requests for some shared and some
+    non-shared resources.
 
     :param ctx: nova.context.RequestContext object
     :param requested_resources: dict, keyed by resource class ID, of amounts
                                 being requested for that resource class
     :param rp_ids: List of resource provider IDs for providers that matched the
                    requested resources
+    :param include_summaries: If False, the provider summaries are not built
+                              and an empty list is returned in their place
     """
     if not rp_ids:
         return [], []
+    if not include_summaries:
+        # The allocation requests only need the UUIDs of the providers
+        sel = sa.select([_RP_TBL.c.id, _RP_TBL.c.uuid]).where(
+            _RP_TBL.c.id.in_(rp_ids))
+        rp_uuids = dict(ctx.session.execute(sel).fetchall())
+        alloc_requests = [
+            _allocation_request_for_provider(
+                requested_resources, rp_id, rp_uuids[rp_id])
+            for rp_id in rp_ids
+        ]
+        return alloc_requests, []
     # Grab usage summaries for each provider and resource class requested
     requested_rc_ids = list(requested_resources)
     usages = _get_usages_by_provider_and_rc(ctx, rp_ids, requested_rc_ids)
@@ -3241,20 +3822,20 @@ def _alloc_candidates_no_shared(ctx, requested_resources, rp_ids):
     # that provider has associated with it
     prov_traits = _provider_traits(ctx, rp_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of ProviderSummary
-    # objects for all providers
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
+    # Get a dict, keyed by resource provider internal ID, of _ProviderSummary
+    # tuples for all providers
+    summaries = _build_provider_summaries(usages, prov_traits)
 
     # Next, build up a list of allocation requests. These allocation requests
-    # are AllocationRequest objects, containing resource provider UUIDs,
-    # resource class names and amounts to consume from that resource provider
-    alloc_requests = []
-    for rp_id in rp_ids:
-        rp_summary = summaries[rp_id]
-        rp_uuid = rp_summary.resource_provider.uuid
-        req_obj = _allocation_request_for_provider(ctx, requested_resources,
-                                                   rp_uuid)
-        alloc_requests.append(req_obj)
+    # are tuples of _AllocationRequestResource, containing resource provider
+    # UUIDs, resource class names and amounts to consume from that resource
+    # provider
+    alloc_requests = [
+        _allocation_request_for_provider(
+            requested_resources, rp_id,
+            summaries[rp_id].resource_provider_uuid)
+        for rp_id in rp_ids
+    ]
     return alloc_requests, list(summaries.values())
 
 
@@ -3310,13 +3891,14 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
     # that provider has associated with it
     prov_traits = _provider_traits(ctx, all_rp_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of ProviderSummary
-    # objects for all providers involved in the request
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
+    # Get a dict, keyed by resource provider internal ID, of _ProviderSummary
+    # tuples for all providers involved in the request
+    summaries = _build_provider_summaries(usages, prov_traits)
 
     # Next, build up a list of allocation requests. These allocation requests
-    # are AllocationRequest objects, containing resource provider UUIDs,
-    # resource class names and amounts to consume from that resource provider
+    # are tuples of _AllocationRequestResource, containing resource provider
+    # UUIDs, resource class names and amounts to consume from that resource
+    # provider
     alloc_requests = []
 
     # Build a list of the sets of provider internal IDs that end up in
@@ -3330,7 +3912,7 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
 
     for ns_rp_id in ns_rp_ids:
         # Build a dict, keyed by resource class ID, of lists of
-        # AllocationRequestResource objects
+        # _AllocationRequestResource tuples
         res_req_dict = collections.defaultdict(list)
 
         if ns_rp_id not in summaries:
@@ -3345,8 +3927,9 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
         # indicates the variable is something related to the non-sharing
         # provider involved in the request
         ns_rp_summary = summaries[ns_rp_id]
-        ns_rp_uuid = ns_rp_summary.resource_provider.uuid
-        ns_resource_class_names = ns_rp_summary.resource_class_names
+        ns_rp_uuid = ns_rp_summary.resource_provider_uuid
+        ns_resource_class_names = set(
+            psr.resource_class for psr in ns_rp_summary.resources)
         ns_resources = set(
             rc_id for rc_id in requested_resources
             if _RC_CACHE.string_from_id(rc_id) in ns_resource_class_names
@@ -3370,30 +3953,28 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
             # list it in provider_summaries.
             continue
 
-        # Get AllocationRequestResource(s) from the non-sharing provider
+        # Get _AllocationRequestResource(s) from the non-sharing provider
         for rc_id, amount in requested_resources.items():
             if rc_id not in ns_resources:
                 continue
             res_req_dict[rc_id].append(
-                AllocationRequestResource(
-                    ctx, resource_provider=ResourceProvider(ctx,
-                                                            uuid=ns_rp_uuid),
-                    resource_class=_RC_CACHE.string_from_id(rc_id),
-                    amount=amount))
+                _AllocationRequestResource(
+                    ns_rp_id, ns_rp_uuid, _RC_CACHE.string_from_id(rc_id),
+                    amount))
 
         # Build a dict, keyed by resource class ID, of lists of
-        # AllocationRequestResource objects that represent each
+        # _AllocationRequestResource tuples that represent each
         # resource provider for a shared resource
         sharing_resource_requests = _shared_allocation_request_resources(
-                                    ctx, ns_rp_id, requested_resources,
+                                    ns_rp_id, requested_resources,
                                     sharing, summaries, prov_aggregates)
 
-        # Get AllocationRequestResource(s) from sharing provider(s)
+        # Get _AllocationRequestResource(s) from sharing provider(s)
         for rc_id in sharing_resource_requests:
             sharing_res_reqs = sharing_resource_requests[rc_id]
             res_req_dict[rc_id].extend(sharing_res_reqs)
 
-        # Get request_groups, lists of lists of AllocationRequestResource
+        # Get request_groups, lists of lists of _AllocationRequestResource
         # for each resource class, which makes no distinction between
         # non-sharing resource providers and sharing resource providers.
         request_groups = res_req_dict.values()
@@ -3409,13 +3990,7 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
             all_prov_ids = set()
             all_traits = set()
             for res_req in res_requests:
-                rp_uuid = res_req.resource_provider.uuid
-                rp_id = None
-                for id, summary in summaries.items():
-                    if summary.resource_provider.uuid == rp_uuid:
-                        rp_id = id
-                        break
-
+                rp_id = res_req.resource_provider_id
                 rp_traits = set(prov_traits.get(rp_id, []))
                 conflict_traits = set(forbidden_traits) & set(rp_traits)
                 if conflict_traits:
@@ -3440,8 +4015,7 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
                 continue
 
             alloc_prov_ids.append(all_prov_ids)
-            req = AllocationRequest(ctx, resource_requests=list(res_requests))
-            alloc_requests.append(req)
+            alloc_requests.append(res_requests)
 
     # The process above may have removed some previously-identified resource
     # providers from being included in the allocation requests due to the
@@ -3449,17 +4023,10 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
     # from "local providers". So, here, we need to remove any provider
     # summaries for resource providers that do not appear in any allocation
     # requests.
-    alloc_req_rp_uuids = set()
-    for ar in alloc_requests:
-        for rr in ar.resource_requests:
-            alloc_req_rp_uuids.add(rr.resource_provider.uuid)
-
-    # Look up the internal ID for each identified rp UUID
     alloc_req_rp_ids = set()
-    for rp_uuid in alloc_req_rp_uuids:
-        for rp_id, summary in summaries.items():
-            if summary.resource_provider.uuid == rp_uuid:
-                alloc_req_rp_ids.add(rp_id)
+    for ar in alloc_requests:
+        for rr in ar:
+            alloc_req_rp_ids.add(rr.resource_provider_id)
 
     p_sums_ids = set(summaries)
     eliminated_rp_ids = p_sums_ids - alloc_req_rp_ids
@@ -3469,7 +4036,7 @@ def _alloc_candidates_with_shared(ctx, requested_resources, required_traits,
     return alloc_requests, list(summaries.values())
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _provider_traits(ctx, rp_ids):
     """Given a list of resource provider internal IDs, returns a dict, keyed by
     those provider IDs, of string trait names associated with that provider.
@@ -3494,7 +4061,7 @@ def _provider_traits(ctx, rp_ids):
     return res
 
 
-@db_api.api_context_manager.reader
+@db_api.api_context_manager.reader.allow_async
 def _trait_ids_from_names(ctx, names):
     """Given a list of string trait names, returns a dict, keyed by those
     string names, of the corresponding internal integer trait ID.
@@ -3534,7 +4101,7 @@ class AllocationCandidates(base.VersionedObject):
     }
 
     @classmethod
-    def get_by_requests(cls, context, requests, limit=None):
+    def get_by_requests(cls, context, requests, limit=None, use_slave=False):
         """Returns an AllocationCandidates object containing all resource
         providers matching a set of supplied resource constraints, with a set
         of allocation requests constructed from that list of resource
@@ -3551,21 +4118,53 @@ class AllocationCandidates(base.VersionedObject):
                       order the database picked them, will be returned. In
                       either case if there are fewer than N total results,
                       all the results will be returned.
+        :param use_slave: Whether the candidates may be read from the API
+                          database replica, if one is configured.
         """
-        _ensure_rc_cache(context)
-        _ensure_trait_sync(context)
-        alloc_reqs, provider_summaries = cls._get_by_requests(context,
-                                                              requests,
-                                                              limit)
+        alloc_reqs, provider_summaries = cls.get_raw_by_requests(
+            context, requests, limit, use_slave=use_slave)
         return cls(
             context,
-            allocation_requests=alloc_reqs,
-            provider_summaries=provider_summaries,
+            allocation_requests=[_allocation_request_obj(context, ar)
+                                 for ar in alloc_reqs],
+            provider_summaries=[_provider_summary_obj(context, ps)
+                                for ps in provider_summaries],
         )
 
+    @classmethod
+    def get_raw_by_requests(cls, context, requests, limit=None,
+                            use_slave=False, include_summaries=True):
+        """Returns the allocation requests and provider summaries which
+        get_by_requests() would return, as plain tuples instead of objects.
+        This is for callers, like the placement API, which serialize a large
+        number of candidates.
+
+        :param requests: List of nova.api.openstack.placement.util.RequestGroup
+        :param limit: An integer, N, representing the maximum number of
+                      allocation candidates to return, see get_by_requests()
+        :param use_slave: Whether the candidates may be read from the API
+                          database replica, if one is configured.
+        :param include_summaries: If False, an empty list of provider
+                                  summaries is returned. They are then only
+                                  built when finding the allocation requests
+                                  involves sharing providers.
+        :returns: A tuple of (allocation requests, provider summaries). Each
+                  allocation request is a tuple of _AllocationRequestResource
+                  and each provider summary is a _ProviderSummary.
+        """
+        _ensure_rc_cache(context)
+        _ensure_trait_sync(context)
+        alloc_reqs, summaries = cls._get_by_requests(
+            context, requests, limit, use_slave=use_slave,
+            include_summaries=include_summaries)
+        if not include_summaries:
+            summaries = []
+        return alloc_reqs, summaries
+
     @staticmethod
-    @db_api.api_context_manager.reader
-    def _get_by_requests(context, requests, limit=None):
+    @_select_reader_mode
+    def _get_by_requests(context, requests, limit=None, use_slave=False,
+                         include_summaries=True):
         # We first get the list of "root providers" that either have the
         # requested resources or are associated with the providers that
         # share one or more of the requested resource(s)
@@ -3606,16 +4205,10 @@ class AllocationCandidates(base.VersionedObject):
         # Contains a set of resource provider IDs that share some inventory for
         # each resource class requested. We do this here as an optimization. If
         # we have no sharing providers, the SQL to find matching providers for
-        # the requested resources is much simpler.
-        # TODO(jaypipes): Consider caching this for some amount of time since
-        # sharing providers generally don't change often and here we aren't
-        # concerned with how *much* inventory/capacity the sharing provider
-        # has, only that it is sharing *some* inventory of a particular
-        # resource class.
-        sharing_providers = {
-            rc_id: _get_providers_with_shared_capacity(context, rc_id, amount)
-            for rc_id, amount in resources.items()
-        }
+        # the requested resources is much simpler. The sharing providers are
+        # cached, so that their capacity is only checked for the resource
+        # classes they have inventory of.
+        sharing_providers = _get_sharing_providers(context, resources)
         have_sharing = any(sharing_providers.values())
         if not have_sharing:
             # We know there's no sharing providers, so we can more efficiently
@@ -3625,12 +4218,16 @@ class AllocationCandidates(base.VersionedObject):
             # add new code paths or modify this code path to return root
             # provider IDs of provider trees instead of the resource provider
             # IDs.
+            # Each provider makes one allocation request, so the limit is
+            # applied to the provider IDs, and the allocation requests and
+            # summaries are only built for the providers which are kept.
             rp_ids = _get_provider_ids_matching(context, resources,
-                                                required_trait_map,
-                                                forbidden_trait_map,
-                                                member_of)
-            alloc_request_objs, summary_objs = _alloc_candidates_no_shared(
-                context, resources, rp_ids)
+                required_trait_map, forbidden_trait_map, member_of,
+                limit=limit,
+                randomize=CONF.placement.randomize_allocation_candidates)
+            return _alloc_candidates_no_shared(
+                context, resources, rp_ids,
+                include_summaries=include_summaries)
         else:
             if required_trait_map:
                 # TODO(cdent): Now that there is also a forbidden_trait_map
@@ -3650,39 +4247,40 @@ class AllocationCandidates(base.VersionedObject):
             # IDs that are NOT sharing resources.
             rps = _get_all_with_shared(context, resources, member_of)
             rp_ids = set([r[0] for r in rps])
-            alloc_request_objs, summary_objs = _alloc_candidates_with_shared(
+            alloc_reqs, summaries = _alloc_candidates_with_shared(
                 context, resources, required_trait_map, forbidden_trait_map,
                 rp_ids, sharing_providers)
 
-        # Limit the number of allocation request objects. We do this after
-        # creating all of them so that we can do a random slice without
-        # needing to mess with the complex sql above or add additional
-        # columns to the DB.
+        # Limit the number of allocation requests. With sharing
+        # providers, we do this after creating all of them, since a provider
+        # may make several allocation requests, so that we can do a random
+        # slice without needing to mess with the complex sql above or add
+        # additional columns to the DB.
 
-        if limit and limit <= len(alloc_request_objs):
+        if limit and limit <= len(alloc_reqs):
             if CONF.placement.randomize_allocation_candidates:
-                alloc_request_objs = random.sample(alloc_request_objs, limit)
+                alloc_reqs = random.sample(alloc_reqs, limit)
             else:
-                alloc_request_objs = alloc_request_objs[:limit]
+                alloc_reqs = alloc_reqs[:limit]
         elif CONF.placement.randomize_allocation_candidates:
-            random.shuffle(alloc_request_objs)
+            random.shuffle(alloc_reqs)
 
         # Limit summaries to only those mentioned in the allocation requests.
-        if limit and limit <= len(alloc_request_objs):
-            kept_summary_objs = []
+        if limit and limit <= len(alloc_reqs):
+            kept_summaries = []
             alloc_req_rp_uuids = set()
             # Extract resource provider uuids from the resource requests.
-            for aro in alloc_request_objs:
-                for arr in aro.resource_requests:
-                    alloc_req_rp_uuids.add(arr.resource_provider.uuid)
-            for summary in summary_objs:
-                rp_uuid = summary.resource_provider.uuid
+            for ar in alloc_reqs:
+                for rr in ar:
+                    alloc_req_rp_uuids.add(rr.resource_provider_uuid)
+            for summary in summaries:
+                rp_uuid = summary.resource_provider_uuid
                 # Skip a summary if we are limiting and haven't selected an
                 # allocation request that uses the resource provider.
                 if rp_uuid not in alloc_req_rp_uuids:
                     continue
-                kept_summary_objs.append(summary)
+                kept_summaries.append(summary)
         else:
-            kept_summary_objs = summary_objs
+            kept_summaries = summaries
 
-        return alloc_request_objs, kept_summary_objs
+        return alloc_reqs, kept_summaries
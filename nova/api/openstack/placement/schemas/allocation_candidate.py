@@ -52,3 +52,9 @@ GET_SCHEMA_1_21 = copy.deepcopy(GET_SCHEMA_1_17)
 GET_SCHEMA_1_21['properties']['member_of'] = {
     "type": ["string"]
 }
+
+GET_SCHEMA_1_23 = copy.deepcopy(GET_SCHEMA_1_21)
+GET_SCHEMA_1_23['properties']['provider_summaries'] = {
+    "type": ["string"],
+    "enum": ["true", "false"]
+}
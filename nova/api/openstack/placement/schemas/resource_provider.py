@@ -13,6 +13,10 @@
 
 import copy
 
+from nova.api.openstack.placement.schemas import aggregate
+from nova.api.openstack.placement.schemas import inventory
+from nova.api.openstack.placement.schemas import trait
+
 
 POST_RESOURCE_PROVIDER_SCHEMA = {
     "type": "object",
@@ -104,3 +108,45 @@ GET_RPS_SCHEMA_1_18 = copy.deepcopy(GET_RPS_SCHEMA_1_14)
 GET_RPS_SCHEMA_1_18['properties']['required'] = {
     "type": "string",
 }
+
+# Placement API microversion 1.25 adds PUT /resource_providers to replace the
+# inventories, traits and aggregates of several resource providers in one
+# request. It is a dict, keyed by resource provider uuid, of the provider
+# generation and any of the inventories, traits and aggregates to set, in the
+# form of the PUT of each of them. The optional 'atomic' flag, true by
+# default, says whether all the providers are updated in a single transaction.
+PUT_RESOURCE_PROVIDERS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "resource_providers": {
+            "type": "object",
+            "minProperties": 1,
+            "patternProperties": {
+                "^[0-9a-fA-F-]{36}$": {
+                    "type": "object",
+                    "properties": {
+                        "resource_provider_generation": {
+                            "type": "integer"
+                        },
+                        "inventories": copy.deepcopy(
+                            inventory.PUT_INVENTORY_SCHEMA[
+                                'properties']['inventories']),
+                        "traits": copy.deepcopy(
+                            trait.SET_TRAITS_FOR_RP_SCHEMA[
+                                'properties']['traits']),
+                        "aggregates": copy.deepcopy(
+                            aggregate.PUT_AGGREGATES_SCHEMA_V1_1),
+                    },
+                    "required": ["resource_provider_generation"],
+                    "additionalProperties": False
+                }
+            },
+            "additionalProperties": False
+        },
+        "atomic": {
+            "type": "boolean"
+        }
+    },
+    "required": ["resource_providers"],
+    "additionalProperties": False
+}
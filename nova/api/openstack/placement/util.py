@@ -12,6 +12,7 @@
 """Utility methods for placement API."""
 
 import functools
+import hashlib
 import re
 
 import jsonschema
@@ -70,6 +71,32 @@ def check_accept(*types):
     return decorator
 
 
+def check_etag(req, *parts):
+    """Set an ETag on the response to the request and check it against the
+    If-None-Match header of the request.
+
+    The ETag is derived from the requested microversion and the supplied
+    parts, which must together identify the representation being returned,
+    for example the generation of a resource provider.
+
+    Returns True if the request already has the representation, in which case
+    the response is turned into a 304 Not Modified and the caller should
+    return it without building a body.
+    """
+    microversion = nova.api.openstack.placement.microversion
+    want_version = req.environ[microversion.MICROVERSION_ENVIRON]
+    etag_parts = [str(want_version)] + [str(part) for part in parts]
+    etag = hashlib.sha1(':'.join(etag_parts).encode('utf-8')).hexdigest()
+    response = req.response
+    response.etag = etag
+    if etag not in req.if_none_match:
+        return False
+    response.status = 304
+    response.cache_control = 'no-cache'
+    del response.content_type
+    return True
+
+
 def extract_json(body, schema):
     """Extract JSON from a body and validate with the provided schema."""
     try:
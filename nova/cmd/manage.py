@@ -44,6 +44,7 @@ import six
 import six.moves.urllib.parse as urlparse
 from sqlalchemy.engine import url as sqla_url
 
+from nova.api.openstack.placement.objects import resource_provider as rp_obj
 from nova.cmd import common as cmd_common
 import nova.conf
 from nova import config
@@ -1695,6 +1696,75 @@ class CellV2Commands(object):
         return 0
 
 
+class PlacementCommands(object):
+    """Commands for managing the placement data."""
+
+    @args('--verify', action='store_true', dest='verify', default=False,
+          help=_('Only report the usages which differ from the allocations, '
+                 'without fixing them.'))
+    def sync_usages(self, verify=False):
+        """Sync the usages tracked when [placement]/track_usages is enabled
+        with the allocations.
+
+        Return codes:
+
+        * 0: The usages were in sync or have been fixed.
+        * 1: The usages were not in sync and --verify was used.
+        """
+        ctxt = context.get_admin_context()
+        mismatches = rp_obj.sync_usages(ctxt, verify=verify)
+        if mismatches:
+            t = prettytable.PrettyTable(
+                [_('Provider ID'), _('Resource Class ID'), _('Tracked'),
+                 _('Allocated')])
+            for row in mismatches:
+                t.add_row(row)
+            print(t)
+        if verify:
+            if mismatches:
+                print(_('%d usage(s) differ from the allocations.') %
+                      len(mismatches))
+                return 1
+            print(_('The usages are in sync with the allocations.'))
+        else:
+            print(_('%d usage(s) fixed.') % len(mismatches))
+        return 0
+
+    @args('--verify', action='store_true', dest='verify', default=False,
+          help=_('Only report the provider trees whose capacity differs from '
+                 'the inventories, without fixing them.'))
+    def sync_provider_trees(self, verify=False):
+        """Sync the capacity of provider trees tracked when
+        [placement]/track_provider_trees is enabled with the inventories and
+        allocations.
+
+        Return codes:
+
+        * 0: The provider trees were in sync or have been fixed.
+        * 1: The provider trees were not in sync and --verify was used.
+        """
+        ctxt = context.get_admin_context()
+        mismatches = rp_obj.sync_provider_trees(ctxt, verify=verify)
+        if mismatches:
+            t = prettytable.PrettyTable(
+                [_('Root Provider ID'), _('Resource Class ID'),
+                 _('Tracked Capacity'), _('Tracked Used'), _('Capacity'),
+                 _('Used')])
+            for row in mismatches:
+                t.add_row(row)
+            print(t)
+        if verify:
+            if mismatches:
+                print(_('%d provider tree inventory(ies) differ from the '
+                        'inventories.') % len(mismatches))
+                return 1
+            print(_('The provider trees are in sync with the inventories.'))
+        else:
+            print(_('%d provider tree inventory(ies) fixed.') %
+                  len(mismatches))
+        return 0
+
+
 CATEGORIES = {
     'api_db': ApiDbCommands,
     'cell': CellCommands,
@@ -1702,6 +1772,7 @@ CATEGORIES = {
     'db': DbCommands,
     'floating': FloatingIpCommands,
     'network': NetworkCommands,
+    'placement': PlacementCommands,
 }
 
 
@@ -200,9 +200,11 @@ class UpgradeCommands(object):
                 versions["versions"][0]["max_version"])
             # NOTE(mriedem): 1.21 is required by nova-scheduler to be able
             # to request aggregates.
+            # 1.24 is required by nova-compute for the conditional GET of
+            # resource providers.
             # NOTE: If you bump this version, remember to update the history
             # section in the nova-status man page (doc/source/cli/nova-status).
-            needs_version = pkg_resources.parse_version("1.21")
+            needs_version = pkg_resources.parse_version("1.24")
             if max_version < needs_version:
                 msg = (_('Placement API version %(needed)s needed, '
                          'you have %(current)s.') %
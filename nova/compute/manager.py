@@ -1126,6 +1126,7 @@ class ComputeManager(manager.Manager):
             # if the configuration is wrong.
             whitelist.Whitelist(CONF.pci.passthrough_whitelist)
 
+        start = time.time()
         self.driver.init_host(host=self.host)
         context = nova.context.get_admin_context()
         instances = objects.InstanceList.get_by_host(
@@ -1139,8 +1140,11 @@ class ComputeManager(manager.Manager):
         try:
             # checking that instance was not already evacuated to other host
             self._destroy_evacuated_instances(context)
-            for instance in instances:
-                self._init_instance(context, instance)
+            self._init_instances(context, instances)
+            LOG.info('Initialized the host and its %(count)d instances in '
+                     '%(seconds).2f seconds.',
+                     {'count': len(instances),
+                      'seconds': time.time() - start})
         finally:
             if CONF.defer_iptables_apply:
                 self.driver.filter_defer_apply_off()
@@ -1153,6 +1157,25 @@ class ComputeManager(manager.Manager):
                 # _sync_scheduler_instance_info periodic task will.
                 self._update_scheduler_instance_info(context, instances)
 
+    def _init_instances(self, context, instances):
+        """Initialize the instances of the host during service init,
+        [DEFAULT]max_concurrent_instance_inits at a time.
+        """
+        def _init(instance):
+            try:
+                self._init_instance(context, instance)
+            except Exception:
+                # The failure to initialize an instance must not prevent
+                # the service from starting and the others from being
+                # initialized.
+                LOG.exception('Failed to initialize instance during '
+                              'service init.', instance=instance)
+
+        pool = eventlet.GreenPool(CONF.max_concurrent_instance_inits)
+        for instance in instances:
+            pool.spawn_n(_init, instance)
+        pool.waitall()
+
     def cleanup_host(self):
         self.driver.register_event_listener(None)
         self.instance_events.cancel_all_events()
@@ -6572,21 +6595,22 @@ class ComputeManager(manager.Manager):
         spacing=CONF.heal_instance_info_cache_interval)
     def _heal_instance_info_cache(self, context):
         """Called periodically.  On every call, try to update the
-        info_cache's network information for another instance by
-        calling to the network manager.
+        info_cache's network information for another batch of instances
+        by calling to the network manager.
 
         This is implemented by keeping a cache of uuids of instances
-        that live on this host.  On each call, we pop one off of a
-        list, pull the DB record, and try the call to the network API.
-        If anything errors don't fail, as it's possible the instance
+        that live on this host.  On each call, we pop a batch of them off
+        of a list, pull the DB records, and try the calls to the network
+        API. If anything errors don't fail, as it's possible the instance
         has been deleted, etc.
         """
         heal_interval = CONF.heal_instance_info_cache_interval
         if not heal_interval:
             return
 
+        batch_size = CONF.heal_instance_info_cache_batch_size
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
-        instance = None
+        instances = []
 
         LOG.debug('Starting heal instance info cache')
 
@@ -6609,17 +6633,17 @@ class ComputeManager(manager.Manager):
                               'because it is being deleted.', instance=inst)
                     continue
 
-                if not instance:
-                    # Save the first one we find so we don't
-                    # have to get it again
-                    instance = inst
+                if len(instances) < batch_size:
+                    # Save the first ones we find so we don't
+                    # have to get them again
+                    instances.append(inst)
                 else:
                     instance_uuids.append(inst['uuid'])
 
             self._instance_uuids_to_heal = instance_uuids
         else:
-            # Find the next valid instance on the list
-            while instance_uuids:
+            # Find the next valid instances on the list
+            while instance_uuids and len(instances) < batch_size:
                 try:
                     inst = objects.Instance.get_by_uuid(
                             context, instance_uuids.pop(0),
@@ -6640,32 +6664,56 @@ class ComputeManager(manager.Manager):
                     LOG.debug('Skipping network cache update for instance '
                               'because it is being deleted.', instance=inst)
                 else:
-                    instance = inst
-                    break
+                    instances.append(inst)
 
-        if instance:
-            # We have an instance now to refresh
-            try:
-                # Call to network API to get instance info.. this will
-                # force an update to the instance's info_cache
-                self.network_api.get_instance_nw_info(context, instance)
-                LOG.debug('Updated the network info_cache for instance',
-                          instance=instance)
-            except exception.InstanceNotFound:
-                # Instance is gone.
-                LOG.debug('Instance no longer exists. Unable to refresh',
-                          instance=instance)
-                return
-            except exception.InstanceInfoCacheNotFound:
-                # InstanceInfoCache is gone.
-                LOG.debug('InstanceInfoCache no longer exists. '
-                          'Unable to refresh', instance=instance)
-            except Exception:
-                LOG.error('An error occurred while refreshing the network '
-                          'cache.', instance=instance, exc_info=True)
-        else:
+        if not instances:
             LOG.debug("Didn't find any instances for network info cache "
                       "update.")
+            return
+
+        nw_info_kwargs = {}
+        if len(instances) > 1:
+            try:
+                nw_info_kwargs = self.network_api.prefetch_instances_nw_info(
+                    context, instances)
+            except Exception:
+                LOG.warning('Failed to query the network information of %d '
+                            'instances at once, querying it per instance.',
+                            len(instances), exc_info=True)
+
+        time_budget = CONF.heal_instance_info_cache_time_budget
+        start = time.time()
+        for i, instance in enumerate(instances):
+            if i and time_budget and time.time() - start > time_budget:
+                LOG.debug('Spent more than %(budget)d seconds updating the '
+                          'network info_cache of instances, leaving '
+                          '%(count)d of them to the next runs.',
+                          {'budget': time_budget,
+                           'count': len(instances) - i})
+                instance_uuids[0:0] = [remaining.uuid
+                                       for remaining in instances[i:]]
+                break
+            self._heal_instance_nw_info(context, instance, **nw_info_kwargs)
+
+    def _heal_instance_nw_info(self, context, instance, **kwargs):
+        """Refresh the network info_cache of an instance."""
+        try:
+            # Call to network API to get instance info.. this will
+            # force an update to the instance's info_cache
+            self.network_api.get_instance_nw_info(context, instance, **kwargs)
+            LOG.debug('Updated the network info_cache for instance',
+                      instance=instance)
+        except exception.InstanceNotFound:
+            # Instance is gone.
+            LOG.debug('Instance no longer exists. Unable to refresh',
+                      instance=instance)
+        except exception.InstanceInfoCacheNotFound:
+            # InstanceInfoCache is gone.
+            LOG.debug('InstanceInfoCache no longer exists. '
+                      'Unable to refresh', instance=instance)
+        except Exception:
+            LOG.error('An error occurred while refreshing the network '
+                      'cache.', instance=instance, exc_info=True)
 
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
@@ -7038,13 +7086,30 @@ class ComputeManager(manager.Manager):
                         {'num_db_instances': num_db_instances,
                          'num_vm_instances': num_vm_instances})
 
+        # Query the power states of the instances to sync at once, rather
+        # than one hypervisor request per instance.
+        vm_power_states = {}
+        bulk_instances = [db_instance for db_instance in db_instances
+                          if db_instance.uuid not in self._syncs_in_progress
+                          and db_instance.task_state is None]
+        if bulk_instances:
+            try:
+                vm_power_states = self.driver.get_power_states(
+                    bulk_instances)
+            except Exception:
+                LOG.warning("Failed to query the power states of the "
+                            "instances at once, querying them one by one.",
+                            exc_info=True)
+
         def _sync(db_instance):
             # NOTE(melwitt): This must be synchronized as we query state from
             #                two separate sources, the driver and the database.
             #                They are set (in stop_instance) and read, in sync.
             @utils.synchronized(db_instance.uuid)
             def query_driver_power_state_and_sync():
-                self._query_driver_power_state_and_sync(context, db_instance)
+                self._query_driver_power_state_and_sync(
+                    context, db_instance,
+                    vm_power_states.get(db_instance.uuid))
 
             try:
                 query_driver_power_state_and_sync()
@@ -7066,36 +7131,51 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
-    def _query_driver_power_state_and_sync(self, context, db_instance):
+    def _query_driver_power_state_and_sync(self, context, db_instance,
+                                           vm_power_state=None):
+        """Sync the power state of an instance with the hypervisor.
+
+        :param vm_power_state: The power state of the instance queried
+                               beforehand from the hypervisor, if any. It is
+                               confirmed with the driver before acting on a
+                               mismatch with the database.
+        """
         if db_instance.task_state is not None:
             LOG.info("During sync_power_state the instance has a "
                      "pending task (%(task)s). Skip.",
                      {'task': db_instance.task_state}, instance=db_instance)
             return
         # No pending tasks. Now try to figure out the real vm_power_state.
-        try:
-            vm_instance = self.driver.get_info(db_instance)
-            vm_power_state = vm_instance.state
-        except exception.InstanceNotFound:
-            vm_power_state = power_state.NOSTATE
+        verify_power_state = vm_power_state is not None
+        if not verify_power_state:
+            try:
+                vm_instance = self.driver.get_info(db_instance)
+                vm_power_state = vm_instance.state
+            except exception.InstanceNotFound:
+                vm_power_state = power_state.NOSTATE
         # Note(maoy): the above get_info call might take a long time,
         # for example, because of a broken libvirt driver.
         try:
-            self._sync_instance_power_state(context,
-                                            db_instance,
-                                            vm_power_state,
-                                            use_slave=True)
+            self._sync_instance_power_state(
+                context, db_instance, vm_power_state, use_slave=True,
+                verify_power_state=verify_power_state)
         except exception.InstanceNotFound:
             # NOTE(hanlind): If the instance gets deleted during sync,
             # silently ignore.
             pass
 
     def _sync_instance_power_state(self, context, db_instance, vm_power_state,
-                                   use_slave=False):
+                                   use_slave=False, verify_power_state=False):
         """Align instance power state between the database and hypervisor.
 
         If the instance is not found on the hypervisor, but is in the database,
         then a stop() API will be called on the instance.
+
+        :param verify_power_state: Whether to query the power state of the
+                                   instance again from the driver when
+                                   vm_power_state does not match the database,
+                                   as it may have been queried before an
+                                   update of the instance
         """
 
         # We re-query the DB to get the latest instance info to minimize
@@ -7131,6 +7211,9 @@ class ComputeManager(manager.Manager):
                      instance=db_instance)
             return
 
+        if verify_power_state and vm_power_state != db_power_state:
+            vm_power_state = self._get_power_state(context, db_instance)
+
         orig_db_power_state = db_power_state
         if vm_power_state != db_power_state:
             LOG.info('During _sync_instance_power_state the DB '
@@ -7350,6 +7433,11 @@ class ComputeManager(manager.Manager):
                 self.scheduler_client.reportclient.delete_resource_provider(
                     context, cn, cascade=True)
 
+        summary = self.reportclient.get_metrics_summary()
+        if summary:
+            LOG.info("Placement requests since the last update of available "
+                     "resources: %s", summary)
+
     def _get_compute_nodes_in_db(self, context, use_slave=False,
                                  startup=False):
         try:
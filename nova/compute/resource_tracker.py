@@ -20,6 +20,7 @@ model.
 """
 import collections
 import copy
+import time
 
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -49,6 +50,10 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
+# Resources reported by the virt driver which are computed from the instances
+# by the resource tracker instead
+_USAGE_RESOURCES = ('vcpus_used', 'memory_mb_used', 'local_gb_used',
+                    'numa_topology')
 
 
 def _instance_in_resize_state(instance):
@@ -139,6 +144,10 @@ class ResourceTracker(object):
         self.stats = stats.Stats()
         self.tracked_instances = {}
         self.tracked_migrations = {}
+        # The time of the last full audit of each node, and the IDs of the
+        # in-progress migrations it found
+        self.last_full_audits = {}
+        self.audited_migrations = {}
         monitor_handler = monitors.MonitorHandler(self)
         self.monitors = monitor_handler.monitors
         self.old_resources = collections.defaultdict(objects.ComputeNode)
@@ -696,15 +705,74 @@ class ResourceTracker(object):
                               'another host\'s instance!',
                           {'uuid': migration.instance_uuid})
 
+    def _full_audit_due(self, nodename):
+        """Return whether the usage of a node should be recomputed from its
+        instances and migrations, rather than just reconciled.
+        """
+        interval = CONF.full_update_resources_interval
+        # Instances and stats are tracked for all the nodes together
+        if not interval or list(self.compute_nodes) != [nodename]:
+            return True
+        last_full_audit = self.last_full_audits.get(nodename)
+        return (last_full_audit is None or
+                time.time() - last_full_audit >= interval or
+                self.disabled(nodename))
+
+    def _reconcile_available_resource(self, context, resources):
+        """Refresh the capacity of a node and the stats of its instances,
+        keeping the usage tracked from the claims and the deletions of
+        instances since the last full audit.
+
+        :returns: False if the instances or in-progress migrations of the
+                  node are not the tracked ones, so that a full audit is
+                  needed, True otherwise.
+        """
+        nodename = resources['hypervisor_hostname']
+        instances = objects.InstanceList.get_by_host_and_node(
+            context, self.host, nodename, expected_attrs=[])
+        instances = [instance for instance in instances
+                     if instance.vm_state not in
+                     vm_states.ALLOW_RESOURCE_REMOVAL]
+        migrations = objects.MigrationList.get_in_progress_by_host_and_node(
+            context, self.host, nodename)
+        tracked_migrations = self.audited_migrations[nodename] | set(
+            migration.id for migration in self.tracked_migrations.values())
+        if (set(instance.uuid for instance in instances) !=
+                set(self.tracked_instances) or
+                set(migration.id for migration in migrations) !=
+                tracked_migrations):
+            LOG.info("Instances or migrations of %(host)s (node: %(node)s) "
+                     "changed since the last audit of its resources, "
+                     "auditing them again.",
+                     {'host': self.host, 'node': nodename})
+            return False
+
+        cn = self.compute_nodes[nodename]
+        cn.update_from_virt_driver(
+            {key: value for key, value in resources.items()
+             if key not in _USAGE_RESOURCES})
+        cn.free_ram_mb = cn.memory_mb - cn.memory_mb_used
+        cn.free_disk_gb = cn.local_gb - cn.local_gb_used
+        self.stats.digest_stats(resources.get('stats'))
+        for instance in instances:
+            self.stats.update_stats_for_instance(instance)
+        cn.stats = copy.deepcopy(self.stats)
+        cn.current_workload = self.stats.calculate_workload()
+
+        self._update_compute_node_view(context, nodename)
+        return True
+
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def _update_available_resource(self, context, resources):
+        nodename = resources['hypervisor_hostname']
+        if (not self._full_audit_due(nodename) and
+                self._reconcile_available_resource(context, resources)):
+            return
 
         # initialize the compute node object, creating it
         # if it does not already exist.
         self._init_compute_node(context, resources)
 
-        nodename = resources['hypervisor_hostname']
-
         # if we could not init the compute node the tracker will be
         # disabled and we should quit now
         if self.disabled(nodename):
@@ -745,6 +813,14 @@ class ResourceTracker(object):
         dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
         cn.pci_device_pools = dev_pools_obj
 
+        self._update_compute_node_view(context, nodename)
+        self.last_full_audits[nodename] = time.time()
+        self.audited_migrations[nodename] = set(
+            migration.id for migration in migrations)
+
+    def _update_compute_node_view(self, context, nodename):
+        """Log the usage of a node and save it along with its metrics."""
+        cn = self.compute_nodes[nodename]
         self._report_final_resource_view(nodename)
 
         metrics = self._get_host_metrics(context, nodename)
@@ -577,6 +577,23 @@ Possible Values:
 
 * 0 : treated as unlimited.
 * Any positive integer representing maximum concurrent builds.
+"""),
+    cfg.IntOpt('max_concurrent_instance_inits',
+        default=10,
+        min=1,
+        help="""
+Maximum number of instances initialized concurrently when nova-compute
+starts.
+
+On startup, the compute service checks the state of each instance of the
+host, plugging its VIFs or resuming it if needed, before it starts to
+handle requests. Initializing several instances at once reduces the startup
+time of hosts with many instances.
+
+Possible values:
+
+* 1: The instances are initialized one after the other.
+* Any positive integer representing maximum concurrent initializations.
 """),
     # TODO(sfinucan): Add min parameter
     cfg.IntOpt('max_concurrent_live_migrations',
@@ -730,6 +747,41 @@ Possible values:
 
 * Any positive integer in seconds.
 * Any value <=0 will disable the sync. This is not recommended.
+"""),
+    cfg.IntOpt('heal_instance_info_cache_batch_size',
+        default=1,
+        min=1,
+        help="""
+Number of instances whose network information cache is updated per run of
+the ``heal_instance_info_cache_interval`` periodic task.
+
+With a value greater than 1, the networking information of the instances
+of a batch is queried at once from Neutron, rather than with several
+requests per instance. This allows the caches of the instances of dense
+compute nodes to be updated more often.
+
+Related options:
+
+* ``heal_instance_info_cache_time_budget``
+"""),
+    cfg.IntOpt('heal_instance_info_cache_time_budget',
+        default=0,
+        min=0,
+        help="""
+Maximum number of seconds spent updating the network information caches of
+a batch of instances per run of the periodic task.
+
+The instances of the batch left when this time is exceeded are updated by
+the next runs of the task.
+
+Possible values:
+
+* 0: No time limit.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``heal_instance_info_cache_batch_size``
 """),
     cfg.IntOpt('reclaim_instance_interval',
         default=0,
@@ -893,7 +945,35 @@ Possible values:
 * 0: Will run at the default periodic interval.
 * Any value < 0: Disables the option.
 * Any positive integer in seconds.
-""")
+"""),
+    cfg.IntOpt('full_update_resources_interval',
+        default=0,
+        min=0,
+        help="""
+Interval between full audits of the resources of a compute node.
+
+A full audit reloads all the instances and in-progress migrations of the node
+to recompute its resource usage from scratch, while blocking the resource
+claims of new instances. Between full audits, the update_available_resource
+periodic task keeps the usage maintained by the resource claims, aborts,
+move claim drops and deletions of instances, and only checks that the
+instances and in-progress migrations of the node are still the tracked ones;
+if they are not, it performs a full audit right away. Orphaned instances,
+allocations of deleted instances and PCI device usage are only checked during
+full audits.
+
+The resources of compute drivers managing several nodes, such as ironic, are
+always fully audited.
+
+Possible values:
+
+* 0: Fully audit the resources each time update_available_resource runs.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``update_resources_interval``
+"""),
 ]
 
 timeout_opts = [
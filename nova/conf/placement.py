@@ -60,6 +60,67 @@ are returned in a deterministic but undefined order. That is, all things
 being equal, two requests for allocation candidates will return the same
 results in the same order; but no guarantees are made as to how that order
 is determined.
+"""),
+    cfg.BoolOpt(
+        'track_usages',
+        default=False,
+        help="""
+If True, the placement service reads the usage of each resource class of each
+resource provider from the usages table to check capacity and find allocation
+candidates, instead of summing the allocations of the providers.
+
+The usages table is always updated in the same transaction as the allocations,
+whatever the value of this option, so it can be toggled at any time and may
+differ between placement services. After upgrading, run ``nova-manage
+placement sync_usages`` once to build the usages table from the existing
+allocations; until then the allocations are still summed. ``nova-manage
+placement sync_usages --verify`` reports the usages which do not match the
+allocations.
+"""),
+    cfg.BoolOpt(
+        'track_provider_trees',
+        default=False,
+        help="""
+If True, the placement service keeps the total capacity and usage of each
+resource class of each tree of nested resource providers in the
+provider_tree_inventories table, updating it in the same transaction as the
+inventories and allocations. Allocation candidates with nested providers are
+then only searched in the trees having enough capacity left.
+
+This option must be set to the same value on all the placement services. After
+enabling it, run ``nova-manage placement sync_provider_trees`` to build the
+table from the existing inventories and allocations; ``nova-manage placement
+sync_provider_trees --verify`` reports the trees which do not match them.
+"""),
+    cfg.IntOpt(
+        'max_concurrent_requests',
+        default=10,
+        min=1,
+        help="""
+Maximum number of requests sent concurrently to the placement service by a
+compute service updating its resource providers.
+
+The providers of a tree which do not depend on each other, such as the
+children of a same parent, are created, deleted and updated concurrently, and
+up to this many connections to the placement service are kept open for reuse.
+
+Possible values:
+
+* Any positive integer. 1 sends the requests one at a time.
+"""),
+    cfg.ListOpt(
+        'metrics_sinks',
+        default=[],
+        help="""
+Names of the sinks receiving the latency, status code and size of each
+request sent to the placement service by the compute and scheduler services,
+as well as the retries of the requests.
+
+The sinks are loaded from the ``nova.scheduler.client.metrics_sinks`` entry
+point namespace and must implement
+``nova.scheduler.client.metrics.MetricsSink``. Regardless of this option, the
+compute service summarizes the requests in its logs each time it updates its
+available resources.
 """),
 ]
 
@@ -552,6 +552,129 @@ In such case enabling this option will reduce contention and chances for
 rescheduling events.
 At the same time it will make the instance packing (even in unweighed case)
 less dense.
+"""),
+    cfg.BoolOpt(
+        "adaptive_filter_order",
+        default=False,
+        help="""
+Reorder the enabled filters based on their measured cost and selectivity.
+
+The scheduler always measures, for each filter, the fraction of the hosts it
+rejects and the time it spends checking each host, and logs those statistics
+at debug level when running its periodic tasks. When this option is enabled,
+once every filter has checked enough hosts, the filters are run in the order
+which minimizes the expected filtering time, so that cheap filters rejecting
+many hosts, like the ``AvailabilityZoneFilter``, run before expensive ones,
+like the ``NUMATopologyFilter``. The hosts selected are the same either way.
+
+When disabled, the filters run in the order of the ``enabled_filters``
+option.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Related options:
+
+* ``enabled_filters``
+"""),
+    cfg.BoolOpt(
+        "columnar_host_states",
+        default=False,
+        help="""
+Evaluate filters and weighers over a columnar view of the host states.
+
+When enabled, the capacity fields of all the candidate hosts (free RAM and
+disk, used vCPUs, allocation ratios, number of instances and I/O operations)
+are gathered once per request into per-field lists, and the filters and
+weighers which support it check the whole batch of hosts at once instead of
+one host at a time. This reduces the scheduler CPU time spent per request in
+large deployments. Filters and weighers without a columnar implementation
+keep running against each host state as usual, so the hosts selected are the
+same either way.
+
+The filters which support this are ``RamFilter``, ``CoreFilter``,
+``DiskFilter``, ``NumInstancesFilter`` and ``IoOpsFilter``, along with their
+``Aggregate*`` variants, and the weighers are ``RAMWeigher``, ``DiskWeigher``
+and ``IoOpsWeigher``.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+"""),
+    cfg.BoolOpt(
+        "cache_host_states",
+        default=False,
+        help="""
+Keep the compute nodes and host states in memory across requests.
+
+When enabled, the HostManager loads all the compute nodes of a cell once and
+then, on each scheduling request, only loads from the cell database the
+compute nodes which were created, updated or deleted since its previous poll
+of that cell. The host states built from those compute nodes are also kept
+across requests, and are refreshed whenever their compute node changes. Each
+request filters, weighs and consumes resources from its own copies of them, so
+that concurrent requests do not see each other's limits and consumption.
+
+Unlike the CachingScheduler, resources are still claimed in placement, and
+only the hosts returned by placement are considered, so the scheduling
+decisions stay consistent with placement. The services are still loaded on
+each request so that the up and disabled state of the hosts is current.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Related options:
+
+* ``compute_node_poll_overlap``
+"""),
+    cfg.IntOpt(
+        "compute_node_poll_overlap",
+        default=60,
+        min=0,
+        help="""
+Number of seconds to overlap between two polls of the compute nodes.
+
+Only used when ``cache_host_states`` is enabled. The compute nodes are
+timestamped by the compute hosts themselves, so each poll of a cell loads the
+compute nodes changed since the previous poll minus this number of seconds,
+in order to tolerate clock skew between the compute hosts and the scheduler.
+
+Related options:
+
+* ``cache_host_states``
+"""),
+    cfg.BoolOpt(
+        "claim_in_batch",
+        default=False,
+        help="""
+Claim the resources of all the instances of a multi-create request at once.
+
+When enabled, the scheduler first selects a host for each of the instances
+requested together, then claims the resources for all of them in placement
+with a single ``POST /allocations`` call, instead of making one call per
+instance. If that claim fails, for example because another scheduler
+consumed some of the same resources concurrently, the scheduler falls back to
+claiming the instances one at a time.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+"""),
+    cfg.BoolOpt(
+        "record_request_timings",
+        default=False,
+        help="""
+Record a timing breakdown of each scheduling request.
+
+When enabled, the scheduler records, for each request, the time spent getting
+allocation candidates from placement, loading the host states, running each
+filter along with the number of hosts it was given and kept, running each
+weigher, and claiming resources in placement. The breakdown is logged as JSON
+at debug level at the end of the request, and passed to the hooks registered
+with ``nova.scheduler.utils.register_timings_hook()``.
+
+When disabled, nothing is recorded.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
 """),
     # TODO(mikal): replace this option with something involving host aggregates
     cfg.ListOpt("isolated_images",
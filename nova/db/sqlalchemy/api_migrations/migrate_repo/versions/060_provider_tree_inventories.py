@@ -0,0 +1,45 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Database migrations for the capacity and usage of provider trees"""
+
+from migrate import UniqueConstraint
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    provider_tree_inventories = Table('provider_tree_inventories', meta,
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime),
+        Column('id', Integer, primary_key=True, nullable=False),
+        Column('root_provider_id', Integer, nullable=False),
+        Column('resource_class_id', Integer, nullable=False),
+        Column('capacity', Integer, nullable=False),
+        Column('used', Integer, nullable=False),
+        Index('provider_tree_inventories_resource_class_id_idx',
+              'resource_class_id'),
+        UniqueConstraint(
+            'root_provider_id', 'resource_class_id',
+            name='uniq_provider_tree_inventories0root_provider_resource_class'
+        ),
+        mysql_engine='InnoDB',
+        mysql_charset='latin1'
+    )
+
+    provider_tree_inventories.create(checkfirst=True)
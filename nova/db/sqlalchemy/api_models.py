@@ -371,6 +371,59 @@ class Allocation(API_BASE):
         foreign_keys=resource_provider_id)
 
 
+class Usage(API_BASE):
+    """The sum of the allocations of a resource class against a provider."""
+
+    __tablename__ = "usages"
+    __table_args__ = (
+        schema.UniqueConstraint('resource_provider_id', 'resource_class_id',
+            name='uniq_usages0resource_provider_resource_class'),
+    )
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    resource_provider_id = Column(Integer, nullable=False)
+    resource_class_id = Column(Integer, nullable=False)
+    used = Column(Integer, nullable=False)
+
+
+class ProviderTreeInventory(API_BASE):
+    """The capacity and usage of a resource class summed over the providers
+    of a tree.
+    """
+
+    __tablename__ = "provider_tree_inventories"
+    __table_args__ = (
+        Index('provider_tree_inventories_resource_class_id_idx',
+              'resource_class_id'),
+        schema.UniqueConstraint(
+            'root_provider_id', 'resource_class_id',
+            name='uniq_provider_tree_inventories0root_provider_resource_class'
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    root_provider_id = Column(Integer, nullable=False)
+    resource_class_id = Column(Integer, nullable=False)
+    capacity = Column(Integer, nullable=False)
+    used = Column(Integer, nullable=False)
+
+
+class PlacementGeneration(API_BASE):
+    """The generation of placement data which is not versioned by the
+    generations of the resource providers, bumped by each change of it.
+    """
+
+    __tablename__ = "placement_generations"
+    __table_args__ = (
+        schema.UniqueConstraint('name',
+            name='uniq_placement_generations0name'),
+    )
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    name = Column(String(255), nullable=False)
+    generation = Column(Integer, nullable=False)
+
+
 class ResourceProviderAggregate(API_BASE):
     """Associate a resource provider with an aggregate."""
 
@@ -0,0 +1,41 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from oslo_log import log as logging
+from sqlalchemy import MetaData, Table, Index
+
+LOG = logging.getLogger(__name__)
+
+# The scheduler polls the compute nodes created, updated or deleted since a
+# time, which can only use indexes if each of the three columns has one.
+INDEXES = {
+    'compute_nodes_created_at_idx': ['created_at'],
+    'compute_nodes_updated_at_idx': ['updated_at'],
+    'compute_nodes_deleted_at_idx': ['deleted_at'],
+}
+TABLE_NAME = 'compute_nodes'
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    table = Table(TABLE_NAME, meta, autoload=True)
+    existing = [idx.columns.keys() for idx in table.indexes]
+    for index_name, index_columns in sorted(INDEXES.items()):
+        if index_columns in existing:
+            LOG.info('Skipped adding %s because an equivalent index'
+                     ' already exists.', index_name)
+            continue
+        columns = [getattr(table.c, col_name) for col_name in index_columns]
+        index = Index(index_name, *columns)
+        index.create(migrate_engine)
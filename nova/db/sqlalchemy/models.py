@@ -113,6 +113,9 @@ class ComputeNode(BASE, NovaBase, models.SoftDeleteMixin):
     __tablename__ = 'compute_nodes'
     __table_args__ = (
         Index('compute_nodes_uuid_idx', 'uuid', unique=True),
+        Index('compute_nodes_created_at_idx', 'created_at'),
+        Index('compute_nodes_updated_at_idx', 'updated_at'),
+        Index('compute_nodes_deleted_at_idx', 'deleted_at'),
         schema.UniqueConstraint(
             'host', 'hypervisor_hostname', 'deleted',
             name="uniq_compute_nodes0host0hypervisor_hostname0deleted"),
@@ -17,6 +17,9 @@
 Filter support
 """
 
+import collections
+import time
+
 from oslo_log import log as logging
 
 from nova.i18n import _LI
@@ -48,6 +51,19 @@ class BaseFilter(object):
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to true in a subclass which implements filter_columns(), so that
+    # the filter can be evaluated over a whole batch of objects at once when
+    # the handler is given a columnar view of those objects.
+    supports_columns = False
+
+    def filter_columns(self, columns, spec_obj):
+        """Return a list of booleans, one for each object in the columnar
+        view, telling whether that object passes the filter.
+
+        Override this in a subclass which sets supports_columns.
+        """
+        raise NotImplementedError()
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
@@ -59,15 +75,115 @@ class BaseFilter(object):
             return True
 
 
+class FilterStats(object):
+    """Running statistics about the objects checked by a filter."""
+
+    def __init__(self):
+        self.runs = 0
+        self.objs_checked = 0
+        self.objs_rejected = 0
+        self.time_spent = 0.0
+
+    def record(self, start_count, end_count, time_spent):
+        self.runs += 1
+        self.objs_checked += start_count
+        self.objs_rejected += start_count - end_count
+        self.time_spent += time_spent
+
+    @property
+    def rejection_rate(self):
+        """Fraction of the checked objects which were rejected."""
+        if not self.objs_checked:
+            return 0.0
+        return float(self.objs_rejected) / self.objs_checked
+
+    @property
+    def time_per_obj(self):
+        """Average time, in seconds, spent checking one object."""
+        if not self.objs_checked:
+            return 0.0
+        return self.time_spent / self.objs_checked
+
+    def to_dict(self):
+        return {'runs': self.runs,
+                'objs_checked': self.objs_checked,
+                'objs_rejected': self.objs_rejected,
+                'rejection_rate': self.rejection_rate,
+                'time_spent': self.time_spent,
+                'time_per_obj': self.time_per_obj}
+
+
 class BaseFilterHandler(loadables.BaseLoader):
     """Base class to handle loading filter classes.
 
     This class should be subclassed where one needs to use filters.
     """
 
-    def get_filtered_objects(self, filters, objs, spec_obj, index=0):
+    # Number of objects each filter must have checked before the measured
+    # statistics are trusted enough to reorder the filters.
+    min_objs_checked_for_ordering = 1000
+
+    def __init__(self, loadable_cls_type):
+        super(BaseFilterHandler, self).__init__(loadable_cls_type)
+        # Dict of FilterStats keyed by filter class name
+        self.filter_stats = collections.defaultdict(FilterStats)
+
+    def get_filter_stats(self):
+        """Return a dict, keyed by filter class name, of the statistics
+        measured for each filter which was run.
+        """
+        return {cls_name: stats.to_dict()
+                for cls_name, stats in self.filter_stats.items()}
+
+    def get_ordered_filters(self, filters):
+        """Return the filters sorted so that the cheapest and most selective
+        ones run first.
+
+        The filters are sorted by the ratio between the average time they
+        spent checking an object and the fraction of the objects they
+        rejected, which minimizes the expected time spent filtering since each
+        filter checks the objects independently of the others. The configured
+        order is kept until every filter has checked enough objects.
+        """
+        all_stats = [self.filter_stats.get(filter_.__class__.__name__)
+                     for filter_ in filters]
+        if any(stats is None or
+               stats.objs_checked < self.min_objs_checked_for_ordering
+               for stats in all_stats):
+            return filters
+
+        def _rank(filter_and_stats):
+            stats = filter_and_stats[1]
+            if not stats.rejection_rate:
+                return float('inf')
+            return stats.time_per_obj / stats.rejection_rate
+
+        # sorted() is stable, so filters with the same rank, like those
+        # which never reject anything, keep their configured order.
+        return [filter_ for filter_, stats
+                in sorted(zip(filters, all_stats), key=_rank)]
+
+    def get_filtered_objects(self, filters, objs, spec_obj, index=0,
+                             columns_cls=None, timings=None):
+        """Run the objects through each filter in turn.
+
+        :param columns_cls: Optional callable building a columnar view of a
+                            list of objects. When given, filters which set
+                            supports_columns are evaluated over that view in
+                            one batch rather than one object at a time. The
+                            view must expose the objects it was built from as
+                            'objs' and support compress(mask).
+        :param timings: Optional object recording the timings of a request,
+                        whose add_filter() method is given the class name,
+                        the numbers of objects in and out and the time spent
+                        for each filter run.
+        """
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
+        # The columnar view of list_objs is only built once a filter which
+        # supports it is run, and is reused by the following columnar filters
+        # until a per-object filter removes some of the objects.
+        columns = None
         # Track the hosts as they are removed. The 'full_filter_results' list
         # contains the host/nodename info for every host that passes each
         # filter, while the 'part_filter_results' list just tracks the number
@@ -82,12 +198,29 @@ class BaseFilterHandler(loadables.BaseLoader):
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
-                objs = filter_.filter_all(list_objs, spec_obj)
-                if objs is None:
-                    LOG.debug("Filter %s says to stop filtering", cls_name)
-                    return
-                list_objs = list(objs)
+                start_time = time.time()
+                if columns_cls is not None and filter_.supports_columns:
+                    if columns is None:
+                        columns = columns_cls(list_objs)
+                    columns = columns.compress(
+                        filter_.filter_columns(columns, spec_obj))
+                    list_objs = columns.objs
+                else:
+                    objs = filter_.filter_all(list_objs, spec_obj)
+                    if objs is None:
+                        LOG.debug("Filter %s says to stop filtering",
+                                  cls_name)
+                        return
+                    list_objs = list(objs)
+                    if len(list_objs) != start_count:
+                        columns = None
                 end_count = len(list_objs)
+                elapsed = time.time() - start_time
+                self.filter_stats[cls_name].record(start_count, end_count,
+                                                   elapsed)
+                if timings is not None:
+                    timings.add_filter(cls_name, start_count, end_count,
+                                       elapsed)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
                 if list_objs:
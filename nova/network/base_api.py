@@ -257,6 +257,16 @@ class NetworkAPI(base.Base):
                                                update_cells=update_cells)
         return result
 
+    def prefetch_instances_nw_info(self, context, instances):
+        """Fetch at once what is needed to build the network info of the
+        given instances.
+
+        :returns: The keyword arguments to pass to get_instance_nw_info() to
+                  build the network info of any of the instances from the
+                  fetched data.
+        """
+        return {}
+
     def _get_instance_nw_info(self, context, instance, **kwargs):
         """Template method, so a subclass can implement for neutron/network."""
         raise NotImplementedError()
@@ -202,6 +202,80 @@ def get_client(context, admin=False):
                          admin=admin or context.is_admin)
 
 
+class _PrefetchedClient(object):
+    """A Neutron client answering the queries made to build the network info
+    of instances from the resources listed in bulk beforehand.
+
+    The other calls, and the queries about resources which were not listed,
+    are passed to the wrapped client.
+    """
+    def __init__(self, client, device_ids, ports, networks, subnets,
+                 dhcp_ports, floating_ips):
+        self.client = client
+        self._ports_by_device = {device_id: [] for device_id in device_ids}
+        for port in ports:
+            self._ports_by_device[port['device_id']].append(port)
+        self._networks = {network['id']: network for network in networks}
+        self._subnets = {subnet['id']: subnet for subnet in subnets}
+        self._dhcp_ports_by_network = {subnet['network_id']: []
+                                       for subnet in subnets}
+        for port in dhcp_ports:
+            self._dhcp_ports_by_network[port['network_id']].append(port)
+        self._floating_ips_by_port = {port['id']: [] for port in ports}
+        for fip in floating_ips:
+            self._floating_ips_by_port[fip['port_id']].append(fip)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    @staticmethod
+    def _get_all(resources, ids):
+        """Return the resources with the given IDs, or None if any of them
+        was not listed.
+        """
+        if not all(id in resources for id in ids):
+            return None
+        return [resources[id] for id in sorted(set(ids))]
+
+    def list_ports(self, **search_opts):
+        if set(search_opts) == {'tenant_id', 'device_id'}:
+            ports = self._ports_by_device.get(search_opts['device_id'])
+            if ports is not None:
+                return {'ports': [
+                    port for port in ports
+                    if port['tenant_id'] == search_opts['tenant_id']]}
+        elif (set(search_opts) == {'network_id', 'device_owner'} and
+                search_opts['device_owner'] == 'network:dhcp'):
+            ports = self._dhcp_ports_by_network.get(search_opts['network_id'])
+            if ports is not None:
+                return {'ports': ports}
+        return self.client.list_ports(**search_opts)
+
+    def list_networks(self, **search_opts):
+        if set(search_opts) == {'id'}:
+            networks = self._get_all(self._networks, search_opts['id'])
+            if networks is not None:
+                return {'networks': networks}
+        return self.client.list_networks(**search_opts)
+
+    def list_subnets(self, **search_opts):
+        if set(search_opts) == {'id'}:
+            subnets = self._get_all(self._subnets, search_opts['id'])
+            if subnets is not None:
+                return {'subnets': subnets}
+        return self.client.list_subnets(**search_opts)
+
+    def list_floatingips(self, **search_opts):
+        if set(search_opts) == {'fixed_ip_address', 'port_id'}:
+            fips = self._floating_ips_by_port.get(search_opts['port_id'])
+            if fips is not None:
+                return {'floatingips': [
+                    fip for fip in fips
+                    if fip['fixed_ip_address'] ==
+                    search_opts['fixed_ip_address']]}
+        return self.client.list_floatingips(**search_opts)
+
+
 def _is_not_duplicate(item, items, items_list_name, instance):
     present = item in items
 
@@ -1405,6 +1479,41 @@ class API(base_api.NetworkAPI):
                                                  preexisting_port_ids)
         return network_model.NetworkInfo.hydrate(nw_info)
 
+    def prefetch_instances_nw_info(self, context, instances):
+        """List at once the ports of the given instances, and their networks,
+        subnets, DHCP ports and floating IPs.
+
+        :returns: The keyword arguments to pass to get_instance_nw_info() to
+                  build the network info of any of the instances from these
+                  resources.
+        """
+        client = get_client(context, admin=True)
+        device_ids = [instance.uuid for instance in instances]
+        ports = client.list_ports(device_id=device_ids).get('ports', [])
+
+        networks = subnets = dhcp_ports = floating_ips = []
+        network_ids = set(port['network_id'] for port in ports)
+        if network_ids:
+            networks = client.list_networks(
+                id=sorted(network_ids)).get('networks', [])
+        subnet_ids = set(fixed_ip['subnet_id']
+                         for port in ports for fixed_ip in port['fixed_ips'])
+        if subnet_ids:
+            subnets = client.list_subnets(
+                id=sorted(subnet_ids)).get('subnets', [])
+        if subnets:
+            dhcp_ports = client.list_ports(
+                network_id=sorted(set(subnet['network_id']
+                                      for subnet in subnets)),
+                device_owner='network:dhcp').get('ports', [])
+        if ports:
+            floating_ips = self._safe_get_floating_ips(
+                client, port_id=[port['id'] for port in ports])
+
+        return {'admin_client': _PrefetchedClient(
+            client, device_ids, ports, networks, subnets, dhcp_ports,
+            floating_ips)}
+
     def _gather_port_ids_and_networks(self, context, instance, networks=None,
                                       port_ids=None, neutron=None):
         """Return an instance's complete list of port_ids and networks."""
@@ -2415,6 +2524,16 @@ class API(base_api.NetworkAPI):
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
 
+        # The prefetched ports were listed before the info cache was
+        # refreshed: list them again rather than dropping from the cache a
+        # port attached in between.
+        if (isinstance(client, _PrefetchedClient) and
+                any(port_id not in current_neutron_port_map
+                    for port_id in port_ids)):
+            data = client.client.list_ports(**search_opts)
+            current_neutron_port_map = {
+                port['id']: port for port in data.get('ports', [])}
+
         for port_id in port_ids:
             current_neutron_port = current_neutron_port_map.get(port_id)
             if current_neutron_port:
@@ -16,6 +16,7 @@
 from oslo_serialization import jsonutils
 from oslo_utils import uuidutils
 from oslo_utils import versionutils
+from sqlalchemy import or_
 
 import nova.conf
 from nova import db
@@ -452,6 +453,26 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @staticmethod
+    @db.select_db_reader_mode
+    def _db_compute_node_get_all_changed_since(context, changed_since):
+        db_computes = context.session.query(models.ComputeNode).filter(
+            or_(models.ComputeNode.created_at >= changed_since,
+                models.ComputeNode.updated_at >= changed_since,
+                models.ComputeNode.deleted_at >= changed_since)).all()
+        return db_computes
+
+    @classmethod
+    def get_all_changed_since(cls, context, changed_since):
+        """Return the ComputeNode records created, updated or deleted since
+        the given time. Deleted records are included, with their deleted
+        field set, so that callers can drop them from their own view.
+        """
+        db_computes = cls._db_compute_node_get_all_changed_since(
+            context, changed_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @staticmethod
     @db.select_db_reader_mode
     def _db_compute_node_get_by_hv_type(context, hv_type):
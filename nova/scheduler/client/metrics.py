@@ -0,0 +1,215 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Measures of the requests sent to the placement service by the report client.
+"""
+
+import abc
+import bisect
+import collections
+import time
+
+from keystoneauth1 import session as ks_session
+from oslo_log import log as logging
+from oslo_utils import uuidutils
+import six
+from stevedore import named
+
+import nova.conf
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+SINK_NAMESPACE = 'nova.scheduler.client.metrics_sinks'
+# Upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Path segments following these ones are names, not part of the route
+_NAMED_COLLECTIONS = ('inventories', 'resource_classes', 'traits')
+
+
+def get_route(path):
+    """Return the route of a placement URL path, with the UUIDs and names of
+    the resources it addresses replaced by placeholders.
+
+    For example '/resource_providers/{uuid}/inventories/{name}'.
+    """
+    parts = path.split('?', 1)[0].split('/')
+    for i in range(1, len(parts)):
+        if uuidutils.is_uuid_like(parts[i]):
+            parts[i] = '{uuid}'
+        elif parts[i] and parts[i - 1] in _NAMED_COLLECTIONS:
+            parts[i] = '{name}'
+    return '/'.join(parts)
+
+
+class MeasuringAdapter(ks_session.TCPKeepAliveAdapter):
+    """The keep-alive adapter of keystoneauth, also measuring the requests it
+    sends.
+    """
+
+    def __init__(self, record, *args, **kwargs):
+        """:param record: Function called like MetricsSink.record_request()
+                          for each response received
+        """
+        self._record = record
+        super(MeasuringAdapter, self).__init__(*args, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        start = time.time()
+        resp = super(MeasuringAdapter, self).send(request, *args, **kwargs)
+        # Read the body, as the session would, to measure it
+        if not kwargs.get('stream'):
+            bytes_received = len(resp.content or b'')
+        else:
+            bytes_received = 0
+        self._record(request.method, get_route(request.path_url),
+                     resp.status_code, time.time() - start,
+                     len(request.body or b''), bytes_received)
+        return resp
+
+
+@six.add_metaclass(abc.ABCMeta)
+class MetricsSink(object):
+    """Base class for the sinks of the measures of the requests sent to the
+    placement service.
+
+    Besides the in-memory sink summarized in the logs of the compute service,
+    the report client sends its measures to the sinks named in
+    [placement]metrics_sinks, loaded from the
+    nova.scheduler.client.metrics_sinks entry point namespace.
+    """
+
+    @abc.abstractmethod
+    def record_request(self, method, route, status_code, elapsed, bytes_sent,
+                       bytes_received):
+        """Record a response received from the placement service.
+
+        :param method: The HTTP method of the request
+        :param route: The route of the request, see get_route()
+        :param status_code: The HTTP status code of the response
+        :param elapsed: Seconds elapsed between sending the request and
+                        receiving the response
+        :param bytes_sent: Size of the body of the request
+        :param bytes_received: Size of the body of the response
+        """
+        raise NotImplementedError('record_request')
+
+    @abc.abstractmethod
+    def record_retry(self, operation):
+        """Record the retry of a report client operation.
+
+        :param operation: The name of the retried method
+        """
+        raise NotImplementedError('record_retry')
+
+
+class _RouteMetrics(object):
+    def __init__(self):
+        self.status_codes = collections.Counter()
+        # Number of requests per latency bucket, the last one being unbound
+        self.latencies = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_elapsed = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def count(self):
+        return sum(self.latencies)
+
+    def percentile(self, fraction):
+        """Return the upper bound of the latency bucket of the given fraction
+        of the requests, or None if it is above the last bucket.
+        """
+        threshold = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latencies):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return None
+
+
+class PlacementMetrics(MetricsSink):
+    """In-memory counters and latency histograms of the requests sent to the
+    placement service, by route.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # _RouteMetrics keyed by (method, route)
+        self.routes = collections.defaultdict(_RouteMetrics)
+        # Number of retries keyed by operation
+        self.retries = collections.Counter()
+
+    def record_request(self, method, route, status_code, elapsed, bytes_sent,
+                       bytes_received):
+        metrics = self.routes[(method, route)]
+        metrics.status_codes[status_code] += 1
+        metrics.latencies[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        metrics.total_elapsed += elapsed
+        metrics.bytes_sent += bytes_sent
+        metrics.bytes_received += bytes_received
+
+    def record_retry(self, operation):
+        self.retries[operation] += 1
+
+    def summarize(self):
+        """Return a summary of the requests recorded since the last summary,
+        the slowest routes first, or None if there were none.
+        """
+        if not self.routes and not self.retries:
+            return None
+        lines = []
+        routes = sorted(self.routes.items(),
+                        key=lambda item: item[1].total_elapsed, reverse=True)
+        for (method, route), metrics in routes:
+            p95 = metrics.percentile(0.95)
+            lines.append(
+                '%(method)s %(route)s: %(count)d requests (%(statuses)s), '
+                '%(total).3fs total, p95 %(p95)s, %(sent)d bytes sent, '
+                '%(received)d bytes received' % {
+                    'method': method,
+                    'route': route,
+                    'count': metrics.count,
+                    'statuses': ', '.join(
+                        '%s: %d' % item
+                        for item in sorted(metrics.status_codes.items())),
+                    'total': metrics.total_elapsed,
+                    'p95': ('<= %ss' % p95 if p95 is not None
+                            else '> %ss' % LATENCY_BUCKETS[-1]),
+                    'sent': metrics.bytes_sent,
+                    'received': metrics.bytes_received,
+                })
+        if self.retries:
+            lines.append('retries: %s' % ', '.join(
+                '%s: %d' % item for item in sorted(self.retries.items())))
+        self.reset()
+        return '; '.join(lines)
+
+
+def load_sinks():
+    """Load the metrics sinks named in [placement]metrics_sinks."""
+    names = CONF.placement.metrics_sinks
+    if not names:
+        return []
+
+    def on_missing(names):
+        LOG.warning('Placement metrics sinks %s were not found.',
+                    ', '.join(sorted(names)))
+
+    mgr = named.NamedExtensionManager(
+        SINK_NAMESPACE, names, invoke_on_load=True, name_order=True,
+        on_missing_entrypoints_callback=on_missing)
+    return [ext.obj for ext in mgr]
@@ -13,17 +13,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import contextlib
 import copy
 import functools
 import re
+import sys
 import time
 
+import eventlet.event
+import eventlet.semaphore
 from keystoneauth1 import exceptions as ks_exc
 import os_traits
 from oslo_log import log as logging
 from oslo_middleware import request_id
 from oslo_utils import versionutils
+import requests
 from six.moves.urllib import parse
 
 from nova.compute import provider_tree
@@ -33,6 +38,7 @@ from nova import exception
 from nova.i18n import _
 from nova import objects
 from nova import rc_fields as fields
+from nova.scheduler.client import metrics
 from nova.scheduler import utils as scheduler_utils
 from nova import utils
 
@@ -51,6 +57,8 @@ ASSOCIATION_REFRESH = 300
 POST_RPS_RETURNS_PAYLOAD_API_VERSION = '1.20'
 NESTED_PROVIDER_API_VERSION = '1.14'
 POST_ALLOCATIONS_API_VERSION = '1.13'
+CONDITIONAL_GET_API_VERSION = '1.24'
+BATCH_PROVIDER_UPDATE_API_VERSION = '1.25'
 
 
 def warn_limit(self, msg):
@@ -110,6 +118,7 @@ def retries(f):
                 LOG.debug(
                     'Unable to %(op)s because %(reason)s; retrying...',
                     {'op': e.operation, 'reason': e.reason})
+                self._record_metrics('record_retry', f.__name__)
         LOG.error('Failed scheduler client operation %s: out of retries',
                   f.__name__)
         return False
@@ -236,6 +245,26 @@ def _extract_inventory_in_use(body):
     return None
 
 
+def _group_by_depth(tree, uuids):
+    """Group providers by their depth in a provider tree, so that the
+    providers of a group do not depend on each other.
+
+    :param tree: The ProviderTree containing the providers
+    :param uuids: List, in top-down traversal order, of the UUIDs of the
+                  providers
+    :returns: A list of lists of UUIDs, starting with the roots
+    """
+    depths = {}
+    groups = []
+    for uuid in uuids:
+        parent_uuid = tree.data(uuid).parent_uuid
+        depth = depths[uuid] = depths.get(parent_uuid, -1) + 1
+        if depth == len(groups):
+            groups.append([])
+        groups[depth].append(uuid)
+    return groups
+
+
 def get_placement_request_id(response):
     if response is not None:
         return response.headers.get(request_id.HTTP_RESP_HEADER_REQUEST_ID)
@@ -250,6 +279,16 @@ class SchedulerReportClient(object):
         self._provider_tree = provider_tree.ProviderTree()
         # Track the last time we updated providers' aggregates and traits
         self._association_refresh_time = {}
+        # The ETags and bodies of the last responses for the resources of
+        # each provider, see _get_provider_resource()
+        self._etag_cache = {}
+        # The events of the refreshes in progress, keyed by what they
+        # refresh, see _single_flight()
+        self._in_flight = {}
+        # The measures of the requests to placement, summarized in the logs,
+        # and the other sinks they are sent to
+        self._metrics = metrics.PlacementMetrics()
+        self._metrics_sinks = [self._metrics] + metrics.load_sinks()
         self._client = self._create_client()
         # NOTE(danms): Keep track of how naggy we've been
         self._warn_count = 0
@@ -260,15 +299,85 @@ class SchedulerReportClient(object):
         # Flush provider tree and associations so we start from a clean slate.
         self._provider_tree = provider_tree.ProviderTree()
         self._association_refresh_time = {}
+        self._etag_cache = {}
+        # Whether the placement service can set the inventories, traits and
+        # aggregates of multiple providers in one request, assumed until it
+        # says otherwise
+        self._provider_batch_supported = True
         client = utils.get_ksa_adapter('placement')
         # Set accept header on every request to ensure we notify placement
         # service of our response body media type preferences.
         client.additional_headers = {'accept': 'application/json'}
+        # Keep enough connections open to be reused by concurrent requests,
+        # and measure the requests.
+        pool_size = max(CONF.placement.max_concurrent_requests,
+                        requests.adapters.DEFAULT_POOLSIZE)
+        for scheme in ('https://', 'http://'):
+            client.session.mount(scheme, metrics.MeasuringAdapter(
+                self._record_request, pool_maxsize=pool_size))
         return client
 
-    def get(self, url, version=None, global_request_id=None):
-        headers = ({request_id.INBOUND_HEADER: global_request_id}
-                   if global_request_id else {})
+    def _record_metrics(self, method, *args):
+        """Send a measure to all the metrics sinks, ignoring their errors."""
+        for sink in self._metrics_sinks:
+            try:
+                getattr(sink, method)(*args)
+            except Exception:
+                LOG.exception('Failed to record placement metrics in %s',
+                              sink)
+
+    def _record_request(self, *args):
+        self._record_metrics('record_request', *args)
+
+    def get_metrics_summary(self):
+        """Return a summary of the requests sent to placement since the last
+        summary, or None if there were none.
+        """
+        return self._metrics.summarize()
+
+    def _single_flight(self, key, func, *args, **kwargs):
+        """Call a function, unless a call with the same key is already in
+        progress in another green thread, in which case wait for that call
+        and return its result or raise its exception instead.
+
+        :param key: Hashable identifying what the function refreshes
+        :param func: The function to call with the remaining arguments
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            return in_flight.wait()
+        in_flight = self._in_flight[key] = eventlet.event.Event()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            in_flight.send_exception(*sys.exc_info())
+            raise
+        else:
+            in_flight.send(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def _concurrently(self, func, items):
+        """Call a function on each of the items in green threads, at most
+        [placement]max_concurrent_requests at a time, and wait for them.
+
+        :returns: The list of the results of the calls, in order
+        """
+        semaphore = eventlet.semaphore.Semaphore(
+            CONF.placement.max_concurrent_requests)
+
+        def call(item):
+            with semaphore:
+                return func(item)
+
+        threads = [utils.spawn(call, item) for item in items]
+        return [thread.wait() for thread in threads]
+
+    def get(self, url, version=None, global_request_id=None, headers=None):
+        headers = dict(headers or {})
+        if global_request_id:
+            headers[request_id.INBOUND_HEADER] = global_request_id
         return self._client.get(url, raise_exc=False, microversion=version,
                                 headers=headers)
 
@@ -294,6 +403,39 @@ class SchedulerReportClient(object):
             kwargs['json'] = data
         return self._client.put(url, raise_exc=False, **kwargs)
 
+    def _get_provider_resource(self, context, rp_uuid, path=''):
+        """Conditionally GETs a resource of a resource provider.
+
+        The ETag and body of the last successful response for the resource
+        are kept, and the ETag is sent in the If-None-Match header so that
+        placement can answer 304 Not Modified without building the body again
+        if the resource has not changed.
+
+        :param context: The security context
+        :param rp_uuid: UUID of the resource provider
+        :param path: The path of the resource below the resource provider,
+                     e.g. '/inventories'
+        :return: A tuple of the response and its JSON body, which is a copy of
+                 the kept body if the resource has not changed, or None if
+                 the request failed.
+        """
+        url = '/resource_providers/%s%s' % (rp_uuid, path)
+        cached = self._etag_cache.get(rp_uuid, {}).get(path)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        resp = self.get(url, version=CONDITIONAL_GET_API_VERSION,
+                        global_request_id=context.global_id, headers=headers)
+        if resp.status_code == 304 and cached:
+            return resp, copy.deepcopy(cached[1])
+        if resp.status_code != 200:
+            self._etag_cache.get(rp_uuid, {}).pop(path, None)
+            return resp, None
+        data = resp.json()
+        etag = resp.headers.get('ETag')
+        if etag:
+            self._etag_cache.setdefault(rp_uuid, {})[path] = (
+                etag, copy.deepcopy(data))
+        return resp, data
+
     def delete(self, url, version=None, global_request_id=None):
         headers = ({request_id.INBOUND_HEADER: global_request_id}
                    if global_request_id else {})
@@ -406,10 +548,9 @@ class SchedulerReportClient(object):
                 None or the empty set()) if the specified resource provider
                 does not exist.
         """
-        resp = self.get("/resource_providers/%s/aggregates" % rp_uuid,
-                        version='1.1', global_request_id=context.global_id)
-        if resp.status_code == 200:
-            data = resp.json()
+        resp, data = self._get_provider_resource(context, rp_uuid,
+                                                 '/aggregates')
+        if data is not None:
             return set(data['aggregates'])
 
         placement_req_id = get_placement_request_id(resp)
@@ -437,11 +578,10 @@ class SchedulerReportClient(object):
                 we raise this exception (as opposed to returning None or the
                 empty set()) if the specified resource provider does not exist.
         """
-        resp = self.get("/resource_providers/%s/traits" % rp_uuid,
-                        version='1.6', global_request_id=context.global_id)
+        resp, data = self._get_provider_resource(context, rp_uuid, '/traits')
 
-        if resp.status_code == 200:
-            return set(resp.json()['traits'])
+        if data is not None:
+            return set(data['traits'])
 
         placement_req_id = get_placement_request_id(resp)
         LOG.error(
@@ -463,11 +603,8 @@ class SchedulerReportClient(object):
                  such resource provider could be found.
         :raise: ResourceProviderRetrievalFailed on error.
         """
-        resp = self.get("/resource_providers/%s" % uuid,
-                        version=NESTED_PROVIDER_API_VERSION,
-                        global_request_id=context.global_id)
-        if resp.status_code == 200:
-            data = resp.json()
+        resp, data = self._get_provider_resource(context, uuid)
+        if data is not None:
             return data
         elif resp.status_code == 404:
             return None
@@ -721,6 +858,7 @@ class SchedulerReportClient(object):
             except ValueError:
                 pass
             self._association_refresh_time.pop(rp_uuid, None)
+            self._etag_cache.pop(rp_uuid, None)
             return
 
         msg = ("[%(placement_req_id)s] Failed to delete resource provider "
@@ -741,11 +879,9 @@ class SchedulerReportClient(object):
         raise exception.ResourceProviderDeletionFailed(uuid=rp_uuid)
 
     def _get_inventory(self, context, rp_uuid):
-        url = '/resource_providers/%s/inventories' % rp_uuid
-        result = self.get(url, global_request_id=context.global_id)
-        if not result:
-            return None
-        return result.json()
+        _resp, data = self._get_provider_resource(context, rp_uuid,
+                                                  '/inventories')
+        return data
 
     def _refresh_and_get_inventory(self, context, rp_uuid):
         """Helper method that retrieves the current inventory for the supplied
@@ -755,7 +891,15 @@ class SchedulerReportClient(object):
         the generation returned from the placement API, we update the cached
         generation and attempt to update inventory if any exists, otherwise
         return empty inventories.
+
+        Concurrent refreshes of the inventory of a same provider are collapsed
+        into one.
         """
+        return self._single_flight(('inventory', rp_uuid),
+                                   self._do_refresh_and_get_inventory,
+                                   context, rp_uuid)
+
+    def _do_refresh_and_get_inventory(self, context, rp_uuid):
         curr = self._get_inventory(context, rp_uuid)
         if curr is None:
             return None
@@ -785,6 +929,8 @@ class SchedulerReportClient(object):
         historical: all code paths that get us here are doing inventory refresh
         themselves.
 
+        Concurrent refreshes of a same provider are collapsed into one.
+
         :param context: The security context
         :param rp_uuid: UUID of the resource provider to check for fresh
                         aggregates and traits
@@ -801,47 +947,53 @@ class SchedulerReportClient(object):
                 - ResourceProviderRetrievalFailed
         """
         if force or self._associations_stale(rp_uuid):
-            # Refresh aggregates
-            aggs = self._get_provider_aggregates(context, rp_uuid)
-            msg = ("Refreshing aggregate associations for resource provider "
-                   "%s, aggregates: %s")
-            LOG.debug(msg, rp_uuid, ','.join(aggs or ['None']))
-
-            # NOTE(efried): This will blow up if called for a RP that doesn't
-            # exist in our _provider_tree.
-            self._provider_tree.update_aggregates(
-                rp_uuid, aggs, generation=generation)
-
-            # Refresh traits
-            traits = self._get_provider_traits(context, rp_uuid)
-            msg = ("Refreshing trait associations for resource provider %s, "
-                   "traits: %s")
-            LOG.debug(msg, rp_uuid, ','.join(traits or ['None']))
-            # NOTE(efried): This will blow up if called for a RP that doesn't
-            # exist in our _provider_tree.
-            self._provider_tree.update_traits(
-                rp_uuid, traits, generation=generation)
-
-            if refresh_sharing:
-                # Refresh providers associated by aggregate
-                for rp in self._get_sharing_providers(context, aggs):
-                    if not self._provider_tree.exists(rp['uuid']):
-                        # NOTE(efried): Right now sharing providers are always
-                        # treated as roots. This is deliberate. From the
-                        # context of this compute's RP, it doesn't matter if a
-                        # sharing RP is part of a tree.
-                        self._provider_tree.new_root(
-                            rp['name'], rp['uuid'],
-                            generation=rp['generation'])
-                    # Now we have to (populate or) refresh that guy's traits
-                    # and aggregates (but not *his* aggregate-associated
-                    # providers).  No need to override force=True for newly-
-                    # added providers - the missing timestamp will always
-                    # trigger them to refresh.
-                    self._refresh_associations(context, rp['uuid'],
-                                               force=force,
-                                               refresh_sharing=False)
-            self._association_refresh_time[rp_uuid] = time.time()
+            self._single_flight(('associations', rp_uuid, refresh_sharing),
+                                self._do_refresh_associations, context,
+                                rp_uuid, generation, force, refresh_sharing)
+
+    def _do_refresh_associations(self, context, rp_uuid, generation, force,
+                                 refresh_sharing):
+        # Refresh aggregates
+        aggs = self._get_provider_aggregates(context, rp_uuid)
+        msg = ("Refreshing aggregate associations for resource provider "
+               "%s, aggregates: %s")
+        LOG.debug(msg, rp_uuid, ','.join(aggs or ['None']))
+
+        # NOTE(efried): This will blow up if called for a RP that doesn't
+        # exist in our _provider_tree.
+        self._provider_tree.update_aggregates(
+            rp_uuid, aggs, generation=generation)
+
+        # Refresh traits
+        traits = self._get_provider_traits(context, rp_uuid)
+        msg = ("Refreshing trait associations for resource provider %s, "
+               "traits: %s")
+        LOG.debug(msg, rp_uuid, ','.join(traits or ['None']))
+        # NOTE(efried): This will blow up if called for a RP that doesn't
+        # exist in our _provider_tree.
+        self._provider_tree.update_traits(
+            rp_uuid, traits, generation=generation)
+
+        if refresh_sharing:
+            # Refresh providers associated by aggregate
+            for rp in self._get_sharing_providers(context, aggs):
+                if not self._provider_tree.exists(rp['uuid']):
+                    # NOTE(efried): Right now sharing providers are always
+                    # treated as roots. This is deliberate. From the
+                    # context of this compute's RP, it doesn't matter if a
+                    # sharing RP is part of a tree.
+                    self._provider_tree.new_root(
+                        rp['name'], rp['uuid'],
+                        generation=rp['generation'])
+                # Now we have to (populate or) refresh that guy's traits
+                # and aggregates (but not *his* aggregate-associated
+                # providers).  No need to override force=True for newly-
+                # added providers - the missing timestamp will always
+                # trigger them to refresh.
+                self._refresh_associations(context, rp['uuid'],
+                                           force=force,
+                                           refresh_sharing=False)
+        self._association_refresh_time[rp_uuid] = time.time()
 
     def _associations_stale(self, uuid):
         """Respond True if aggregates and traits have not been refreshed
@@ -1376,6 +1528,9 @@ class SchedulerReportClient(object):
         the placement database in an inconsistent state.  This should be
         recoverable through subsequent calls.
 
+        When the placement service supports it, the changed inventories,
+        traits and aggregates of all the providers are sent in one request.
+
         :param context: The security context
         :param new_tree: A ProviderTree instance representing the desired state
                          of providers in placement.
@@ -1421,6 +1576,18 @@ class SchedulerReportClient(object):
                 except ValueError:
                     pass
                 self._association_refresh_time.pop(rp_uuid, None)
+                self._etag_cache.pop(rp_uuid, None)
+
+        def for_each(func, uuids):
+            """Call func on each of the provider uuids concurrently, catching
+            the expected exceptions, and return whether all the calls
+            succeeded.
+            """
+            def call(uuid):
+                with catch_all(uuid) as status:
+                    func(uuid)
+                return status.success
+            return all(self._concurrently(call, uuids))
 
         # Overall indicator of success.  Will be set to False on any exception.
         success = True
@@ -1431,32 +1598,38 @@ class SchedulerReportClient(object):
         old_tree = self._provider_tree
         old_uuids = old_tree.get_provider_uuids()
         new_uuids = new_tree.get_provider_uuids()
+        # The providers of a same depth in a tree do not depend on each other,
+        # so they are processed concurrently, one depth after the other.
+        old_groups = _group_by_depth(old_tree, old_uuids)
+        new_groups = _group_by_depth(new_tree, new_uuids)
 
         # Do provider deletion first, since it has the best chance of failing
         # for non-generation-conflict reasons (i.e. allocations).
         uuids_to_remove = set(old_uuids) - set(new_uuids)
         # We have to do deletions in bottom-up order, so we don't error
         # attempting to delete a parent who still has children.
-        for uuid in reversed(old_uuids):
-            if uuid not in uuids_to_remove:
-                continue
-            with catch_all(uuid) as status:
-                self._delete_provider(uuid)
-            success = success and status.success
+        for group in reversed(old_groups):
+            group = [uuid for uuid in group if uuid in uuids_to_remove]
+            success = for_each(self._delete_provider, group) and success
 
         # Now create (or load) any "new" providers
         uuids_to_add = set(new_uuids) - set(old_uuids)
+
+        def add(uuid):
+            # Loading a provider from placement also loads the rest of its
+            # tree, which does not need to be loaded again.
+            if self._provider_tree.exists(uuid):
+                return
+            provider = new_tree.data(uuid)
+            self._ensure_resource_provider(
+                context, uuid, name=provider.name,
+                parent_provider_uuid=provider.parent_uuid)
+
         # We have to do additions in top-down order, so we don't error
         # attempting to create a child before its parent exists.
-        for uuid in new_uuids:
-            if uuid not in uuids_to_add:
-                continue
-            provider = new_tree.data(uuid)
-            with catch_all(uuid) as status:
-                self._ensure_resource_provider(
-                    context, uuid, name=provider.name,
-                    parent_provider_uuid=provider.parent_uuid)
-            success = success and status.success
+        for group in new_groups:
+            group = [uuid for uuid in group if uuid in uuids_to_add]
+            success = for_each(add, group) and success
 
         # At this point the local cache should have all the same providers as
         # new_tree.  Whether we added them or not, walk through and diff/flush
@@ -1467,19 +1640,181 @@ class SchedulerReportClient(object):
         # its descendants are also removed, and set_*_for_provider methods on
         # it wouldn't be able to get started. Walking the tree in bottom-up
         # order ensures we at least try to process all of the providers.
-        for uuid in reversed(new_uuids):
-            pd = new_tree.data(uuid)
-            with catch_all(pd.uuid) as status:
+        if self._provider_batch_supported:
+            # Send the changes of all the providers in a single request.
+            # Each provider is updated on its own, so that one failing
+            # provider does not prevent updating the others.
+            batch = collections.OrderedDict()
+            for uuid in reversed(new_uuids):
+                pd = new_tree.data(uuid)
+                with catch_all(pd.uuid) as status:
+                    update = self._get_provider_update(context, pd)
+                    if update:
+                        batch[pd.uuid] = update
+                success = success and status.success
+            resp = None
+            if batch:
+                resp = self._put_provider_updates(context, batch)
+            # The request may have found that placement does not support it
+            if self._provider_batch_supported:
+                results = resp.json()['resource_providers'] if resp else {}
+                for uuid, update in batch.items():
+                    # Skip the providers removed from the cache along with
+                    # an ancestor which failed; they will be refreshed later.
+                    if not self._provider_tree.exists(uuid):
+                        continue
+                    with catch_all(uuid) as status:
+                        self._apply_provider_update(
+                            uuid, update, results.get(uuid), resp)
+                    success = success and status.success
+        if not self._provider_batch_supported:
+            def update(uuid):
+                pd = new_tree.data(uuid)
                 self._set_inventory_for_provider(
                     context, pd.uuid, pd.inventory)
                 self.set_aggregates_for_provider(
                     context, pd.uuid, pd.aggregates)
                 self.set_traits_for_provider(context, pd.uuid, pd.traits)
-            success = success and status.success
+
+            for group in reversed(new_groups):
+                success = for_each(update, group) and success
 
         if not success:
             raise exception.ResourceProviderSyncFailed()
 
+    def _get_provider_update(self, context, provider):
+        """Return the changes to send to placement in a batched update of the
+        inventory, traits and aggregates of a provider, or an empty dict if
+        none of them differ from the local cache.
+
+        The resource classes and traits of the provider are created in
+        placement if needed.
+
+        :param context: The security context
+        :param provider: The ProviderData of the provider from the new tree
+        :raises: InvalidResourceClass if the inventory contains a resource
+                 class which cannot be created.
+        :raises: TraitCreationFailed or TraitRetrievalFailed if the traits
+                 could not be ensured.
+        """
+        rp_uuid = provider.uuid
+        update = {}
+        if self._provider_tree.has_inventory_changed(rp_uuid,
+                                                     provider.inventory):
+            self._ensure_resource_classes(context, set(provider.inventory))
+            update['inventories'] = provider.inventory or {}
+        if self._provider_tree.have_traits_changed(rp_uuid, provider.traits):
+            self._ensure_traits(context, provider.traits)
+            update['traits'] = list(provider.traits)
+        if self._provider_tree.have_aggregates_changed(rp_uuid,
+                                                       provider.aggregates):
+            update['aggregates'] = list(provider.aggregates)
+        if update:
+            update['resource_provider_generation'] = (
+                self._provider_tree.data(rp_uuid).generation)
+        return update
+
+    @safe_connect
+    def _put_provider_updates(self, context, updates):
+        """Set the inventories, traits and aggregates of multiple providers
+        in one request, each provider being updated on its own.
+
+        If placement does not support the request, remember that so the
+        changes are sent provider by provider instead.
+
+        :param context: The security context
+        :param updates: Dict, keyed by provider UUID, of the changes to the
+                        provider as returned by _get_provider_update()
+        :returns: The response, or None if placement could not be reached or
+                  does not support the request.
+        """
+        url = '/resource_providers'
+        payload = {'resource_providers': updates, 'atomic': False}
+        resp = self.put(url, payload,
+                        version=BATCH_PROVIDER_UPDATE_API_VERSION,
+                        global_request_id=context.global_id)
+        if resp.status_code in (405, 406):
+            LOG.info('The placement service does not support updating '
+                     'multiple resource providers in one request, they will '
+                     'be updated one by one.')
+            self._provider_batch_supported = False
+            return None
+        if resp.status_code != 200:
+            msg = ("[%(placement_req_id)s] Failed to update resource "
+                   "providers %(uuids)s.  Got %(status_code)d: %(err_text)s")
+            args = {
+                'placement_req_id': get_placement_request_id(resp),
+                'uuids': ','.join(updates),
+                'status_code': resp.status_code,
+                'err_text': resp.text,
+            }
+            LOG.error(msg, args)
+        return resp
+
+    def _apply_provider_update(self, rp_uuid, update, result, resp):
+        """Update the local cache of a provider with its result in the
+        response to a batched update, or raise its error.
+
+        :param rp_uuid: The UUID of the provider
+        :param update: The changes sent for the provider
+        :param result: The result for the provider in the response, or None if
+                       the whole request failed
+        :param resp: The response to the batched update, or None if placement
+                     could not be reached
+        :raises: InventoryInUse if the update removed inventory in a resource
+                 class which has active allocations for this provider.
+        :raises: ResourceProviderUpdateConflict if the provider's generation
+                 doesn't match the generation in the cache.
+        :raises: ResourceProviderUpdateFailed on any other failure.
+        """
+        url = '/resource_providers'
+        if result is None:
+            raise exception.ResourceProviderUpdateFailed(
+                url=url, error=resp.text if resp is not None else '')
+
+        if 'errors' not in result:
+            generation = result['resource_provider_generation']
+            if 'inventories' in result:
+                self._provider_tree.update_inventory(
+                    rp_uuid, result['inventories'], generation=generation)
+            if 'traits' in result:
+                self._provider_tree.update_traits(
+                    rp_uuid, result['traits'], generation=generation)
+            if 'aggregates' in result:
+                self._provider_tree.update_aggregates(
+                    rp_uuid, result['aggregates'], generation=generation)
+            return
+
+        error = result['errors'][0]
+        msg = ("[%(placement_req_id)s] Failed to update resource provider "
+               "with UUID %(uuid)s.  Got %(status_code)d: %(err_text)s")
+        args = {
+            'placement_req_id': get_placement_request_id(resp),
+            'uuid': rp_uuid,
+            'status_code': error['status'],
+            'err_text': error['detail'],
+        }
+        LOG.error(msg, args)
+
+        if error['status'] == 409:
+            # If a conflict attempting to remove inventory in a resource class
+            # with active allocations, raise InventoryInUse
+            rc = _extract_inventory_in_use(error['detail'])
+            if rc is not None:
+                raise exception.InventoryInUse(
+                    resource_classes=rc,
+                    resource_provider=rp_uuid,
+                )
+            # Other conflicts are generation mismatch: raise conflict exception
+            raise exception.ResourceProviderUpdateConflict(
+                uuid=rp_uuid,
+                generation=update['resource_provider_generation'],
+                error=error['detail'])
+
+        # Otherwise, raise generic exception
+        raise exception.ResourceProviderUpdateFailed(
+            url=url, error=error['detail'])
+
     @safe_connect
     def get_allocations_for_consumer(self, context, consumer):
         url = '/allocations/%s' % consumer
@@ -1616,6 +1951,65 @@ class SchedulerReportClient(object):
                      'text': r.text})
         return r.status_code == 204
 
+    @safe_connect
+    @retries
+    def claim_resources_in_batch(self, context, alloc_requests, project_id,
+                                 user_id, allocation_request_version=None):
+        """Creates allocation records for several new consumers at once.
+
+        Unlike claim_resources(), this does not check for existing
+        allocations, so it must only be used for consumers which do not have
+        any yet, like instances being built. The allocations are all written
+        in a single POST /allocations call, which either creates all of them
+        or none of them.
+
+        :param context: The security context
+        :param alloc_requests: Dict, keyed by consumer UUID, of the
+                               allocation requests received from placement
+                               to claim for each consumer.
+        :param project_id: The project_id associated with the allocations.
+        :param user_id: The user_id associated with the allocations.
+        :param allocation_request_version: The microversion used to request the
+                                           allocations.
+        :returns: True if the allocations were created, False otherwise.
+        """
+        allocation_request_version = allocation_request_version or '1.10'
+        payload = {}
+        for consumer_uuid, alloc_request in alloc_requests.items():
+            # The dict format of the allocations is the only one accepted by
+            # POST /allocations, so convert the array format if needed.
+            if versionutils.convert_version_to_tuple(
+                    allocation_request_version) < (1, 12):
+                allocations = {
+                    alloc['resource_provider']['uuid']: {
+                        'resources': alloc['resources']
+                    } for alloc in alloc_request['allocations']
+                }
+            else:
+                allocations = copy.deepcopy(alloc_request['allocations'])
+            payload[consumer_uuid] = {
+                'allocations': allocations,
+                'project_id': project_id,
+                'user_id': user_id,
+            }
+
+        r = self.post('/allocations', payload, version='1.13',
+                      global_request_id=context.global_id)
+        if r.status_code != 204:
+            if 'concurrently updated' in r.text:
+                reason = ('another process changed the resource providers '
+                          'involved in our attempt to post allocations for '
+                          'consumers %s' % ', '.join(alloc_requests))
+                raise Retry('claim_resources_in_batch', reason)
+            else:
+                LOG.warning(
+                    'Unable to submit allocations for instances '
+                    '%(uuids)s (%(code)i %(text)s)',
+                    {'uuids': ', '.join(alloc_requests),
+                     'code': r.status_code,
+                     'text': r.text})
+        return r.status_code == 204
+
     @safe_connect
     def remove_provider_from_instance_allocation(self, context, consumer_uuid,
                                                  rp_uuid, user_id, project_id,
@@ -19,6 +19,7 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import itertools
 import random
 
 from oslo_log import log as logging
@@ -45,6 +46,19 @@ class FilterScheduler(driver.Scheduler):
         scheduler_client = client.SchedulerClient()
         self.placement_client = scheduler_client.reportclient
 
+    def run_periodic_tasks(self, context):
+        """Called from a periodic tasks in the manager."""
+        for cls_name, stats in sorted(
+                self.host_manager.get_filter_stats().items()):
+            LOG.debug("Filter %(cls_name)s checked %(objs_checked)d host(s) "
+                      "in %(runs)d run(s), rejecting %(rejection_rate).1f%% "
+                      "of them in %(time_per_host).1f us per host.",
+                      {'cls_name': cls_name,
+                       'objs_checked': stats['objs_checked'],
+                       'runs': stats['runs'],
+                       'rejection_rate': stats['rejection_rate'] * 100,
+                       'time_per_host': stats['time_per_obj'] * 1e6})
+
     def select_destinations(self, context, spec_obj, instance_uuids,
             alloc_reqs_by_rp_uuid, provider_summaries,
             allocation_request_version=None, return_alternates=False):
@@ -139,8 +153,9 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using a generator-iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self._get_all_host_states(elevated, spec_obj,
-            provider_summaries)
+        with utils.measure_phase(spec_obj, 'host_states'):
+            hosts = self._get_all_host_states(elevated, spec_obj,
+                provider_summaries)
 
         # NOTE(sbauza): The RequestSpec.num_instances field contains the number
         # of instances created when the RequestSpec was used to first boot some
@@ -184,7 +199,18 @@ class FilterScheduler(driver.Scheduler):
         # The list of hosts that have been selected (and claimed).
         claimed_hosts = []
 
-        for num in range(num_instances):
+        # The list of the allocation_requests used to claim resources against
+        # each selected host.
+        claimed_alloc_reqs = []
+
+        if (CONF.filter_scheduler.claim_in_batch and num_instances > 1 and
+                not utils.request_is_rebuild(spec_obj)):
+            hosts, num, claimed_hosts, claimed_alloc_reqs = (
+                self._schedule_in_batch(elevated, spec_obj, instance_uuids,
+                    hosts, alloc_reqs_by_rp_uuid, allocation_request_version))
+            claimed_instance_uuids = instance_uuids[:len(claimed_hosts)]
+
+        for num in range(len(claimed_hosts), num_instances):
             hosts = self._get_sorted_hosts(spec_obj, hosts, num)
             if not hosts:
                 # NOTE(jaypipes): If we get here, that means not all instances
@@ -199,27 +225,15 @@ class FilterScheduler(driver.Scheduler):
             # looking for an allocation_request that contains that host's
             # resource provider UUID
             claimed_host = None
-            for host in hosts:
-                cn_uuid = host.uuid
-                if cn_uuid not in alloc_reqs_by_rp_uuid:
-                    msg = ("A host state with uuid = '%s' that did not have a "
-                          "matching allocation_request was encountered while "
-                          "scheduling. This host was skipped.")
-                    LOG.debug(msg, cn_uuid)
-                    continue
-
-                alloc_reqs = alloc_reqs_by_rp_uuid[cn_uuid]
-                # TODO(jaypipes): Loop through all allocation_requests instead
-                # of just trying the first one. For now, since we'll likely
-                # want to order the allocation_requests in the future based on
-                # information in the provider summaries, we'll just try to
-                # claim resources using the first allocation_request
-                alloc_req = alloc_reqs[0]
-                if utils.claim_resources(elevated, self.placement_client,
-                        spec_obj, instance_uuid, alloc_req,
-                        allocation_request_version=allocation_request_version):
-                    claimed_host = host
-                    break
+            with utils.measure_phase(spec_obj, 'claims'):
+                for host, alloc_req in self._get_host_alloc_reqs(
+                        hosts, alloc_reqs_by_rp_uuid):
+                    if utils.claim_resources(elevated, self.placement_client,
+                            spec_obj, instance_uuid, alloc_req,
+                            allocation_request_version=(
+                                allocation_request_version)):
+                        claimed_host = host
+                        break
 
             if claimed_host is None:
                 # We weren't able to claim resources in the placement API
@@ -232,6 +246,7 @@ class FilterScheduler(driver.Scheduler):
 
             claimed_instance_uuids.append(instance_uuid)
             claimed_hosts.append(claimed_host)
+            claimed_alloc_reqs.append(alloc_req)
 
             # Now consume the resources so the filter/weights will change for
             # the next instance.
@@ -244,11 +259,128 @@ class FilterScheduler(driver.Scheduler):
 
         # We have selected and claimed hosts for each instance. Now we need to
         # find alternates for each host.
-        selections_to_return = self._get_alternate_hosts(
-            claimed_hosts, spec_obj, hosts, num, num_alts,
-            alloc_reqs_by_rp_uuid, allocation_request_version)
+        with utils.measure_phase(spec_obj, 'alternates'):
+            selections_to_return = self._get_alternate_hosts(
+                claimed_hosts, spec_obj, hosts, num, num_alts,
+                alloc_reqs_by_rp_uuid, allocation_request_version,
+                selected_alloc_reqs=claimed_alloc_reqs)
         return selections_to_return
 
+    @staticmethod
+    def _get_host_alloc_reqs(hosts, alloc_reqs_by_rp_uuid):
+        """Yields a (host, allocation_request) tuple for each of the
+        allocation_requests of each of the supplied hosts, in the order of
+        the hosts.
+        """
+        for host in hosts:
+            cn_uuid = host.uuid
+            if cn_uuid not in alloc_reqs_by_rp_uuid:
+                msg = ("A host state with uuid = '%s' that did not have a "
+                      "matching allocation_request was encountered while "
+                      "scheduling. This host was skipped.")
+                LOG.debug(msg, cn_uuid)
+                continue
+
+            # Try each of the allocation_requests for the host before moving
+            # on to the next host, since some of them may involve different
+            # sharing providers.
+            for alloc_req in alloc_reqs_by_rp_uuid[cn_uuid]:
+                yield host, alloc_req
+
+    def _schedule_in_batch(self, elevated, spec_obj, instance_uuids, hosts,
+            alloc_reqs_by_rp_uuid, allocation_request_version=None):
+        """Selects a host and an allocation_request for each instance, then
+        claims the resources for all of them in a single call to the
+        placement API.
+
+        If that claim fails, the selected hosts are claimed one instance at a
+        time, stopping at the first instance which can't be claimed against
+        its selected host.
+
+        Returns a tuple (hosts, index, claimed_hosts, claimed_alloc_reqs)
+        where hosts and index are those of the last call to
+        _get_sorted_hosts(), and claimed_hosts and claimed_alloc_reqs are the
+        hosts and allocation_requests claimed for the first instances. When
+        not all the instances were claimed, the resources consumed for the
+        others are released and hosts are those to place them again from.
+        """
+        selected_hosts = []
+        selected_alloc_reqs = []
+        # The hosts passed to _get_sorted_hosts() for each instance
+        unsorted_hosts = []
+        # The consumable states of each selected host before and after
+        # consuming the resources of its instance
+        consumed_states = []
+        num_group_hosts = None
+        if spec_obj.instance_group is not None:
+            num_group_hosts = len(spec_obj.instance_group.hosts)
+
+        # The hosts may be a generator-iterator, which can only be traversed
+        # once
+        hosts = list(hosts)
+        for num in range(len(instance_uuids)):
+            unsorted_hosts.append(hosts)
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num)
+            selected = next(self._get_host_alloc_reqs(hosts,
+                                                      alloc_reqs_by_rp_uuid),
+                            None)
+            if selected is None:
+                break
+            selected_host, alloc_req = selected
+            selected_hosts.append(selected_host)
+            selected_alloc_reqs.append(alloc_req)
+            before = selected_host.get_consumable_state()
+            self._consume_selected_host(selected_host, spec_obj)
+            consumed_states.append(
+                (before, selected_host.get_consumable_state()))
+
+        if len(selected_hosts) == len(instance_uuids):
+            with utils.measure_phase(spec_obj, 'claims'):
+                claimed = utils.claim_resources_in_batch(elevated,
+                        self.placement_client, spec_obj,
+                        dict(zip(instance_uuids, selected_alloc_reqs)),
+                        allocation_request_version=allocation_request_version)
+            if all(claimed.values()):
+                return hosts, num, selected_hosts, selected_alloc_reqs
+
+        LOG.debug("Unable to claim resources for all the instances at once, "
+                  "claiming them one at a time.")
+        claimed_hosts = []
+        claimed_alloc_reqs = []
+        with utils.measure_phase(spec_obj, 'claims'):
+            for instance_uuid, selected_host in zip(instance_uuids,
+                                                    selected_hosts):
+                for host, alloc_req in self._get_host_alloc_reqs(
+                        [selected_host], alloc_reqs_by_rp_uuid):
+                    if utils.claim_resources(elevated, self.placement_client,
+                            spec_obj, instance_uuid, alloc_req,
+                            allocation_request_version=(
+                                allocation_request_version)):
+                        claimed_hosts.append(host)
+                        claimed_alloc_reqs.append(alloc_req)
+                        break
+                else:
+                    break
+
+        num_claimed = len(claimed_hosts)
+        if num_claimed < len(selected_hosts):
+            # The following instances will be placed again, from the hosts
+            # they were first placed from, so the resources consumed for them
+            # are released, latest first, and their hosts should not count as
+            # members of the instance group.
+            for host, (before, after) in reversed(list(zip(
+                    selected_hosts, consumed_states))[num_claimed:]):
+                host.release_from_request(before, after)
+            hosts = unsorted_hosts[num_claimed]
+            if num_group_hosts is not None:
+                member_counts = utils.get_group_member_counts(spec_obj)
+                for host in selected_hosts[num_claimed:]:
+                    member_counts.remove(host.host)
+                del spec_obj.instance_group.hosts[
+                    num_group_hosts + num_claimed:]
+                spec_obj.instance_group.obj_reset_changes(['hosts'])
+        return hosts, num, claimed_hosts, claimed_alloc_reqs
+
     def _ensure_sufficient_hosts(self, context, hosts, required_count,
             claimed_uuids=None):
         """Checks that we have selected a host for each requested instance. If
@@ -324,13 +456,15 @@ class FilterScheduler(driver.Scheduler):
         LOG.debug("Selected host: %(host)s", {'host': selected_host})
         selected_host.consume_from_request(spec_obj)
         if spec_obj.instance_group is not None:
+            utils.get_group_member_counts(spec_obj).add(selected_host.host)
             spec_obj.instance_group.hosts.append(selected_host.host)
             # hosts has to be not part of the updates when saving
             spec_obj.instance_group.obj_reset_changes(['hosts'])
 
     def _get_alternate_hosts(self, selected_hosts, spec_obj, hosts, index,
                              num_alts, alloc_reqs_by_rp_uuid=None,
-                             allocation_request_version=None):
+                             allocation_request_version=None,
+                             selected_alloc_reqs=None):
         # We only need to filter/weigh the hosts again if we're dealing with
         # more than one instance since the single selected host will get
         # filtered out of the list of alternates below.
@@ -344,9 +478,11 @@ class FilterScheduler(driver.Scheduler):
         # representing the selected host along with alternates from the same
         # cell.
         selections_to_return = []
-        for selected_host in selected_hosts:
+        for i, selected_host in enumerate(selected_hosts):
             # This is the list of hosts for one particular instance.
-            if alloc_reqs_by_rp_uuid:
+            if selected_alloc_reqs:
+                selected_alloc_req = selected_alloc_reqs[i]
+            elif alloc_reqs_by_rp_uuid:
                 selected_alloc_req = alloc_reqs_by_rp_uuid.get(
                         selected_host.uuid)[0]
             else:
@@ -397,43 +533,54 @@ class FilterScheduler(driver.Scheduler):
         """Returns a list of HostState objects that match the required
         scheduling constraints for the request spec object and have been sorted
         according to the weighers.
+
+        The hosts are sorted as the list is accessed, so that only the hosts
+        which the caller looks at are sorted.
         """
-        filtered_hosts = self.host_manager.get_filtered_hosts(host_states,
-            spec_obj, index)
+        with utils.measure_phase(spec_obj, 'filtering'):
+            filtered_hosts = self.host_manager.get_filtered_hosts(host_states,
+                spec_obj, index)
 
         LOG.debug("Filtered %(hosts)s", {'hosts': filtered_hosts})
 
         if not filtered_hosts:
             return []
 
-        weighed_hosts = self.host_manager.get_weighed_hosts(filtered_hosts,
-            spec_obj)
+        with utils.measure_phase(spec_obj, 'weighing'):
+            weighed_hosts = iter(self.host_manager.get_weighed_hosts(
+                filtered_hosts, spec_obj, lazy=True))
+        host_subset_size = CONF.filter_scheduler.host_subset_size
+        best_hosts = list(itertools.islice(weighed_hosts, host_subset_size))
         if CONF.filter_scheduler.shuffle_best_same_weighed_hosts:
             # NOTE(pas-ha) Randomize best hosts, relying on weighed_hosts
             # being already sorted by weight in descending order.
             # This decreases possible contention and rescheduling attempts
             # when there is a large number of hosts having the same best
             # weight, especially so when host_subset_size is 1 (default)
-            best_hosts = [w for w in weighed_hosts
-                          if w.weight == weighed_hosts[0].weight]
-            random.shuffle(best_hosts)
-            weighed_hosts = best_hosts + weighed_hosts[len(best_hosts):]
+            best_weight = best_hosts[0].weight
+            same_weighed = [w for w in best_hosts if w.weight == best_weight]
+            other_hosts = best_hosts[len(same_weighed):]
+            if not other_hosts:
+                # Take all the following hosts with the best weight too
+                for weighed_host in weighed_hosts:
+                    if weighed_host.weight != best_weight:
+                        other_hosts.append(weighed_host)
+                        break
+                    same_weighed.append(weighed_host)
+            random.shuffle(same_weighed)
+            best_hosts = same_weighed + other_hosts
         # Strip off the WeighedHost wrapper class...
-        weighed_hosts = [h.obj for h in weighed_hosts]
+        best_hosts = [h.obj for h in best_hosts]
 
-        LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+        LOG.debug("Best weighed %(hosts)s", {'hosts': best_hosts})
 
         # We randomize the first element in the returned list to alleviate
         # congestion where the same host is consistently selected among
         # numerous potential hosts for similar request specs.
-        host_subset_size = CONF.filter_scheduler.host_subset_size
-        if host_subset_size < len(weighed_hosts):
-            weighed_subset = weighed_hosts[0:host_subset_size]
-        else:
-            weighed_subset = weighed_hosts
-        chosen_host = random.choice(weighed_subset)
-        weighed_hosts.remove(chosen_host)
-        return [chosen_host] + weighed_hosts
+        chosen_host = random.choice(best_hosts[0:host_subset_size])
+        best_hosts.remove(chosen_host)
+        return utils.LazyList(itertools.chain(
+            [chosen_host], best_hosts, (h.obj for h in weighed_hosts)))
 
     def _get_all_host_states(self, context, spec_obj, provider_summaries):
         """Template method, so a subclass can implement caching."""
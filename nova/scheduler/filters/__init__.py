@@ -30,6 +30,40 @@ class BaseHostFilter(filters.BaseFilter):
     # existing compute node, etc.
     RUN_ON_REBUILD = False
 
+    # Set by the HostManager running the filter to its
+    # nova.scheduler.host_manager.AggregateMetadataIndex.
+    aggregate_index = None
+
+    def filter_all(self, filter_obj_list, spec_obj):
+        """Yield the HostStates that pass the filter.
+
+        When the filter is given an aggregate index and builds a host check
+        from it, each HostState is checked by looking its host up with that
+        check instead of calling host_passes().
+        """
+        host_check = None
+        if self.aggregate_index is not None:
+            from nova.scheduler import utils
+            if not self.RUN_ON_REBUILD and utils.request_is_rebuild(spec_obj):
+                return iter(filter_obj_list)
+            host_check = self.get_aggregate_host_check(self.aggregate_index,
+                                                       spec_obj)
+        if host_check is None:
+            return super(BaseHostFilter, self).filter_all(filter_obj_list,
+                                                          spec_obj)
+        return (host_state for host_state in filter_obj_list
+                if host_check(host_state.host))
+
+    def get_aggregate_host_check(self, aggregate_index, spec_obj):
+        """Return a callable telling, given a host name, whether that host
+        passes the filter, or None if the filter can't be checked with
+        aggregate_index.
+
+        Override this in a subclass which only checks aggregate metadata, to
+        compute what passes once per call rather than once per host.
+        """
+        return None
+
     def _filter_one(self, obj, spec):
         """Return True if the object passes the filter, otherwise False."""
         # Do this here so we don't get scheduler.filters.utils
@@ -49,6 +83,24 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def filter_columns(self, columns, spec_obj):
+        """Return a list of booleans, one for each host in the columnar
+        view, telling whether that host passes the filter.
+        """
+        from nova.scheduler import utils
+        if not self.RUN_ON_REBUILD and utils.request_is_rebuild(spec_obj):
+            return [True] * len(columns)
+        return self.hosts_pass(columns, spec_obj)
+
+    def hosts_pass(self, columns, spec_obj):
+        """Columnar counterpart of host_passes().
+
+        Given a nova.scheduler.host_manager.HostStateColumns view, return a
+        list of booleans, one for each host in the view. Override this in a
+        subclass which sets supports_columns.
+        """
+        raise NotImplementedError()
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
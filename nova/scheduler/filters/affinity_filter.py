@@ -20,6 +20,7 @@ from oslo_log import log as logging
 
 from nova.scheduler import filters
 from nova.scheduler.filters import utils
+from nova.scheduler import utils as scheduler_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -98,16 +99,11 @@ class _GroupAntiAffinityFilter(filters.BaseHostFilter):
         if spec_obj.instance_uuid in host_state.instances.keys():
             return True
 
-        group_hosts = (spec_obj.instance_group.hosts
-                       if spec_obj.instance_group else [])
-        LOG.debug("Group anti affinity: check if %(host)s not "
-                  "in %(configured)s", {'host': host_state.host,
-                                        'configured': group_hosts})
-        if group_hosts:
-            return host_state.host not in group_hosts
-
-        # No groups configured
-        return True
+        member_counts = scheduler_utils.get_group_member_counts(spec_obj)
+        LOG.debug("Group anti affinity: check if %(host)s not in the "
+                  "%(count)d hosts of the group",
+                  {'host': host_state.host, 'count': len(member_counts)})
+        return host_state.host not in member_counts
 
 
 class ServerGroupAntiAffinityFilter(_GroupAntiAffinityFilter):
@@ -129,13 +125,12 @@ class _GroupAffinityFilter(filters.BaseHostFilter):
         if self.policy_name not in policies:
             return True
 
-        group_hosts = (spec_obj.instance_group.hosts
-                       if spec_obj.instance_group else [])
-        LOG.debug("Group affinity: check if %(host)s in "
-                  "%(configured)s", {'host': host_state.host,
-                                     'configured': group_hosts})
-        if group_hosts:
-            return host_state.host in group_hosts
+        member_counts = scheduler_utils.get_group_member_counts(spec_obj)
+        LOG.debug("Group affinity: check if %(host)s in the %(count)d "
+                  "hosts of the group",
+                  {'host': host_state.host, 'count': len(member_counts)})
+        if len(member_counts):
+            return host_state.host in member_counts
 
         # No groups configured
         return True
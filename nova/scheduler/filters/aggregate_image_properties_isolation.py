@@ -71,3 +71,38 @@ class AggregateImagePropertiesIsolation(filters.BaseHostFilter):
                            'options': options})
                 return False
         return True
+
+    def get_aggregate_host_check(self, aggregate_index, spec_obj):
+        cfg_namespace = (CONF.filter_scheduler.
+            aggregate_image_properties_isolation_namespace)
+        cfg_separator = (CONF.filter_scheduler.
+            aggregate_image_properties_isolation_separator)
+
+        image_props = spec_obj.image.properties if spec_obj.image else {}
+        failing_hosts = set()
+
+        for key in aggregate_index.keys():
+            if (cfg_namespace and
+                    not key.startswith(cfg_namespace + cfg_separator)):
+                continue
+            prop = None
+            try:
+                prop = image_props.get(key)
+            except AttributeError:
+                LOG.warning(_LW("Hosts have a metadata key '%(key)s' that is "
+                                "not present in the image metadata."),
+                            {"key": key})
+                continue
+
+            # NOTE(sbauza): Aggregate metadata is only strings, we need to
+            # stringify the property to match with the option
+            if prop:
+                failing_hosts |= (aggregate_index.get_hosts_with_key(key) -
+                                  aggregate_index.get_hosts(key, str(prop)))
+
+        LOG.debug("%(failed)d host(s) fail image aggregate properties "
+                  "requirements.", {'failed': len(failing_hosts)})
+
+        def _host_passes(host):
+            return host not in failing_hosts
+        return _host_passes
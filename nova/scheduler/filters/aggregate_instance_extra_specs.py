@@ -76,3 +76,35 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
                            'aggregate_vals': aggregate_vals})
                 return False
         return True
+
+    def get_aggregate_host_check(self, aggregate_index, spec_obj):
+        instance_type = spec_obj.flavor
+        passing_hosts = None
+        if (instance_type.obj_attr_is_set('extra_specs')
+                and instance_type.extra_specs):
+            for key, req in instance_type.extra_specs.items():
+                # Either not scope format, or aggregate_instance_extra_specs
+                # scope
+                scope = key.split(':', 1)
+                if len(scope) > 1:
+                    if scope[0] != _SCOPE:
+                        continue
+                    else:
+                        del scope[0]
+                key = scope[0]
+                key_hosts = set()
+                for aggregate_val in aggregate_index.get_values(key):
+                    if extra_specs_ops.match(aggregate_val, req):
+                        key_hosts |= aggregate_index.get_hosts(key,
+                                                               aggregate_val)
+                LOG.debug("%(hosts)d host(s) match instance_type extra_spec "
+                          "%(key)s '%(req)s'.",
+                          {'hosts': len(key_hosts), 'key': key, 'req': req})
+                if passing_hosts is None:
+                    passing_hosts = key_hosts
+                else:
+                    passing_hosts &= key_hosts
+
+        def _host_passes(host):
+            return passing_hosts is None or host in passing_hosts
+        return _host_passes
@@ -53,3 +53,19 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
             else:
                 LOG.debug("No tenant id's defined on host. Host passes.")
         return True
+
+    def get_aggregate_host_check(self, aggregate_index, spec_obj):
+        tenant_id = spec_obj.project_id
+        isolated_hosts = aggregate_index.get_hosts_with_key('filter_tenant_id')
+        tenant_hosts = set()
+        if tenant_id is not None:
+            tenant_hosts = aggregate_index.get_hosts('filter_tenant_id',
+                                                     tenant_id)
+        LOG.debug("%(isolated)d host(s) are in tenant isolated aggregates, "
+                  "%(matched)d of which match tenant id %(tenant_id)s",
+                  {'isolated': len(isolated_hosts),
+                   'matched': len(tenant_hosts), 'tenant_id': tenant_id})
+
+        def _host_passes(host):
+            return host not in isolated_hosts or host in tenant_hosts
+        return _host_passes
@@ -28,9 +28,15 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    supports_columns = True
+
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         raise NotImplementedError
 
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        return [self._get_cpu_allocation_ratio(host_state, spec_obj)
+                for host_state in columns.objs]
+
     def host_passes(self, host_state, spec_obj):
         """Return True if host has sufficient CPU cores.
 
@@ -75,6 +81,42 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def hosts_pass(self, columns, spec_obj):
+        """Return a list telling which hosts have sufficient CPU cores.
+
+        :param columns: nova.scheduler.host_manager.HostStateColumns
+        :param spec_obj: filter options
+        :return: list of booleans
+        """
+        instance_vcpus = spec_obj.vcpus
+        ratios = self._get_cpu_allocation_ratios(columns, spec_obj)
+        passes = []
+        vcpus_not_set = False
+        for host_state, vcpus_total, vcpus_used, ratio in zip(
+                columns.objs, columns.vcpus_total, columns.vcpus_used,
+                ratios):
+            if not vcpus_total:
+                # Fail safe
+                vcpus_not_set = True
+                passes.append(True)
+                continue
+            vcpus_limit = vcpus_total * ratio
+            if vcpus_limit > 0:
+                host_state.limits['vcpu'] = vcpus_limit
+                # Do not allow an instance to overcommit against itself, only
+                # against other instances.
+                if instance_vcpus > vcpus_total:
+                    passes.append(False)
+                    continue
+            passes.append(vcpus_limit - vcpus_used >= instance_vcpus)
+        if vcpus_not_set:
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+        LOG.debug("%(failed)d of %(total)d host(s) do not have "
+                  "%(instance_vcpus)d usable vcpus.",
+                  {'failed': passes.count(False), 'total': len(passes),
+                   'instance_vcpus': instance_vcpus})
+        return passes
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -82,6 +124,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         return host_state.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        return columns.cpu_allocation_ratio
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -93,6 +138,18 @@ class AggregateCoreFilter(BaseCoreFilter):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
             'cpu_allocation_ratio')
+        return self._validate_cpu_allocation_ratio(host_state,
+                                                   aggregate_vals)
+
+    def _get_cpu_allocation_ratios(self, columns, spec_obj):
+        all_aggregate_vals = utils.aggregate_values_by_host(
+            columns.objs, 'cpu_allocation_ratio', self.aggregate_index)
+        return [self._validate_cpu_allocation_ratio(host_state,
+                                                    aggregate_vals)
+                for host_state, aggregate_vals
+                in zip(columns.objs, all_aggregate_vals)]
+
+    def _validate_cpu_allocation_ratio(self, host_state, aggregate_vals):
         try:
             ratio = utils.validate_num_values(
                 aggregate_vals, host_state.cpu_allocation_ratio, cast_to=float)
@@ -27,9 +27,14 @@ class DiskFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    supports_columns = True
+
     def _get_disk_allocation_ratio(self, host_state, spec_obj):
         return host_state.disk_allocation_ratio
 
+    def _get_disk_allocation_ratios(self, columns, spec_obj):
+        return columns.disk_allocation_ratio
+
     def host_passes(self, host_state, spec_obj):
         """Filter based on disk usage."""
         requested_disk = (1024 * (spec_obj.root_gb +
@@ -71,6 +76,28 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def hosts_pass(self, columns, spec_obj):
+        """Filter based on disk usage."""
+        requested_disk = (1024 * (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) +
+                          spec_obj.swap)
+        ratios = self._get_disk_allocation_ratios(columns, spec_obj)
+        totals = [total_gb * 1024 for total_gb in columns.total_usable_disk_gb]
+        limits = [total * ratio for total, ratio in zip(totals, ratios)]
+        passes = [total >= requested_disk and
+                  limit - (total - free) >= requested_disk
+                  for total, free, limit
+                  in zip(totals, columns.free_disk_mb, limits)]
+        for host_state, disk_mb_limit, passed in zip(columns.objs, limits,
+                                                     passes):
+            if passed:
+                host_state.limits['disk_gb'] = disk_mb_limit / 1024
+        LOG.debug("%(failed)d of %(total)d host(s) do not have "
+                  "%(requested_disk)s MB usable disk.",
+                  {'failed': passes.count(False), 'total': len(passes),
+                   'requested_disk': requested_disk})
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -85,6 +112,18 @@ class AggregateDiskFilter(DiskFilter):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
             'disk_allocation_ratio')
+        return self._validate_disk_allocation_ratio(host_state,
+                                                    aggregate_vals)
+
+    def _get_disk_allocation_ratios(self, columns, spec_obj):
+        all_aggregate_vals = utils.aggregate_values_by_host(
+            columns.objs, 'disk_allocation_ratio', self.aggregate_index)
+        return [self._validate_disk_allocation_ratio(host_state,
+                                                     aggregate_vals)
+                for host_state, aggregate_vals
+                in zip(columns.objs, all_aggregate_vals)]
+
+    def _validate_disk_allocation_ratio(self, host_state, aggregate_vals):
         try:
             ratio = utils.validate_num_values(
                 aggregate_vals, host_state.disk_allocation_ratio,
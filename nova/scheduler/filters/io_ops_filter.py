@@ -30,9 +30,14 @@ class IoOpsFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    supports_columns = True
+
     def _get_max_io_ops_per_host(self, host_state, spec_obj):
         return CONF.filter_scheduler.max_io_ops_per_host
 
+    def _get_max_io_ops_for_hosts(self, columns, spec_obj):
+        return [CONF.filter_scheduler.max_io_ops_per_host] * len(columns)
+
     def host_passes(self, host_state, spec_obj):
         """Use information about current vm and task states collected from
         compute node statistics to decide whether to filter.
@@ -48,6 +53,14 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def hosts_pass(self, columns, spec_obj):
+        max_io_ops = self._get_max_io_ops_for_hosts(columns, spec_obj)
+        passes = [num_io_ops < max_value for num_io_ops, max_value
+                  in zip(columns.num_io_ops, max_io_ops)]
+        LOG.debug("%(failed)d of %(total)d host(s) fail I/O ops check.",
+                  {'failed': passes.count(False), 'total': len(passes)})
+        return passes
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -69,3 +82,7 @@ class AggregateIoOpsFilter(IoOpsFilter):
             value = max_io_ops_per_host
 
         return value
+
+    def _get_max_io_ops_for_hosts(self, columns, spec_obj):
+        return [self._get_max_io_ops_per_host(host_state, spec_obj)
+                for host_state in columns.objs]
@@ -30,9 +30,14 @@ class NumInstancesFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    supports_columns = True
+
     def _get_max_instances_per_host(self, host_state, spec_obj):
         return CONF.filter_scheduler.max_instances_per_host
 
+    def _get_max_instances_for_hosts(self, columns, spec_obj):
+        return [CONF.filter_scheduler.max_instances_per_host] * len(columns)
+
     def host_passes(self, host_state, spec_obj):
         num_instances = host_state.num_instances
         max_instances = self._get_max_instances_per_host(
@@ -45,6 +50,14 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def hosts_pass(self, columns, spec_obj):
+        max_instances = self._get_max_instances_for_hosts(columns, spec_obj)
+        passes = [num_instances < max_value for num_instances, max_value
+                  in zip(columns.num_instances, max_instances)]
+        LOG.debug("%(failed)d of %(total)d host(s) fail num_instances check.",
+                  {'failed': passes.count(False), 'total': len(passes)})
+        return passes
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -68,3 +81,7 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
             value = max_instances_per_host
 
         return value
+
+    def _get_max_instances_for_hosts(self, columns, spec_obj):
+        return [self._get_max_instances_per_host(host_state, spec_obj)
+                for host_state in columns.objs]
@@ -27,9 +27,15 @@ class BaseRamFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    supports_columns = True
+
     def _get_ram_allocation_ratio(self, host_state, spec_obj):
         raise NotImplementedError
 
+    def _get_ram_allocation_ratios(self, columns, spec_obj):
+        return [self._get_ram_allocation_ratio(host_state, spec_obj)
+                for host_state in columns.objs]
+
     def host_passes(self, host_state, spec_obj):
         """Only return hosts with sufficient available RAM."""
         requested_ram = spec_obj.memory_mb
@@ -65,6 +71,29 @@ class BaseRamFilter(filters.BaseHostFilter):
         host_state.limits['memory_mb'] = memory_mb_limit
         return True
 
+    def hosts_pass(self, columns, spec_obj):
+        """Only return hosts with sufficient available RAM."""
+        requested_ram = spec_obj.memory_mb
+        ratios = self._get_ram_allocation_ratios(columns, spec_obj)
+        limits = [total * ratio for total, ratio
+                  in zip(columns.total_usable_ram_mb, ratios)]
+        passes = [total >= requested_ram and
+                  limit - (total - free) >= requested_ram
+                  for total, free, limit
+                  in zip(columns.total_usable_ram_mb, columns.free_ram_mb,
+                         limits)]
+        for host_state, memory_mb_limit, passed in zip(columns.objs, limits,
+                                                       passes):
+            if passed:
+                # save oversubscription limit for compute node to test
+                # against:
+                host_state.limits['memory_mb'] = memory_mb_limit
+        LOG.debug("%(failed)d of %(total)d host(s) do not have "
+                  "%(requested_ram)s MB usable ram.",
+                  {'failed': passes.count(False), 'total': len(passes),
+                   'requested_ram': requested_ram})
+        return passes
+
 
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
@@ -72,6 +101,9 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, spec_obj):
         return host_state.ram_allocation_ratio
 
+    def _get_ram_allocation_ratios(self, columns, spec_obj):
+        return columns.ram_allocation_ratio
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
@@ -83,7 +115,18 @@ class AggregateRamFilter(BaseRamFilter):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
             'ram_allocation_ratio')
-
+        return self._validate_ram_allocation_ratio(host_state,
+                                                   aggregate_vals)
+
+    def _get_ram_allocation_ratios(self, columns, spec_obj):
+        all_aggregate_vals = utils.aggregate_values_by_host(
+            columns.objs, 'ram_allocation_ratio', self.aggregate_index)
+        return [self._validate_ram_allocation_ratio(host_state,
+                                                    aggregate_vals)
+                for host_state, aggregate_vals
+                in zip(columns.objs, all_aggregate_vals)]
+
+    def _validate_ram_allocation_ratio(self, host_state, aggregate_vals):
         try:
             ratio = utils.validate_num_values(
                 aggregate_vals, host_state.ram_allocation_ratio, cast_to=float)
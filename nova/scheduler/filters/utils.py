@@ -33,6 +33,18 @@ def aggregate_values_from_key(host_state, key_name):
               }
 
 
+def aggregate_values_by_host(host_states, key_name, aggregate_index=None):
+    """Returns a list with the set of values based on a metadata key for each
+    of the hosts, using the aggregate metadata index when it is provided.
+    """
+    if aggregate_index is None:
+        return [aggregate_values_from_key(host_state, key_name)
+                for host_state in host_states]
+    values_by_host = aggregate_index.get_values_by_host(key_name)
+    return [values_by_host.get(host_state.host, set())
+            for host_state in host_states]
+
+
 def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata based on a metadata key for a specific
     host. If the key is not provided, returns a dict of all metadata.
@@ -18,7 +18,11 @@ Manage hosts in the current zone.
 """
 
 import collections
+import copy
+import datetime
 import functools
+import itertools
+import operator
 import time
 try:
     from collections import UserDict as IterableUserDict   # Python 3
@@ -38,6 +42,7 @@ from nova.i18n import _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
+from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -322,6 +327,64 @@ class HostState(object):
         # is always an IO operation because we want to move the instance
         self.num_io_ops += 1
 
+    def copy_for_request(self):
+        """Returns a copy of the host state for a single request, whose limits
+        and consumed resources are not shared with the other requests.
+        """
+
+        @utils.synchronized(self._lock_name)
+        def _locked(self):
+            host_state = copy.copy(self)
+            host_state.limits = {}
+            host_state.pci_stats = copy.deepcopy(self.pci_stats)
+            return host_state
+
+        return _locked(self)
+
+    def get_consumable_state(self):
+        """Returns the attributes which consume_from_request() changes, to
+        pass to release_from_request().
+        """
+        return {
+            'free_ram_mb': self.free_ram_mb,
+            'free_disk_mb': self.free_disk_mb,
+            'vcpus_used': self.vcpus_used,
+            'num_instances': self.num_instances,
+            'num_io_ops': self.num_io_ops,
+            'numa_topology': self.numa_topology,
+            'pci_pools': (copy.deepcopy(self.pci_stats.pools)
+                          if self.pci_stats else None),
+            'updated': self.updated,
+        }
+
+    def release_from_request(self, before, after):
+        """Releases the resources consumed by a call to consume_from_request()
+        between the before and after states returned by
+        get_consumable_state(), keeping those consumed since by other
+        requests.
+        """
+
+        @utils.synchronized(self._lock_name)
+        def _locked(self, before, after):
+            for key in ('free_ram_mb', 'free_disk_mb', 'vcpus_used',
+                        'num_instances', 'num_io_ops'):
+                setattr(self, key,
+                        getattr(self, key) - after[key] + before[key])
+            pci_pools = self.pci_stats.pools if self.pci_stats else None
+            if (self.numa_topology is after['numa_topology'] and
+                    pci_pools == after['pci_pools']):
+                self.numa_topology = before['numa_topology']
+                if self.pci_stats:
+                    self.pci_stats.pools = before['pci_pools']
+                if self.updated == after['updated']:
+                    self.updated = before['updated']
+            else:
+                # The NUMA or PCI usage changed since, refresh the host state
+                # from its compute node in the next request
+                self.updated = None
+
+        return _locked(self, before, after)
+
     def __repr__(self):
         return ("(%(host)s, %(node)s) ram: %(free_ram)sMB "
                 "disk: %(free_disk)sMB io_ops: %(num_io_ops)s "
@@ -332,6 +395,136 @@ class HostState(object):
                  'num_instances': self.num_instances})
 
 
+class HostStateColumns(object):
+    """Columnar view over the capacity fields of a list of HostStates.
+
+    Each field in FIELDS is exposed as a list holding one value per host, in
+    the order of the objs list, so that the filters and weighers which
+    support it can evaluate a whole batch of hosts at once instead of one
+    HostState at a time.
+    """
+
+    FIELDS = ('free_ram_mb', 'total_usable_ram_mb', 'free_disk_mb',
+              'total_usable_disk_gb', 'vcpus_total', 'vcpus_used',
+              'ram_allocation_ratio', 'cpu_allocation_ratio',
+              'disk_allocation_ratio', 'num_instances', 'num_io_ops')
+
+    def __init__(self, host_states):
+        self.objs = list(host_states)
+        if self.objs:
+            rows = map(operator.attrgetter(*self.FIELDS), self.objs)
+            values = zip(*rows)
+        else:
+            values = [()] * len(self.FIELDS)
+        for field, column in zip(self.FIELDS, values):
+            setattr(self, field, list(column))
+
+    def __len__(self):
+        return len(self.objs)
+
+    def compress(self, mask):
+        """Return a new view of the hosts whose value in mask is True."""
+        mask = list(mask)
+        columns = self.__class__.__new__(self.__class__)
+        columns.objs = list(itertools.compress(self.objs, mask))
+        for field in self.FIELDS:
+            setattr(columns, field,
+                    list(itertools.compress(getattr(self, field), mask)))
+        return columns
+
+
+class AggregateMetadataIndex(object):
+    """Inverted index of the metadata of the host aggregates.
+
+    For each metadata key, maps each value of that key to the names of the
+    hosts in an aggregate with that value, and each of those hosts to the
+    values of the key on its aggregates. Values are indexed split on commas
+    in the former, as aggregate_metadata_get_by_host() returns them, and as
+    they are in the latter, as aggregate_values_from_key() returns them.
+
+    Host counts are kept so that a host in several aggregates with the same
+    metadata stays indexed until it has left all of them.
+    """
+
+    def __init__(self):
+        # {key: {value token: Counter of host names}}
+        self._hosts_by_value = collections.defaultdict(
+            lambda: collections.defaultdict(collections.Counter))
+        # {key: {host name: Counter of values}}
+        self._values_by_host = collections.defaultdict(
+            lambda: collections.defaultdict(collections.Counter))
+
+    def add(self, aggregate):
+        """Indexes the metadata of an aggregate for each of its hosts."""
+        self._update(aggregate, 1)
+
+    def remove(self, aggregate):
+        """Removes the metadata of an aggregate for each of its hosts."""
+        self._update(aggregate, -1)
+
+    def _update(self, aggregate, delta):
+        if not aggregate.obj_attr_is_set('metadata'):
+            return
+        for key, value in aggregate.metadata.items():
+            tokens = set(token.strip() for token in value.split(','))
+            for host in aggregate.hosts:
+                for token in tokens:
+                    self._add_count(self._hosts_by_value[key], token, host,
+                                    delta)
+                self._add_count(self._values_by_host[key], host, value,
+                                delta)
+            self._prune(self._hosts_by_value, key)
+            self._prune(self._values_by_host, key)
+
+    @staticmethod
+    def _add_count(index, entry, item, delta):
+        counter = index[entry]
+        counter[item] += delta
+        if counter[item] <= 0:
+            del counter[item]
+            if not counter:
+                del index[entry]
+
+    @staticmethod
+    def _prune(index, key):
+        if not index[key]:
+            del index[key]
+
+    def keys(self):
+        """Returns the metadata keys set on an aggregate with hosts."""
+        return list(self._values_by_host)
+
+    def get_hosts_with_key(self, key):
+        """Returns the set of hosts in an aggregate with the metadata key."""
+        if key not in self._values_by_host:
+            return set()
+        return set(self._values_by_host[key])
+
+    def get_hosts(self, key, value):
+        """Returns the set of hosts in an aggregate with the value, amongst
+        the values split on commas, for the metadata key.
+        """
+        if (key not in self._hosts_by_value or
+                value not in self._hosts_by_value[key]):
+            return set()
+        return set(self._hosts_by_value[key][value])
+
+    def get_values(self, key):
+        """Returns the values, split on commas, of the metadata key."""
+        if key not in self._hosts_by_value:
+            return []
+        return list(self._hosts_by_value[key])
+
+    def get_values_by_host(self, key):
+        """Returns a dict, keyed by host name, of the set of values of the
+        metadata key on the aggregates of each host.
+        """
+        if key not in self._values_by_host:
+            return {}
+        return {host: set(values)
+                for host, values in self._values_by_host[key].items()}
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -341,6 +534,9 @@ class HostManager(object):
 
     def __init__(self):
         self.refresh_cells_caches()
+        # Inverted index of the metadata of the aggregates in aggs_by_id,
+        # which the filters matching aggregate metadata look hosts up in
+        self.aggregate_index = AggregateMetadataIndex()
         self.filter_handler = filters.HostFilterHandler()
         filter_classes = self.filter_handler.get_matching_classes(
                 CONF.filter_scheduler.available_filters)
@@ -363,6 +559,14 @@ class HostManager(object):
         self._instance_info = {}
         if self.track_instance_changes:
             self._init_instance_info()
+        # When caching host states, dict of the compute nodes of each cell
+        # keyed by the cell UUID and then by the compute node UUID, along
+        # with the time each cell was last polled for changed compute nodes
+        self._compute_nodes_by_cell = {}
+        self._compute_nodes_polled_at = {}
+        # When caching host states, dict of the HostStates kept across
+        # requests, keyed by (host, nodename)
+        self._host_state_map = {}
 
     def _load_filters(self):
         return CONF.filter_scheduler.enabled_filters
@@ -372,6 +576,7 @@ class HostManager(object):
         aggs = objects.AggregateList.get_all(elevated)
         for agg in aggs:
             self.aggs_by_id[agg.id] = agg
+            self.aggregate_index.add(agg)
             for host in agg.hosts:
                 self.host_aggregates_map[host].add(agg.id)
 
@@ -384,7 +589,10 @@ class HostManager(object):
             self._update_aggregate(aggregates)
 
     def _update_aggregate(self, aggregate):
+        if aggregate.id in self.aggs_by_id:
+            self.aggregate_index.remove(self.aggs_by_id[aggregate.id])
         self.aggs_by_id[aggregate.id] = aggregate
+        self.aggregate_index.add(aggregate)
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
         # Refreshing the mapping dict to remove all hosts that are no longer
@@ -398,6 +606,7 @@ class HostManager(object):
         """Deletes internal HostManager information about a specific aggregate.
         """
         if aggregate.id in self.aggs_by_id:
+            self.aggregate_index.remove(self.aggs_by_id[aggregate.id])
             del self.aggs_by_id[aggregate.id]
         for host in self.host_aggregates_map:
             if aggregate.id in self.host_aggregates_map[host]:
@@ -482,7 +691,9 @@ class HostManager(object):
                     bad_filters.append(filter_name)
                     continue
                 filter_cls = self.filter_cls_map[filter_name]
-                self.filter_obj_map[filter_name] = filter_cls()
+                filter_obj = filter_cls()
+                filter_obj.aggregate_index = self.aggregate_index
+                self.filter_obj_map[filter_name] = filter_obj
             good_filters.append(self.filter_obj_map[filter_name])
         if bad_filters:
             msg = ", ".join(bad_filters)
@@ -588,13 +799,36 @@ class HostManager(object):
                     return []
             hosts = six.itervalues(name_to_cls_map)
 
-        return self.filter_handler.get_filtered_objects(self.enabled_filters,
-                hosts, spec_obj, index)
+        enabled_filters = self.enabled_filters
+        if CONF.filter_scheduler.adaptive_filter_order:
+            enabled_filters = self.filter_handler.get_ordered_filters(
+                enabled_filters)
+        return self.filter_handler.get_filtered_objects(enabled_filters,
+                hosts, spec_obj, index, columns_cls=self._get_columns_cls(),
+                timings=scheduler_utils.get_request_timings(spec_obj))
+
+    def get_filter_stats(self):
+        """Return a dict, keyed by filter class name, of the rejection rate
+        and the time spent per host measured for each enabled filter.
+        """
+        return self.filter_handler.get_filter_stats()
+
+    def get_weighed_hosts(self, hosts, spec_obj, lazy=False):
+        """Weigh the hosts.
 
-    def get_weighed_hosts(self, hosts, spec_obj):
-        """Weigh the hosts."""
+        If lazy is True, return an iterator which sorts the hosts as they are
+        consumed.
+        """
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, spec_obj)
+                hosts, spec_obj, columns_cls=self._get_columns_cls(),
+                timings=scheduler_utils.get_request_timings(spec_obj),
+                lazy=lazy)
+
+    @staticmethod
+    def _get_columns_cls():
+        if CONF.filter_scheduler.columnar_host_states:
+            return HostStateColumns
+        return None
 
     def _get_computes_for_cells(self, context, cells, compute_uuids=None):
         """Get a tuple of compute node and service information.
@@ -618,7 +852,18 @@ class HostManager(object):
             LOG.debug('Getting compute nodes and services for cell %(cell)s',
                       {'cell': cell.identity})
             with context_module.target_cell(context, cell) as cctxt:
-                if compute_uuids is None:
+                if CONF.filter_scheduler.cache_host_states:
+                    cell_computes = self._get_cached_compute_nodes(cctxt,
+                                                                   cell)
+                    if compute_uuids is None:
+                        compute_nodes[cell.uuid].extend(
+                            cell_computes.values())
+                    else:
+                        compute_nodes[cell.uuid].extend(
+                            cell_computes[compute_uuid]
+                            for compute_uuid in compute_uuids
+                            if compute_uuid in cell_computes)
+                elif compute_uuids is None:
                     compute_nodes[cell.uuid].extend(
                         objects.ComputeNodeList.get_all(cctxt))
                 else:
@@ -632,10 +877,55 @@ class HostManager(object):
                              include_disabled=True)})
         return compute_nodes, services
 
+    def _get_cached_compute_nodes(self, context, cell):
+        """Return the cached compute nodes of a cell, keyed by UUID.
+
+        The first call for a cell loads all of its compute nodes, and the
+        following calls only load the compute nodes created, updated or
+        deleted since the previous one.
+
+        :param context: request context targeted at the cell
+        :param cell: CellMapping object
+        """
+        polled_at = timeutils.utcnow()
+        last_polled_at = self._compute_nodes_polled_at.get(cell.uuid)
+        computes = self._compute_nodes_by_cell.get(cell.uuid)
+        if last_polled_at is None or computes is None:
+            computes = {compute.uuid: compute for compute in
+                        objects.ComputeNodeList.get_all(context)}
+            LOG.debug('Loaded %(count)d compute nodes for cell %(cell)s',
+                      {'count': len(computes), 'cell': cell.identity})
+        else:
+            # The compute nodes are timestamped by the compute
+            # hosts, so look back a bit further than the previous poll in
+            # order to not miss updates from hosts whose clock is late.
+            changed_since = last_polled_at - datetime.timedelta(
+                seconds=CONF.filter_scheduler.compute_node_poll_overlap)
+            changed = objects.ComputeNodeList.get_all_changed_since(
+                context, changed_since)
+            for compute in changed:
+                if compute.deleted:
+                    computes.pop(compute.uuid, None)
+                    self._host_state_map.pop(
+                        (compute.host, compute.hypervisor_hostname), None)
+                else:
+                    computes[compute.uuid] = compute
+            LOG.debug('Refreshed %(count)d changed compute nodes for cell '
+                      '%(cell)s', {'count': len(changed),
+                                   'cell': cell.identity})
+        self._compute_nodes_by_cell[cell.uuid] = computes
+        self._compute_nodes_polled_at[cell.uuid] = polled_at
+        return computes
+
     def refresh_cells_caches(self):
         # NOTE(tssurya): This function is called from the scheduler manager's
         # reset signal handler and also upon startup of the scheduler.
         context = context_module.RequestContext()
+        # The cells may have changed, so reload the cached compute
+        # nodes and host states from scratch on the next request.
+        self._compute_nodes_by_cell = {}
+        self._compute_nodes_polled_at = {}
+        self._host_state_map = {}
         temp_cells = objects.CellMappingList.get_all(context)
         # NOTE(tssurya): filtering cell0 from the list since it need
         # not be considered for scheduling.
@@ -698,7 +988,11 @@ class HostManager(object):
         Also updates the HostStates internal mapping for the HostManager.
         """
         # Get resource usage across the available compute nodes:
-        host_state_map = {}
+        cache_host_states = CONF.filter_scheduler.cache_host_states
+        if cache_host_states:
+            host_state_map = self._host_state_map
+        else:
+            host_state_map = {}
         seen_nodes = set()
         for cell_uuid, computes in compute_nodes.items():
             for compute in computes:
@@ -729,6 +1023,11 @@ class HostManager(object):
 
                 seen_nodes.add(state_key)
 
+        if cache_host_states:
+            # The cached host states only hold what was loaded from the
+            # database, each request consumes from and limits its own copies.
+            return (host_state_map[host].copy_for_request()
+                    for host in seen_nodes)
         return (host_state_map[host] for host in seen_nodes)
 
     def _get_aggregates_info(self, host):
@@ -129,13 +129,15 @@ class SchedulerManager(manager.Manager):
         except exception.RequestFilterFailed as e:
             raise exception.NoValidHost(reason=e.message)
 
+        utils.start_request_timings(spec_obj)
         resources = utils.resources_from_request_spec(spec_obj)
         is_rebuild = utils.request_is_rebuild(spec_obj)
         alloc_reqs_by_rp_uuid, provider_summaries, allocation_request_version \
             = None, None, None
         if self.driver.USES_ALLOCATION_CANDIDATES and not is_rebuild:
-            res = self.placement_client.get_allocation_candidates(ctxt,
-                                                                  resources)
+            with utils.measure_phase(spec_obj, 'placement'):
+                res = self.placement_client.get_allocation_candidates(
+                    ctxt, resources)
             if res is None:
                 # We have to handle the case that we failed to connect to the
                 # Placement service and the safe_connect decorator on
@@ -150,6 +152,7 @@ class SchedulerManager(manager.Manager):
                           "API. This may be a temporary occurrence as compute "
                           "nodes start up and begin reporting inventory to "
                           "the Placement service.")
+                utils.finish_request_timings(spec_obj)
                 raise exception.NoValidHost(reason="")
             else:
                 # Build a dict of lists of allocation requests, keyed by
@@ -163,9 +166,12 @@ class SchedulerManager(manager.Manager):
         # Only return alternates if both return_objects and return_alternates
         # are True.
         return_alternates = return_alternates and return_objects
-        selections = self.driver.select_destinations(ctxt, spec_obj,
-                instance_uuids, alloc_reqs_by_rp_uuid, provider_summaries,
-                allocation_request_version, return_alternates)
+        try:
+            selections = self.driver.select_destinations(ctxt, spec_obj,
+                    instance_uuids, alloc_reqs_by_rp_uuid, provider_summaries,
+                    allocation_request_version, return_alternates)
+        finally:
+            utils.finish_request_timings(spec_obj)
         # If `return_objects` is False, we need to convert the selections to
         # the older format, which is a list of host state dicts.
         if not return_objects:
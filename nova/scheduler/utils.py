@@ -15,9 +15,13 @@
 """Utility methods for scheduling."""
 
 import collections
+import contextlib
 import functools
+import itertools
 import re
 import sys
+import time
+import weakref
 
 from oslo_log import log as logging
 import oslo_messaging as messaging
@@ -720,6 +724,262 @@ def setup_instance_group(context, request_spec):
         request_spec.instance_group.members = group_info.members
 
 
+class GroupMemberCounts(object):
+    """Tracks where the members of a server group are during one request.
+
+    The server group filters and weighers look hosts up here instead of
+    scanning the hosts and members of the group for every host they check,
+    and the scheduler records each instance of the request it places.
+    """
+
+    def __init__(self, instance_group):
+        self._instance_group = instance_group
+        # Number of members on each host of the group, built from the
+        # group's hosts as used by the (anti-)affinity filters.
+        self._group_hosts = None
+        self._group_hosts_list = None
+        # Members of the group and the number of them found amongst the
+        # instances of each HostState, as used by the soft (anti-)affinity
+        # weighers.
+        self._members = None
+        self._members_on_host = {}
+        self._placed = collections.Counter()
+
+    def _get_group_hosts(self):
+        hosts = self._instance_group.hosts
+        # The hosts of the group were replaced rather than updated through
+        # add() and remove(), forget what was placed on the previous ones.
+        if hosts is not self._group_hosts_list:
+            self._group_hosts = collections.Counter(hosts or [])
+            self._group_hosts_list = hosts
+            self._placed.clear()
+        return self._group_hosts
+
+    def __contains__(self, host):
+        """Returns whether the named host is one of the hosts of the group.
+        """
+        return host in self._get_group_hosts()
+
+    def __len__(self):
+        """Returns the number of hosts of the group."""
+        return len(self._get_group_hosts())
+
+    def count(self, host_state):
+        """Returns the number of members of the group on the host."""
+        if self._instance_group.obj_attr_is_set('hosts'):
+            # Forget what was placed if the hosts of the group were replaced.
+            self._get_group_hosts()
+        host = host_state.host
+        count = self._members_on_host.get(host)
+        if count is None:
+            if self._members is None:
+                self._members = set(self._instance_group.members or [])
+            count = len(self._members.intersection(host_state.instances))
+            self._members_on_host[host] = count
+        return count + self._placed[host]
+
+    def add(self, host):
+        """Records that an instance of the request was placed on the host.
+
+        The caller is expected to append the host to the hosts of the group.
+        """
+        self._get_group_hosts()[host] += 1
+        self._placed[host] += 1
+
+    def remove(self, host):
+        """Records that an instance of the request placed on the host with
+        add() is not going there after all.
+
+        The caller is expected to remove the host from the hosts of the group.
+        """
+        group_hosts = self._get_group_hosts()
+        group_hosts[host] -= 1
+        if group_hosts[host] <= 0:
+            del group_hosts[host]
+        self._placed[host] -= 1
+
+
+_GROUP_MEMBER_COUNTS = weakref.WeakKeyDictionary()
+
+
+def get_group_member_counts(spec_obj):
+    """Returns the GroupMemberCounts of the server group of a request spec,
+    or None if the request spec has no server group.
+
+    The same GroupMemberCounts is returned for as long as the request spec
+    keeps the same InstanceGroup object, which is for the whole request.
+    """
+    instance_group = spec_obj.instance_group
+    if instance_group is None:
+        return None
+    member_counts = _GROUP_MEMBER_COUNTS.get(instance_group)
+    if member_counts is None:
+        member_counts = GroupMemberCounts(instance_group)
+        _GROUP_MEMBER_COUNTS[instance_group] = member_counts
+    return member_counts
+
+
+class LazyList(object):
+    """A read-only list whose items are only taken from an iterator as far as
+    they are accessed, so that the scheduler only sorts as many hosts as it
+    looks at.
+    """
+
+    def __init__(self, iterable):
+        self._items = []
+        self._iterator = iter(iterable)
+
+    def _fill(self, count=None):
+        """Takes items from the iterator until there are count items, or all
+        of them if count is None.
+        """
+        if self._iterator is None:
+            return
+        if count is None:
+            self._items.extend(self._iterator)
+            self._iterator = None
+            return
+        needed = count - len(self._items)
+        if needed > 0:
+            self._items.extend(itertools.islice(self._iterator, needed))
+            if len(self._items) < count:
+                self._iterator = None
+
+    def __iter__(self):
+        index = 0
+        while True:
+            self._fill(index + 1)
+            if index >= len(self._items):
+                return
+            yield self._items[index]
+            index += 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if (index.start or 0) < 0 or index.stop is None or index.stop < 0:
+                self._fill()
+            else:
+                self._fill(index.stop)
+        elif index < 0:
+            self._fill()
+        else:
+            self._fill(index + 1)
+        return self._items[index]
+
+    def __len__(self):
+        self._fill()
+        return len(self._items)
+
+    def __bool__(self):
+        self._fill(1)
+        return bool(self._items)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class RequestTimings(object):
+    """Timing breakdown of the handling of one scheduling request."""
+
+    def __init__(self):
+        self.start_time = time.time()
+        # Seconds spent in each phase of the request, keyed by phase name
+        self.phases = collections.OrderedDict()
+        # A (filter class name, hosts in, hosts out, seconds) tuple for each
+        # run of a filter
+        self.filters = []
+        # Seconds spent weighing, keyed by weigher class name
+        self.weighers = collections.OrderedDict()
+
+    def add_phase(self, phase, elapsed):
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def add_filter(self, cls_name, start_count, end_count, elapsed):
+        self.filters.append((cls_name, start_count, end_count, elapsed))
+
+    def add_weigher(self, cls_name, elapsed):
+        self.weighers[cls_name] = self.weighers.get(cls_name, 0.0) + elapsed
+
+    def to_dict(self):
+        return {'total': time.time() - self.start_time,
+                'phases': dict(self.phases),
+                'filters': [{'name': cls_name, 'hosts_in': start_count,
+                             'hosts_out': end_count, 'time': elapsed}
+                            for cls_name, start_count, end_count, elapsed
+                            in self.filters],
+                'weighers': dict(self.weighers)}
+
+
+_REQUEST_TIMINGS = weakref.WeakKeyDictionary()
+_TIMINGS_HOOKS = []
+
+
+def register_timings_hook(hook):
+    """Registers a callable to be called with the request spec and the dict
+    of its timings at the end of each request whose timings are recorded,
+    see the filter_scheduler.record_request_timings option.
+    """
+    _TIMINGS_HOOKS.append(hook)
+
+
+def unregister_timings_hook(hook):
+    _TIMINGS_HOOKS.remove(hook)
+
+
+def start_request_timings(spec_obj):
+    """Starts recording the timings of a request, if enabled."""
+    if CONF.filter_scheduler.record_request_timings:
+        _REQUEST_TIMINGS[spec_obj] = RequestTimings()
+
+
+def get_request_timings(spec_obj):
+    """Returns the RequestTimings being recorded for a request spec, or None
+    if they are not recorded.
+    """
+    if not _REQUEST_TIMINGS:
+        return None
+    try:
+        return _REQUEST_TIMINGS.get(spec_obj)
+    except TypeError:
+        # Legacy filter properties dicts can't be weakly referenced
+        return None
+
+
+@contextlib.contextmanager
+def measure_phase(spec_obj, phase):
+    """Adds the time spent in the block to a phase of the timings of a
+    request spec, if they are recorded.
+    """
+    timings = get_request_timings(spec_obj)
+    if timings is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings.add_phase(phase, time.time() - start)
+
+
+def finish_request_timings(spec_obj):
+    """Stops recording the timings of a request, then logs them and passes
+    them to the registered hooks.
+    """
+    timings = get_request_timings(spec_obj)
+    if timings is None:
+        return
+    del _REQUEST_TIMINGS[spec_obj]
+    timings_dict = timings.to_dict()
+    LOG.debug("Scheduling request timings: %s", jsonutils.dumps(timings_dict))
+    for hook in _TIMINGS_HOOKS:
+        try:
+            hook(spec_obj, timings_dict)
+        except Exception:
+            LOG.exception("Scheduling request timings hook %s failed", hook)
+
+
 def retry_on_timeout(retries=1):
     """Retry the call in case a MessagingTimeout is raised.
 
@@ -808,6 +1068,39 @@ def claim_resources(ctx, client, spec_obj, instance_uuid, alloc_req,
             user_id, allocation_request_version=allocation_request_version)
 
 
+def claim_resources_in_batch(ctx, client, spec_obj, alloc_reqs,
+        allocation_request_version=None):
+    """Given a dict of allocation_request JSON objects returned from
+    Placement, keyed by the UUID of the instance (representing the consumer of
+    resources) they were selected for, attempt to claim resources for all the
+    instances in a single call to the placement API. Returns a dict, keyed by
+    instance UUID, telling whether the claim for each instance was successful.
+
+    This must only be used for instances which are being built, since any
+    existing allocations of the instances would be replaced.
+
+    :param ctx: The RequestContext object
+    :param client: The scheduler client to use for making the claim call
+    :param spec_obj: The RequestSpec object - needed to get the project_id
+    :param alloc_reqs: Dict, keyed by instance UUID, of the
+                       allocation_requests received from placement for the
+                       resources we want to claim against the host chosen for
+                       each instance
+    :param allocation_request_version: The microversion used to request the
+                                       allocations.
+    """
+    LOG.debug("Attempting to claim resources in the placement API for "
+              "instances %s", ', '.join(alloc_reqs))
+
+    # See claim_resources() about the user_id
+    claimed = client.claim_resources_in_batch(ctx, alloc_reqs,
+            spec_obj.project_id, ctx.user_id,
+            allocation_request_version=allocation_request_version)
+    # The allocations are written in a single transaction, so they are
+    # either all created or none of them are.
+    return {instance_uuid: bool(claimed) for instance_uuid in alloc_reqs}
+
+
 def remove_allocation_from_compute(context, instance, compute_node_uuid,
                                    reportclient, flavor=None):
     """Removes the instance allocation from the compute host.
@@ -26,6 +26,7 @@ from oslo_config import cfg
 from oslo_log import log as logging
 
 from nova.i18n import _LW
+from nova.scheduler import utils
 from nova.scheduler import weights
 
 CONF = cfg.CONF
@@ -46,11 +47,8 @@ class _SoftAffinityWeigherBase(weights.BaseHostWeigher):
         if self.policy_name not in policies:
             return 0
 
-        instances = set(host_state.instances.keys())
-        members = set(request_spec.instance_group.members)
-        member_on_host = instances.intersection(members)
-
-        return len(member_on_host)
+        member_counts = utils.get_group_member_counts(request_spec)
+        return member_counts.count(host_state)
 
 
 class ServerGroupSoftAffinityWeigher(_SoftAffinityWeigherBase):
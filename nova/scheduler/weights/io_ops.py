@@ -30,6 +30,8 @@ CONF = nova.conf.CONF
 class IoOpsWeigher(weights.BaseHostWeigher):
     minval = 0
 
+    supports_columns = True
+
     def weight_multiplier(self):
         """Override the weight multiplier."""
         return CONF.filter_scheduler.io_ops_weight_multiplier
@@ -39,3 +41,6 @@ class IoOpsWeigher(weights.BaseHostWeigher):
         to be the default.
         """
         return host_state.num_io_ops
+
+    def _weigh_columns(self, columns, weight_properties):
+        return columns.num_io_ops
@@ -20,6 +20,7 @@
 import os
 import random
 import sys
+import time
 
 from oslo_concurrency import processutils
 from oslo_log import log as logging
@@ -155,6 +156,7 @@ class Service(service.Service):
         """
         assert_eventlet_uses_monotonic_clock()
 
+        start_time = time.time()
         verstr = version.version_string_with_package()
         LOG.info(_LI('Starting %(topic)s node (version %(version)s)'),
                   {'topic': self.topic, 'version': verstr})
@@ -215,6 +217,10 @@ class Service(service.Service):
                                      periodic_interval_max=
                                         self.periodic_interval_max)
 
+        LOG.info(_LI('%(topic)s node is ready, started in %(seconds).2f '
+                     'seconds'),
+                 {'topic': self.topic, 'seconds': time.time() - start_time})
+
     def __getattr__(self, key):
         manager = self.__dict__.get('manager', None)
         return getattr(manager, key)
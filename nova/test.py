@@ -310,9 +310,10 @@ class TestCase(testtools.TestCase):
         # caching of that value.
         utils._IS_NEUTRON = None
 
-        # Reset the traits sync and rc cache flags
+        # Reset the traits sync flag and the rc and sharing providers caches
         resource_provider._TRAITS_SYNCED = False
         resource_provider._RC_CACHE = None
+        resource_provider._SHARING_CACHE = None
         # Reset the global QEMU version flag.
         images.QEMU_VERSION = None
 
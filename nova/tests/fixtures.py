@@ -1736,7 +1736,8 @@ class PlacementFixture(fixtures.Fixture):
         # TODO(sbauza): The current placement NoAuthMiddleware returns a 401
         # in case a token is not provided. We should change that by creating
         # a fake token so we could remove adding the header below.
-        headers = {'x-auth-token': self.token}
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers['x-auth-token'] = self.token
         self._update_headers_with_version(headers, **kwargs)
         return self._client.get(
             url,
@@ -9,6 +9,7 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import mock
 import os_traits
 from oslo_utils import uuidutils
 import sqlalchemy as sa
@@ -251,6 +252,30 @@ class ProviderDBHelperTestCase(ProviderDBBase):
 
         self.assertEqual([incl_biginv_noalloc.id], res)
 
+    def test_get_provider_ids_matching_limit(self):
+        rp_ids = set()
+        for name in ('cn1', 'cn2', 'cn3'):
+            cn = self._create_provider(name)
+            _add_inventory(cn, fields.ResourceClass.VCPU, 8)
+            rp_ids.add(cn.id)
+        resources = {
+            fields.ResourceClass.STANDARD.index(fields.ResourceClass.VCPU): 1,
+        }
+
+        res = rp_obj._get_provider_ids_matching(self.ctx, resources, {}, {},
+                                                limit=2)
+        self.assertEqual(2, len(res))
+        self.assertTrue(set(res) < rp_ids)
+
+        res = rp_obj._get_provider_ids_matching(self.ctx, resources, {}, {},
+                                                limit=2, randomize=True)
+        self.assertEqual(2, len(set(res)))
+        self.assertTrue(set(res) < rp_ids)
+
+        res = rp_obj._get_provider_ids_matching(self.ctx, resources, {}, {},
+                                                limit=5, randomize=True)
+        self.assertEqual(rp_ids, set(res))
+
     def test_get_provider_ids_having_all_traits(self):
         def run(traitnames, expected_ids):
             tmap = {}
@@ -476,6 +501,67 @@ class AllocationCandidatesTestCase(ProviderDBBase):
         }
         self._validate_provider_summary_resources(expected, alloc_cands)
 
+    def test_get_raw_by_requests(self):
+        cn1 = self._create_provider('cn1', uuids.agg1)
+        _add_inventory(cn1, fields.ResourceClass.VCPU, 8)
+        _set_traits(cn1, 'HW_CPU_X86_SSE')
+        ss = self._create_provider('ss', uuids.agg1)
+        _add_inventory(ss, fields.ResourceClass.DISK_GB, 2000)
+        _set_traits(ss, 'MISC_SHARES_VIA_AGGREGATE')
+        _allocate_from_provider(ss, fields.ResourceClass.DISK_GB, 100)
+
+        requests = [placement_lib.RequestGroup(
+            use_same_provider=False,
+            resources={
+                fields.ResourceClass.VCPU: 1,
+                fields.ResourceClass.DISK_GB: 10,
+            })]
+        alloc_reqs, p_sums = rp_obj.AllocationCandidates.get_raw_by_requests(
+            self.ctx, requests)
+
+        self.assertEqual([set([
+            (cn1.id, cn1.uuid, fields.ResourceClass.VCPU, 1),
+            (ss.id, ss.uuid, fields.ResourceClass.DISK_GB, 10),
+        ])], [set(ar) for ar in alloc_reqs])
+        p_sums = {ps.resource_provider_uuid: ps for ps in p_sums}
+        self.assertEqual(
+            [(fields.ResourceClass.VCPU, 8, 0)], p_sums[cn1.uuid].resources)
+        self.assertEqual(['HW_CPU_X86_SSE'], p_sums[cn1.uuid].traits)
+        self.assertEqual(
+            [(fields.ResourceClass.DISK_GB, 2000, 100)],
+            p_sums[ss.uuid].resources)
+
+        alloc_reqs, p_sums = rp_obj.AllocationCandidates.get_raw_by_requests(
+            self.ctx, requests, include_summaries=False)
+        self.assertEqual(1, len(alloc_reqs))
+        self.assertEqual([], p_sums)
+
+    def test_get_raw_by_requests_without_summaries(self):
+        cn1, cn2 = (self._create_provider(name) for name in ('cn1', 'cn2'))
+        for cn in (cn1, cn2):
+            _add_inventory(cn, fields.ResourceClass.VCPU, 8)
+        _allocate_from_provider(cn1, fields.ResourceClass.VCPU, 2)
+
+        requests = [placement_lib.RequestGroup(
+            use_same_provider=False,
+            resources={fields.ResourceClass.VCPU: 1})]
+        with test.nested(
+                mock.patch.object(rp_obj, '_get_usages_by_provider_and_rc'),
+                mock.patch.object(rp_obj, '_provider_traits'),
+        ) as (mock_usages, mock_traits):
+            alloc_reqs, p_sums = (
+                rp_obj.AllocationCandidates.get_raw_by_requests(
+                    self.ctx, requests, include_summaries=False))
+
+        # The summaries are not built
+        mock_usages.assert_not_called()
+        mock_traits.assert_not_called()
+        self.assertEqual([], p_sums)
+        self.assertEqual(
+            set([((cn1.id, cn1.uuid, fields.ResourceClass.VCPU, 1),),
+                 ((cn2.id, cn2.uuid, fields.ResourceClass.VCPU, 1),)]),
+            set(tuple(ar) for ar in alloc_reqs))
+
     def test_all_local(self):
         """Create some resource providers that can satisfy the request for
         resources with local (non-shared) resources and verify that the
@@ -1793,3 +1879,33 @@ class AllocationCandidatesTestCase(ProviderDBBase):
         cn_names = ['cn1', 'cn3']
         cn_root_ids = self._get_root_ids_matching_names(cn_names)
         self.assertEqual(cn_root_ids, set(trees))
+
+    def test_trees_matching_all_resources_tracked_trees(self):
+        """Runs the above test with the capacity of provider trees tracked and
+        checks that the tracked capacity is used to filter the trees.
+        """
+        self.flags(track_provider_trees=True, group='placement')
+        self.test_trees_matching_all_resources()
+        self.assertEqual([], rp_obj.sync_provider_trees(self.ctx,
+                                                        verify=True))
+
+        # Mark the VFs of the first compute node as all used in the tracked
+        # capacity only, which is enough to filter out its tree
+        vf_id = fields.ResourceClass.STANDARD.index(
+            fields.ResourceClass.SRIOV_NET_VF)
+        cn1_root_id, = self._get_root_ids_matching_names(['cn1'])
+        tbl = rp_obj._TREE_INV_TBL
+        upd = tbl.update().where(sa.and_(
+            tbl.c.root_provider_id == cn1_root_id,
+            tbl.c.resource_class_id == vf_id)).values(used=tbl.c.capacity)
+        with self.api_db.get_engine().connect() as conn:
+            conn.execute(upd)
+
+        resources = {
+            fields.ResourceClass.STANDARD.index(
+                fields.ResourceClass.VCPU): 2,
+            vf_id: 1,
+        }
+        trees = rp_obj._get_trees_matching_all_resources(self.ctx, resources)
+        cn_root_ids = self._get_root_ids_matching_names(['cn3'])
+        self.assertEqual(cn_root_ids, set(trees))
@@ -20,6 +20,7 @@ import nova
 from nova.api.openstack.placement import exception
 from nova.api.openstack.placement.objects import resource_provider as rp_obj
 from nova import context
+from nova.db.sqlalchemy import api as db_api
 from nova import rc_fields as fields
 from nova import test
 from nova.tests import fixtures
@@ -963,6 +964,60 @@ class ResourceProviderTestCase(ResourceProviderBaseCase):
         for inv in got_inv:
             self.assertEqual(rp1.id, inv.resource_provider.id)
 
+    def test_update_providers(self):
+        rp1 = rp_obj.ResourceProvider(context=self.ctx,
+                uuid=uuidsentinel.cn1, name='cn1')
+        rp1.create()
+        rp2 = rp_obj.ResourceProvider(context=self.ctx,
+                uuid=uuidsentinel.cn2, name='cn2')
+        rp2.create()
+        disk_inv = rp_obj.Inventory(context=self.ctx, resource_provider=rp1,
+                **DISK_INVENTORY)
+        traits = rp_obj.TraitList.get_all(
+            self.ctx, filters={'name_in': [os_traits.HW_CPU_X86_AVX2]})
+        rp_obj.update_providers(self.ctx, [
+            rp_obj.ProviderUpdate(rp1, rp_obj.InventoryList(
+                objects=[disk_inv]), traits, None),
+            rp_obj.ProviderUpdate(rp2, None, None, [uuidsentinel.agg]),
+        ])
+        self.assertEqual(2, rp1.generation)
+        self.assertEqual(1, rp2.generation)
+
+        rp1 = rp_obj.ResourceProvider.get_by_uuid(self.ctx, rp1.uuid)
+        self.assertEqual(2, rp1.generation)
+        got_inv = rp_obj.InventoryList.get_all_by_resource_provider(
+                self.ctx, rp1)
+        self.assertEqual([fields.ResourceClass.DISK_GB],
+                         [inv.resource_class for inv in got_inv])
+        got_traits = rp_obj.TraitList.get_all_by_resource_provider(
+                self.ctx, rp1)
+        self.assertEqual([os_traits.HW_CPU_X86_AVX2],
+                         [t.name for t in got_traits])
+        self.assertEqual([uuidsentinel.agg], rp2.get_aggregates())
+
+    def test_update_providers_rolled_back(self):
+        rp1 = rp_obj.ResourceProvider(context=self.ctx,
+                uuid=uuidsentinel.cn1, name='cn1')
+        rp1.create()
+        rp2, _ = self._make_allocation(rp_uuid=uuidsentinel.cn2)
+        disk_inv = rp_obj.Inventory(context=self.ctx, resource_provider=rp1,
+                **DISK_INVENTORY)
+        # Removing the inventory of the second provider fails as it is in
+        # use, which also undoes the change of the first one
+        self.assertRaises(exception.InventoryInUse,
+                          rp_obj.update_providers, self.ctx, [
+            rp_obj.ProviderUpdate(rp1, rp_obj.InventoryList(
+                objects=[disk_inv]), None, None),
+            rp_obj.ProviderUpdate(rp2, rp_obj.InventoryList(objects=[]),
+                                  None, None),
+        ])
+
+        rp1 = rp_obj.ResourceProvider.get_by_uuid(self.ctx, rp1.uuid)
+        self.assertEqual(0, rp1.generation)
+        got_inv = rp_obj.InventoryList.get_all_by_resource_provider(
+                self.ctx, rp1)
+        self.assertEqual(0, len(got_inv))
+
 
 class ResourceProviderListTestCase(ResourceProviderBaseCase):
     def setUp(self):
@@ -1136,6 +1191,38 @@ class ResourceProviderListTestCase(ResourceProviderBaseCase):
                                    [uuidsentinel.agg_1, uuidsentinel.agg_2]})
         self.assertEqual(0, len(resource_providers))
 
+    def test_get_all_by_filters_use_slave(self):
+        # Without a replica configured, the replica reads go to the primary,
+        # so they must find the same providers, with every filter.
+        trait = rp_obj.Trait(self.ctx, name='CUSTOM_TRAIT_A')
+        trait.create()
+        for rp_i in [1, 2]:
+            uuid = getattr(uuidsentinel, 'rp_uuid_' + str(rp_i))
+            rp = rp_obj.ResourceProvider(
+                self.ctx, name='rp_name_' + str(rp_i), uuid=uuid)
+            rp.create()
+            inv = rp_obj.Inventory(resource_provider=rp,
+                                   resource_class=fields.ResourceClass.VCPU,
+                                   total=2 * rp_i, max_unit=4)
+            inv.obj_set_defaults()
+            rp.set_inventory(rp_obj.InventoryList(objects=[inv]))
+            if rp_i == 2:
+                rp.set_aggregates([uuidsentinel.agg_a])
+                rp.set_traits(rp_obj.TraitList(objects=[trait]))
+
+        filters = {
+            'member_of': [uuidsentinel.agg_a],
+            'in_tree': uuidsentinel.rp_uuid_2,
+            'required': ['CUSTOM_TRAIT_A'],
+            'resources': {fields.ResourceClass.VCPU: 3},
+        }
+        for use_slave in (False, True):
+            resource_providers = (
+                rp_obj.ResourceProviderList.get_all_by_filters(
+                    self.ctx, filters=filters, use_slave=use_slave))
+            self.assertEqual([uuidsentinel.rp_uuid_2],
+                             [p.uuid for p in resource_providers])
+
     def test_get_all_by_required(self):
         # Create some resource providers and give them each 0 or more traits.
         # rp_name_0: no traits
@@ -1234,6 +1321,23 @@ class TestResourceProviderAggregates(test.NoDBTestCase):
         read_aggregate_uuids = rp.get_aggregates()
         self.assertEqual([], read_aggregate_uuids)
 
+    def test_set_aggregates_generation(self):
+        rp = rp_obj.ResourceProvider(
+            context=self.ctx,
+            uuid=uuidsentinel.rp_uuid,
+            name=uuidsentinel.rp_name
+        )
+        rp.create()
+        gen1 = rp_obj.get_aggregates_generation(self.ctx)
+
+        rp.set_aggregates([uuidsentinel.agg_a])
+        gen2 = rp_obj.get_aggregates_generation(self.ctx)
+        self.assertNotEqual(gen1, gen2)
+
+        # Incrementing the provider generation leaves the aggregates one
+        rp.set_aggregates([], increment_generation=True)
+        self.assertEqual(gen2, rp_obj.get_aggregates_generation(self.ctx))
+
     def test_delete_rp_clears_aggs(self):
         rp = rp_obj.ResourceProvider(
             context=self.ctx,
@@ -1976,6 +2080,300 @@ class UsageListTestCase(ResourceProviderBaseCase):
             self.ctx, db_rp.uuid)
         self.assertEqual(2, len(usage_list))
 
+    def test_get_all_use_slave(self):
+        db_rp, _ = self._make_allocation(rp_uuid=uuidsentinel.rp_uuid)
+
+        usage_list = rp_obj.UsageList.get_all_by_resource_provider_uuid(
+            self.ctx, db_rp.uuid, use_slave=True)
+        self.assertEqual(1, len(usage_list))
+        self.assertEqual(2, usage_list[0].usage)
+        self.assertEqual(fields.ResourceClass.DISK_GB,
+                         usage_list[0].resource_class)
+
+        usage_lists = [
+            rp_obj.UsageList.get_all_by_project_user(
+                self.ctx, self.ctx.project_id, user_id=self.ctx.user_id,
+                use_slave=use_slave)
+            for use_slave in (False, True)]
+        self.assertEqual(*[[(usage.resource_class, usage.usage)
+                            for usage in usages]
+                           for usages in usage_lists])
+
+
+class TrackedUsagesTestCase(ResourceProviderBaseCase):
+
+    def setUp(self):
+        super(TrackedUsagesTestCase, self).setUp()
+        self.flags(track_usages=True, group='placement')
+
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def _get_usages(ctx):
+        tbl = rp_obj._USAGE_TBL
+        sel = sa.select([tbl.c.resource_provider_id, tbl.c.used])
+        return dict(ctx.session.execute(sel).fetchall())
+
+    @staticmethod
+    @db_api.api_context_manager.writer
+    def _delete_usages(ctx):
+        # Leaves the allocations without usages, as they were before upgrading
+        ctx.session.execute(rp_obj._USAGE_TBL.delete())
+
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def _usages_synced(ctx):
+        return rp_obj._usages_synced(ctx)
+
+    @staticmethod
+    @db_api.api_context_manager.writer
+    def _set_usage(ctx, rp_id, used):
+        tbl = rp_obj._USAGE_TBL
+        ctx.session.execute(tbl.update().where(
+            tbl.c.resource_provider_id == rp_id).values(used=used))
+
+    def _allocate(self, rp, consumer_id, used):
+        alloc = rp_obj.Allocation(
+            self.ctx, resource_provider=rp, consumer_id=consumer_id,
+            resource_class=fields.ResourceClass.DISK_GB, used=used)
+        alloc_list = rp_obj.AllocationList(self.ctx, objects=[alloc])
+        alloc_list.create_all()
+        return alloc_list
+
+    def test_allocations_update_usages(self):
+        rp, _ = self._make_allocation()
+        self.assertEqual({rp.id: 2}, self._get_usages(self.ctx))
+
+        other = self._allocate(rp, uuidsentinel.other_consumer, 4)
+        self.assertEqual({rp.id: 6}, self._get_usages(self.ctx))
+
+        # Replacing the allocations of a consumer only accounts the new ones
+        self._allocate(rp, DISK_ALLOCATION['consumer_id'], 5)
+        self.assertEqual({rp.id: 9}, self._get_usages(self.ctx))
+
+        other.delete_all()
+        self.assertEqual({rp.id: 5}, self._get_usages(self.ctx))
+        self.assertEqual([], rp_obj.sync_usages(self.ctx, verify=True))
+
+        usages = rp_obj.UsageList.get_all_by_resource_provider_uuid(
+            self.ctx, rp.uuid)
+        self.assertEqual(5, usages[0].usage)
+
+        rp_obj.AllocationList.get_all_by_consumer_id(
+            self.ctx, DISK_ALLOCATION['consumer_id']).delete_all()
+        rp.destroy()
+        self.assertEqual({}, self._get_usages(self.ctx))
+
+    def test_capacity_uses_tracked_usages(self):
+        rp, _ = self._make_allocation()
+        self.assertEqual([], rp_obj.sync_usages(self.ctx))
+        # Available capacity is (200 - 10) * 1.0
+        self._set_usage(self.ctx, rp.id, 189)
+        self.assertRaises(exception.InvalidAllocationCapacityExceeded,
+                          self._allocate, rp, uuidsentinel.other_consumer, 2)
+
+        disk_gb_id = rp_obj._RC_CACHE.id_from_string(
+            fields.ResourceClass.DISK_GB)
+        self.assertEqual([(rp.id, disk_gb_id, 189, 2)],
+                         rp_obj.sync_usages(self.ctx, verify=True))
+        self.assertEqual({rp.id: 189}, self._get_usages(self.ctx))
+
+        self.assertEqual([(rp.id, disk_gb_id, 189, 2)],
+                         rp_obj.sync_usages(self.ctx))
+        self.assertEqual({rp.id: 2}, self._get_usages(self.ctx))
+        self._allocate(rp, uuidsentinel.other_consumer, 2)
+        self.assertEqual({rp.id: 4}, self._get_usages(self.ctx))
+
+    def test_untracked_allocations_update_usages(self):
+        self.flags(track_usages=False, group='placement')
+        rp, _ = self._make_allocation()
+        self.assertEqual([], rp_obj.sync_usages(self.ctx))
+        other = self._allocate(rp, uuidsentinel.other_consumer, 4)
+        self.assertEqual({rp.id: 6}, self._get_usages(self.ctx))
+        other.delete_all()
+        self.assertEqual({rp.id: 2}, self._get_usages(self.ctx))
+
+        # Enabling the option again reads usages which did not go stale
+        self.flags(track_usages=True, group='placement')
+        self.assertEqual([], rp_obj.sync_usages(self.ctx, verify=True))
+        # Available capacity is (200 - 10) * 1.0
+        self._set_usage(self.ctx, rp.id, 189)
+        self.assertRaises(exception.InvalidAllocationCapacityExceeded,
+                          self._allocate, rp, uuidsentinel.other_consumer, 2)
+
+    def test_usages_read_once_synced(self):
+        rp, _ = self._make_allocation(
+            inv_dict=dict(DISK_INVENTORY, max_unit=200))
+        self._delete_usages(self.ctx)
+        # The allocation has no usage, the allocations are summed until the
+        # usages are synced. Available capacity is (200 - 10) * 1.0
+        self.assertRaises(exception.InvalidAllocationCapacityExceeded,
+                          self._allocate, rp, uuidsentinel.other_consumer,
+                          189)
+        self.assertFalse(self._usages_synced(self.ctx))
+
+        rp_obj.sync_usages(self.ctx)
+        self.assertTrue(self._usages_synced(self.ctx))
+        self.assertEqual({rp.id: 2}, self._get_usages(self.ctx))
+        self._set_usage(self.ctx, rp.id, 0)
+        self._allocate(rp, uuidsentinel.other_consumer, 189)
+
+    def test_sync_usages_missing(self):
+        rp, _ = self._make_allocation()
+        self._delete_usages(self.ctx)
+        self.assertEqual({}, self._get_usages(self.ctx))
+
+        disk_gb_id = rp_obj._RC_CACHE.id_from_string(
+            fields.ResourceClass.DISK_GB)
+        self.assertEqual([(rp.id, disk_gb_id, None, 2)],
+                         rp_obj.sync_usages(self.ctx))
+        self.assertEqual({rp.id: 2}, self._get_usages(self.ctx))
+        self.assertEqual([], rp_obj.sync_usages(self.ctx, verify=True))
+
+    def test_concurrent_usage_insert(self):
+        rp, _ = self._make_allocation()
+        self._delete_usages(self.ctx)
+        sum_allocations = rp_obj._sum_allocations
+
+        def insert_concurrently(ctx, rp_id, rc_id):
+            # Another writer inserts the usage between our update and insert
+            ctx.session.execute(rp_obj._USAGE_TBL.insert().values(
+                resource_provider_id=rp_id, resource_class_id=rc_id,
+                used=2))
+            return sum_allocations(ctx, rp_id, rc_id)
+
+        with mock.patch.object(rp_obj, '_sum_allocations',
+                               side_effect=insert_concurrently):
+            self._allocate(rp, uuidsentinel.other_consumer, 4)
+        self.assertEqual({rp.id: 6}, self._get_usages(self.ctx))
+        self.assertEqual([], rp_obj.sync_usages(self.ctx, verify=True))
+
+
+class TrackedProviderTreesTestCase(ResourceProviderBaseCase):
+
+    def setUp(self):
+        super(TrackedProviderTreesTestCase, self).setUp()
+        self.flags(track_provider_trees=True, group='placement')
+
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def _get_trees(ctx):
+        tbl = rp_obj._TREE_INV_TBL
+        sel = sa.select([tbl.c.root_provider_id, tbl.c.capacity, tbl.c.used])
+        return {r[0]: (r[1], r[2]) for r in ctx.session.execute(sel)
+                if r[1] or r[2]}
+
+    def _allocate(self, rp, consumer_id, used):
+        alloc = rp_obj.Allocation(
+            self.ctx, resource_provider=rp, consumer_id=consumer_id,
+            resource_class=fields.ResourceClass.DISK_GB, used=used)
+        alloc_list = rp_obj.AllocationList(self.ctx, objects=[alloc])
+        alloc_list.create_all()
+        return alloc_list
+
+    def test_changes_update_trees(self):
+        root = rp_obj.ResourceProvider(
+            context=self.ctx, uuid=uuidsentinel.root, name='root')
+        root.create()
+        disk_inv = rp_obj.Inventory(context=self.ctx,
+                resource_provider=root, **DISK_INVENTORY)
+        root.set_inventory(rp_obj.InventoryList(objects=[disk_inv]))
+        self.assertEqual({root.id: (190, 0)}, self._get_trees(self.ctx))
+
+        child, _ = self._make_allocation(rp_uuid=uuidsentinel.child)
+        self.assertEqual({root.id: (190, 0), child.id: (190, 2)},
+                         self._get_trees(self.ctx))
+
+        # Parenting the provider moves its inventory into the parent's tree
+        child = rp_obj.ResourceProvider.get_by_uuid(self.ctx, child.uuid)
+        child.parent_provider_uuid = root.uuid
+        child.save()
+        self.assertEqual({root.id: (380, 2)}, self._get_trees(self.ctx))
+
+        other = self._allocate(root, uuidsentinel.other_consumer, 4)
+        self.assertEqual({root.id: (380, 6)}, self._get_trees(self.ctx))
+
+        disk_inv = rp_obj.Inventory(
+            context=self.ctx, resource_provider=child,
+            **dict(DISK_INVENTORY, reserved=100))
+        child.update_inventory(disk_inv)
+        self.assertEqual({root.id: (290, 6)}, self._get_trees(self.ctx))
+
+        other.delete_all()
+        self.assertEqual({root.id: (290, 2)}, self._get_trees(self.ctx))
+        self.assertEqual([], rp_obj.sync_provider_trees(self.ctx,
+                                                        verify=True))
+
+        rp_obj.AllocationList.get_all_by_consumer_id(
+            self.ctx, DISK_ALLOCATION['consumer_id']).delete_all()
+        child.destroy()
+        self.assertEqual({root.id: (190, 0)}, self._get_trees(self.ctx))
+        root.delete_inventory(fields.ResourceClass.DISK_GB)
+        self.assertEqual({}, self._get_trees(self.ctx))
+        root.destroy()
+        self.assertEqual([], rp_obj.sync_provider_trees(self.ctx,
+                                                        verify=True))
+
+    def test_overcommitted_provider(self):
+        rp, _ = self._make_allocation()
+        disk_inv = rp_obj.Inventory(
+            context=self.ctx, resource_provider=rp,
+            **dict(DISK_INVENTORY, total=11))
+        rp.update_inventory(disk_inv)
+        # The amount used is capped at the lowered capacity of the provider
+        self.assertEqual({rp.id: (1, 1)}, self._get_trees(self.ctx))
+
+        # Removing the allocation leaves the tree looking less full than it is
+        # until it is synced
+        rp_obj.AllocationList.get_all_by_consumer_id(
+            self.ctx, DISK_ALLOCATION['consumer_id']).delete_all()
+        self.assertEqual({rp.id: (1, -1)}, self._get_trees(self.ctx))
+        disk_gb_id = rp_obj._RC_CACHE.id_from_string(
+            fields.ResourceClass.DISK_GB)
+        self.assertEqual([(rp.id, disk_gb_id, 1, -1, 1, 0)],
+                         rp_obj.sync_provider_trees(self.ctx))
+        self.assertEqual({rp.id: (1, 0)}, self._get_trees(self.ctx))
+
+    def test_sync_provider_trees_missing(self):
+        self.flags(track_provider_trees=False, group='placement')
+        rp, _ = self._make_allocation()
+        self.assertEqual({}, self._get_trees(self.ctx))
+
+        self.flags(track_provider_trees=True, group='placement')
+        disk_gb_id = rp_obj._RC_CACHE.id_from_string(
+            fields.ResourceClass.DISK_GB)
+        self.assertEqual([(rp.id, disk_gb_id, None, None, 190, 2)],
+                         rp_obj.sync_provider_trees(self.ctx, verify=True))
+        self.assertEqual({}, self._get_trees(self.ctx))
+        self.assertEqual([(rp.id, disk_gb_id, None, None, 190, 2)],
+                         rp_obj.sync_provider_trees(self.ctx))
+        self.assertEqual({rp.id: (190, 2)}, self._get_trees(self.ctx))
+        self.assertEqual([], rp_obj.sync_provider_trees(self.ctx,
+                                                        verify=True))
+
+    def test_concurrent_tree_insert(self):
+        self.flags(track_provider_trees=False, group='placement')
+        rp, _ = self._make_allocation()
+        self.flags(track_provider_trees=True, group='placement')
+        get_tree_inventories = rp_obj._get_tree_inventories
+
+        def insert_concurrently(ctx, root_ids=None, rp_id=None):
+            trees = get_tree_inventories(ctx, root_ids=root_ids, rp_id=rp_id)
+            if root_ids is not None:
+                # Another writer inserts the tree between our update and
+                # insert
+                for root_id, rc_id in trees:
+                    ctx.session.execute(rp_obj._TREE_INV_TBL.insert().values(
+                        root_provider_id=root_id, resource_class_id=rc_id,
+                        capacity=190, used=2))
+            return trees
+
+        with mock.patch.object(rp_obj, '_get_tree_inventories',
+                               side_effect=insert_concurrently):
+            self._allocate(rp, uuidsentinel.other_consumer, 4)
+        self.assertEqual({rp.id: (190, 6)}, self._get_trees(self.ctx))
+        self.assertEqual([], rp_obj.sync_provider_trees(self.ctx,
+                                                        verify=True))
+
 
 class ResourceClassListTestCase(ResourceProviderBaseCase):
 
@@ -2006,6 +2404,25 @@ class ResourceClassListTestCase(ResourceProviderBaseCase):
         expected_count = len(fields.ResourceClass.STANDARD) + len(customs)
         self.assertEqual(expected_count, len(rcs))
 
+    def test_get_generation(self):
+        gen1 = rp_obj.ResourceClassList.get_generation(self.ctx)
+        self.assertEqual(
+            gen1, rp_obj.ResourceClassList.get_generation(self.ctx))
+
+        rc = rp_obj.ResourceClass(self.ctx, name='CUSTOM_IRON_NFV')
+        rc.create()
+        gen2 = rp_obj.ResourceClassList.get_generation(self.ctx)
+        self.assertNotEqual(gen1, gen2)
+
+        rc.name = 'CUSTOM_IRON_ENTERPRISE'
+        rc.save()
+        gen3 = rp_obj.ResourceClassList.get_generation(self.ctx)
+        self.assertNotIn(gen3, (gen1, gen2))
+
+        rc.destroy()
+        self.assertNotIn(rp_obj.ResourceClassList.get_generation(self.ctx),
+                         (gen1, gen2, gen3))
+
 
 class ResourceClassTestCase(ResourceProviderBaseCase):
 
@@ -2648,6 +3065,53 @@ class SharedProviderTestCase(ResourceProviderBaseCase):
         )
         self.assertEqual([ss.id], got_ids)
 
+    def test_get_sharing_providers_by_rc(self):
+        """Checks that the sharing providers are cached until one of them
+        changes, and that their capacity is only queried for the resource
+        classes they share.
+        """
+        VCPU_ID = fields.ResourceClass.STANDARD.index(
+            fields.ResourceClass.VCPU)
+        DISK_GB_ID = fields.ResourceClass.STANDARD.index(
+            fields.ResourceClass.DISK_GB)
+        self.assertEqual({}, rp_obj._get_sharing_providers_by_rc(self.ctx))
+        with mock.patch.object(rp_obj,
+                               '_get_providers_with_shared_capacity') as m:
+            self.assertEqual({VCPU_ID: [], DISK_GB_ID: []},
+                             rp_obj._get_sharing_providers(
+                                 self.ctx, {VCPU_ID: 1, DISK_GB_ID: 100}))
+            m.assert_not_called()
+
+        ss = rp_obj.ResourceProvider(self.ctx, name='shared storage',
+                                     uuid=uuidsentinel.ss)
+        ss.create()
+        disk_gb = rp_obj.Inventory(
+            resource_provider=ss, resource_class=fields.ResourceClass.DISK_GB,
+            total=2000, reserved=0, min_unit=10, max_unit=100, step_size=10,
+            allocation_ratio=1.0)
+        ss.set_inventory(rp_obj.InventoryList(objects=[disk_gb]))
+        t = rp_obj.Trait.get_by_name(self.ctx, "MISC_SHARES_VIA_AGGREGATE")
+        ss.set_traits(rp_obj.TraitList(objects=[t]))
+
+        by_rc = rp_obj._get_sharing_providers_by_rc(self.ctx)
+        self.assertEqual({DISK_GB_ID: set([ss.id])}, by_rc)
+        self.assertIs(by_rc, rp_obj._get_sharing_providers_by_rc(self.ctx))
+        self.assertEqual({VCPU_ID: [], DISK_GB_ID: [ss.id]},
+                         rp_obj._get_sharing_providers(
+                             self.ctx, {VCPU_ID: 1, DISK_GB_ID: 100}))
+
+        # Adding inventory increments the generation of the provider
+        vcpu = rp_obj.Inventory(
+            resource_provider=ss, resource_class=fields.ResourceClass.VCPU,
+            total=8, reserved=0, min_unit=1, max_unit=8, step_size=1,
+            allocation_ratio=1.0)
+        ss.add_inventory(vcpu)
+        self.assertEqual({DISK_GB_ID: set([ss.id]), VCPU_ID: set([ss.id])},
+                         rp_obj._get_sharing_providers_by_rc(self.ctx))
+
+        ss.set_traits(rp_obj.TraitList(objects=[]))
+        self.assertEqual({}, rp_obj._get_sharing_providers_by_rc(self.ctx))
+
     def test_get_all_with_shared(self):
         """We set up two compute nodes with VCPU and MEMORY_MB only, a shared
         resource provider having DISK_GB inventory, and associate all of them
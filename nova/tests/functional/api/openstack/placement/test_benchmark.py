@@ -0,0 +1,41 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from nova import test
+from nova.tests.functional.api.openstack.placement import benchmark
+
+
+class PlacementBenchmarkTestCase(test.TestCase):
+    """Runs the placement benchmark on a few providers so that it keeps
+    working.
+    """
+
+    def test_run(self):
+        bench = self.useFixture(benchmark.PlacementBenchmark(
+            10, num_aggregates=3, num_sharing=1))
+        result = bench.run(40, num_clients=4)
+
+        self.assertGreaterEqual(result.num_requests, 40)
+        self.assertGreater(result.requests_per_second, 0)
+        stats = result.routes['GET /allocation_candidates']
+        self.assertGreater(len(stats.latencies), 0)
+        self.assertEqual(0, stats.failures)
+        self.assertGreater(stats.statements, 0)
+        self.assertIn('PUT /allocations/{consumer_uuid}', result.routes)
+        self.assertIn('PUT /resource_providers/{uuid}/inventories',
+                      result.routes)
+        self.assertTrue(result.report())
+
+    def test_percentile(self):
+        values = [float(x) for x in range(1, 101)]
+        self.assertEqual(90.0, benchmark.percentile(values, 90))
+        self.assertEqual(0.0, benchmark.percentile([], 50))
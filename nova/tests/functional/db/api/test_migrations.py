@@ -689,6 +689,32 @@ class NovaAPIMigrationsWalk(test_migrations.WalkVersionsMixin):
     def _check_058(self, engine, data):
         self.assertColumnExists(engine, 'cell_mappings', 'disabled')
 
+    def _check_059(self, engine, data):
+        for column in ['created_at', 'updated_at', 'id',
+                       'resource_provider_id', 'resource_class_id', 'used']:
+            self.assertColumnExists(engine, 'usages', column)
+        self.assertUniqueConstraintExists(
+            engine, 'usages', ['resource_provider_id', 'resource_class_id'])
+
+    def _check_060(self, engine, data):
+        for column in ['created_at', 'updated_at', 'id', 'root_provider_id',
+                       'resource_class_id', 'capacity', 'used']:
+            self.assertColumnExists(engine, 'provider_tree_inventories',
+                                    column)
+        self.assertIndexExists(
+            engine, 'provider_tree_inventories',
+            'provider_tree_inventories_resource_class_id_idx')
+        self.assertUniqueConstraintExists(
+            engine, 'provider_tree_inventories',
+            ['root_provider_id', 'resource_class_id'])
+
+    def _check_061(self, engine, data):
+        for column in ['created_at', 'updated_at', 'id', 'name',
+                       'generation']:
+            self.assertColumnExists(engine, 'placement_generations', column)
+        self.assertUniqueConstraintExists(
+            engine, 'placement_generations', ['name'])
+
 
 class TestNovaAPIMigrationsWalkSQLite(NovaAPIMigrationsWalk,
                                       test_base.DbTestCase,
@@ -10,6 +10,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+import mock
+from oslo_utils import timeutils
+
 from nova import context
 from nova import objects
 from nova.objects import fields as obj_fields
@@ -123,3 +128,25 @@ class ComputeNodeTestCase(test.TestCase):
                                                              'ironic')
         self.assertEqual(1, len(cns))
         self.assertEqual(cn1.uuid, cns[0].uuid)
+
+    def test_get_all_changed_since(self):
+        cn1 = fake_compute_obj.obj_clone()
+        cn1._context = self.context
+        cn1.create()
+        cn2 = fake_compute_obj.obj_clone()
+        cn2._context = self.context
+        cn2.host += '-alt'
+        cn2.create()
+        changed_since = timeutils.utcnow()
+
+        with mock.patch('oslo_utils.timeutils.utcnow',
+                        return_value=changed_since + datetime.timedelta(
+                            seconds=1)):
+            cn1.vcpus_used = 1
+            cn1.save()
+            cn2.destroy()
+
+        cns = objects.ComputeNodeList.get_all_changed_since(self.context,
+                                                            changed_since)
+        self.assertEqual({cn1.uuid: False, cn2.uuid: True},
+                         {cn.uuid: cn.deleted for cn in cns})
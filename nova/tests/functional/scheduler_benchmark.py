@@ -0,0 +1,558 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the FilterScheduler against a synthetic fleet.
+
+The fleet of compute nodes is written to in-memory cell databases, with the
+resources the fake virt driver reports, and the placement API is simulated in
+memory so that only the scheduler is measured. A mix of requests, with NUMA
+and PCI requests, server groups and multi-create, is then scheduled with
+FilterScheduler.select_destinations().
+
+Run it with::
+
+    tox -e scheduler-benchmark -- --hosts 10000 --cells 4 --requests 500
+
+or, in an environment with the test requirements installed::
+
+    python -m nova.tests.functional.scheduler_benchmark --hosts 1000
+
+Scheduler options can be set with --config, for instance
+``--config filter_scheduler.cache_host_states=True``.
+"""
+
+import argparse
+import collections
+import random
+import sys
+import time
+
+import fixtures
+from oslo_utils import uuidutils
+
+import nova.conf
+from nova import context
+from nova import exception
+from nova import objects
+from nova.scheduler import filter_scheduler
+from nova.scheduler import utils as scheduler_utils
+from nova.tests import fixtures as nova_fixtures
+from nova.tests.unit import conf_fixture
+from nova.virt import fake
+from nova.virt import hardware
+
+CONF = nova.conf.CONF
+
+# The enabled filters by default, plus those handling NUMA and PCI requests
+BENCHMARK_FILTERS = CONF.filter_scheduler.enabled_filters + [
+    'NUMATopologyFilter', 'PciPassthroughFilter']
+
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '154d'
+
+# Microversion of the allocation requests of the simulated placement API
+ALLOCATION_REQUEST_VERSION = '1.21'
+
+
+class SmallHostDriver(fake.FakeDriver):
+    vcpus = 16
+    memory_mb = 65536
+    local_gb = 1024
+
+
+class LargeHostDriver(fake.FakeDriver):
+    vcpus = 64
+    memory_mb = 262144
+    local_gb = 4096
+
+
+# (driver class, share of the fleet)
+HOST_SHAPES = [(SmallHostDriver, 0.6), (LargeHostDriver, 0.4)]
+
+# Share of the hosts with PCI devices to pass through
+PCI_HOST_SHARE = 0.2
+
+# Name: (vcpus, memory_mb, root_gb, extra_specs)
+FLAVORS = {
+    'small': (1, 2048, 20, {}),
+    'medium': (2, 4096, 40, {}),
+    'large': (8, 16384, 80, {}),
+    'numa': (8, 16384, 80, {'hw:numa_nodes': '2'}),
+    'pinned': (4, 8192, 40, {'hw:cpu_policy': 'dedicated'}),
+}
+
+Scenario = collections.namedtuple('Scenario', ['flavor', 'num_instances',
+                                               'group_policy', 'pci'])
+
+# (scenario, share of the requests)
+REQUEST_MIX = [
+    (Scenario('small', 1, None, False), 0.35),
+    (Scenario('medium', 1, None, False), 0.2),
+    (Scenario('large', 1, None, False), 0.1),
+    (Scenario('numa', 1, None, False), 0.08),
+    (Scenario('pinned', 1, None, False), 0.07),
+    (Scenario('medium', 1, None, True), 0.05),
+    (Scenario('small', 5, None, False), 0.05),
+    (Scenario('small', 3, 'anti-affinity', False), 0.04),
+    (Scenario('small', 3, 'affinity', False), 0.02),
+    (Scenario('medium', 4, 'soft-anti-affinity', False), 0.02),
+    (Scenario('medium', 4, 'soft-affinity', False), 0.02),
+]
+
+
+class SimulatedPlacement(object):
+    """In-memory stand-in for the placement API as used by the scheduler.
+
+    Each compute node is a resource provider with VCPU, MEMORY_MB and
+    DISK_GB inventories. Allocation candidates are the providers with enough
+    free capacity, limited to CONF.scheduler.max_placement_results, and
+    claims are checked against that capacity.
+    """
+
+    def __init__(self):
+        # {rp_uuid: {resource class: capacity}}
+        self._capacity = {}
+        # {rp_uuid: {resource class: used}}
+        self._usage = {}
+        # {consumer_uuid: allocations}
+        self._allocations = {}
+
+    def add_compute_node(self, compute):
+        self._capacity[compute.uuid] = {
+            'VCPU': int(compute.vcpus * compute.cpu_allocation_ratio),
+            'MEMORY_MB': int(compute.memory_mb *
+                             compute.ram_allocation_ratio),
+            'DISK_GB': int(compute.local_gb * compute.disk_allocation_ratio),
+        }
+        self._usage[compute.uuid] = {
+            'VCPU': compute.vcpus_used,
+            'MEMORY_MB': compute.memory_mb_used,
+            'DISK_GB': compute.local_gb_used,
+        }
+
+    def _fits(self, rp_uuid, resources):
+        capacity = self._capacity[rp_uuid]
+        usage = self._usage[rp_uuid]
+        return all(usage.get(rc, 0) + amount <= capacity.get(rc, 0)
+                   for rc, amount in resources.items())
+
+    def get_allocation_candidates(self, context, resources):
+        res = resources.get_request_group(None).resources
+        rp_uuids = [rp_uuid for rp_uuid in self._capacity
+                    if self._fits(rp_uuid, res)]
+        if CONF.placement.randomize_allocation_candidates:
+            random.shuffle(rp_uuids)
+        rp_uuids = rp_uuids[:CONF.scheduler.max_placement_results]
+        alloc_reqs = [{'allocations': {rp_uuid: {'resources': dict(res)}}}
+                      for rp_uuid in rp_uuids]
+        provider_summaries = {
+            rp_uuid: {'resources': {
+                rc: {'capacity': capacity, 'used': self._usage[rp_uuid][rc]}
+                for rc, capacity in self._capacity[rp_uuid].items()}}
+            for rp_uuid in rp_uuids}
+        return alloc_reqs, provider_summaries, ALLOCATION_REQUEST_VERSION
+
+    def _update_usage(self, allocations, sign):
+        for rp_uuid, allocation in allocations.items():
+            usage = self._usage[rp_uuid]
+            for rc, amount in allocation['resources'].items():
+                usage[rc] += sign * amount
+
+    def claim_resources(self, context, consumer_uuid, alloc_request,
+                        project_id, user_id, allocation_request_version=None):
+        allocations = alloc_request['allocations']
+        if not all(self._fits(rp_uuid, allocation['resources'])
+                   for rp_uuid, allocation in allocations.items()):
+            return False
+        self._allocations[consumer_uuid] = allocations
+        self._update_usage(allocations, 1)
+        return True
+
+    def claim_resources_in_batch(self, context, alloc_requests, project_id,
+                                 user_id, allocation_request_version=None):
+        claimed = []
+        for consumer_uuid, alloc_request in alloc_requests.items():
+            if not self.claim_resources(context, consumer_uuid,
+                                        alloc_request, project_id, user_id):
+                # The allocations are written all at once or not at all
+                for claimed_uuid in claimed:
+                    self.delete_allocation_for_instance(context,
+                                                        claimed_uuid)
+                return False
+            claimed.append(consumer_uuid)
+        return True
+
+    def delete_allocation_for_instance(self, context, uuid):
+        allocations = self._allocations.pop(uuid, None)
+        if allocations is not None:
+            self._update_usage(allocations, -1)
+        return True
+
+
+class BenchmarkEnvironment(fixtures.Fixture):
+    """Sets up the configuration and the in-memory API and cell databases
+    the benchmark runs against, as nova.test.TestCase does for tests.
+
+    :param num_cells: Number of cells, besides cell0, to create
+    """
+
+    def __init__(self, num_cells=1):
+        super(BenchmarkEnvironment, self).__init__()
+        self.num_cells = num_cells
+
+    def _setUp(self):
+        objects.register_all()
+        self.useFixture(conf_fixture.ConfFixture(CONF))
+        self.useFixture(nova_fixtures.RPCFixture('nova.test'))
+        self.useFixture(nova_fixtures.Database(database='api'))
+
+        ctxt = context.get_admin_context()
+        celldbs = nova_fixtures.CellDatabases()
+        fake_transport = 'fake://nowhere/'
+        cell0 = objects.CellMapping(
+            context=ctxt,
+            uuid=objects.CellMapping.CELL0_UUID,
+            name='cell0',
+            transport_url=fake_transport,
+            database_connection=objects.CellMapping.CELL0_UUID)
+        cell0.create()
+        celldbs.add_cell_database(objects.CellMapping.CELL0_UUID)
+        for x in range(self.num_cells):
+            cell_uuid = uuidutils.generate_uuid()
+            cell = objects.CellMapping(
+                context=ctxt,
+                uuid=cell_uuid,
+                name='cell%i' % (x + 1),
+                transport_url=fake_transport,
+                database_connection=cell_uuid)
+            cell.create()
+            celldbs.add_cell_database(cell_uuid, default=(x == 0))
+        self.useFixture(celldbs)
+
+
+class SchedulerBenchmark(fixtures.Fixture):
+    """Creates a synthetic fleet in the existing cells and a FilterScheduler
+    to schedule onto it.
+
+    :param num_hosts: Number of compute nodes in the fleet
+    :param seed: Seed of the random generator shaping the fleet and requests
+    :param config: Dict, keyed by (group, option name), of the options to
+                   set for the benchmark, in addition to BENCHMARK_FILTERS
+    """
+
+    def __init__(self, num_hosts, seed=0, config=None):
+        super(SchedulerBenchmark, self).__init__()
+        self.num_hosts = num_hosts
+        self.random = random.Random(seed)
+        self.config = config or {}
+
+    def _setUp(self):
+        self.useFixture(nova_fixtures.ConfPatcher(
+            enabled_filters=BENCHMARK_FILTERS, record_request_timings=True,
+            group='filter_scheduler'))
+        # The fleet is never heartbeating, keep its services up
+        self.useFixture(nova_fixtures.ConfPatcher(
+            service_down_time=sys.maxsize))
+        for (group, name), value in self.config.items():
+            self.useFixture(nova_fixtures.ConfPatcher(group=group,
+                                                      **{name: value}))
+        self.context = context.get_admin_context()
+        self.cells = [cell for cell in
+                      objects.CellMappingList.get_all(self.context)
+                      if not cell.is_cell0()]
+        self.placement = SimulatedPlacement()
+        self._create_fleet()
+
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        self.scheduler = filter_scheduler.FilterScheduler()
+        self.scheduler.placement_client = self.placement
+        # The compute nodes have reported that they don't run any instances
+        for hostname in self.hostnames:
+            self.scheduler.host_manager.update_instance_info(
+                self.context, hostname, objects.InstanceList(objects=[]))
+        self.phase_stats = collections.defaultdict(float)
+        self.weigher_stats = collections.defaultdict(float)
+        scheduler_utils.register_timings_hook(self._record_timings)
+        self.addCleanup(scheduler_utils.unregister_timings_hook,
+                        self._record_timings)
+
+    def _host_topology(self, resources):
+        # Two NUMA nodes sharing the resources of the host evenly, without
+        # hyperthreading
+        vcpus = resources['vcpus']
+        memory_mb = resources['memory_mb']
+        cells = []
+        for cell_id in range(2):
+            cpuset = set(range(cell_id * vcpus // 2,
+                               (cell_id + 1) * vcpus // 2))
+            cells.append(objects.NUMACell(
+                id=cell_id, cpuset=cpuset, memory=memory_mb // 2,
+                cpu_usage=0, memory_usage=0, mempages=[],
+                siblings=[set([cpu]) for cpu in cpuset], pinned_cpus=set()))
+        return objects.NUMATopology(cells=cells)
+
+    def _create_fleet(self):
+        self.hostnames = ['compute%05d' % x for x in range(self.num_hosts)]
+        fake.set_nodes(self.hostnames)
+        self.addCleanup(fake.restore_nodes)
+        drivers = [driver_cls(fake.FakeVirtAPI())
+                   for driver_cls, share in HOST_SHAPES]
+        shares = [share for driver_cls, share in HOST_SHAPES]
+
+        for x, hostname in enumerate(self.hostnames):
+            cell = self.cells[x % len(self.cells)]
+            driver = self._choose(drivers, shares)
+            resources = driver.get_available_resource(hostname)
+            with context.target_cell(self.context, cell) as cctxt:
+                service = objects.Service(cctxt, host=hostname,
+                                          binary='nova-compute',
+                                          topic='compute', report_count=0)
+                service.create()
+                compute = objects.ComputeNode(
+                    cctxt, host=hostname, service_id=service.id,
+                    uuid=uuidutils.generate_uuid(),
+                    current_workload=0, running_vms=0,
+                    free_ram_mb=0, free_disk_gb=0,
+                    cpu_allocation_ratio=CONF.cpu_allocation_ratio or 16.0,
+                    ram_allocation_ratio=CONF.ram_allocation_ratio or 1.5,
+                    disk_allocation_ratio=(CONF.disk_allocation_ratio or
+                                           1.0),
+                    pci_device_pools=self._pci_device_pools())
+                compute.update_from_virt_driver(resources)
+                # Part of the hosts are already in use
+                used = self.random.random() * 0.8
+                compute.vcpus_used = int(compute.vcpus * used)
+                compute.memory_mb_used = int(compute.memory_mb * used)
+                compute.local_gb_used = int(compute.local_gb * used)
+                compute.free_ram_mb = (compute.memory_mb -
+                                       compute.memory_mb_used)
+                compute.free_disk_gb = (compute.local_gb -
+                                        compute.local_gb_used)
+                compute.numa_topology = self._host_topology(
+                    resources)._to_json()
+                compute.create()
+            self.placement.add_compute_node(compute)
+
+    def _choose(self, population, weights):
+        point = self.random.random() * sum(weights)
+        for item, weight in zip(population, weights):
+            point -= weight
+            if point < 0:
+                return item
+        return population[-1]
+
+    def _pci_device_pools(self):
+        if self.random.random() >= PCI_HOST_SHARE:
+            return objects.PciDevicePoolList(objects=[])
+        return objects.PciDevicePoolList(objects=[
+            objects.PciDevicePool(vendor_id=PCI_VENDOR_ID,
+                                  product_id=PCI_PRODUCT_ID,
+                                  numa_node=0, count=4, tags={})])
+
+    def _record_timings(self, spec_obj, timings):
+        for phase, time_spent in timings['phases'].items():
+            self.phase_stats[phase] += time_spent
+        for name, time_spent in timings['weighers'].items():
+            self.weigher_stats[name] += time_spent
+
+    def build_request(self, scenario):
+        """Returns a (RequestSpec, instance UUIDs) tuple for a scenario."""
+        vcpus, memory_mb, root_gb, extra_specs = FLAVORS[scenario.flavor]
+        flavor = objects.Flavor(name=scenario.flavor, vcpus=vcpus,
+                                memory_mb=memory_mb, root_gb=root_gb,
+                                ephemeral_gb=0, swap=0, flavorid=1,
+                                extra_specs=dict(extra_specs))
+        image_meta = objects.ImageMeta.from_dict({'properties': {}})
+        pci_requests = objects.InstancePCIRequests(requests=[])
+        if scenario.pci:
+            pci_requests.requests.append(objects.InstancePCIRequest(
+                count=1, spec=[{'vendor_id': PCI_VENDOR_ID,
+                                'product_id': PCI_PRODUCT_ID}]))
+        instance_group = None
+        if scenario.group_policy is not None:
+            instance_group = objects.InstanceGroup(
+                uuid=uuidutils.generate_uuid(),
+                policies=[scenario.group_policy], hosts=[], members=[])
+        instance_uuids = [uuidutils.generate_uuid()
+                          for x in range(scenario.num_instances)]
+        spec_obj = objects.RequestSpec.from_components(
+            self.context, instance_uuids[0], image_meta, flavor,
+            hardware.numa_get_constraints(flavor, image_meta),
+            pci_requests, {}, instance_group, None,
+            project_id=uuidutils.generate_uuid())
+        spec_obj.num_instances = scenario.num_instances
+        return spec_obj, instance_uuids
+
+    def schedule(self, spec_obj, instance_uuids):
+        """Schedules a request as the scheduler manager would.
+
+        Returns the time spent in select_destinations(), in seconds, and
+        whether hosts were selected.
+        """
+        scheduler_utils.start_request_timings(spec_obj)
+        resources = scheduler_utils.resources_from_request_spec(spec_obj)
+        with scheduler_utils.measure_phase(spec_obj, 'placement'):
+            alloc_reqs, provider_summaries, version = (
+                self.placement.get_allocation_candidates(self.context,
+                                                         resources))
+        if not alloc_reqs:
+            scheduler_utils.finish_request_timings(spec_obj)
+            return 0.0, False
+        alloc_reqs_by_rp_uuid = collections.defaultdict(list)
+        for alloc_req in alloc_reqs:
+            for rp_uuid in alloc_req['allocations']:
+                alloc_reqs_by_rp_uuid[rp_uuid].append(alloc_req)
+
+        start = time.time()
+        try:
+            self.scheduler.select_destinations(
+                self.context, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, provider_summaries, version,
+                return_alternates=True)
+        except exception.NoValidHost:
+            return time.time() - start, False
+        finally:
+            scheduler_utils.finish_request_timings(spec_obj)
+        return time.time() - start, True
+
+    def run(self, num_requests):
+        """Schedules num_requests requests from REQUEST_MIX and returns a
+        BenchmarkResult.
+        """
+        scenarios = [scenario for scenario, share in REQUEST_MIX]
+        shares = [share for scenario, share in REQUEST_MIX]
+        result = BenchmarkResult()
+        for x in range(num_requests):
+            scenario = self._choose(scenarios, shares)
+            spec_obj, instance_uuids = self.build_request(scenario)
+            elapsed, scheduled = self.schedule(spec_obj, instance_uuids)
+            result.record(scenario, elapsed, scheduled)
+        result.filter_stats = self.scheduler.host_manager.get_filter_stats()
+        result.phase_stats = dict(self.phase_stats)
+        result.weigher_stats = dict(self.weigher_stats)
+        return result
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(int(round(percent / 100.0 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class BenchmarkResult(object):
+    """Latencies and phase, filter and weigher times of a benchmark run."""
+
+    def __init__(self):
+        self.latencies = []
+        self.num_instances = 0
+        self.no_valid_host = 0
+        self.latencies_by_scenario = collections.defaultdict(list)
+        self.filter_stats = {}
+        self.phase_stats = {}
+        self.weigher_stats = {}
+
+    def record(self, scenario, elapsed, scheduled):
+        self.latencies.append(elapsed)
+        self.latencies_by_scenario[scenario].append(elapsed)
+        if scheduled:
+            self.num_instances += scenario.num_instances
+        else:
+            self.no_valid_host += 1
+
+    @property
+    def requests_per_second(self):
+        total = sum(self.latencies)
+        return len(self.latencies) / total if total else 0.0
+
+    def report(self):
+        """Returns the results as a list of lines of text."""
+        lines = [
+            'Requests: %d (%d instances scheduled, %d NoValidHost)' % (
+                len(self.latencies), self.num_instances,
+                self.no_valid_host),
+            'Requests per second: %.1f' % self.requests_per_second,
+            'Latency: p50 %.1f ms, p99 %.1f ms' % (
+                percentile(self.latencies, 50) * 1000,
+                percentile(self.latencies, 99) * 1000),
+            '',
+            '%-50s %8s %10s %10s' % ('Scenario', 'Requests', 'p50 ms',
+                                     'p99 ms'),
+        ]
+        for scenario, latencies in sorted(
+                self.latencies_by_scenario.items()):
+            name = '%s x%d' % (scenario.flavor, scenario.num_instances)
+            if scenario.group_policy:
+                name += ' %s' % scenario.group_policy
+            if scenario.pci:
+                name += ' pci'
+            lines.append('%-50s %8d %10.1f %10.1f' % (
+                name, len(latencies), percentile(latencies, 50) * 1000,
+                percentile(latencies, 99) * 1000))
+        lines += ['', '%-50s %12s' % ('Phase', 'Time ms')]
+        for phase, time_spent in sorted(self.phase_stats.items(),
+                                        key=lambda item: -item[1]):
+            lines.append('%-50s %12.1f' % (phase, time_spent * 1000))
+        lines += ['', '%-50s %10s %10s %12s' % ('Filter', 'Hosts',
+                                                'Rejected', 'Time ms')]
+        for name, stats in sorted(self.filter_stats.items(),
+                                  key=lambda item: -item[1]['time_spent']):
+            lines.append('%-50s %10d %9.1f%% %12.1f' % (
+                name, stats['objs_checked'], stats['rejection_rate'] * 100,
+                stats['time_spent'] * 1000))
+        lines += ['', '%-50s %12s' % ('Weigher', 'Time ms')]
+        for name, time_spent in sorted(self.weigher_stats.items(),
+                                       key=lambda item: -item[1]):
+            lines.append('%-50s %12.1f' % (name, time_spent * 1000))
+        return lines
+
+
+def _parse_config(value):
+    option, _sep, setting = value.partition('=')
+    group, _sep, name = option.rpartition('.')
+    if not name or not _sep:
+        raise argparse.ArgumentTypeError(
+            "expected GROUP.OPTION=VALUE, got '%s'" % value)
+    return (group or None, name), setting
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=1000,
+                        help='Number of compute nodes in the fleet.')
+    parser.add_argument('--cells', type=int, default=2,
+                        help='Number of cells the fleet is spread across.')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Number of scheduling requests to run.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed shaping the fleet and the requests.')
+    parser.add_argument('--config', type=_parse_config, action='append',
+                        default=[], metavar='GROUP.OPTION=VALUE',
+                        help='Scheduler option to set, can be repeated.')
+    args = parser.parse_args(argv)
+
+    print('Building a fleet of %d compute nodes in %d cell(s)...' % (
+        args.hosts, args.cells))
+    start = time.time()
+    with BenchmarkEnvironment(num_cells=args.cells):
+        with SchedulerBenchmark(args.hosts, seed=args.seed,
+                                config=dict(args.config)) as benchmark:
+            print('Built in %.1f s, scheduling %d requests...' % (
+                time.time() - start, args.requests))
+            result = benchmark.run(args.requests)
+    print('\n'.join(result.report()))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from nova import objects
+from nova import test
+from nova.tests.functional import scheduler_benchmark
+from nova.tests import uuidsentinel as uuids
+
+
+class SchedulerBenchmarkTestCase(test.TestCase):
+    """Runs the scheduler benchmark on a tiny fleet so that it keeps working.
+    """
+    NUMBER_OF_CELLS = 2
+
+    def test_run(self):
+        benchmark = self.useFixture(scheduler_benchmark.SchedulerBenchmark(
+            10, config={('filter_scheduler', 'claim_in_batch'): True}))
+        result = benchmark.run(20)
+
+        self.assertEqual(20, len(result.latencies))
+        self.assertGreater(result.num_instances, 0)
+        self.assertGreater(result.requests_per_second, 0)
+        self.assertIn('NUMATopologyFilter', result.filter_stats)
+        self.assertIn('RAMWeigher', result.weigher_stats)
+        self.assertIn('filtering', result.phase_stats)
+        self.assertTrue(result.report())
+
+
+class SimulatedPlacementTestCase(test.NoDBTestCase):
+
+    def test_claims(self):
+        placement = scheduler_benchmark.SimulatedPlacement()
+        placement.add_compute_node(objects.ComputeNode(
+            uuid=uuids.compute, vcpus=2, memory_mb=2048, local_gb=10,
+            vcpus_used=0, memory_mb_used=0, local_gb_used=0,
+            cpu_allocation_ratio=1.0, ram_allocation_ratio=1.0,
+            disk_allocation_ratio=1.0))
+        alloc_req = {'allocations': {
+            uuids.compute: {'resources': {'VCPU': 2, 'MEMORY_MB': 1024}}}}
+
+        self.assertTrue(placement.claim_resources(
+            None, uuids.instance1, alloc_req, 'project', 'user'))
+        self.assertFalse(placement.claim_resources_in_batch(
+            None, {uuids.instance2: alloc_req}, 'project', 'user'))
+        placement.delete_allocation_for_instance(None, uuids.instance1)
+        self.assertTrue(placement.claim_resources_in_batch(
+            None, {uuids.instance2: alloc_req}, 'project', 'user'))
+
+    def test_percentile(self):
+        values = [float(x) for x in range(1, 101)]
+        self.assertEqual(50.0, scheduler_benchmark.percentile(values, 50))
+        self.assertEqual(99.0, scheduler_benchmark.percentile(values, 99))
+        self.assertEqual(0.0, scheduler_benchmark.percentile([], 50))
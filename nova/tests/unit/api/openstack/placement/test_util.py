@@ -82,6 +82,47 @@ class TestCheckAccept(test.NoDBTestCase):
         self.assertTrue(self.handler(req))
 
 
+class TestCheckETag(test.NoDBTestCase):
+    """Confirm behavior of util.check_etag."""
+
+    def _request(self, version='1.24', if_none_match=None):
+        req = webob.Request.blank('/')
+        req.environ[microversion.MICROVERSION_ENVIRON] = (
+            microversion_parse.Version(*map(int, version.split('.'))))
+        req.response = webob.Response()
+        if if_none_match:
+            req.if_none_match = if_none_match
+        return req
+
+    def test_no_if_none_match(self):
+        req = self._request()
+        self.assertFalse(util.check_etag(req, uuidsentinel.rp, 1))
+        self.assertIsNotNone(req.response.etag)
+        self.assertEqual(200, req.response.status_int)
+
+    def test_match(self):
+        req = self._request()
+        util.check_etag(req, uuidsentinel.rp, 1)
+        etag = req.response.etag
+
+        req = self._request(if_none_match='"%s"' % etag)
+        self.assertTrue(util.check_etag(req, uuidsentinel.rp, 1))
+        self.assertEqual(304, req.response.status_int)
+        self.assertEqual(etag, req.response.etag)
+
+    def test_no_match(self):
+        req = self._request()
+        util.check_etag(req, uuidsentinel.rp, 1)
+        etag = req.response.etag
+
+        for version, parts in (('1.24', (uuidsentinel.rp, 2)),
+                               ('1.25', (uuidsentinel.rp, 1))):
+            req = self._request(version=version, if_none_match='"%s"' % etag)
+            self.assertFalse(util.check_etag(req, *parts))
+            self.assertEqual(200, req.response.status_int)
+            self.assertNotEqual(etag, req.response.etag)
+
+
 class TestExtractJSON(test.NoDBTestCase):
 
     # Although the intent of this test class is not to test that
@@ -211,7 +211,7 @@ class TestPlacementCheck(test.NoDBTestCase):
             "versions": [
                 {
                     "min_version": "1.0",
-                    "max_version": "1.21",
+                    "max_version": "1.24",
                     "id": "v1.0"
                 }
             ]
@@ -231,7 +231,7 @@ class TestPlacementCheck(test.NoDBTestCase):
              "versions": [
                 {
                     "min_version": "1.0",
-                    "max_version": "1.21",
+                    "max_version": "1.24",
                     "id": "v1.0"
                 }
             ]
@@ -252,7 +252,7 @@ class TestPlacementCheck(test.NoDBTestCase):
         }
         res = self.cmd._check_placement()
         self.assertEqual(status.UpgradeCheckCode.FAILURE, res.code)
-        self.assertIn('Placement API version 1.21 needed, you have 0.9',
+        self.assertIn('Placement API version 1.24 needed, you have 0.9',
                       res.details)
 
 
@@ -18,6 +18,7 @@ import time
 
 from cinderclient import exceptions as cinder_exception
 from cursive import exception as cursive_exception
+import eventlet
 from eventlet import event as eventlet_event
 import mock
 import netaddr
@@ -53,6 +54,7 @@ from nova.objects import network_request as net_req_obj
 from nova import test
 from nova.tests import fixtures
 from nova.tests.unit.api.openstack import fakes
+from nova.tests.unit.compute import eventlet_utils
 from nova.tests.unit.compute import fake_resource_tracker
 from nova.tests.unit import fake_block_device
 from nova.tests.unit import fake_flavor
@@ -269,6 +271,32 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         update_mock.assert_not_called()
         del_rp_mock.assert_not_called()
 
+    @mock.patch('nova.compute.manager.LOG')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_metrics_summary')
+    @mock.patch.object(manager.ComputeManager,
+                       'update_available_resource_for_node')
+    @mock.patch.object(fake_driver.FakeDriver, 'get_available_nodes')
+    @mock.patch.object(manager.ComputeManager, '_get_compute_nodes_in_db',
+                       return_value=[])
+    def test_update_available_resource_placement_metrics(
+            self, get_db_nodes, get_avail_nodes, update_mock, summary_mock,
+            log_mock):
+        get_avail_nodes.return_value = set(['node1'])
+        summary_mock.return_value = 'GET /traits: 1 requests (200: 1)'
+
+        self.compute.update_available_resource(self.context)
+
+        summary_mock.assert_called_once_with()
+        log_mock.info.assert_called_once_with(
+            mock.ANY, 'GET /traits: 1 requests (200: 1)')
+
+        # Nothing is logged when no request was sent
+        summary_mock.return_value = None
+        log_mock.reset_mock()
+        self.compute.update_available_resource(self.context)
+        log_mock.info.assert_not_called()
+
     @mock.patch('nova.context.get_admin_context')
     def test_pre_start_hook(self, get_admin_context):
         """Very simple test just to make sure update_available_resource is
@@ -675,6 +703,33 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         """
         self.compute.init_host()
 
+    def test_init_instances_concurrently(self):
+        self.flags(max_concurrent_instance_inits=2)
+        instances = [objects.Instance(uuid=getattr(uuids, 'instance%d' % i))
+                     for i in range(5)]
+        running = set()
+        max_running = [0]
+
+        def fake_init_instance(context, instance):
+            running.add(instance.uuid)
+            max_running[0] = max(max_running[0], len(running))
+            eventlet.sleep(0)
+            running.remove(instance.uuid)
+            if instance.uuid == uuids.instance1:
+                raise test.TestingException()
+
+        with mock.patch.object(self.compute, '_init_instance',
+                               side_effect=fake_init_instance) as mock_init:
+            self.compute._init_instances(self.context, instances)
+
+        # The failure of an instance does not prevent the initialization of
+        # the others
+        mock_init.assert_has_calls(
+            [mock.call(self.context, instance) for instance in instances],
+            any_order=True)
+        self.assertEqual(5, mock_init.call_count)
+        self.assertEqual(2, max_running[0])
+
     @mock.patch('nova.objects.InstanceList')
     @mock.patch('nova.objects.MigrationList.get_by_filters')
     def test_cleanup_host(self, mock_miglist_get, mock_instance_list):
@@ -1605,6 +1660,79 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             self.assertTrue(mock_begin.called)
             self.assertTrue(mock_end.called)
 
+    def _make_heal_instances(self, count):
+        return [objects.Instance(uuid=getattr(uuids, 'instance%d' % i),
+                                 vm_state=vm_states.ACTIVE, task_state=None)
+                for i in range(count)]
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_batch(self, mock_get):
+        self.flags(heal_instance_info_cache_batch_size=3)
+        instances = self._make_heal_instances(4)
+        mock_get.return_value = instances
+
+        with test.nested(
+            mock.patch.object(self.compute.network_api,
+                              'prefetch_instances_nw_info',
+                              return_value={'admin_client': mock.sentinel.c}),
+            mock.patch.object(self.compute.network_api,
+                              'get_instance_nw_info',
+                              side_effect=[None, exception.InstanceNotFound(
+                                  instance_id=uuids.instance1), None])
+        ) as (mock_prefetch, mock_get_nw_info):
+            self.compute._heal_instance_info_cache(self.context)
+
+        mock_prefetch.assert_called_once_with(self.context, instances[:3])
+        # The error of an instance does not prevent healing the others
+        mock_get_nw_info.assert_has_calls([
+            mock.call(self.context, instance, admin_client=mock.sentinel.c)
+            for instance in instances[:3]])
+        self.assertEqual([uuids.instance3],
+                         self.compute._instance_uuids_to_heal)
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_batch_prefetch_fails(self, mock_get):
+        self.flags(heal_instance_info_cache_batch_size=2)
+        instances = self._make_heal_instances(2)
+        mock_get.return_value = instances
+
+        with test.nested(
+            mock.patch.object(self.compute.network_api,
+                              'prefetch_instances_nw_info',
+                              side_effect=exception.Unauthorized),
+            mock.patch.object(self.compute.network_api,
+                              'get_instance_nw_info')
+        ) as (mock_prefetch, mock_get_nw_info):
+            self.compute._heal_instance_info_cache(self.context)
+
+        mock_get_nw_info.assert_has_calls([
+            mock.call(self.context, instance) for instance in instances])
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_time_budget(self, mock_get):
+        self.flags(heal_instance_info_cache_batch_size=4,
+                   heal_instance_info_cache_time_budget=10)
+        instances = self._make_heal_instances(5)
+        mock_get.return_value = instances
+        clock = {'now': 0}
+
+        def fake_heal(context, instance):
+            clock['now'] += 5.5
+
+        with test.nested(
+            mock.patch.object(time, 'time', side_effect=lambda: clock['now']),
+            mock.patch.object(self.compute.network_api,
+                              'prefetch_instances_nw_info', return_value={}),
+            mock.patch.object(self.compute, '_heal_instance_nw_info',
+                              side_effect=fake_heal)
+        ) as (mock_time, mock_prefetch, mock_heal):
+            self.compute._heal_instance_info_cache(self.context)
+
+        self.assertEqual(2, mock_heal.call_count)
+        # The instances left are healed first by the next run
+        self.assertEqual([uuids.instance2, uuids.instance3, uuids.instance4],
+                         self.compute._instance_uuids_to_heal)
+
     @mock.patch.object(objects.InstanceList, 'get_by_host')
     def test_sync_power_states(self, mock_get):
         instance = mock.Mock()
@@ -1617,6 +1745,49 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(manager.ComputeManager,
+                       '_query_driver_power_state_and_sync')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get, mock_query):
+        instances = [
+            objects.Instance(uuid=uuids.instance1, task_state=None),
+            objects.Instance(uuid=uuids.instance2, task_state=None),
+            objects.Instance(uuid=uuids.instance3,
+                             task_state=task_states.POWERING_OFF),
+            objects.Instance(uuid=uuids.instance4, task_state=None)]
+        mock_get.return_value = instances
+        self.compute._syncs_in_progress[uuids.instance4] = True
+        self.compute._sync_power_pool = eventlet_utils.SyncPool()
+
+        with mock.patch.object(
+                self.compute.driver, 'get_power_states',
+                return_value={uuids.instance1: power_state.RUNNING,
+                              uuids.instance2: power_state.SHUTDOWN}
+        ) as mock_get_power_states:
+            self.compute._sync_power_states(self.context)
+
+        mock_get_power_states.assert_called_once_with(instances[:2])
+        mock_query.assert_has_calls([
+            mock.call(self.context, instances[0], power_state.RUNNING),
+            mock.call(self.context, instances[1], power_state.SHUTDOWN),
+            mock.call(self.context, instances[2], None)])
+        self.assertEqual(3, mock_query.call_count)
+
+    @mock.patch.object(manager.ComputeManager,
+                       '_query_driver_power_state_and_sync')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk_fails(self, mock_get, mock_query):
+        instance = objects.Instance(uuid=uuids.instance, task_state=None)
+        mock_get.return_value = [instance]
+        self.compute._sync_power_pool = eventlet_utils.SyncPool()
+
+        with mock.patch.object(self.compute.driver, 'get_power_states',
+                               side_effect=exception.VirtDriverNotReady):
+            self.compute._sync_power_states(self.context)
+
+        # The power state is then queried with the instance locked
+        mock_query.assert_called_once_with(self.context, instance, None)
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -1648,6 +1819,33 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         mock_refresh.assert_called_once_with(use_slave=False)
         self.assertTrue(mock_save.called)
 
+    @mock.patch.object(objects.Instance, 'refresh')
+    @mock.patch.object(objects.Instance, 'save')
+    def test_sync_instance_power_state_verify(self, mock_save, mock_refresh):
+        instance = self._get_sync_instance(power_state.RUNNING,
+                                           vm_states.ACTIVE)
+        with mock.patch.object(self.compute.driver, 'get_info',
+                               return_value=hardware.InstanceInfo(
+                                   state=power_state.RUNNING)) as mock_info:
+            self.compute._sync_instance_power_state(self.context, instance,
+                                                    power_state.SHUTDOWN,
+                                                    verify_power_state=True)
+        # The instance was started since its power state was queried
+        mock_info.assert_called_once_with(instance)
+        self.assertEqual(power_state.RUNNING, instance.power_state)
+        self.assertFalse(mock_save.called)
+
+    @mock.patch.object(objects.Instance, 'refresh')
+    def test_sync_instance_power_state_verify_match(self, mock_refresh):
+        instance = self._get_sync_instance(power_state.RUNNING,
+                                           vm_states.ACTIVE)
+        with mock.patch.object(self.compute.driver,
+                               'get_info') as mock_info:
+            self.compute._sync_instance_power_state(self.context, instance,
+                                                    power_state.RUNNING,
+                                                    verify_power_state=True)
+        self.assertFalse(mock_info.called)
+
     def _test_sync_to_stop(self, power_state, vm_state, driver_power_state,
                            stop=True, force=False, shutdown_terminate=False):
         instance = self._get_sync_instance(
@@ -1723,10 +1921,24 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             self.compute._query_driver_power_state_and_sync(self.context,
                                                             db_instance)
             mock_get_info.assert_called_once_with(db_instance)
-            mock_sync_power_state.assert_called_once_with(self.context,
-                                                          db_instance,
-                                                          power_state.NOSTATE,
-                                                          use_slave=True)
+            mock_sync_power_state.assert_called_once_with(
+                self.context, db_instance, power_state.NOSTATE,
+                use_slave=True, verify_power_state=False)
+
+    @mock.patch('nova.compute.manager.ComputeManager.'
+                '_sync_instance_power_state')
+    def test_query_driver_power_state_and_sync_queried(
+            self, mock_sync_power_state):
+        with mock.patch.object(self.compute.driver,
+                               'get_info') as mock_get_info:
+            db_instance = objects.Instance(uuid=uuids.db_instance,
+                                           task_state=None)
+            self.compute._query_driver_power_state_and_sync(
+                self.context, db_instance, power_state.SHUTDOWN)
+            self.assertFalse(mock_get_info.called)
+            mock_sync_power_state.assert_called_once_with(
+                self.context, db_instance, power_state.SHUTDOWN,
+                use_slave=True, verify_power_state=True)
 
     @mock.patch.object(virt_driver.ComputeDriver, 'delete_instance_files')
     @mock.patch.object(objects.InstanceList, 'get_by_filters')
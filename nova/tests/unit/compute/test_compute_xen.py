@@ -63,7 +63,8 @@ class ComputeXenTestCase(stubs.XenAPITestBaseNoDB):
                ctxt, self.compute.host, expected_attrs=[], use_slave=True)
             mock_compute_get_num_instances.assert_called_once_with()
             mock_compute_sync_powerstate.assert_called_once_with(
-               ctxt, instance, power_state.NOSTATE, use_slave=True)
+               ctxt, instance, power_state.NOSTATE, use_slave=True,
+               verify_power_state=True)
             mock_vm_utils_lookup.assert_called_once_with(
                self.compute.driver._session, instance['name'],
                False)
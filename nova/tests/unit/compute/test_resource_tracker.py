@@ -661,6 +661,116 @@ class TestUpdateAvailableResources(BaseTestCase):
         self.assertTrue(obj_base.obj_equal_prims(expected_resources,
                                                  actual_resources))
 
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_by_host_and_node')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_reconcile_between_full_audits(self, get_mock, migr_mock,
+                                           get_cn_mock, pci_mock,
+                                           instance_pci_mock):
+        self.flags(full_update_resources_interval=3600)
+        self._setup_rt()
+        get_mock.return_value = _INSTANCE_FIXTURES
+        migr_mock.return_value = []
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+
+        self._update_available_resources()
+
+        # The hypervisor reports a bigger host and usage it does not know
+        # about, the usage of the tracked instance is kept
+        self.driver_mock.get_available_resource.return_value.update(
+            memory_mb=1024, memory_mb_used=1000)
+        with mock.patch.object(
+                self.rt, '_update_usage_from_instances') as usage_mock:
+            update_mock = self._update_available_resources()
+        usage_mock.assert_not_called()
+
+        get_mock.assert_called_with(mock.ANY, _HOSTNAME, _NODENAME,
+                                    expected_attrs=[])
+        self.assertEqual(2, get_mock.call_count)
+        expected_resources = copy.deepcopy(_COMPUTE_NODE_FIXTURES[0])
+        vals = {
+            'free_disk_gb': 5,  # 6 - 1 used
+            'local_gb': 6,
+            'free_ram_mb': 896,  # 1024 - 128 used
+            'memory_mb_used': 128,
+            'vcpus_used': 1,
+            'local_gb_used': 1,
+            'memory_mb': 1024,
+            'current_workload': 0,
+            'vcpus': 4,
+            'running_vms': 1  # One active instance
+        }
+        _update_compute_node(expected_resources, **vals)
+        actual_resources = update_mock.call_args[0][1]
+        self.assertTrue(obj_base.obj_equal_prims(expected_resources,
+                                                 actual_resources))
+        self.assertEqual('1', actual_resources.stats['num_instances'])
+
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_by_host_and_node')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_reconcile_drift(self, get_mock, migr_mock, get_cn_mock,
+                             pci_mock, instance_pci_mock):
+        self.flags(full_update_resources_interval=3600)
+        self._setup_rt()
+        get_mock.return_value = _INSTANCE_FIXTURES
+        migr_mock.return_value = []
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+
+        self._update_available_resources()
+
+        # The instance left the host without the resource tracker knowing
+        get_mock.return_value = []
+        update_mock = self._update_available_resources()
+
+        # Checked, then fully audited
+        self.assertEqual(3, get_mock.call_count)
+        self.assertEqual(
+            [mock.call(mock.ANY, _HOSTNAME, _NODENAME, expected_attrs=[]),
+             mock.call(mock.ANY, _HOSTNAME, _NODENAME,
+                       expected_attrs=['system_metadata', 'numa_topology',
+                                       'flavor', 'migration_context'])],
+            get_mock.call_args_list[1:])
+        actual_resources = update_mock.call_args[0][1]
+        self.assertEqual(0, actual_resources.memory_mb_used)
+        self.assertEqual(0, actual_resources.running_vms)
+
+        # A migration unknown to the resource tracker is a drift too
+        migr_mock.return_value = [objects.Migration(id=1)]
+        self.assertFalse(self.rt._reconcile_available_resource(
+            mock.MagicMock(), copy.deepcopy(_VIRT_DRIVER_AVAIL_RESOURCES)))
+
+    @mock.patch('nova.compute.resource_tracker.time.time')
+    def test_full_audit_due(self, time_mock):
+        self._setup_rt()
+        self.rt.compute_nodes[_NODENAME] = _COMPUTE_NODE_FIXTURES[0]
+        self.rt.last_full_audits[_NODENAME] = 1000
+        time_mock.return_value = 1059
+
+        # Incremental tracking is disabled by default
+        self.assertTrue(self.rt._full_audit_due(_NODENAME))
+
+        self.flags(full_update_resources_interval=60)
+        self.assertFalse(self.rt._full_audit_due(_NODENAME))
+        time_mock.return_value = 1060
+        self.assertTrue(self.rt._full_audit_due(_NODENAME))
+
+        # Never audited
+        self.assertTrue(self.rt._full_audit_due('other-node'))
+
+        # Several nodes
+        time_mock.return_value = 1059
+        self.rt.compute_nodes['other-node'] = mock.sentinel.other_node
+        self.assertTrue(self.rt._full_audit_due(_NODENAME))
+
     @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
                 return_value=objects.InstancePCIRequests(requests=[]))
     @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
@@ -1009,6 +1009,12 @@ class NovaMigrationsCheckers(test_migrations.ModelsMigrationsSync,
         self.assertColumnExists(engine, 'shadow_instance_extra',
                                 'trusted_certs')
 
+    def _check_391(self, engine, data):
+        for column in ('created_at', 'updated_at', 'deleted_at'):
+            self.assertIndexMembers(engine, 'compute_nodes',
+                                    'compute_nodes_%s_idx' % column,
+                                    [column])
+
 
 class TestNovaMigrationsSQLite(NovaMigrationsCheckers,
                                test_base.DbTestCase,
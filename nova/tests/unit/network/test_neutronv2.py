@@ -4993,6 +4993,136 @@ class TestNeutronv2WithMock(test.TestCase):
                               '172.24.5.15', '10.1.0.9')
 
 
+class _FakeNeutronClient(object):
+    """Lists resources, filtered like Neutron does, counting the calls."""
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.calls = 0
+
+    def _list(self, collection, search_opts):
+        self.calls += 1
+        items = []
+        for item in self.resources[collection]:
+            for key, value in search_opts.items():
+                if isinstance(value, list):
+                    if item.get(key) not in value:
+                        break
+                elif item.get(key) != value:
+                    break
+            else:
+                items.append(item)
+        return {collection: items}
+
+    def list_ports(self, **search_opts):
+        return self._list('ports', search_opts)
+
+    def list_networks(self, **search_opts):
+        return self._list('networks', search_opts)
+
+    def list_subnets(self, **search_opts):
+        return self._list('subnets', search_opts)
+
+    def list_floatingips(self, **search_opts):
+        return self._list('floatingips', search_opts)
+
+
+class TestPrefetchInstancesNwInfo(test.NoDBTestCase):
+    def setUp(self):
+        super(TestPrefetchInstancesNwInfo, self).setUp()
+        self.api = neutronapi.API()
+        self.context = context.RequestContext('fake-user', 'fake-project')
+        ports = [self._make_port(uuids.port1, uuids.instance1, '10.0.0.2'),
+                 self._make_port(uuids.port2, uuids.instance2, '10.0.0.3'),
+                 self._make_port(uuids.dhcp_port, uuids.dhcp, '10.0.0.1',
+                                 device_owner='network:dhcp')]
+        self.client = _FakeNeutronClient({
+            'ports': ports,
+            'networks': [{'id': uuids.network, 'name': 'private',
+                          'tenant_id': 'fake-project', 'mtu': 1450}],
+            'subnets': [{'id': uuids.subnet, 'network_id': uuids.network,
+                         'cidr': '10.0.0.0/24', 'gateway_ip': '10.0.0.254',
+                         'dns_nameservers': ['8.8.8.8'],
+                         'host_routes': []}],
+            'floatingips': [{'id': uuids.fip, 'port_id': uuids.port1,
+                             'fixed_ip_address': '10.0.0.2',
+                             'floating_ip_address': '172.24.4.2'}]})
+        self.instances = [self._make_instance(uuids.instance1, uuids.port1),
+                          self._make_instance(uuids.instance2, uuids.port2)]
+
+    @staticmethod
+    def _make_port(port_id, device_id, ip_address, device_owner='compute:'):
+        return {'id': port_id, 'device_id': device_id,
+                'device_owner': device_owner, 'tenant_id': 'fake-project',
+                'network_id': uuids.network, 'admin_state_up': True,
+                'status': 'ACTIVE', 'mac_address': 'fa:16:3e:4c:2c:30',
+                'binding:vif_type': model.VIF_TYPE_OVS,
+                'fixed_ips': [{'subnet_id': uuids.subnet,
+                               'ip_address': ip_address}]}
+
+    @staticmethod
+    def _make_instance(instance_uuid, *port_ids):
+        network = model.Network(id=uuids.network,
+                                meta={'tenant_id': 'fake-project'})
+        return objects.Instance(
+            uuid=instance_uuid, project_id='fake-project',
+            info_cache=objects.InstanceInfoCache(
+                network_info=model.NetworkInfo([
+                    model.VIF(id=port_id, network=network)
+                    for port_id in port_ids])))
+
+    def _prefetch(self):
+        with mock.patch.object(neutronapi, 'get_client',
+                               return_value=self.client):
+            kwargs = self.api.prefetch_instances_nw_info(self.context,
+                                                         self.instances)
+        # The ports, networks, subnets, DHCP ports and floating IPs
+        self.assertEqual(5, self.client.calls)
+        self.client.calls = 0
+        return kwargs['admin_client']
+
+    def test_build_network_info_model(self):
+        expected = [self.api._build_network_info_model(
+                        self.context, instance, admin_client=self.client)
+                    for instance in self.instances]
+        self.client.calls = 0
+        prefetched_client = self._prefetch()
+
+        for instance, nw_info in zip(self.instances, expected):
+            self.assertEqual(nw_info, self.api._build_network_info_model(
+                self.context, instance, admin_client=prefetched_client))
+        self.assertEqual(0, self.client.calls)
+        self.assertEqual('172.24.4.2',
+                         expected[0].floating_ips()[0]['address'])
+
+    def test_build_network_info_model_port_attached(self):
+        prefetched_client = self._prefetch()
+        # A port attached after the ports were listed
+        self.client.resources['ports'].append(
+            self._make_port(uuids.port3, uuids.instance2, '10.0.0.4'))
+        instance = self._make_instance(uuids.instance2, uuids.port2,
+                                       uuids.port3)
+
+        nw_info = self.api._build_network_info_model(
+            self.context, instance, admin_client=prefetched_client)
+
+        self.assertEqual([uuids.port2, uuids.port3],
+                         [vif['id'] for vif in nw_info])
+        # The ports are listed again, with the floating IPs of the new one
+        self.assertEqual(2, self.client.calls)
+
+    def test_prefetched_client_passes_other_queries(self):
+        prefetched_client = self._prefetch()
+
+        self.assertEqual(
+            [], prefetched_client.list_networks(shared=True)['networks'])
+        self.assertEqual(
+            [], prefetched_client.list_ports(
+                tenant_id='fake-project',
+                device_id=uuids.other_instance)['ports'])
+        self.assertEqual(2, self.client.calls)
+
+
 class TestNeutronv2ModuleMethods(test.NoDBTestCase):
 
     def test_gather_port_ids_and_networks_wrong_params(self):
@@ -0,0 +1,155 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import requests
+
+from nova.scheduler.client import metrics
+from nova.scheduler.client import report
+from nova import test
+from nova.tests import uuidsentinel as uuids
+
+
+class TestGetRoute(test.NoDBTestCase):
+    def test_get_route(self):
+        for path, route in (
+                ('/', '/'),
+                ('/resource_providers?in_tree=%s' % uuids.rp,
+                 '/resource_providers'),
+                ('/resource_providers/%s' % uuids.rp,
+                 '/resource_providers/{uuid}'),
+                ('/resource_providers/%s/inventories/VCPU' % uuids.rp,
+                 '/resource_providers/{uuid}/inventories/{name}'),
+                ('/resource_providers/%s/traits' % uuids.rp,
+                 '/resource_providers/{uuid}/traits'),
+                ('/traits/CUSTOM_GOLD', '/traits/{name}'),
+                ('/resource_classes/CUSTOM_FPGA', '/resource_classes/{name}'),
+                ('/placement/allocations/%s' % uuids.consumer,
+                 '/placement/allocations/{uuid}')):
+            self.assertEqual(route, metrics.get_route(path))
+
+
+class TestMeasuringAdapter(test.NoDBTestCase):
+    @mock.patch('keystoneauth1.session.TCPKeepAliveAdapter.send')
+    def test_send(self, send_mock):
+        resp = requests.Response()
+        resp.status_code = 409
+        resp._content = b'{"errors": []}'
+        send_mock.return_value = resp
+        record = mock.Mock()
+        adapter = metrics.MeasuringAdapter(record)
+        request = requests.Request(
+            'PUT', 'http://placement/resource_providers/%s/traits' % uuids.rp,
+            json={'traits': []}).prepare()
+
+        self.assertIs(resp, adapter.send(request, timeout=None))
+
+        send_mock.assert_called_once_with(request, timeout=None)
+        record.assert_called_once_with(
+            'PUT', '/resource_providers/{uuid}/traits', 409, mock.ANY,
+            len(request.body), 14)
+
+
+class TestPlacementMetrics(test.NoDBTestCase):
+    def setUp(self):
+        super(TestPlacementMetrics, self).setUp()
+        self.metrics = metrics.PlacementMetrics()
+
+    def test_summarize_nothing(self):
+        self.assertIsNone(self.metrics.summarize())
+
+    def test_summarize(self):
+        for status_code in (200, 200, 409):
+            self.metrics.record_request(
+                'PUT', '/resource_providers/{uuid}/inventories', status_code,
+                0.02, 100, 200)
+        self.metrics.record_request('GET', '/traits', 503, 20, 0, 50)
+        self.metrics.record_retry('put_allocations')
+        self.metrics.record_retry('put_allocations')
+
+        self.assertEqual(
+            'GET /traits: 1 requests (503: 1), 20.000s total, p95 > 10s, '
+            '0 bytes sent, 50 bytes received; '
+            'PUT /resource_providers/{uuid}/inventories: 3 requests '
+            '(200: 2, 409: 1), 0.060s total, p95 <= 0.025s, 300 bytes sent, '
+            '600 bytes received; '
+            'retries: put_allocations: 2',
+            self.metrics.summarize())
+        # The metrics are reset by the summary
+        self.assertIsNone(self.metrics.summarize())
+
+    def test_percentile(self):
+        for elapsed in (0.001, 0.03, 0.03, 0.2):
+            self.metrics.record_request('GET', '/', 200, elapsed, 0, 0)
+        route_metrics = self.metrics.routes[('GET', '/')]
+        self.assertEqual(4, route_metrics.count)
+        self.assertEqual(0.01, route_metrics.percentile(0.25))
+        self.assertEqual(0.05, route_metrics.percentile(0.5))
+        self.assertEqual(0.25, route_metrics.percentile(0.95))
+
+
+class TestLoadSinks(test.NoDBTestCase):
+    def test_load_sinks_none(self):
+        self.assertEqual([], metrics.load_sinks())
+
+    @mock.patch('stevedore.named.NamedExtensionManager')
+    def test_load_sinks(self, mgr_mock):
+        self.flags(metrics_sinks=['statsd', 'other'], group='placement')
+        ext = mock.Mock()
+        mgr_mock.return_value = [ext]
+
+        self.assertEqual([ext.obj], metrics.load_sinks())
+        mgr_mock.assert_called_once_with(
+            metrics.SINK_NAMESPACE, ['statsd', 'other'], invoke_on_load=True,
+            name_order=True, on_missing_entrypoints_callback=mock.ANY)
+
+
+class TestReportClientMetrics(test.NoDBTestCase):
+    @mock.patch('keystoneauth1.loading.load_session_from_conf_options')
+    @mock.patch('keystoneauth1.loading.load_auth_from_conf_options')
+    def setUp(self, load_auth_mock, load_sess_mock):
+        super(TestReportClientMetrics, self).setUp()
+        self.sink = mock.Mock()
+        with mock.patch.object(metrics, 'load_sinks',
+                               return_value=[self.sink]):
+            self.client = report.SchedulerReportClient()
+        self.adapter = load_sess_mock.return_value.mount.call_args[0][1]
+
+    def test_record_request(self):
+        self.assertIsInstance(self.adapter, metrics.MeasuringAdapter)
+        self.adapter._record('GET', '/traits', 200, 0.5, 0, 10)
+
+        self.sink.record_request.assert_called_once_with(
+            'GET', '/traits', 200, 0.5, 0, 10)
+        self.assertEqual(
+            'GET /traits: 1 requests (200: 1), 0.500s total, p95 <= 0.5s, '
+            '0 bytes sent, 10 bytes received',
+            self.client.get_metrics_summary())
+
+    def test_record_request_sink_error(self):
+        self.sink.record_request.side_effect = ValueError
+        self.adapter._record('GET', '/traits', 200, 0.5, 0, 10)
+
+        # The error of a sink does not prevent recording in the others
+        self.assertIsNotNone(self.client.get_metrics_summary())
+
+    def test_record_retry(self):
+        @report.retries
+        def operation(client):
+            raise report.Retry('operation', 'conflict')
+
+        self.assertFalse(operation(self.client))
+
+        self.assertEqual(3, self.sink.record_retry.call_count)
+        self.sink.record_retry.assert_called_with('operation')
+        self.assertEqual('retries: operation: 3',
+                         self.client.get_metrics_summary())
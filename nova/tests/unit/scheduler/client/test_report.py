@@ -12,7 +12,9 @@
 
 import time
 
+import eventlet
 from keystoneauth1 import exceptions as ks_exc
+from keystoneauth1 import session as ks_session
 import mock
 from six.moves.urllib import parse
 
@@ -172,6 +174,22 @@ class TestConstructor(test.NoDBTestCase):
         self.assertEqual({'accept': 'application/json'},
                          client._client.additional_headers)
 
+    @mock.patch('keystoneauth1.loading.load_session_from_conf_options')
+    @mock.patch('keystoneauth1.loading.load_auth_from_conf_options')
+    def test_constructor_connection_pool(self, load_auth_mock,
+                                         load_sess_mock):
+        self.flags(max_concurrent_requests=20, group='placement')
+        report.SchedulerReportClient()
+
+        sess = load_sess_mock.return_value
+        self.assertEqual(2, sess.mount.call_count)
+        for call, scheme in zip(sess.mount.call_args_list,
+                                ('https://', 'http://')):
+            self.assertEqual(scheme, call[0][0])
+            adapter = call[0][1]
+            self.assertIsInstance(adapter, ks_session.TCPKeepAliveAdapter)
+            self.assertEqual(20, adapter._pool_maxsize)
+
 
 class SchedulerReportClientTestCase(test.NoDBTestCase):
 
@@ -425,6 +443,94 @@ class TestPutAllocations(SchedulerReportClientTestCase):
 
         self.assertTrue(res)
 
+    def test_claim_resources_in_batch(self):
+        resp_mock = mock.Mock(status_code=204)
+        self.ks_adap_mock.post.return_value = resp_mock
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': [
+                    {
+                        'resource_provider': {'uuid': uuids.cn1},
+                        'resources': {'VCPU': 1, 'MEMORY_MB': 1024},
+                    },
+                ],
+            },
+            uuids.consumer2: {
+                'allocations': [
+                    {
+                        'resource_provider': {'uuid': uuids.cn2},
+                        'resources': {'VCPU': 1, 'MEMORY_MB': 1024},
+                    },
+                ],
+            },
+        }
+
+        project_id = uuids.project_id
+        user_id = uuids.user_id
+        res = self.client.claim_resources_in_batch(self.context, alloc_reqs,
+                                                   project_id, user_id,
+                                                   '1.10')
+
+        expected_payload = {
+            consumer_uuid: {
+                'allocations': {
+                    alloc['resource_provider']['uuid']: {
+                        'resources': alloc['resources']
+                    } for alloc in alloc_req['allocations']
+                },
+                'project_id': project_id,
+                'user_id': user_id,
+            } for consumer_uuid, alloc_req in alloc_reqs.items()
+        }
+        self.ks_adap_mock.post.assert_called_once_with(
+            '/allocations', microversion='1.13', json=expected_payload,
+            raise_exc=False,
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        # There is no check for existing allocations
+        self.ks_adap_mock.get.assert_not_called()
+        self.assertTrue(res)
+
+    def test_claim_resources_in_batch_fail_retry_success(self):
+        resp_mocks = [
+            mock.Mock(
+                status_code=409,
+                text='Inventory changed while attempting to allocate: '
+                     'Another thread concurrently updated the data. '
+                     'Please retry your update'),
+            mock.Mock(status_code=204),
+        ]
+        self.ks_adap_mock.post.side_effect = resp_mocks
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1}},
+                },
+            },
+        }
+        res = self.client.claim_resources_in_batch(
+            self.context, alloc_reqs, uuids.project_id, uuids.user_id,
+            allocation_request_version='1.12')
+
+        self.assertEqual(2, self.ks_adap_mock.post.call_count)
+        self.assertTrue(res)
+
+    def test_claim_resources_in_batch_fail_no_retry(self):
+        self.ks_adap_mock.post.return_value = mock.Mock(
+            status_code=409, text='Unable to allocate inventory')
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1}},
+                },
+            },
+        }
+        res = self.client.claim_resources_in_batch(
+            self.context, alloc_reqs, uuids.project_id, uuids.user_id,
+            allocation_request_version='1.12')
+
+        self.ks_adap_mock.post.assert_called_once()
+        self.assertFalse(res)
+
     def test_claim_resources_success_move_operation_no_shared(self):
         """Tests that when a move operation is detected (existing allocations
         for the same instance UUID) that we end up constructing an appropriate
@@ -1533,7 +1639,7 @@ class TestProviderOperations(SchedulerReportClientTestCase):
         )
         expected_url = '/resource_providers/' + uuid
         self.ks_adap_mock.get.assert_called_once_with(
-            expected_url, raise_exc=False, microversion='1.14',
+            expected_url, raise_exc=False, microversion='1.24',
             headers={'X-Openstack-Request-Id': self.context.global_id})
         self.assertEqual(expected_provider_dict, result)
 
@@ -1548,7 +1654,7 @@ class TestProviderOperations(SchedulerReportClientTestCase):
 
         expected_url = '/resource_providers/' + uuid
         self.ks_adap_mock.get.assert_called_once_with(
-            expected_url, raise_exc=False, microversion='1.14',
+            expected_url, raise_exc=False, microversion='1.24',
             headers={'X-Openstack-Request-Id': self.context.global_id})
         self.assertIsNone(result)
 
@@ -1569,7 +1675,7 @@ class TestProviderOperations(SchedulerReportClientTestCase):
 
         expected_url = '/resource_providers/' + uuid
         self.ks_adap_mock.get.assert_called_once_with(
-            expected_url, raise_exc=False, microversion='1.14',
+            expected_url, raise_exc=False, microversion='1.24',
             headers={'X-Openstack-Request-Id': self.context.global_id})
         # A 503 Service Unavailable should trigger an error log that
         # includes the placement request id and return None
@@ -1578,6 +1684,42 @@ class TestProviderOperations(SchedulerReportClientTestCase):
         self.assertEqual(uuids.request_id,
                          logging_mock.call_args[0][1]['placement_req_id'])
 
+    def test_get_resource_provider_not_modified(self):
+        rp = {'uuid': uuids.compute_node, 'name': 'cn', 'generation': 1}
+        ok_resp = mock.Mock(status_code=200, headers={'ETag': '"etag1"'})
+        ok_resp.json.return_value = rp
+        not_modified_resp = mock.Mock(status_code=304, headers={})
+        self.ks_adap_mock.get.side_effect = [ok_resp, not_modified_resp]
+
+        self.assertEqual(rp, self.client._get_resource_provider(
+            self.context, uuids.compute_node))
+        result = self.client._get_resource_provider(self.context,
+                                                    uuids.compute_node)
+
+        self.assertEqual(rp, result)
+        # The caller gets a copy of the kept body
+        result['name'] = 'changed'
+        expected_url = '/resource_providers/' + uuids.compute_node
+        self.ks_adap_mock.get.assert_has_calls([
+            mock.call(expected_url, raise_exc=False, microversion='1.24',
+                      headers={'X-Openstack-Request-Id':
+                               self.context.global_id}),
+            mock.call(expected_url, raise_exc=False, microversion='1.24',
+                      headers={'X-Openstack-Request-Id':
+                               self.context.global_id,
+                               'If-None-Match': '"etag1"'}),
+        ])
+        self.assertEqual(
+            ('"etag1"', rp),
+            self.client._etag_cache[uuids.compute_node][''])
+
+        # An error forgets the ETag
+        self.ks_adap_mock.get.side_effect = None
+        self.ks_adap_mock.get.return_value = mock.Mock(status_code=404)
+        self.assertIsNone(self.client._get_resource_provider(
+            self.context, uuids.compute_node))
+        self.assertEqual({}, self.client._etag_cache[uuids.compute_node])
+
     def test_get_sharing_providers(self):
         resp_mock = mock.Mock(status_code=200)
         rpjson = [
@@ -1927,7 +2069,7 @@ class TestAggregates(SchedulerReportClientTestCase):
 
         expected_url = '/resource_providers/' + uuid + '/aggregates'
         self.ks_adap_mock.get.assert_called_once_with(
-            expected_url, raise_exc=False, microversion='1.1',
+            expected_url, raise_exc=False, microversion='1.24',
             headers={'X-Openstack-Request-Id': self.context.global_id})
         self.assertEqual(set(aggs), result)
 
@@ -1949,7 +2091,7 @@ class TestAggregates(SchedulerReportClientTestCase):
 
             expected_url = '/resource_providers/' + uuid + '/aggregates'
             self.ks_adap_mock.get.assert_called_once_with(
-                expected_url, raise_exc=False, microversion='1.1',
+                expected_url, raise_exc=False, microversion='1.24',
                 headers={'X-Openstack-Request-Id': self.context.global_id})
             self.assertTrue(log_mock.called)
             self.assertEqual(uuids.request_id,
@@ -1977,7 +2119,7 @@ class TestTraits(SchedulerReportClientTestCase):
         self.ks_adap_mock.get.assert_called_once_with(
             expected_url,
             headers={'X-Openstack-Request-Id': self.context.global_id},
-            **self.trait_api_kwargs)
+            raise_exc=False, microversion='1.24')
         self.assertEqual(set(traits), result)
 
     @mock.patch.object(report.LOG, 'error')
@@ -2000,7 +2142,7 @@ class TestTraits(SchedulerReportClientTestCase):
             self.ks_adap_mock.get.assert_called_once_with(
                 expected_url,
                 headers={'X-Openstack-Request-Id': self.context.global_id},
-                **self.trait_api_kwargs)
+                raise_exc=False, microversion='1.24')
             self.assertTrue(log_mock.called)
             self.assertEqual(uuids.request_id,
                              log_mock.call_args[0][1]['placement_req_id'])
@@ -2154,6 +2296,151 @@ class TestTraits(SchedulerReportClientTestCase):
             self.context, uuids.rp, traits)
 
 
+class TestProviderUpdates(SchedulerReportClientTestCase):
+    def test_put_provider_updates(self):
+        updates = {uuids.rp: {'resource_provider_generation': 1,
+                              'traits': ['HW_CPU_X86_AVX']}}
+        resp_mock = mock.Mock(status_code=200)
+        self.ks_adap_mock.put.return_value = resp_mock
+
+        resp = self.client._put_provider_updates(self.context, updates)
+
+        self.assertIs(resp_mock, resp)
+        self.ks_adap_mock.put.assert_called_once_with(
+            '/resource_providers',
+            json={'resource_providers': updates, 'atomic': False},
+            raise_exc=False, microversion='1.25',
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        self.assertTrue(self.client._provider_batch_supported)
+
+    def test_put_provider_updates_not_supported(self):
+        updates = {uuids.rp: {'resource_provider_generation': 1,
+                              'traits': []}}
+        for status_code in (405, 406):
+            self.client._provider_batch_supported = True
+            self.ks_adap_mock.put.return_value = mock.Mock(
+                status_code=status_code)
+
+            self.assertIsNone(
+                self.client._put_provider_updates(self.context, updates))
+            self.assertFalse(self.client._provider_batch_supported)
+
+    def test_apply_provider_update(self):
+        self._init_provider_tree()
+        update = {'resource_provider_generation': 1,
+                  'traits': ['HW_CPU_X86_AVX'],
+                  'aggregates': [uuids.agg]}
+        result = {'resource_provider_generation': 3,
+                  'traits': ['HW_CPU_X86_AVX'],
+                  'aggregates': [uuids.agg]}
+
+        self.client._apply_provider_update(
+            uuids.compute_node, update, result, mock.Mock())
+
+        self._validate_provider(uuids.compute_node, generation=3,
+                                traits=set(['HW_CPU_X86_AVX']),
+                                aggregates=set([uuids.agg]))
+
+    @mock.patch.object(report.LOG, 'error')
+    def test_apply_provider_update_errors(self, log_mock):
+        self._init_provider_tree()
+        update = {'resource_provider_generation': 1, 'traits': []}
+        resp = mock.Mock(text='error', headers={
+            'x-openstack-request-id': uuids.request_id})
+
+        def _result(status, detail):
+            return {'errors': [{'status': status, 'title': 'Error',
+                                'detail': detail}]}
+
+        self.assertRaises(
+            exception.InventoryInUse,
+            self.client._apply_provider_update, uuids.compute_node, update,
+            _result(409, "update conflict: Inventory for 'VCPU' on resource "
+                         "provider '%s' in use." % uuids.compute_node), resp)
+        self.assertRaises(
+            exception.ResourceProviderUpdateConflict,
+            self.client._apply_provider_update, uuids.compute_node, update,
+            _result(409, 'generation conflict'), resp)
+        self.assertRaises(
+            exception.ResourceProviderUpdateFailed,
+            self.client._apply_provider_update, uuids.compute_node, update,
+            _result(400, 'bad request'), resp)
+        # The whole request failed
+        self.assertRaises(
+            exception.ResourceProviderUpdateFailed,
+            self.client._apply_provider_update, uuids.compute_node, update,
+            None, resp)
+        self.assertEqual(uuids.request_id,
+                         log_mock.call_args[0][1]['placement_req_id'])
+        # The cache was not changed
+        self._validate_provider(uuids.compute_node, generation=1)
+
+
+class TestConcurrency(SchedulerReportClientTestCase):
+    def test_single_flight(self):
+        calls = []
+
+        def refresh(arg):
+            calls.append(arg)
+            eventlet.sleep(0.01)
+            return arg
+
+        threads = [eventlet.spawn(self.client._single_flight, 'key',
+                                  refresh, arg) for arg in (1, 2)]
+        self.assertEqual([1, 1], [thread.wait() for thread in threads])
+        self.assertEqual([1], calls)
+        self.assertEqual({}, self.client._in_flight)
+
+        # Calls with another key or which are not concurrent are not
+        # collapsed
+        threads = [eventlet.spawn(self.client._single_flight, key,
+                                  refresh, key) for key in (3, 4)]
+        self.assertEqual([3, 4], [thread.wait() for thread in threads])
+        self.assertEqual(5, self.client._single_flight('key', refresh, 5))
+        self.assertEqual([1, 3, 4, 5], calls)
+
+    def test_single_flight_error(self):
+        def refresh():
+            eventlet.sleep(0.01)
+            raise exception.ResourceProviderRetrievalFailed(uuid=uuids.rp)
+
+        threads = [eventlet.spawn(self.client._single_flight, 'key',
+                                  refresh) for _ in range(2)]
+        for thread in threads:
+            self.assertRaises(exception.ResourceProviderRetrievalFailed,
+                              thread.wait)
+        self.assertEqual({}, self.client._in_flight)
+
+    def test_concurrently(self):
+        self.flags(max_concurrent_requests=2, group='placement')
+        running = []
+        most_running = []
+
+        def func(item):
+            running.append(item)
+            most_running.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(item)
+            return item * 2
+
+        self.assertEqual([2, 4, 6, 8, 10],
+                         self.client._concurrently(func, [1, 2, 3, 4, 5]))
+        self.assertEqual(2, max(most_running))
+
+    def test_group_by_depth(self):
+        tree = self.client._provider_tree
+        tree.new_root('root', uuids.root)
+        tree.new_child('child1', uuids.root, uuid=uuids.child1)
+        tree.new_child('grandchild1', uuids.child1, uuid=uuids.grandchild1)
+        tree.new_child('child2', uuids.root, uuid=uuids.child2)
+        tree.new_root('root2', uuids.root2)
+
+        self.assertEqual(
+            [[uuids.root, uuids.root2], [uuids.child1, uuids.child2],
+             [uuids.grandchild1]],
+            report._group_by_depth(tree, tree.get_provider_uuids()))
+
+
 class TestAssociations(SchedulerReportClientTestCase):
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 '_get_provider_aggregates')
@@ -2420,6 +2707,7 @@ class TestInventory(SchedulerReportClientTestCase):
         # Make sure the resource provider exists for preventing to call the API
         self._init_provider_tree(resources_override={})
 
+        mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
             'resource_provider_generation': 43,
             'inventories': {
@@ -2446,7 +2734,8 @@ class TestInventory(SchedulerReportClientTestCase):
 
         exp_url = '/resource_providers/%s/inventories' % uuid
         mock_get.assert_called_once_with(
-            exp_url, global_request_id=self.context.global_id)
+            exp_url, version='1.24', global_request_id=self.context.global_id,
+            headers={})
         # Updated with the new inventory from the PUT call
         self._validate_provider(uuid, generation=44)
         expected = {
@@ -2498,6 +2787,7 @@ class TestInventory(SchedulerReportClientTestCase):
         self._init_provider_tree()
         new_vcpus_total = 240
 
+        mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
             'resource_provider_generation': 43,
             'inventories': {
@@ -2526,7 +2816,8 @@ class TestInventory(SchedulerReportClientTestCase):
 
         exp_url = '/resource_providers/%s/inventories' % uuid
         mock_get.assert_called_once_with(
-            exp_url, global_request_id=self.context.global_id)
+            exp_url, version='1.24', global_request_id=self.context.global_id,
+            headers={})
         # Updated with the new inventory from the PUT call
         self._validate_provider(uuid, generation=44)
         expected = {
@@ -2577,6 +2868,7 @@ class TestInventory(SchedulerReportClientTestCase):
         compute_node = self.compute_node
         # Make sure the resource provider exists for preventing to call the API
         self._init_provider_tree(generation_override=42, resources_override={})
+        mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
             'resource_provider_generation': 43,
             'inventories': {
@@ -2613,7 +2905,8 @@ class TestInventory(SchedulerReportClientTestCase):
         self.assertTrue(result)
         exp_url = '/resource_providers/%s/inventories' % uuid
         mock_get.assert_called_once_with(
-            exp_url, global_request_id=self.context.global_id)
+            exp_url, version='1.24', global_request_id=self.context.global_id,
+            headers={})
         # No update so put should not be called
         self.assertFalse(mock_put.called)
         # Make sure we updated the generation from the inventory records
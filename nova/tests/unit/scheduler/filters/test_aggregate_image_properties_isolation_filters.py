@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import aggregate_image_properties_isolation as aipi
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -148,3 +149,24 @@ class TestAggImagePropsIsolationFilter(test.NoDBTestCase):
                 os_type='linux')))
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
+
+    def test_aggregate_image_properties_isolation_with_aggregate_index(self,
+            agg_mock):
+        index = host_manager.AggregateMetadataIndex()
+        index.add(objects.Aggregate(
+            id=1, hosts=['host1'], metadata={'hw_vm_mode': 'hvm, xen'}))
+        index.add(objects.Aggregate(
+            id=2, hosts=['host2'], metadata={'hw_vm_mode': 'xen'}))
+        index.add(objects.Aggregate(
+            id=3, hosts=['host3'], metadata={'os_distro': 'fedora'}))
+        self.filt_cls.aggregate_index = index
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx,
+            image=objects.ImageMeta(properties=objects.ImageMetaProps(
+                hw_vm_mode='hvm')))
+        hosts = [fakes.FakeHostState(host, 'compute', {})
+                 for host in ('host1', 'host2', 'host3', 'host4')]
+        passing = self.filt_cls.filter_all(hosts, spec_obj)
+        self.assertEqual(['host1', 'host3', 'host4'],
+                         [h.host for h in passing])
+        self.assertFalse(agg_mock.called)
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import aggregate_instance_extra_specs as agg_specs
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -90,3 +91,24 @@ class TestAggregateInstanceExtraSpecsFilter(test.NoDBTestCase):
             'opt2': '222'
         }
         self._do_test_aggregate_filter_extra_specs(especs, passes=False)
+
+    def test_aggregate_filter_with_aggregate_index(self, agg_mock):
+        index = host_manager.AggregateMetadataIndex()
+        index.add(objects.Aggregate(
+            id=1, hosts=['host1', 'host2'], metadata={'opt1': '1'}))
+        index.add(objects.Aggregate(
+            id=2, hosts=['host1'], metadata={'opt2': '2, 3'}))
+        index.add(objects.Aggregate(
+            id=3, hosts=['host2'], metadata={'opt2': '4'}))
+        self.filt_cls.aggregate_index = index
+        extra_specs = {'opt1': '1',
+                       'aggregate_instance_extra_specs:opt2': '3',
+                       'trust:trusted_host': 'true'}
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx,
+            flavor=objects.Flavor(memory_mb=1024, extra_specs=extra_specs))
+        hosts = [fakes.FakeHostState(host, 'compute', {})
+                 for host in ('host1', 'host2', 'host3')]
+        passing = self.filt_cls.filter_all(hosts, spec_obj)
+        self.assertEqual(['host1'], [h.host for h in passing])
+        self.assertFalse(agg_mock.called)
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import aggregate_multitenancy_isolation as ami
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -63,3 +64,21 @@ class TestAggregateMultitenancyIsolationFilter(test.NoDBTestCase):
             context=mock.sentinel.ctx, project_id='my_tenantid')
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
+
+    def test_aggregate_multi_tenancy_isolation_with_aggregate_index(self,
+            agg_mock):
+        index = host_manager.AggregateMetadataIndex()
+        index.add(objects.Aggregate(
+            id=1, hosts=['host1'],
+            metadata={'filter_tenant_id': 'my_tenantid, mytenantid2'}))
+        index.add(objects.Aggregate(
+            id=2, hosts=['host2'],
+            metadata={'filter_tenant_id': 'other_tenantid'}))
+        self.filt_cls.aggregate_index = index
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx, project_id='my_tenantid')
+        hosts = [fakes.FakeHostState(host, 'compute', {})
+                 for host in ('host1', 'host2', 'host3')]
+        passing = self.filt_cls.filter_all(hosts, spec_obj)
+        self.assertEqual(['host1', 'host3'], [h.host for h in passing])
+        self.assertFalse(agg_mock.called)
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import core_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -92,3 +93,54 @@ class TestCoreFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
         self.assertEqual(4 * 2, host.limits['vcpu'])
+
+    def test_core_filter_columns(self):
+        self.filt_cls = core_filter.CoreFilter()
+        spec_obj = objects.RequestSpec(flavor=objects.Flavor(vcpus=2))
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x, values)
+                 for x, values in enumerate([
+                     {'vcpus_total': 4, 'vcpus_used': 6,
+                      'cpu_allocation_ratio': 2},
+                     {'vcpus_total': 4, 'vcpus_used': 7,
+                      'cpu_allocation_ratio': 2},
+                     {'vcpus_total': 1, 'vcpus_used': 0,
+                      'cpu_allocation_ratio': 2},
+                     {}])]
+        columns = host_manager.HostStateColumns(hosts)
+        self.assertEqual([True, False, False, True],
+                         self.filt_cls.filter_columns(columns, spec_obj))
+        self.assertEqual(8, hosts[0].limits['vcpu'])
+        self.assertEqual({}, hosts[3].limits)
+        self.assertEqual(
+            [self.filt_cls.host_passes(host, spec_obj) for host in hosts],
+            self.filt_cls.hosts_pass(columns, spec_obj))
+
+    def test_core_filter_columns_rebuild(self):
+        self.filt_cls = core_filter.CoreFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(vcpus=2),
+            scheduler_hints={'_nova_check_type': ['rebuild']})
+        host = fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 1, 'vcpus_used': 1,
+                 'cpu_allocation_ratio': 1})
+        columns = host_manager.HostStateColumns([host])
+        self.assertEqual([True],
+                         self.filt_cls.filter_columns(columns, spec_obj))
+
+    def test_aggregate_core_filter_columns_with_aggregate_index(self):
+        self.filt_cls = core_filter.AggregateCoreFilter()
+        index = host_manager.AggregateMetadataIndex()
+        index.add(objects.Aggregate(
+            id=1, hosts=['host0'], metadata={'cpu_allocation_ratio': '3'}))
+        index.add(objects.Aggregate(
+            id=2, hosts=['host1'], metadata={'cpu_allocation_ratio': 'XXX'}))
+        self.filt_cls.aggregate_index = index
+        spec_obj = objects.RequestSpec(flavor=objects.Flavor(vcpus=2))
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                                     {'vcpus_total': 4, 'vcpus_used': 8,
+                                      'cpu_allocation_ratio': 2})
+                 for x in range(3)]
+        columns = host_manager.HostStateColumns(hosts)
+        self.assertEqual([True, False, False],
+                         self.filt_cls.filter_columns(columns, spec_obj))
+        self.assertEqual(12, hosts[0].limits['vcpu'])
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import disk_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -109,3 +110,22 @@ class TestDiskFilter(test.NoDBTestCase):
 
         agg_mock.return_value = set(['2'])
         self.assertTrue(filt_cls.host_passes(host, spec_obj))
+
+    def test_disk_filter_columns(self):
+        filt_cls = disk_filter.DiskFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=3, ephemeral_gb=3, swap=1024))
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                 {'free_disk_mb': free, 'total_usable_disk_gb': total,
+                  'disk_allocation_ratio': ratio})
+                 for x, (free, total, ratio) in enumerate([
+                     (11 * 1024, 13, 1.0), (1 * 1024, 12, 10.0),
+                     (1 * 1024, 12, 1.0), (29 * 1024, 6, 10.0)])]
+        columns = host_manager.HostStateColumns(hosts)
+        self.assertEqual([True, True, False, False],
+                         filt_cls.filter_columns(columns, spec_obj))
+        self.assertEqual(12 * 10.0, hosts[1].limits['disk_gb'])
+        self.assertEqual({}, hosts[2].limits)
+        self.assertEqual(
+            [filt_cls.host_passes(host, spec_obj) for host in hosts],
+            filt_cls.hosts_pass(columns, spec_obj))
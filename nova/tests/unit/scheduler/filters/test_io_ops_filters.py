@@ -15,6 +15,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import io_ops_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -60,3 +61,14 @@ class TestIoOpsFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_io_ops_per_host')
+
+    def test_filter_num_iops_columns(self):
+        self.flags(max_io_ops_per_host=8, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                                     {'num_io_ops': num_io_ops})
+                 for x, num_io_ops in enumerate([0, 7, 8, 9])]
+        columns = host_manager.HostStateColumns(hosts)
+        spec_obj = objects.RequestSpec()
+        self.assertEqual([True, True, False, False],
+                         self.filt_cls.filter_columns(columns, spec_obj))
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import num_instances_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -60,3 +61,30 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         agg_mock.return_value = set(['XXX'])
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_instances_per_host')
+
+    def test_filter_num_instances_columns(self):
+        self.flags(max_instances_per_host=5, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                                     {'num_instances': x * 2})
+                 for x in range(4)]
+        columns = host_manager.HostStateColumns(hosts)
+        spec_obj = objects.RequestSpec()
+        self.assertEqual([True, True, True, False],
+                         self.filt_cls.filter_columns(columns, spec_obj))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_filter_num_instances_columns(self, agg_mock):
+        self.flags(max_instances_per_host=4, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                                     {'num_instances': 5})
+                 for x in range(2)]
+        columns = host_manager.HostStateColumns(hosts)
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        agg_mock.side_effect = [set(['6']), set([])]
+        self.assertEqual([True, False],
+                         self.filt_cls.filter_columns(columns, spec_obj))
+        agg_mock.assert_has_calls([
+            mock.call(hosts[0], 'max_instances_per_host'),
+            mock.call(hosts[1], 'max_instances_per_host')])
@@ -14,6 +14,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import ram_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -57,6 +58,24 @@ class TestRamFilter(test.NoDBTestCase):
                  'ram_allocation_ratio': 2.0})
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
 
+    def test_ram_filter_columns(self):
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024))
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                 {'free_ram_mb': free, 'total_usable_ram_mb': total,
+                  'ram_allocation_ratio': ratio})
+                 for x, (free, total, ratio) in enumerate([
+                     (1023, 1024, 1.0), (1024, 1024, 1.0),
+                     (-1024, 2048, 2.0), (512, 512, 2.0)])]
+        columns = host_manager.HostStateColumns(hosts)
+        self.assertEqual([False, True, True, False],
+                         self.filt_cls.filter_columns(columns, spec_obj))
+        self.assertEqual({}, hosts[0].limits)
+        self.assertEqual(2048 * 2.0, hosts[2].limits['memory_mb'])
+        self.assertEqual(
+            [self.filt_cls.host_passes(host, spec_obj) for host in hosts],
+            self.filt_cls.hosts_pass(columns, spec_obj))
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -539,6 +539,188 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertEqual(['host2', 'host1'], ig.hosts)
         self.assertEqual({}, ig.obj_get_changes())
 
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_tries_all_alloc_reqs(self, mock_get_hosts,
+            mock_get_all_states, mock_claim):
+        """Tests that every allocation_request of a host is tried before
+        moving on to the next host.
+        """
+        spec_obj = objects.RequestSpec(
+            num_instances=1,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+
+        host_state = mock.Mock(spec=host_manager.HostState,
+                host="fake_host", nodename="fake_node", uuid=uuids.cn1,
+                cell_uuid=uuids.cell, limits={})
+        all_host_states = [host_state]
+        mock_get_all_states.return_value = all_host_states
+        mock_get_hosts.return_value = all_host_states
+        mock_claim.side_effect = [False, True]
+
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": "fake_cn1_alloc"},
+                        {"allocations": "fake_cn1_shared_alloc"}],
+        }
+        ctx = mock.Mock()
+        selected_hosts = self.driver._schedule(ctx, spec_obj,
+                [uuids.instance], alloc_reqs_by_rp_uuid,
+                mock.sentinel.provider_summaries)
+
+        claim_calls = [
+            mock.call(ctx.elevated.return_value, self.placement_client,
+                    spec_obj, uuids.instance, alloc_req,
+                    allocation_request_version=None)
+            for alloc_req in alloc_reqs_by_rp_uuid[uuids.cn1]
+        ]
+        mock_claim.assert_has_calls(claim_calls)
+        # The selection holds the allocation_request which was claimed
+        expected = objects.Selection.from_host_state(host_state,
+                allocation_request=alloc_reqs_by_rp_uuid[uuids.cn1][1])
+        self.assertEqual([[expected]], selected_hosts)
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.utils.claim_resources_in_batch')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_claim_in_batch(self, mock_get_hosts,
+            mock_get_all_states, mock_claim_batch, mock_claim):
+        self.flags(claim_in_batch=True, group='filter_scheduler')
+        ig = objects.InstanceGroup(hosts=[])
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=ig)
+
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                nodename="node1", limits={}, uuid=uuids.cn1,
+                cell_uuid=uuids.cell1)
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                nodename="node2", limits={}, uuid=uuids.cn2,
+                cell_uuid=uuids.cell2)
+        all_host_states = [hs1, hs2]
+        mock_get_all_states.return_value = all_host_states
+        mock_get_hosts.side_effect = ([hs2, hs1], [hs1, hs2], [hs1, hs2])
+        mock_claim_batch.return_value = {uuids.instance0: True,
+                                         uuids.instance1: True}
+
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": "fake_cn1_alloc"}],
+            uuids.cn2: [{"allocations": "fake_cn2_alloc"}],
+        }
+        instance_uuids = [uuids.instance0, uuids.instance1]
+        ctx = mock.Mock()
+        selected_hosts = self.driver._schedule(ctx, spec_obj, instance_uuids,
+            alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+
+        mock_claim_batch.assert_called_once_with(ctx.elevated.return_value,
+                self.placement_client, spec_obj,
+                {uuids.instance0: alloc_reqs_by_rp_uuid[uuids.cn2][0],
+                 uuids.instance1: alloc_reqs_by_rp_uuid[uuids.cn1][0]},
+                allocation_request_version=None)
+        mock_claim.assert_not_called()
+        self.assertEqual([hs2.host, hs1.host],
+                         [selection[0].service_host
+                          for selection in selected_hosts])
+        self.assertEqual(['host2', 'host1'], ig.hosts)
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.utils.claim_resources_in_batch')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_claim_in_batch_fails(self, mock_get_hosts,
+            mock_get_all_states, mock_claim_batch, mock_claim):
+        """Tests that the instances are claimed one at a time when the batch
+        claim fails, and that the instances which can't be claimed against
+        the host selected in the batch are placed again.
+        """
+        self.flags(claim_in_batch=True, group='filter_scheduler')
+        ig = objects.InstanceGroup(hosts=[])
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=ig)
+
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1',
+                nodename="node1", limits={}, uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, updated='fake')
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
+                nodename="node2", limits={}, uuid=uuids.cn2,
+                cell_uuid=uuids.cell2, updated='fake')
+        all_host_states = [hs1, hs2]
+        mock_get_all_states.return_value = all_host_states
+        mock_get_hosts.side_effect = ([hs2, hs1], [hs2], [hs1], [hs1, hs2])
+        mock_claim_batch.return_value = {uuids.instance0: False,
+                                         uuids.instance1: False}
+        # The first instance is claimed against its selected host, not the
+        # second one, which is then claimed against another host.
+        mock_claim.side_effect = [True, False, True]
+
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": "fake_cn1_alloc"}],
+            uuids.cn2: [{"allocations": "fake_cn2_alloc"}],
+        }
+        instance_uuids = [uuids.instance0, uuids.instance1]
+        ctx = mock.Mock()
+        selected_hosts = self.driver._schedule(ctx, spec_obj, instance_uuids,
+            alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+
+        claim_calls = [
+            mock.call(ctx.elevated.return_value, self.placement_client,
+                    spec_obj, uuids.instance0,
+                    alloc_reqs_by_rp_uuid[uuids.cn2][0],
+                    allocation_request_version=None),
+            mock.call(ctx.elevated.return_value, self.placement_client,
+                    spec_obj, uuids.instance1,
+                    alloc_reqs_by_rp_uuid[uuids.cn2][0],
+                    allocation_request_version=None),
+            mock.call(ctx.elevated.return_value, self.placement_client,
+                    spec_obj, uuids.instance1,
+                    alloc_reqs_by_rp_uuid[uuids.cn1][0],
+                    allocation_request_version=None),
+        ]
+        self.assertEqual(claim_calls, mock_claim.call_args_list)
+        self.assertEqual(['host2', 'host1'],
+                         [selection[0].service_host
+                          for selection in selected_hosts])
+        # The host selected for the second instance in the batch was
+        # released, and is only a member of the group once.
+        hs2.release_from_request.assert_called_once_with(
+            hs2.get_consumable_state.return_value,
+            hs2.get_consumable_state.return_value)
+        hs1.release_from_request.assert_not_called()
+        # The second instance is placed again from the hosts it was first
+        # placed from
+        self.assertEqual(mock.call(spec_obj, [hs2, hs1], 1),
+                         mock_get_hosts.call_args_list[2])
+        self.assertEqual(['host2', 'host1'], ig.hosts)
+        member_counts = scheduler_utils.get_group_member_counts(spec_obj)
+        self.assertEqual(2, len(member_counts))
+        self.assertIn('host2', member_counts)
+
     @mock.patch('random.choice', side_effect=lambda x: x[1])
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
     @mock.patch('nova.scheduler.host_manager.HostManager.get_filtered_hosts')
@@ -564,13 +746,13 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, lazy=True)
 
         # We override random.choice() to pick the **second** element of the
         # returned weighed hosts list, which is the host state #2. This tests
         # the code path that combines the randomly-chosen host with the
         # remaining list of weighed host state objects
-        self.assertEqual([hs2, hs1], results)
+        self.assertEqual([hs2, hs1], list(results))
 
     @mock.patch('random.choice', side_effect=lambda x: x[0])
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -598,11 +780,11 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, lazy=True)
 
         # We should be randomly selecting only from a list of one host state
         mock_rand.assert_called_once_with([hs1])
-        self.assertEqual([hs1, hs2], results)
+        self.assertEqual([hs1, hs2], list(results))
 
     @mock.patch('random.choice', side_effect=lambda x: x[0])
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -630,13 +812,13 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, lazy=True)
 
         # We overrode random.choice() to return the first element in the list,
         # so even though we had a host_subset_size greater than the number of
         # weighed hosts (2), we just random.choice() on the entire set of
         # weighed hosts and thus return [hs1, hs2]
-        self.assertEqual([hs1, hs2], results)
+        self.assertEqual([hs1, hs2], list(results))
 
     @mock.patch('random.shuffle', side_effect=lambda x: x.reverse())
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -668,12 +850,54 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
             mock.sentinel.index)
 
         mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+            mock.sentinel.spec, lazy=True)
 
         # We override random.shuffle() to reverse the list, thus the
         # head of the list should become [host#2, host#1]
         # (as the host_subset_size is 1) and the tail should stay the same.
-        self.assertEqual([hs2, hs1, hs3, hs4], results)
+        self.assertEqual([hs2, hs1, hs3, hs4], list(results))
+
+    @mock.patch('random.shuffle', side_effect=lambda x: x.reverse())
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_filtered_hosts')
+    def test_get_sorted_hosts_shuffle_top_equal_lazy(self, mock_filt,
+            mock_weighed, mock_shuffle):
+        """Tests that all the best weighed hosts are shuffled, and that the
+        other hosts are only taken from the weighed hosts as needed.
+        """
+        self.flags(host_subset_size=1, group='filter_scheduler')
+        self.flags(shuffle_best_same_weighed_hosts=True,
+                   group='filter_scheduler')
+        hs1 = mock.Mock(spec=host_manager.HostState, host='host1')
+        hs2 = mock.Mock(spec=host_manager.HostState, host='host2')
+        hs3 = mock.Mock(spec=host_manager.HostState, host='host3')
+        hs4 = mock.Mock(spec=host_manager.HostState, host='host4')
+        hs5 = mock.Mock(spec=host_manager.HostState, host='host5')
+        all_host_states = [hs1, hs2, hs3, hs4, hs5]
+        taken = []
+
+        def weighed_hosts():
+            for weighed_host in [weights.WeighedHost(hs1, 1.0),
+                                 weights.WeighedHost(hs2, 1.0),
+                                 weights.WeighedHost(hs3, 1.0),
+                                 weights.WeighedHost(hs4, 0.5),
+                                 weights.WeighedHost(hs5, 0.2)]:
+                taken.append(weighed_host.obj)
+                yield weighed_host
+
+        mock_weighed.return_value = weighed_hosts()
+
+        results = self.driver._get_sorted_hosts(mock.sentinel.spec,
+            all_host_states, mock.sentinel.index)
+
+        mock_weighed.assert_called_once_with(mock_filt.return_value,
+            mock.sentinel.spec, lazy=True)
+        # The hosts are taken up to the first one not having the best weight
+        self.assertEqual([hs1, hs2, hs3, hs4], taken)
+        self.assertEqual(hs3, results[0])
+        self.assertEqual([hs1, hs2, hs3, hs4], taken)
+        self.assertEqual([hs3, hs2, hs1, hs4, hs5], list(results))
+        self.assertEqual(all_host_states, taken)
 
     def test_cleanup_allocations(self):
         instance_uuids = []
@@ -150,6 +150,116 @@ class FiltersTestCase(test.NoDBTestCase):
                                                       spec_obj)
         filt2_mock.filter_all.assert_not_called()
 
+    def test_get_filtered_objects_with_columns(self):
+        class FakeColumns(object):
+            def __init__(self, objs):
+                self.objs = list(objs)
+
+            def compress(self, mask):
+                return FakeColumns(obj for obj, passed
+                                   in zip(self.objs, mask) if passed)
+
+        class ColumnFilter(filters.BaseFilter):
+            supports_columns = True
+
+            def filter_columns(self, columns, spec_obj):
+                return [obj != 'obj2' for obj in columns.objs]
+
+        class ObjectFilter(filters.BaseFilter):
+            def _filter_one(self, obj, spec_obj):
+                return obj != 'obj3'
+
+        spec_obj = objects.RequestSpec()
+        column_filter = ColumnFilter()
+        object_filter = ObjectFilter()
+        all_filters = [column_filter, object_filter]
+        objs = ['obj1', 'obj2', 'obj3', 'obj4']
+        with mock.patch.object(column_filter, 'filter_all') as mock_all:
+            result = self.filter_handler.get_filtered_objects(
+                all_filters, objs, spec_obj, columns_cls=FakeColumns)
+            mock_all.assert_not_called()
+        self.assertEqual(['obj1', 'obj4'], result)
+
+        # Without a columnar view, every filter runs one object at a time.
+        with mock.patch.object(column_filter,
+                               'filter_columns') as mock_columns:
+            result = self.filter_handler.get_filtered_objects(
+                [object_filter], objs, spec_obj)
+            mock_columns.assert_not_called()
+        self.assertEqual(['obj1', 'obj2', 'obj4'], result)
+
+    def test_get_filtered_objects_records_stats(self):
+        class FilterA(filters.BaseFilter):
+            def _filter_one(self, obj, spec_obj):
+                return obj != 'obj1'
+
+        class FilterB(filters.BaseFilter):
+            def _filter_one(self, obj, spec_obj):
+                return obj != 'obj2'
+
+        spec_obj = objects.RequestSpec()
+        objs = ['obj1', 'obj2', 'obj3', 'obj4']
+        with mock.patch.object(filters, 'time') as mock_time:
+            mock_time.time.side_effect = [0.0, 0.2, 0.2, 0.5]
+            self.filter_handler.get_filtered_objects(
+                [FilterA(), FilterB()], objs, spec_obj)
+
+        stats = self.filter_handler.get_filter_stats()
+        self.assertEqual({'runs': 1, 'objs_checked': 4, 'objs_rejected': 1,
+                          'rejection_rate': 0.25, 'time_spent': 0.2,
+                          'time_per_obj': 0.05}, stats['FilterA'])
+        self.assertEqual(3, stats['FilterB']['objs_checked'])
+        self.assertEqual(1, stats['FilterB']['objs_rejected'])
+        self.assertAlmostEqual(0.1, stats['FilterB']['time_per_obj'])
+
+    def test_get_filtered_objects_records_timings(self):
+        class FilterA(filters.BaseFilter):
+            def _filter_one(self, obj, spec_obj):
+                return obj != 'obj1'
+
+        spec_obj = objects.RequestSpec()
+        timings = mock.Mock()
+        with mock.patch.object(filters, 'time') as mock_time:
+            mock_time.time.side_effect = [0.0, 0.2]
+            self.filter_handler.get_filtered_objects(
+                [FilterA()], ['obj1', 'obj2'], spec_obj, timings=timings)
+
+        timings.add_filter.assert_called_once_with('FilterA', 2, 1, 0.2)
+
+    def test_get_ordered_filters(self):
+        class FilterA(filters.BaseFilter):
+            pass
+
+        class FilterB(filters.BaseFilter):
+            pass
+
+        class FilterC(filters.BaseFilter):
+            pass
+
+        class FilterD(filters.BaseFilter):
+            pass
+
+        filter_a, filter_b, filter_c, filter_d = (
+            FilterA(), FilterB(), FilterC(), FilterD())
+        all_filters = [filter_a, filter_b, filter_c, filter_d]
+        self.filter_handler.min_objs_checked_for_ordering = 100
+
+        # The configured order is kept until the filters were measured
+        self.assertEqual(all_filters,
+                         self.filter_handler.get_ordered_filters(all_filters))
+
+        stats = self.filter_handler.filter_stats
+        # Expensive and selective
+        stats['FilterA'].record(100, 10, 1.0)
+        # Cheap and selective
+        stats['FilterB'].record(100, 10, 0.01)
+        # Never rejects anything
+        stats['FilterC'].record(100, 100, 0.001)
+        # Cheapest and rejects half of them
+        stats['FilterD'].record(100, 50, 0.001)
+        self.assertEqual([filter_d, filter_b, filter_a, filter_c],
+                         self.filter_handler.get_ordered_filters(all_filters))
+
     def test_get_filtered_objects_none_response(self):
         filter_objs_initial = ['initial', 'filter1', 'objects1']
         spec_obj = objects.RequestSpec()
@@ -22,6 +22,7 @@ import datetime
 
 import mock
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 from oslo_utils import versionutils
 import six
 
@@ -255,6 +256,43 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual({'fake-host': set([])},
                          self.host_manager.host_aggregates_map)
 
+    def test_update_aggregates_updates_aggregate_index(self):
+        fake_agg = objects.Aggregate(id=1, hosts=['host1', 'host2'],
+                                     metadata={'foo': 'bar, baz'})
+        self.host_manager.update_aggregates([fake_agg])
+        index = self.host_manager.aggregate_index
+        self.assertEqual({'host1', 'host2'}, index.get_hosts('foo', 'baz'))
+        self.assertEqual({'host1': {'bar, baz'}, 'host2': {'bar, baz'}},
+                         index.get_values_by_host('foo'))
+        # Let's remove a host and change the metadata of the aggregate
+        fake_agg = objects.Aggregate(id=1, hosts=['host2'],
+                                     metadata={'foo': 'qux'})
+        self.host_manager.update_aggregates([fake_agg])
+        self.assertEqual(set(), index.get_hosts('foo', 'bar'))
+        self.assertEqual({'host2'}, index.get_hosts('foo', 'qux'))
+        self.assertEqual({'host2'}, index.get_hosts_with_key('foo'))
+        self.assertEqual(['qux'], index.get_values('foo'))
+
+    def test_delete_aggregate_updates_aggregate_index(self):
+        agg1 = objects.Aggregate(id=1, hosts=['host1', 'host2'],
+                                 metadata={'foo': 'bar'})
+        agg2 = objects.Aggregate(id=2, hosts=['host2'],
+                                 metadata={'foo': 'bar'})
+        self.host_manager.update_aggregates([agg1, agg2])
+        self.host_manager.delete_aggregate(agg1)
+        index = self.host_manager.aggregate_index
+        # host2 is still in an aggregate with the metadata
+        self.assertEqual({'host2'}, index.get_hosts('foo', 'bar'))
+        self.host_manager.delete_aggregate(agg2)
+        self.assertEqual([], index.keys())
+        self.assertEqual(set(), index.get_hosts_with_key('foo'))
+
+    def test_choose_host_filters_sets_aggregate_index(self):
+        host_filters = self.host_manager._choose_host_filters(
+            ['FakeFilterClass2'])
+        self.assertIs(self.host_manager.aggregate_index,
+                      host_filters[0].aggregate_index)
+
     def test_choose_host_filters_not_found(self):
         self.assertRaises(exception.SchedulerHostFilterNotFound,
                           self.host_manager._choose_host_filters,
@@ -301,6 +339,50 @@ class HostManagerTestCase(test.NoDBTestCase):
                 fake_properties)
         self._verify_result(info, result)
 
+    @mock.patch('nova.filters.BaseFilterHandler.get_filtered_objects')
+    def test_get_filtered_hosts_with_columnar_host_states(self,
+                                                          mock_filtered):
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=[],
+                                              force_nodes=[])
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             fake_properties)
+        mock_filtered.assert_called_once_with(
+            self.host_manager.enabled_filters, self.fake_hosts,
+            fake_properties, 0, columns_cls=None, timings=None)
+
+        mock_filtered.reset_mock()
+        self.flags(columnar_host_states=True, group='filter_scheduler')
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             fake_properties)
+        mock_filtered.assert_called_once_with(
+            self.host_manager.enabled_filters, self.fake_hosts,
+            fake_properties, 0, columns_cls=host_manager.HostStateColumns,
+            timings=None)
+
+    @mock.patch('nova.filters.BaseFilterHandler.get_filtered_objects')
+    @mock.patch('nova.filters.BaseFilterHandler.get_ordered_filters')
+    def test_get_filtered_hosts_with_adaptive_filter_order(self,
+            mock_ordered, mock_filtered):
+        fake_properties = objects.RequestSpec(ignore_hosts=[],
+                                              instance_uuid=uuids.instance,
+                                              force_hosts=[],
+                                              force_nodes=[])
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             fake_properties)
+        mock_ordered.assert_not_called()
+
+        mock_filtered.reset_mock()
+        self.flags(adaptive_filter_order=True, group='filter_scheduler')
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             fake_properties)
+        mock_ordered.assert_called_once_with(
+            self.host_manager.enabled_filters)
+        mock_filtered.assert_called_once_with(
+            mock_ordered.return_value, self.fake_hosts, fake_properties, 0,
+            columns_cls=None, timings=None)
+
     def test_get_filtered_hosts_with_requested_destination(self):
         dest = objects.Destination(host='fake_host1', node='fake-node')
         fake_properties = objects.RequestSpec(requested_destination=dest,
@@ -1038,6 +1120,97 @@ class HostManagerTestCase(test.NoDBTestCase):
         mock_sl.assert_called_once_with(mock.sentinel.cctxt, 'nova-compute',
                                         include_disabled=True)
 
+    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_computes_for_cells_cached(self, mock_sl, mock_cn,
+                                           mock_changed, mock_target):
+        self.flags(cache_host_states=True, compute_node_poll_overlap=10,
+                   group='filter_scheduler')
+        cell = objects.CellMapping(uuid=uuids.cell1,
+                                   database_connection='none://1',
+                                   transport_url='none://')
+        mock_sl.return_value = [objects.Service(host='foo'),
+                                objects.Service(host='bar')]
+        cn1 = objects.ComputeNode(uuid=uuids.cn1, host='foo',
+                                  hypervisor_hostname='foo', deleted=False)
+        cn2 = objects.ComputeNode(uuid=uuids.cn2, host='bar',
+                                  hypervisor_hostname='bar', deleted=False)
+        mock_cn.return_value = [cn1, cn2]
+
+        @contextlib.contextmanager
+        def fake_set_target(context, cell):
+            yield mock.sentinel.cctxt
+
+        mock_target.side_effect = fake_set_target
+
+        context = nova_context.RequestContext('fake', 'fake')
+        now = timeutils.utcnow()
+        with mock.patch('oslo_utils.timeutils.utcnow', return_value=now):
+            cns, srv = self.host_manager._get_computes_for_cells(
+                context, [cell])
+        self.assertEqual([cn1, cn2], cns[uuids.cell1])
+        mock_cn.assert_called_once_with(mock.sentinel.cctxt)
+        mock_changed.assert_not_called()
+
+        # Only the compute nodes changed since the previous poll are loaded
+        # from now on, and the deleted ones are dropped from the cache.
+        new_cn1 = objects.ComputeNode(uuid=uuids.cn1, host='foo',
+                                      hypervisor_hostname='foo',
+                                      deleted=False)
+        deleted_cn2 = objects.ComputeNode(uuid=uuids.cn2, host='bar',
+                                          hypervisor_hostname='bar',
+                                          deleted=True)
+        mock_changed.return_value = [new_cn1, deleted_cn2]
+        cns, srv = self.host_manager._get_computes_for_cells(
+            context, [cell], compute_uuids=[uuids.cn1, uuids.cn2])
+        self.assertEqual([new_cn1], cns[uuids.cell1])
+        self.assertEqual(1, mock_cn.call_count)
+        mock_changed.assert_called_once_with(
+            mock.sentinel.cctxt, now - datetime.timedelta(seconds=10))
+        self.assertEqual(2, mock_sl.call_count)
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_get_all_host_states_cached(self, mock_get_by_host, mock_get_all,
+                                        mock_get_by_binary):
+        self.flags(cache_host_states=True, group='filter_scheduler')
+        mock_get_by_host.return_value = objects.InstanceList()
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = 'fake_context'
+
+        host_states = {(state.host, state.nodename): state for state in
+                       self.host_manager.get_all_host_states(context)}
+        host_state = host_states['host1', 'node1']
+        free_ram_mb = host_state.free_ram_mb
+        host_state.limits['memory_mb'] = 1024
+        host_state.consume_from_request(objects.RequestSpec(
+            numa_topology=None, pci_requests=None,
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=512,
+                                  vcpus=1)))
+        with mock.patch.object(objects.ComputeNodeList,
+                               'get_all_changed_since', return_value=[]):
+            new_host_states = {
+                (state.host, state.nodename): state for state in
+                self.host_manager.get_all_host_states(context)}
+
+        # The host states are kept across requests, but each request gets its
+        # own copies, with the limits and consumption of no other request
+        new_host_state = new_host_states['host1', 'node1']
+        cached_host_state = self.host_manager._host_state_map['host1',
+                                                              'node1']
+        self.assertIsNot(host_state, new_host_state)
+        self.assertIsNot(cached_host_state, new_host_state)
+        self.assertEqual({}, cached_host_state.limits)
+        self.assertEqual(free_ram_mb, cached_host_state.free_ram_mb)
+        self.assertEqual({}, new_host_state.limits)
+        self.assertEqual(free_ram_mb, new_host_state.free_ram_mb)
+        self.assertEqual(free_ram_mb - 512, host_state.free_ram_mb)
+        self.assertEqual(1, mock_get_all.call_count)
+
 
 class HostManagerChangedNodesTestCase(test.NoDBTestCase):
     """Test case for HostManager class."""
@@ -1153,6 +1326,40 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(0, num_hosts2)
 
 
+class HostStateColumnsTestCase(test.NoDBTestCase):
+    """Test case for HostStateColumns class."""
+
+    def test_columns(self):
+        hosts = [fakes.FakeHostState('host1', 'node1',
+                                     {'free_ram_mb': 512, 'num_io_ops': 2}),
+                 fakes.FakeHostState('host2', 'node2',
+                                     {'free_ram_mb': 1024, 'num_io_ops': 0})]
+        columns = host_manager.HostStateColumns(hosts)
+        self.assertEqual(2, len(columns))
+        self.assertEqual(hosts, columns.objs)
+        self.assertEqual([512, 1024], columns.free_ram_mb)
+        self.assertEqual([2, 0], columns.num_io_ops)
+        self.assertEqual([0, 0], columns.vcpus_used)
+
+    def test_columns_empty(self):
+        columns = host_manager.HostStateColumns([])
+        self.assertEqual(0, len(columns))
+        for field in host_manager.HostStateColumns.FIELDS:
+            self.assertEqual([], getattr(columns, field))
+
+    def test_compress(self):
+        hosts = [fakes.FakeHostState('host%d' % x, 'node%d' % x,
+                                     {'free_ram_mb': x * 512})
+                 for x in range(4)]
+        columns = host_manager.HostStateColumns(hosts)
+        compressed = columns.compress(iter([True, False, False, True]))
+        self.assertEqual([hosts[0], hosts[3]], compressed.objs)
+        self.assertEqual([0, 1536], compressed.free_ram_mb)
+        self.assertEqual([0, 0], compressed.num_instances)
+        # The original view is left untouched.
+        self.assertEqual(4, len(columns))
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
@@ -1375,6 +1582,78 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual(0, len(host.pci_stats.pools))
         self.assertIsNotNone(host.updated)
 
+    def test_release_from_request_pci(self):
+        inst_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell(cpuset=set([0]), memory=512,
+                                            id=0)])
+        fake_requests_obj = objects.InstancePCIRequests(
+            requests=[objects.InstancePCIRequest(
+                request_id=uuids.request_id, count=1,
+                spec=[{'vendor_id': '8086'}])],
+            instance_uuid=uuids.instance)
+        req_spec = objects.RequestSpec(
+            instance_uuid=uuids.instance,
+            project_id='12345',
+            numa_topology=inst_topology,
+            pci_requests=fake_requests_obj,
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=512,
+                                  vcpus=1))
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.free_ram_mb = 2048
+        host.pci_stats = pci_stats.PciDeviceStats(
+            [objects.PciDevicePool(vendor_id='8086', product_id='15ed',
+                                   numa_node=1, count=1)])
+        host.numa_topology = fakes.NUMA_TOPOLOGY
+        before = host.get_consumable_state()
+        host.consume_from_request(req_spec)
+        after = host.get_consumable_state()
+        self.assertEqual(0, len(host.pci_stats.pools))
+
+        host.release_from_request(before, after)
+        self.assertEqual(2048, host.free_ram_mb)
+        self.assertEqual(0, host.vcpus_used)
+        self.assertEqual(0, host.num_instances)
+        self.assertEqual(0, host.num_io_ops)
+        self.assertIs(fakes.NUMA_TOPOLOGY, host.numa_topology)
+        self.assertEqual(1, len(host.pci_stats.pools))
+        self.assertIsNone(host.updated)
+
+    def test_release_from_request_consumed_since(self):
+        req_spec = objects.RequestSpec(
+            instance_uuid=uuids.instance,
+            project_id='12345',
+            numa_topology=None,
+            pci_requests=objects.InstancePCIRequests(requests=[]),
+            flavor=objects.Flavor(root_gb=1, ephemeral_gb=0, memory_mb=512,
+                                  vcpus=1))
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.free_ram_mb = 2048
+        host.free_disk_mb = 4096
+        host.pci_stats = pci_stats.PciDeviceStats()
+        before = host.get_consumable_state()
+        host.consume_from_request(req_spec)
+        after = host.get_consumable_state()
+        # Another request consumes from the host before the release
+        host.consume_from_request(req_spec)
+        updated = host.updated
+
+        host.release_from_request(before, after)
+        self.assertEqual(1536, host.free_ram_mb)
+        self.assertEqual(3072, host.free_disk_mb)
+        self.assertEqual(1, host.vcpus_used)
+        self.assertEqual(1, host.num_instances)
+        self.assertEqual(1, host.num_io_ops)
+        self.assertEqual(updated, host.updated)
+
+        # The NUMA usage can't be released if it changed since
+        before = host.get_consumable_state()
+        host.consume_from_request(req_spec)
+        after = host.get_consumable_state()
+        host.numa_topology = mock.sentinel.numa_topology
+        host.release_from_request(before, after)
+        self.assertEqual(1536, host.free_ram_mb)
+        self.assertIsNone(host.updated)
+
     def test_stat_consumption_from_instance_with_pci_exception(self):
         fake_requests = [{'request_id': uuids.request_id, 'count': 3,
                           'spec': [{'vendor_id': '8086'}]}]
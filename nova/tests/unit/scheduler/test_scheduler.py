@@ -21,6 +21,7 @@ import mock
 import oslo_messaging as messaging
 
 from nova import context
+from nova import exception
 from nova import objects
 from nova.scheduler import caching_scheduler
 from nova.scheduler import chance
@@ -28,6 +29,7 @@ from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
 from nova.scheduler import ironic_host_manager
 from nova.scheduler import manager
+from nova.scheduler import utils as scheduler_utils
 from nova import servicegroup
 from nova import test
 from nova.tests.unit import fake_server_actions
@@ -228,6 +230,36 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
         place_res = ([], {}, None)
         self._test_select_destination(place_res)
 
+    @mock.patch('nova.scheduler.utils.resources_from_request_spec')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_allocation_candidates')
+    def test_select_destination_records_timings(self, mock_get_ac,
+                                                mock_rfrs):
+        self.flags(record_request_timings=True, group='filter_scheduler')
+        fake_spec = objects.RequestSpec()
+        fake_spec.instance_uuid = uuids.instance
+        mock_get_ac.return_value = (fakes.ALLOC_REQS, mock.sentinel.p_sums,
+                                    "9.42")
+        hook = mock.Mock()
+        scheduler_utils.register_timings_hook(hook)
+        self.addCleanup(scheduler_utils.unregister_timings_hook, hook)
+
+        def fake_select_destinations(context, spec_obj, *args):
+            self.assertIsNotNone(
+                scheduler_utils.get_request_timings(spec_obj))
+            raise exception.NoValidHost(reason="")
+
+        with mock.patch.object(self.manager.driver, 'select_destinations',
+                               side_effect=fake_select_destinations):
+            self.assertRaises(messaging.rpc.dispatcher.ExpectedException,
+                              self.manager.select_destinations, self.context,
+                              spec_obj=fake_spec,
+                              instance_uuids=[fake_spec.instance_uuid])
+
+        hook.assert_called_once_with(fake_spec, mock.ANY)
+        self.assertIn('placement', hook.call_args[0][1]['phases'])
+        self.assertIsNone(scheduler_utils.get_request_timings(fake_spec))
+
     @mock.patch('nova.scheduler.utils.resources_from_request_spec')
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 'get_allocation_candidates')
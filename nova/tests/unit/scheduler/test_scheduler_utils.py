@@ -27,6 +27,7 @@ from nova.scheduler import utils as scheduler_utils
 from nova import test
 from nova.tests.unit import fake_instance
 from nova.tests.unit.objects import test_flavor
+from nova.tests.unit.scheduler import fakes
 from nova.tests import uuidsentinel as uuids
 
 
@@ -407,3 +408,116 @@ class SchedulerUtilsTestCase(test.NoDBTestCase):
         self.assertRaises(exception.NoValidHost,
                           scheduler_utils.setup_instance_group,
                           self.context, spec)
+
+    def test_get_group_member_counts_no_group(self):
+        spec = objects.RequestSpec(instance_group=None)
+        self.assertIsNone(scheduler_utils.get_group_member_counts(spec))
+
+    def test_get_group_member_counts(self):
+        spec = objects.RequestSpec(instance_group=objects.InstanceGroup(
+            hosts=['host1', 'host2'], members=['member1', 'member2']))
+        member_counts = scheduler_utils.get_group_member_counts(spec)
+        host1 = fakes.FakeHostState('host1', 'node1', {'instances': {
+            'member1': mock.sentinel, 'member2': mock.sentinel,
+            'instance1': mock.sentinel}})
+        host3 = fakes.FakeHostState('host3', 'node3', {})
+
+        self.assertIs(member_counts,
+                      scheduler_utils.get_group_member_counts(spec))
+        self.assertEqual(2, len(member_counts))
+        self.assertIn('host1', member_counts)
+        self.assertNotIn('host3', member_counts)
+        self.assertEqual(2, member_counts.count(host1))
+        self.assertEqual(0, member_counts.count(host3))
+
+        member_counts.add('host3')
+        member_counts.add('host3')
+        self.assertIn('host3', member_counts)
+        self.assertEqual(2, member_counts.count(host3))
+        member_counts.remove('host3')
+        self.assertIn('host3', member_counts)
+        self.assertEqual(1, member_counts.count(host3))
+        member_counts.remove('host3')
+        self.assertNotIn('host3', member_counts)
+        self.assertEqual(0, member_counts.count(host3))
+
+    def test_get_group_member_counts_hosts_replaced(self):
+        spec = objects.RequestSpec(instance_group=objects.InstanceGroup(
+            hosts=['host1'], members=[]))
+        member_counts = scheduler_utils.get_group_member_counts(spec)
+        member_counts.add('host2')
+        spec.instance_group.hosts.append('host2')
+        self.assertIn('host2', member_counts)
+
+        spec.instance_group.hosts = ['host3']
+
+        self.assertNotIn('host1', member_counts)
+        self.assertNotIn('host2', member_counts)
+        self.assertIn('host3', member_counts)
+        self.assertEqual(0, member_counts.count(
+            fakes.FakeHostState('host2', 'node2', {})))
+
+    def test_lazy_list(self):
+        taken = []
+
+        def items():
+            for item in range(5):
+                taken.append(item)
+                yield item
+
+        lazy_list = scheduler_utils.LazyList(items())
+        self.assertTrue(lazy_list)
+        self.assertEqual([0], taken)
+        self.assertEqual(2, lazy_list[2])
+        self.assertEqual([0, 1], lazy_list[:2])
+        self.assertEqual([0, 1, 2], taken)
+        self.assertIn(3, lazy_list)
+        self.assertEqual([0, 1, 2, 3], taken)
+        self.assertEqual([0, 1, 2, 3, 4], list(lazy_list))
+        self.assertEqual(5, len(lazy_list))
+        self.assertEqual(4, lazy_list[-1])
+        self.assertFalse(scheduler_utils.LazyList([]))
+
+    def test_request_timings_not_recorded(self):
+        spec = objects.RequestSpec()
+        scheduler_utils.start_request_timings(spec)
+        self.assertIsNone(scheduler_utils.get_request_timings(spec))
+        self.assertIsNone(scheduler_utils.get_request_timings({}))
+        with scheduler_utils.measure_phase(spec, 'filtering'):
+            pass
+        hook = mock.Mock()
+        scheduler_utils.register_timings_hook(hook)
+        self.addCleanup(scheduler_utils.unregister_timings_hook, hook)
+        scheduler_utils.finish_request_timings(spec)
+        hook.assert_not_called()
+
+    @mock.patch.object(scheduler_utils, 'time')
+    def test_request_timings(self, mock_time):
+        self.flags(record_request_timings=True, group='filter_scheduler')
+        mock_time.time.side_effect = [0.0, 1.0, 1.5, 2.0, 2.5, 3.0]
+        spec = objects.RequestSpec()
+        hook = mock.Mock(side_effect=[test.TestingException, None])
+        scheduler_utils.register_timings_hook(hook)
+        self.addCleanup(scheduler_utils.unregister_timings_hook, hook)
+        other_hook = mock.Mock()
+        scheduler_utils.register_timings_hook(other_hook)
+        self.addCleanup(scheduler_utils.unregister_timings_hook, other_hook)
+
+        scheduler_utils.start_request_timings(spec)
+        timings = scheduler_utils.get_request_timings(spec)
+        self.assertIsNotNone(timings)
+        with scheduler_utils.measure_phase(spec, 'filtering'):
+            timings.add_filter('RamFilter', 10, 4, 0.25)
+        with scheduler_utils.measure_phase(spec, 'filtering'):
+            timings.add_weigher('RAMWeigher', 0.125)
+        scheduler_utils.finish_request_timings(spec)
+
+        expected = {'total': 3.0,
+                    'phases': {'filtering': 1.0},
+                    'filters': [{'name': 'RamFilter', 'hosts_in': 10,
+                                 'hosts_out': 4, 'time': 0.25}],
+                    'weighers': {'RAMWeigher': 0.125}}
+        # A failing hook doesn't prevent the next ones from being called
+        hook.assert_called_once_with(spec, expected)
+        other_hook.assert_called_once_with(spec, expected)
+        self.assertIsNone(scheduler_utils.get_request_timings(spec))
@@ -629,3 +629,34 @@ class TestUtils(test.NoDBTestCase):
         self.assertTrue(res)
         mock_is_rebuild.assert_called_once_with(mock.sentinel.spec_obj)
         self.assertFalse(mock_client.claim_resources.called)
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient')
+    def test_claim_resources_in_batch(self, mock_client):
+        ctx = mock.Mock(user_id=uuids.user_id)
+        spec_obj = mock.Mock(project_id=uuids.project_id)
+        alloc_reqs = {uuids.instance1: mock.sentinel.alloc_req1,
+                      uuids.instance2: mock.sentinel.alloc_req2}
+        mock_client.claim_resources_in_batch.return_value = True
+
+        res = utils.claim_resources_in_batch(ctx, mock_client, spec_obj,
+                alloc_reqs, allocation_request_version='1.12')
+
+        mock_client.claim_resources_in_batch.assert_called_once_with(
+            ctx, alloc_reqs, uuids.project_id, uuids.user_id,
+            allocation_request_version='1.12')
+        self.assertEqual({uuids.instance1: True, uuids.instance2: True}, res)
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient')
+    def test_claim_resources_in_batch_fails(self, mock_client):
+        ctx = mock.Mock(user_id=uuids.user_id)
+        spec_obj = mock.Mock(project_id=uuids.project_id)
+        alloc_reqs = {uuids.instance1: mock.sentinel.alloc_req1,
+                      uuids.instance2: mock.sentinel.alloc_req2}
+        # safe_connect returns None when placement can't be reached
+        mock_client.claim_resources_in_batch.return_value = None
+
+        res = utils.claim_resources_in_batch(ctx, mock_client, spec_obj,
+                alloc_reqs)
+
+        self.assertEqual({uuids.instance1: False, uuids.instance2: False},
+                         res)
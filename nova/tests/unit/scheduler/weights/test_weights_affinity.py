@@ -16,6 +16,7 @@
 import mock
 
 from nova import objects
+from nova.scheduler import utils
 from nova.scheduler import weights
 from nova.scheduler.weights import affinity
 from nova import test
@@ -129,6 +130,23 @@ class SoftAntiAffinityWeigherTestCase(SoftWeigherTestBase):
                       expected_weight=1.0,
                       expected_host='host3')
 
+    def test_soft_anti_affinity_counts_placed_instances(self):
+        request_spec = objects.RequestSpec(
+            instance_group=objects.InstanceGroup(
+                policies=['soft-anti-affinity'], hosts=['host4'],
+                members=['member1', 'member2', 'member3', 'member4',
+                         'member5', 'member6', 'member7']))
+        # Two instances of the request were already placed on host3.
+        member_counts = utils.get_group_member_counts(request_spec)
+        member_counts.add('host3')
+        member_counts.add('host3')
+
+        weighed_host = self.weight_handler.get_weighed_objects(
+            self.weighers, self._get_all_hosts(), request_spec)[0]
+
+        self.assertEqual(1.0, weighed_host.weight)
+        self.assertEqual('host1', weighed_host.obj.host)
+
     def test_soft_anti_affinity_weight_multiplier_zero_value(self):
         # We do not know the host, all have same weight.
         self.flags(soft_anti_affinity_weight_multiplier=0.0,
@@ -2382,6 +2382,64 @@ class CellV2CommandsTestCase(test.NoDBTestCase):
             node.save.assert_called_once_with()
 
 
+@mock.patch('nova.api.openstack.placement.objects.resource_provider.'
+            'sync_usages')
+class PlacementCommandsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(PlacementCommandsTestCase, self).setUp()
+        self.output = StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
+        self.commands = manage.PlacementCommands()
+
+    def test_sync_usages(self, mock_sync):
+        mock_sync.return_value = [(1, 0, None, 2)]
+        self.assertEqual(0, self.commands.sync_usages())
+        mock_sync.assert_called_once_with(
+            test.MatchType(context.RequestContext), verify=False)
+        self.assertIn('1 usage(s) fixed.', self.output.getvalue())
+
+    def test_sync_usages_verify(self, mock_sync):
+        mock_sync.return_value = []
+        self.assertEqual(0, self.commands.sync_usages(verify=True))
+        mock_sync.assert_called_once_with(
+            test.MatchType(context.RequestContext), verify=True)
+        self.assertIn('in sync', self.output.getvalue())
+
+    def test_sync_usages_verify_mismatch(self, mock_sync):
+        mock_sync.return_value = [(1, 0, 3, 2)]
+        self.assertEqual(1, self.commands.sync_usages(verify=True))
+        self.assertIn('1 usage(s) differ', self.output.getvalue())
+
+    @mock.patch('nova.api.openstack.placement.objects.resource_provider.'
+                'sync_provider_trees')
+    def test_sync_provider_trees(self, mock_sync_trees, mock_sync):
+        mock_sync_trees.return_value = [(1, 0, None, None, 8, 2)]
+        self.assertEqual(0, self.commands.sync_provider_trees())
+        mock_sync_trees.assert_called_once_with(
+            test.MatchType(context.RequestContext), verify=False)
+        self.assertIn('1 provider tree inventory(ies) fixed.',
+                      self.output.getvalue())
+        mock_sync.assert_not_called()
+
+    @mock.patch('nova.api.openstack.placement.objects.resource_provider.'
+                'sync_provider_trees')
+    def test_sync_provider_trees_verify(self, mock_sync_trees, mock_sync):
+        mock_sync_trees.return_value = []
+        self.assertEqual(0, self.commands.sync_provider_trees(verify=True))
+        mock_sync_trees.assert_called_once_with(
+            test.MatchType(context.RequestContext), verify=True)
+        self.assertIn('in sync', self.output.getvalue())
+
+    @mock.patch('nova.api.openstack.placement.objects.resource_provider.'
+                'sync_provider_trees')
+    def test_sync_provider_trees_verify_mismatch(self, mock_sync_trees,
+                                                 mock_sync):
+        mock_sync_trees.return_value = [(1, 0, 8, 3, 8, 2)]
+        self.assertEqual(1, self.commands.sync_provider_trees(verify=True))
+        self.assertIn('1 provider tree inventory(ies) differ',
+                      self.output.getvalue())
+
+
 class TestNovaManageMain(test.NoDBTestCase):
     """Tests the nova-manage:main() setup code."""
 
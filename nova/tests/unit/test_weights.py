@@ -18,6 +18,7 @@ Tests For weights.
 
 import mock
 
+from nova.scheduler import host_manager
 from nova.scheduler import weights as scheduler_weights
 from nova.scheduler.weights import ram
 from nova import test
@@ -72,3 +73,71 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    def test_weigh_columns_records_min_max(self):
+        class FakeWeigher(weights.BaseWeigher):
+            supports_columns = True
+            minval = 0
+
+            def _weigh_object(self, obj, weight_properties):
+                return obj.free_ram_mb
+
+            def _weigh_columns(self, columns, weight_properties):
+                return columns.free_ram_mb
+
+        weigher = FakeWeigher()
+        columns = mock.Mock(free_ram_mb=[512, -128, 2048])
+        self.assertEqual([512, -128, 2048],
+                         weigher.weigh_columns(columns, {}))
+        self.assertEqual(-128, weigher.minval)
+        self.assertEqual(2048, weigher.maxval)
+
+    def test_get_weighed_objects_with_columns(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512}),
+            ('host2', 'node2', {'free_ram_mb': 8192}),
+            ('host3', 'node3', {'free_ram_mb': 1024}),
+        ]
+        hostinfo = [fakes.FakeHostState(host, node, values)
+                    for host, node, values in host_values]
+
+        weight_handler = scheduler_weights.HostWeightHandler()
+        expected = weight_handler.get_weighed_objects([ram.RAMWeigher()],
+                                                      hostinfo, {})
+        with mock.patch('nova.weights.BaseWeigher.weigh_objects') as mock_w:
+            weighed = weight_handler.get_weighed_objects(
+                [ram.RAMWeigher()], hostinfo, {},
+                columns_cls=host_manager.HostStateColumns)
+            mock_w.assert_not_called()
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in weighed])
+
+    def test_get_weighed_objects_records_timings(self):
+        hostinfo = [fakes.FakeHostState('host1', 'node1',
+                                        {'free_ram_mb': 512}),
+                    fakes.FakeHostState('host2', 'node2',
+                                        {'free_ram_mb': 1024})]
+        timings = mock.Mock()
+        with mock.patch.object(weights, 'time') as mock_time:
+            mock_time.time.side_effect = [1.0, 1.5]
+            scheduler_weights.HostWeightHandler().get_weighed_objects(
+                [ram.RAMWeigher()], hostinfo, {}, timings=timings)
+
+        timings.add_weigher.assert_called_once_with('RAMWeigher', 0.5)
+
+    def test_get_weighed_objects_lazy(self):
+        hostinfo = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                        {'free_ram_mb': free_ram_mb})
+                    for i, free_ram_mb in enumerate([512, 4096, 1024, 4096,
+                                                     2048, 256])]
+        weight_handler = scheduler_weights.HostWeightHandler()
+        expected = weight_handler.get_weighed_objects([ram.RAMWeigher()],
+                                                      hostinfo, {})
+
+        weighed = weight_handler.get_weighed_objects([ram.RAMWeigher()],
+                                                     hostinfo, {}, lazy=True)
+
+        # The hosts come in the same order as when sorting all of them,
+        # including those with the same weight
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in weighed])
@@ -553,6 +553,31 @@ class IronicDriverTestCase(test.NoDBTestCase):
         expected = [n.instance_uuid for n in nodes]
         self.assertEqual(sorted(expected), sorted(uuids))
 
+    @mock.patch.object(cw.IronicClientWrapper, 'call')
+    def test_get_power_states(self, mock_call):
+        instance_uuids = [uuidutils.generate_uuid() for i in range(3)]
+        mock_call.return_value = [
+            ironic_utils.get_test_node(instance_uuid=instance_uuids[0],
+                                       power_state=ironic_states.POWER_ON),
+            ironic_utils.get_test_node(instance_uuid=instance_uuids[1],
+                                       power_state=ironic_states.POWER_OFF)]
+        instances = [fake_instance.fake_instance_obj(self.ctx, uuid=uuid)
+                     for uuid in instance_uuids]
+
+        self.assertEqual({instance_uuids[0]: nova_states.RUNNING,
+                          instance_uuids[1]: nova_states.SHUTDOWN,
+                          instance_uuids[2]: nova_states.NOSTATE},
+                         self.driver.get_power_states(instances))
+        mock_call.assert_called_once_with(
+            'node.list', associated=True, limit=0,
+            fields=('uuid', 'instance_uuid', 'power_state'))
+
+    @mock.patch.object(cw.IronicClientWrapper, 'call')
+    def test_get_power_states_fail(self, mock_call):
+        mock_call.side_effect = exception.NovaException
+        self.assertRaises(exception.VirtDriverNotReady,
+                          self.driver.get_power_states, [])
+
     @mock.patch.object(FAKE_CLIENT.node, 'list')
     @mock.patch.object(FAKE_CLIENT.node, 'get')
     @mock.patch.object(objects.InstanceList, 'get_uuids_by_host')
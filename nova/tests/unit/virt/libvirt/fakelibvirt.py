@@ -149,6 +149,11 @@ VIR_DOMAIN_BLOCK_REBASE_RELATIVE = 8
 VIR_CONNECT_LIST_DOMAINS_ACTIVE = 1
 VIR_CONNECT_LIST_DOMAINS_INACTIVE = 2
 
+VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE = 1
+VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE = 2
+
+VIR_DOMAIN_STATS_STATE = 1
+
 # secret type
 VIR_SECRET_USAGE_TYPE_NONE = 0
 VIR_SECRET_USAGE_TYPE_VOLUME = 1
@@ -1083,6 +1088,21 @@ class Connection(object):
                     vms.append(vm)
         return vms
 
+    def getAllDomainStats(self, stats, flags=0):
+        all_stats = []
+        for vm in self._vms.values():
+            if vm._state == VIR_DOMAIN_SHUTOFF:
+                if not flags & VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE:
+                    continue
+            elif not flags & VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE:
+                continue
+            vm_stats = {}
+            if stats & VIR_DOMAIN_STATS_STATE:
+                vm_stats['state.state'] = vm._state
+                vm_stats['state.reason'] = 0
+            all_stats.append((vm, vm_stats))
+        return all_stats
+
     def _emit_lifecycle(self, dom, event, detail):
         if VIR_DOMAIN_EVENT_ID_LIFECYCLE not in self._event_callbacks:
             return
@@ -6814,6 +6814,25 @@ class LibvirtConnTestCase(test.NoDBTestCase,
         self.assertEqual(uuids[3], vm4.UUIDString())
         mock_list.assert_called_with(only_guests=True, only_running=False)
 
+    @mock.patch.object(host.Host, 'get_instance_domain_states')
+    def test_get_power_states(self, mock_states):
+        mock_states.return_value = {
+            uuids.running: fakelibvirt.VIR_DOMAIN_RUNNING,
+            uuids.paused: fakelibvirt.VIR_DOMAIN_PAUSED,
+            uuids.shutoff: fakelibvirt.VIR_DOMAIN_SHUTOFF,
+            uuids.other: fakelibvirt.VIR_DOMAIN_RUNNING}
+        instances = [objects.Instance(uuid=uuid)
+                     for uuid in (uuids.running, uuids.paused,
+                                  uuids.shutoff, uuids.missing)]
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertEqual({uuids.running: power_state.RUNNING,
+                          uuids.paused: power_state.PAUSED,
+                          uuids.shutoff: power_state.SHUTDOWN,
+                          uuids.missing: power_state.NOSTATE},
+                         drvr.get_power_states(instances))
+        mock_states.assert_called_once_with()
+
     @mock.patch('nova.virt.libvirt.host.Host.get_online_cpus',
                 return_value=None)
     @mock.patch('nova.virt.libvirt.host.Host.get_cpu_count',
@@ -493,6 +493,24 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(doms[1].name(), vm1.name())
         self.assertEqual(doms[2].name(), vm2.name())
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_instance_domain_states(self, mock_stats):
+        vm0 = FakeVirtDomain(id=0, name="Domain-0")  # Xen dom-0
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_stats.return_value = [
+            (vm0, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm2, {'state.state': fakelibvirt.VIR_DOMAIN_SHUTOFF})]
+
+        self.assertEqual({vm1.UUIDString(): fakelibvirt.VIR_DOMAIN_RUNNING,
+                          vm2.UUIDString(): fakelibvirt.VIR_DOMAIN_SHUTOFF},
+                         self.host.get_instance_domain_states())
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE,
+            fakelibvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE |
+            fakelibvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE)
+
     @mock.patch.object(host.Host, "list_instance_domains")
     def test_list_guests(self, mock_list_domains):
         dom0 = mock.Mock(spec=fakelibvirt.virDomain)
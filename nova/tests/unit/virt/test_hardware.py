@@ -1807,6 +1807,59 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
         self.assertIsInstance(instance_topology, objects.InstanceNUMATopology)
         self.assertEqual(1, instance_topology.cells[0].id)
 
+    @mock.patch.dict(hw._numa_fit_cache, clear=True)
+    @mock.patch.object(hw, '_numa_fit_instance_cell',
+                       wraps=hw._numa_fit_instance_cell)
+    def test_get_fitting_cached_for_identical_hosts(self, mock_fit):
+        # Like the NUMATopologyFilter, fit a copy of the instance topology
+        # on each host as fitting it updates its cells.
+        fitted_instance1 = hw.numa_fit_instance_to_host(
+                self.host, self.instance3.obj_clone(), self.limits)
+        calls = mock_fit.call_count
+        fitted_instance2 = hw.numa_fit_instance_to_host(
+                self.host.obj_clone(), self.instance3.obj_clone(),
+                self.limits)
+
+        self.assertEqual(calls, mock_fit.call_count)
+        self.assertIsNot(fitted_instance1, fitted_instance2)
+        self.assertEqual(1, fitted_instance2.cells[0].id)
+
+    @mock.patch.dict(hw._numa_fit_cache, clear=True)
+    @mock.patch.object(hw, '_numa_fit_instance_cell',
+                       wraps=hw._numa_fit_instance_cell)
+    def test_get_fitting_not_cached_for_different_usage(self, mock_fit):
+        fitted_instance1 = hw.numa_fit_instance_to_host(
+                self.host, self.instance1, self.limits)
+        calls = mock_fit.call_count
+        host = hw.numa_usage_from_instances(self.host, [fitted_instance1])
+        fitted_instance2 = hw.numa_fit_instance_to_host(
+                host, self.instance3, self.limits)
+
+        self.assertGreater(mock_fit.call_count, calls)
+        self.assertEqual(2, fitted_instance2.cells[0].id)
+
+    @mock.patch.dict(hw._numa_fit_cache, clear=True)
+    @mock.patch.object(hw, '_numa_fit_instance_cell',
+                       wraps=hw._numa_fit_instance_cell)
+    def test_get_fitting_prunes_permutations(self, mock_fit):
+        host = objects.NUMATopology(cells=[
+            objects.NUMACell(id=cell_id, cpuset=set([cell_id]),
+                             memory=2048, cpu_usage=0, memory_usage=0,
+                             mempages=[], siblings=[set([cell_id])],
+                             pinned_cpus=set([]))
+            for cell_id in range(4)])
+        instance = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=0, cpuset=set([0]), memory=1024),
+            objects.InstanceNUMACell(id=1, cpuset=set([1]), memory=4096)])
+
+        fitted_instance = hw.numa_fit_instance_to_host(host, instance)
+
+        self.assertIsNone(fitted_instance)
+        # The first instance cell is fitted on each host cell once and the
+        # second one is tried on each host cell once, instead of both
+        # being tried for all 12 permutations.
+        self.assertEqual(8, mock_fit.call_count)
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
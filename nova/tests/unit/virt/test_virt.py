@@ -18,9 +18,14 @@ import io
 import mock
 import six
 
+from nova.compute import power_state
+from nova import exception
+from nova import objects
 from nova import test
+from nova.tests import uuidsentinel as uuids
 from nova.virt.disk import api as disk_api
 from nova.virt import driver
+from nova.virt import hardware
 
 PROC_MOUNTS_CONTENTS = """rootfs / rootfs rw 0 0
 sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0
@@ -89,6 +94,22 @@ class TestVirtDriver(test.NoDBTestCase):
         self.assertTrue(driver.swap_is_usable({'device_name': '/dev/sdb',
                                                 'swap_size': 1}))
 
+    def test_get_power_states(self):
+        def fake_get_info(instance):
+            if instance.uuid == uuids.missing:
+                raise exception.InstanceNotFound(instance_id=instance.uuid)
+            return hardware.InstanceInfo(state=power_state.RUNNING)
+
+        drvr = driver.ComputeDriver(None)
+        instances = [objects.Instance(uuid=uuids.running),
+                     objects.Instance(uuid=uuids.missing)]
+        with mock.patch.object(drvr, 'get_info',
+                               side_effect=fake_get_info) as mock_get_info:
+            self.assertEqual({uuids.running: power_state.RUNNING,
+                              uuids.missing: power_state.NOSTATE},
+                             drvr.get_power_states(instances))
+        self.assertEqual(2, mock_get_info.call_count)
+
 
 class FakeMount(object):
     def __init__(self, image, mount_dir, partition=None, device=None):
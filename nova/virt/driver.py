@@ -22,11 +22,14 @@ Driver base-classes:
 
 import sys
 
+import eventlet
 from oslo_log import log as logging
 from oslo_utils import importutils
 import six
 
+from nova.compute import power_state
 import nova.conf
+from nova import exception
 from nova.i18n import _
 from nova.virt import event as virtevent
 
@@ -166,6 +169,29 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self, instances):
+        """Get the current power states of the given instances.
+
+        .. note::
+
+            This implementation calls get_info() for each instance,
+            concurrently. Drivers able to query the power states of all
+            their instances at once are encouraged to override it.
+
+        :param instances: list of nova.objects.instance.Instance objects
+        :returns: dict of nova.compute.power_state values keyed by
+                  instance UUID, power_state.NOSTATE for the instances not
+                  found on the hypervisor
+        """
+        def _get_power_state(instance):
+            try:
+                return instance.uuid, self.get_info(instance).state
+            except exception.InstanceNotFound:
+                return instance.uuid, power_state.NOSTATE
+
+        pool = eventlet.GreenPool(CONF.sync_power_state_pool_size)
+        return dict(pool.imap(_get_power_state, instances))
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -27,6 +27,7 @@ from nova import context
 from nova import exception
 from nova.i18n import _
 from nova import objects
+from nova.objects import base as obj_base
 from nova.objects import fields
 from nova.objects import instance as obj_instance
 
@@ -38,6 +39,12 @@ MEMPAGES_SMALL = -1
 MEMPAGES_LARGE = -2
 MEMPAGES_ANY = -3
 
+# Bound on the number of distinct fits remembered by
+# numa_fit_instance_to_host; a scheduling request against a homogeneous
+# fleet only needs a handful of them.
+_NUMA_FIT_CACHE_SIZE = 1024
+_numa_fit_cache = collections.OrderedDict()
+
 
 def get_vcpu_pin_set():
     """Parse vcpu_pin_set config.
@@ -1531,6 +1538,9 @@ def numa_fit_instance_to_host(
     with its cell ids set to host cell ids of the first successful
     permutation, or None.
 
+    Results of fits that request no PCI devices are remembered, so that
+    hosts with identical topology and usage are only fitted once.
+
     :param host_topology: objects.NUMATopology object to fit an
                           instance on
     :param instance_topology: objects.InstanceNUMATopology to be fitted
@@ -1566,42 +1576,127 @@ def numa_fit_instance_to_host(
         host_cells = sorted(host_cells, key=lambda cell: cell.id in [
             pool['numa_node'] for pool in pci_stats.pools])
 
+    # Fits requesting PCI devices are not cached, the PCI stats they are
+    # checked against change with every claim on the host.
+    cache_key = None
+    if not pci_requests:
+        cache_key = _numa_fit_cache_key(
+            host_topology, instance_topology, limits, pci_stats)
+        if cache_key in _numa_fit_cache:
+            _numa_fit_cache[cache_key] = cached = _numa_fit_cache.pop(
+                cache_key)
+            return cached.obj_clone() if cached else None
+
+    fitted = None
     # TODO(ndipanov): We may want to sort permutations differently
     # depending on whether we want packing/spreading over NUMA nodes
-    for host_cell_perm in itertools.permutations(
-            host_cells, len(instance_topology)):
-        cells = []
-        for host_cell, instance_cell in zip(
-                host_cell_perm, instance_topology.cells):
+    for cells in _numa_fit_instance_cells(host_cells, instance_topology,
+                                          limits):
+        if not pci_requests or ((pci_stats is not None) and
+                pci_stats.support_requests(pci_requests, cells)):
+            fitted = objects.InstanceNUMATopology(
+                cells=cells,
+                emulator_threads_policy=emulator_threads_policy)
+            break
+
+    if cache_key is not None:
+        _numa_fit_cache[cache_key] = fitted.obj_clone() if fitted else None
+        if len(_numa_fit_cache) > _NUMA_FIT_CACHE_SIZE:
+            _numa_fit_cache.popitem(last=False)
+
+    return fitted
+
+
+def _numa_fit_instance_cells(host_cells, instance_topology, limits):
+    """Generate the fitted instance cells of every host cell permutation.
+
+    Candidates are generated in the order itertools.permutations would
+    produce them, but a permutation is abandoned as soon as one of its
+    instance cells does not fit, and a host cell known not to fit a given
+    instance cell is never tried for it again.
+
+    :returns: a generator of lists of fitted objects.InstanceNUMACell
+    """
+    instance_cells = instance_topology.cells
+    used = [False] * len(host_cells)
+    unfit = set()
+    cells = []
+
+    def _fit(depth):
+        if depth == len(instance_cells):
+            yield list(cells)
+            return
+
+        instance_cell = instance_cells[depth]
+        cpuset_reserved = 0
+        if instance_topology.emulator_threads_isolated and depth == 0:
+            # For the case of isolate emulator threads, to
+            # make predictable where that CPU overhead is
+            # located we always configure it to be on host
+            # NUMA node associated to the guest NUMA node
+            # 0.
+            cpuset_reserved = 1
+
+        for index, host_cell in enumerate(host_cells):
+            # A successful fit records the page size it picked on the
+            # instance cell, so it is part of what made a fit fail.
+            unfit_key = (index, depth, instance_cell.pagesize)
+            if used[index] or unfit_key in unfit:
+                continue
             try:
-                cpuset_reserved = 0
-                if (instance_topology.emulator_threads_isolated
-                    and len(cells) == 0):
-                    # For the case of isolate emulator threads, to
-                    # make predictable where that CPU overhead is
-                    # located we always configure it to be on host
-                    # NUMA node associated to the guest NUMA node
-                    # 0.
-                    cpuset_reserved = 1
                 got_cell = _numa_fit_instance_cell(
                     host_cell, instance_cell, limits, cpuset_reserved)
             except exception.MemoryPageSizeNotSupported:
                 # This exception will been raised if instance cell's
                 # custom pagesize is not supported with host cell in
                 # _numa_cell_supports_pagesize_request function.
-                break
+                got_cell = None
             if got_cell is None:
-                break
+                unfit.add(unfit_key)
+                continue
+
+            used[index] = True
             cells.append(got_cell)
+            for fitted_cells in _fit(depth + 1):
+                yield fitted_cells
+            cells.pop()
+            used[index] = False
 
-        if len(cells) != len(host_cell_perm):
-            continue
+    return _fit(0)
 
-        if not pci_requests or ((pci_stats is not None) and
-                pci_stats.support_requests(pci_requests, cells)):
-            return objects.InstanceNUMATopology(
-                cells=cells,
-                emulator_threads_policy=emulator_threads_policy)
+
+def _numa_fit_cache_key(host_topology, instance_topology, limits,
+                        pci_stats):
+    """Build the numa_fit_instance_to_host cache key for a fit.
+
+    Only the NUMA nodes of the PCI pools matter when no PCI devices are
+    requested, as they decide which host cells are preferred.
+    """
+    pci_numa_nodes = None
+    if pci_stats:
+        pci_numa_nodes = frozenset(
+            pool['numa_node'] for pool in pci_stats.pools)
+    return (_numa_fit_fingerprint(host_topology),
+            _numa_fit_fingerprint(instance_topology),
+            _numa_fit_fingerprint(limits),
+            pci_numa_nodes)
+
+
+def _numa_fit_fingerprint(value):
+    """Return a hashable value equal for equal NUMA fitting inputs."""
+    if isinstance(value, obj_base.NovaObject):
+        return (value.obj_name(),
+                tuple((name, _numa_fit_fingerprint(getattr(value, name)))
+                      for name in sorted(value.fields)
+                      if value.obj_attr_is_set(name)))
+    if isinstance(value, dict):
+        return frozenset((key, _numa_fit_fingerprint(item))
+                         for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_numa_fit_fingerprint(item) for item in value)
+    return value
 
 
 def numa_get_reserved_huge_pages():
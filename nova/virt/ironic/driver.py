@@ -875,6 +875,28 @@ class IronicDriver(virt_driver.ComputeDriver):
 
         return hardware.InstanceInfo(state=map_power_state(node.power_state))
 
+    def get_power_states(self, instances):
+        """Get the current power states of the given instances, listing
+        the nodes associated with instances at once.
+
+        :param instances: list of nova.objects.instance.Instance objects
+        :returns: dict of nova.compute.power_state values keyed by
+                  instance UUID
+        :raises: VirtDriverNotReady
+        """
+        # A limit of 0 continues the pagination until all the nodes are
+        # returned.
+        node_list = self._get_node_list(
+            associated=True, limit=0,
+            fields=('uuid', 'instance_uuid', 'power_state'))
+        node_states = {node.instance_uuid: node.power_state
+                       for node in node_list}
+        power_states = {}
+        for instance in instances:
+            power_states[instance.uuid] = map_power_state(
+                node_states.get(instance.uuid, ironic_states.NOSTATE))
+        return power_states
+
     def deallocate_networks_on_reschedule(self, instance):
         """Does the driver want networks deallocated on reschedule?
 
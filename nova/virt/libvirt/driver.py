@@ -5454,6 +5454,21 @@ class LibvirtDriver(driver.ComputeDriver):
         # workaround, see libvirt/compat.py
         return guest.get_info(self._host)
 
+    def get_power_states(self, instances):
+        """Get the power states of the given instances with a single
+        request to libvirt.
+        """
+        states = self._host.get_instance_domain_states()
+        power_states = {}
+        for instance in instances:
+            state = states.get(instance.uuid)
+            if state is None:
+                power_states[instance.uuid] = power_state.NOSTATE
+            else:
+                power_states[instance.uuid] = (
+                    libvirt_guest.LIBVIRT_POWER_STATE[state])
+        return power_states
+
     def _create_domain_setup_lxc(self, context, instance, image_meta,
                                  block_device_info):
         inst_path = libvirt_utils.get_instance_path(instance)
@@ -593,6 +593,30 @@ class Host(object):
 
         return doms
 
+    def get_instance_domain_states(self, only_guests=True):
+        """Get the states of the libvirt domains of nova instances
+
+        :param only_guests: True to filter out any host domain (eg Dom-0)
+
+        Unlike querying the state of each domain returned by
+        "list_instance_domains", this sends a single request to libvirt
+        for all the domains, running or not.
+
+        :returns: dict of libvirt domain states keyed by domain UUID
+        """
+        flags = (libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE |
+                 libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE)
+        all_stats = self.get_connection().getAllDomainStats(
+            libvirt.VIR_DOMAIN_STATS_STATE, flags)
+
+        states = {}
+        for dom, stats in all_stats:
+            if only_guests and dom.ID() == 0:
+                continue
+            states[dom.UUIDString()] = stats['state.state']
+
+        return states
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
@@ -18,6 +18,8 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
+import time
 
 import six
 
@@ -76,6 +78,11 @@ class BaseWeigher(object):
     minval = None
     maxval = None
 
+    # Set to true in a subclass which implements _weigh_columns(), so that
+    # the weigher can weigh a whole batch of objects at once when the handler
+    # is given a columnar view of those objects.
+    supports_columns = False
+
     def weight_multiplier(self):
         """How weighted this weigher should be.
 
@@ -117,19 +124,76 @@ class BaseWeigher(object):
 
         return weights
 
+    def _weigh_columns(self, columns, weight_properties):
+        """Weigh all the objects of a columnar view at once.
+
+        Override this in a subclass which sets supports_columns.
+        """
+        raise NotImplementedError()
+
+    def weigh_columns(self, columns, weight_properties):
+        """Weigh all the objects of a columnar view in one pass.
+
+        This is the batch counterpart of weigh_objects(), returning the
+        weights in the order of the objects in the view and recording the
+        min and max values the same way.
+        """
+        weights = self._weigh_columns(columns, weight_properties)
+        if weights:
+            minval = min(weights)
+            maxval = max(weights)
+            if self.minval is None or minval < self.minval:
+                self.minval = minval
+            if self.maxval is None or maxval > self.maxval:
+                self.maxval = maxval
+        return weights
+
+
+def _iter_sorted(weighed_objs):
+    """Yields the weighed objects in the order of a sort by descending
+    weight, only sorting as many of them as are consumed.
+    """
+    heap = [(-w.weight, i, w) for i, w in enumerate(weighed_objs)]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[2]
+
 
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            columns_cls=None, timings=None, lazy=False):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        :param columns_cls: Optional callable building a columnar view of a
+                            list of objects. When given, weighers which set
+                            supports_columns weigh that view in one batch
+                            rather than one object at a time.
+        :param timings: Optional object recording the timings of a request,
+                        whose add_weigher() method is given the class name
+                        and the time spent for each weigher.
+        :param lazy: If True, return an iterator over the WeighedObjects
+                     which sorts them as they are consumed, in the same
+                     order as the sorted list, so that a caller only needing
+                     the best objects doesn't sort all of them.
+        """
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
 
         if len(weighed_objs) <= 1:
-            return weighed_objs
+            return iter(weighed_objs) if lazy else weighed_objs
 
+        columns = None
         for weigher in weighers:
-            weights = weigher.weigh_objects(weighed_objs, weighing_properties)
+            if timings is not None:
+                start_time = time.time()
+            if columns_cls is not None and weigher.supports_columns:
+                if columns is None:
+                    columns = columns_cls([w.obj for w in weighed_objs])
+                weights = weigher.weigh_columns(columns, weighing_properties)
+            else:
+                weights = weigher.weigh_objects(weighed_objs,
+                                                weighing_properties)
 
             # Normalize the weights
             weights = normalize(weights,
@@ -140,4 +204,10 @@ class BaseWeightHandler(loadables.BaseLoader):
                 obj = weighed_objs[i]
                 obj.weight += weigher.weight_multiplier() * weight
 
+            if timings is not None:
+                timings.add_weigher(weigher.__class__.__name__,
+                                    time.time() - start_time)
+
+        if lazy:
+            return _iter_sorted(weighed_objs)
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)